@@ -0,0 +1,134 @@
+# encoding: utf-8
+#
+# 导出 Logstash 镜像内全部插件及其配置项的 schema（供 Web/MCP 离线静态检查）
+#
+# 两种用法：
+#   1. 被 validator_worker.rb 加载，通过 {"op": "schema"} 请求返回
+#   2. 单独运行：docker run --rm -i --entrypoint /usr/share/logstash/bin/ruby <image> /dev/stdin < plugin_schema.rb
+#      结果以 "LAB_SCHEMA " 前缀单独输出一行 JSON
+#
+# schema 结构：
+#   {"version": 1, "logstash_version": "8.14.2",
+#    "plugins": {"filter": {"grok": {"options": {"match": {"type": "hash", "required": false, ...}},
+#                                    "option_patterns": []}}, ...}}
+# options 为 null 表示无法读取配置定义（如 Java 插件），静态检查时跳过配置项检查
+
+require "json"
+require "time"
+
+unless defined?(LogStash::PLUGIN_REGISTRY)
+  LOGSTASH_HOME = ENV.fetch("LOGSTASH_HOME", "/usr/share/logstash")
+  lib_dir = File.join(LOGSTASH_HOME, "lib")
+  $LOAD_PATH.unshift(lib_dir) unless $LOAD_PATH.include?(lib_dir)
+
+  require "bootstrap/environment"
+  require "bootstrap/bundler" unless defined?(LogStash::Bundler)
+  LogStash::Bundler.setup!({:without => [:build, :development]})
+  begin
+    require "bootstrap/patches/jar_dependencies"
+  rescue LoadError
+  end
+  require "logstash-core/logstash-core"
+  require "logstash/environment"
+  require "logstash/runner"
+
+  LogStash::SETTINGS.set_value("path.settings", File.join(LOGSTASH_HOME, "config"))
+  LogStash::PLUGIN_REGISTRY.setup!
+end
+
+module LabSchema
+  SCHEMA_VERSION = 1
+  PLUGIN_TYPES = %w(input filter output codec)
+
+  class << self
+    def extract
+      plugins = Hash[PLUGIN_TYPES.map { |type| [type, {}] }]
+      installed_plugins.each do |type, name|
+        begin
+          klass = LogStash::PLUGIN_REGISTRY.lookup(type, name)
+          plugins[type][name] = describe(klass)
+        rescue Exception, java.lang.Exception => e
+          plugins[type][name] = { "options" => nil, "option_patterns" => [], "load_error" => e.message.to_s }
+        end
+      end
+
+      # 内置插件（pipeline、java_stdout 等）不以 gem 形式安装
+      PLUGIN_TYPES.each do |type|
+        begin
+          LogStash::PLUGIN_REGISTRY.plugins_with_type(type.to_sym).each do |klass|
+            name = klass.respond_to?(:config_name) ? klass.config_name.to_s : nil
+            next if name.nil? || name.empty? || plugins[type].key?(name)
+            plugins[type][name] = describe(klass)
+          end
+        rescue Exception, java.lang.Exception
+        end
+      end
+
+      { "version" => SCHEMA_VERSION, "logstash_version" => LOGSTASH_VERSION,
+        "generated_at" => Time.now.utc.iso8601, "plugins" => plugins }
+    end
+
+    # [[type, name], ...]，包括 integration 插件内含的各个插件
+    def installed_plugins
+      result = []
+      Gem::Specification.each do |spec|
+        next unless spec.metadata && spec.metadata["logstash_plugin"] == "true"
+        if spec.metadata["logstash_group"] == "integration"
+          spec.metadata.fetch("integration_plugins", "").split(",").each do |gem_name|
+            parsed = parse_gem_name(gem_name.strip)
+            result << parsed if parsed
+          end
+        else
+          parsed = parse_gem_name(spec.name)
+          result << parsed if parsed
+        end
+      end
+      result.uniq
+    end
+
+    def parse_gem_name(gem_name)
+      match = gem_name.match(/\Alogstash-(input|filter|output|codec)-(.+)\z/)
+      match ? [match[1], match[2]] : nil
+    end
+
+    def describe(klass)
+      return { "options" => nil, "option_patterns" => [] } unless klass.respond_to?(:get_config)
+
+      options = {}
+      patterns = []
+      klass.get_config.each do |name, spec|
+        spec ||= {}
+        entry = {
+          "type" => type_of(spec[:validate]),
+          "required" => spec[:required] ? true : false,
+          "list" => spec[:list] ? true : false,
+          "deprecated" => message_of(spec[:deprecated]),
+          "obsolete" => message_of(spec[:obsolete])
+        }
+        entry["values"] = spec[:validate].map(&:to_s) if spec[:validate].is_a?(Array)
+        if name.is_a?(Regexp)
+          patterns << name.source
+        else
+          options[name.to_s] = entry
+        end
+      end
+      { "options" => options, "option_patterns" => patterns }
+    end
+
+    def type_of(validate)
+      return "enum" if validate.is_a?(Array)
+      return validate.to_s if validate.is_a?(Symbol)
+      "any"
+    end
+
+    def message_of(value)
+      return nil unless value
+      value.is_a?(String) ? value : true
+    end
+  end
+end
+
+if __FILE__ == $0 || $0 == "/dev/stdin" || $0 == "-"
+  $stdout.puts("LAB_SCHEMA " + JSON.generate(LabSchema.extract))
+  $stdout.flush
+end
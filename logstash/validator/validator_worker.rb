@@ -0,0 +1,151 @@
+# encoding: utf-8
+#
+# Logstash 配置验证常驻进程
+#
+# 在 Logstash 镜像内通过 bin/ruby 启动，JVM、JRuby 和插件只加载一次。
+# 监听 TCP 端口（默认 19600），每行一个 JSON 请求：
+#   {"id": "...", "config": "input { ... } filter { ... } output { ... }"}
+#   {"op": "ping"}
+#   {"op": "schema"}   导出插件/配置项 schema（见 plugin_schema.rb）
+#   {"op": "batch", "configs": [{"id": "a.conf", "config": "..."}, ...]}
+#     每个配置作为独立的 pipeline.id 依次编译，返回 {"ok": true, "results": [{"id": "a.conf", "success": ...}, ...]}
+# 每个请求在已预热的 JVM 中完成与 --config.test_and_exit 相同的检查
+# （解析配置、编译 pipeline、实例化全部插件），返回一行 JSON：
+#   {"id": "...", "success": true/false, "error": "...", "error_class": "...", "validation_time": 秒}
+#
+# 设置 VALIDATOR_BATCH_FILE 时不启动服务：读取该文件中的 batch 请求，验证后输出一行 "LAB_BATCH <JSON>" 并退出
+# （验证进程不可用时 docker run 一次完成整批验证）
+
+require "socket"
+require "json"
+
+LOGSTASH_HOME = ENV.fetch("LOGSTASH_HOME", "/usr/share/logstash")
+lib_dir = File.join(LOGSTASH_HOME, "lib")
+$LOAD_PATH.unshift(lib_dir) unless $LOAD_PATH.include?(lib_dir)
+
+require "bootstrap/environment"
+require "bootstrap/bundler" unless defined?(LogStash::Bundler)
+LogStash::Bundler.setup!({:without => [:build, :development]})
+begin
+  require "bootstrap/patches/jar_dependencies"
+rescue LoadError
+end
+require "logstash-core/logstash-core"
+require "logstash/environment"
+require "logstash/runner"
+
+LogStash::SETTINGS.set_value("path.settings", File.join(LOGSTASH_HOME, "config"))
+LogStash::PLUGIN_REGISTRY.setup!
+
+begin
+  require_relative "plugin_schema"
+rescue LoadError
+  # 单文件运行（docker run 批量验证）时没有 plugin_schema.rb
+end
+
+module LabValidator
+  PORT = Integer(ENV.fetch("VALIDATOR_PORT", "19600"))
+  # 单个请求最大字节数（JSON 行）
+  MAX_REQUEST_BYTES = Integer(ENV.fetch("VALIDATOR_MAX_REQUEST_BYTES", (16 * 1024 * 1024).to_s))
+  WARMUP_CONFIG = <<-CONF
+    input { generator { count => 1 } }
+    filter { mutate { add_field => { "a" => "b" } } grok { match => { "message" => "%{WORD:w}" } } ruby { code => "event" } }
+    output { stdout { codec => rubydebug } }
+  CONF
+
+  @lock = Mutex.new
+  @validations = 0
+
+  class << self
+    attr_reader :validations
+
+    # 与 LogStash::Runner 的 config.test_and_exit 分支一致：构造 PipelineConfig 并编译 JavaPipeline
+    def validate(config, pipeline_id = "lab_validation")
+      started = Time.now
+      @lock.synchronize do
+        @validations += 1
+        begin
+          settings = LogStash::SETTINGS.clone
+          settings.set_value("pipeline.id", pipeline_id)
+          part = org.logstash.common.SourceWithMetadata.new("string", "config_string", 0, 0, config)
+          pipeline_config = org.logstash.config.ir.PipelineConfig.new(
+            LogStash::Config::Source::Local, pipeline_id.to_sym, [part], settings
+          )
+          pipeline = LogStash::JavaPipeline.new(pipeline_config)
+          begin
+            pipeline.close
+          rescue Exception, java.lang.Exception
+          end
+          result(true, started)
+        rescue Exception, java.lang.Exception => e
+          result(false, started, e)
+        end
+      end
+    end
+
+    # 同一 JVM 中逐个编译，每个配置使用自己的 pipeline.id，错误按 id 返回
+    def validate_batch(configs)
+      return [] unless configs.is_a?(Array)
+      configs.each_with_index.map do |item, index|
+        id = (item.is_a?(Hash) && item["id"]) ? item["id"].to_s : "config_#{index}"
+        config = item.is_a?(Hash) ? item["config"] : nil
+        next { "id" => id, "success" => false, "error" => "missing config" } unless config.is_a?(String)
+
+        pipeline_id = "lab_batch_#{index}_#{id.gsub(/[^A-Za-z0-9_.-]/, "_")}"
+        validate(config, pipeline_id).merge("id" => id, "pipeline_id" => pipeline_id)
+      end
+    end
+
+    def result(success, started, error = nil)
+      response = { "success" => success, "validation_time" => (Time.now - started).round(3) }
+      if error
+        response["error"] = error.message.to_s
+        response["error_class"] = error.class.name
+      end
+      response
+    end
+
+    def handle(line)
+      request = JSON.parse(line)
+      return { "ok" => true, "ready" => true, "validations" => @validations, "logstash_version" => LOGSTASH_VERSION } if request["op"] == "ping"
+      return @lock.synchronize { { "ok" => true, "schema" => LabSchema.extract } } if request["op"] == "schema" && defined?(LabSchema)
+      return { "ok" => true, "results" => validate_batch(request["configs"]) } if request["op"] == "batch"
+
+      config = request["config"]
+      return { "id" => request["id"], "success" => false, "error" => "missing config" } unless config.is_a?(String)
+
+      validate(config, request["pipeline_id"] || "lab_validation").merge("id" => request["id"])
+    rescue JSON::ParserError => e
+      { "success" => false, "error" => "invalid request: #{e.message}" }
+    end
+
+    def serve(connection)
+      while (line = connection.gets("\n", MAX_REQUEST_BYTES))
+        next if line.strip.empty?
+        connection.write(JSON.generate(handle(line)) + "\n")
+      end
+    rescue IOError, SystemCallError
+    ensure
+      connection.close rescue nil
+    end
+
+    def run
+      warmup = validate(WARMUP_CONFIG, "warmup")
+      $stdout.puts("[validator] warmup #{warmup["success"] ? "ok" : "failed: #{warmup["error"]}"} in #{warmup["validation_time"]}s")
+      server = TCPServer.new("0.0.0.0", PORT)
+      $stdout.puts("[validator] listening on #{PORT}")
+      $stdout.flush
+      loop do
+        Thread.new(server.accept) { |connection| serve(connection) }
+      end
+    end
+  end
+end
+
+if ENV["VALIDATOR_BATCH_FILE"]
+  request = JSON.parse(File.read(ENV["VALIDATOR_BATCH_FILE"]))
+  $stdout.puts("LAB_BATCH " + JSON.generate(LabValidator.validate_batch(request["configs"])))
+  $stdout.flush
+else
+  LabValidator.run
+end
@@ -0,0 +1,16 @@
+#!/bin/sh
+# MCP 容器入口：以 root 启动，修正数据目录属主后降权为 mcp 用户运行
+# bind mount 的源目录不存在时由 dockerd 以 root 创建，mcp 用户（uid 1000）无法写入任务状态和验证缓存
+
+set -e
+
+if [ "$(id -u)" = "0" ]; then
+    for dir in "${JOB_DIR:-/app/data/jobs}" "${VALIDATION_CACHE_DIR:-/app/data/validation_cache}"; do
+        mkdir -p "$dir"
+        # 只修正属主不对的文件，避免每次启动都递归改写整个缓存目录
+        find "$dir" \! -user mcp -exec chown mcp:mcp {} +
+    done
+    exec setpriv --reuid=mcp --regid=mcp --init-groups "$@"
+fi
+
+exec "$@"
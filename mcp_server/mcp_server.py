@@ -12,7 +12,8 @@ import traceback
 import time
 import uuid
 from datetime import datetime
-from typing import Any, Dict, List, Optional, Union, Generator
+from urllib.parse import urlencode
+from typing import Any, Dict, List, Optional, Tuple, Union, Generator
 from flask import Flask, request, jsonify, Response, stream_template
 from flask_cors import CORS
 import requests
@@ -20,6 +21,18 @@ import threading
 
 # Logstash 测试服务配置
 LOGSTASH_SERVICE_URL = os.getenv("LOGSTASH_SERVICE_URL", "http://web:19000")
+# 上传配置后等待 Logstash 热重载完成的最长时间（秒）
+RELOAD_TIMEOUT = float(os.getenv("RELOAD_TIMEOUT", "60"))
+# Logstash 容器名（通过 Docker Engine API 读取日志）
+LOGSTASH_CONTAINER = os.getenv("LOGSTASH_CONTAINER", "logstash-lab")
+# Logstash 监控 API 和组合健康状态的后台刷新间隔（秒）
+LOGSTASH_API = os.getenv("LOGSTASH_API", "http://logstash:9600")
+HEALTH_INTERVAL = float(os.getenv("HEALTH_INTERVAL", "10"))
+# 后台测试任务并发数（测试流程共用同一个 Logstash 环境，默认串行）
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "1"))
+# 完整测试流程排队等待测试沙箱的最长时间（秒）
+SANDBOX_QUEUE_TIMEOUT = float(os.getenv("SANDBOX_QUEUE_TIMEOUT", "600"))
+SANDBOX_TICKET_HEADER = "X-Sandbox-Ticket"
 
 app = Flask(__name__)
 CORS(app)  # 启用跨域支持
@@ -28,38 +41,53 @@ class LogstashMCPServer:
     """Logstash 测试服务 SSE 版本 MCP 服务器"""
     
     def __init__(self):
-        self.session = requests.Session()
-        self.session.headers.update({
-            'Content-Type': 'application/x-www-form-urlencoded'
-        })
+        import sys
+        sys.path.append('/app/utils')
+        from service_client import ServiceClient
+        
+        # 调用 Web 服务的共享客户端：连接池复用、幂等请求重试、熔断、按接口统计延迟
+        self.client = ServiceClient(LOGSTASH_SERVICE_URL)
         # 服务器启动时间
         self.start_time = datetime.now()
         # 活跃的 SSE 连接
         self.active_connections = {}
+        # Docker Engine API 客户端（首次读取日志时创建，连接池复用）
+        self.docker = None
+        # Logstash 日志跟踪器（首次读取日志时启动）
+        self.log_follower = None
+        # 组合健康状态（首次健康检查时启动后台刷新）
+        self.health = None
+        # 后台测试任务（首次提交时启动 worker）
+        self.jobs = None
+        # 当前线程持有的沙箱票据（完整测试流程期间的请求都带上）
+        self._sandbox = threading.local()
         
-    def _make_request(self, method: str, endpoint: str, data: Optional[Dict] = None, files: Optional[Dict] = None, timeout: int = 30) -> Dict[str, Any]:
-        """统一的请求处理方法"""
-        url = f"{LOGSTASH_SERVICE_URL}{endpoint}"
+    def _make_request(self, method: str, endpoint: str, data: Optional[Dict] = None, files: Optional[Dict] = None, timeout: int = 30,
+                      label: Optional[str] = None) -> Dict[str, Any]:
+        """统一的请求处理方法（label 为延迟直方图的路由模板，endpoint 带 ID 时传入）"""
+        from service_client import CircuitOpenError
         
         try:
-            if method.upper() == "GET":
-                response = requests.get(url, timeout=timeout)
-            elif method.upper() == "POST":
-                if files:
-                    response = requests.post(url, files=files, timeout=timeout)
-                else:
-                    response = self.session.post(url, data=data, timeout=timeout)
-            else:
+            if method.upper() not in ("GET", "POST", "DELETE"):
                 return {"success": False, "error": f"不支持的 HTTP 方法: {method}"}
+            ticket = getattr(self._sandbox, "ticket", None)
+            headers = {SANDBOX_TICKET_HEADER: ticket} if ticket else None
+            response = self.client.request(method, endpoint, data=data, files=files, timeout=timeout, headers=headers,
+                                           label=label)
             
-            if response.status_code == 200:
+            if response.status_code in (200, 201):
                 return response.json()
+            elif response.status_code in (409, 423):
+                # 沙箱被占用 / 票据失效：Web 返回 JSON 说明
+                return {**response.json(), "success": False, "status_code": response.status_code}
             else:
                 return {
                     "success": False, 
                     "error": f"HTTP {response.status_code}: {response.text}",
                     "status_code": response.status_code
                 }
+        except CircuitOpenError as e:
+            return {"success": False, "error": f"Logstash 测试服务不可用: {e}"}
         except requests.exceptions.ConnectionError:
             return {"success": False, "error": "无法连接到 Logstash 测试服务"}
         except requests.exceptions.Timeout:
@@ -83,8 +111,33 @@ class LogstashMCPServer:
                 print(f"SSE 发送失败: {e}")
         return None
     
-    def upload_pipeline(self, pipeline_content: str, use_file_upload: bool = True) -> Dict[str, Any]:
-        """上传 Pipeline 配置"""
+    def upload_pipeline(self, pipeline_content: str, use_file_upload: bool = True,
+                        wait_reload: bool = True, reload_timeout: Optional[float] = None,
+                        benchmark_gate: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """
+        上传 Pipeline 配置，默认等待 Logstash 热重载完成（或失败）后返回
+        
+        Args:
+            benchmark_gate: 基准测试把关 {test_logs, is_json, rate, events, duration, batch_size, repeat}：
+                新配置生效后重复测量并与基线比较，显著回归时 Web 服务恢复上传前的配置
+        """
+        reload_timeout = RELOAD_TIMEOUT if reload_timeout is None else reload_timeout
+        options = {"wait_reload": "1" if wait_reload else "0", "reload_timeout": str(reload_timeout)}
+        # 请求超时需覆盖服务端等待重载的时间
+        timeout = int(reload_timeout) + 30 if wait_reload else 30
+        if benchmark_gate:
+            options.update({"benchmark_gate": "1",
+                            "gate_logs_json": json.dumps(benchmark_gate.get("test_logs", []), ensure_ascii=False)})
+            if benchmark_gate.get("is_json"):
+                options["gate_is_json"] = "1"
+            for name in ("rate", "events", "duration", "batch_size", "repeat"):
+                if benchmark_gate.get(name) is not None:
+                    options[f"gate_{name}"] = str(benchmark_gate[name])
+            # 基线和新配置各运行 repeat 次，失败时还要等待回滚重载
+            runs = 2 * (benchmark_gate.get("repeat") or 3)
+            rate = benchmark_gate.get("rate")
+            per_run = benchmark_gate.get("duration") or ((benchmark_gate.get("events") or 2000) / rate if rate else 60)
+            timeout = int(reload_timeout) * 2 + int(runs * (per_run + 30)) + 30
         if use_file_upload:
             # 文件上传方式（推荐）
             with tempfile.NamedTemporaryFile(mode='w', suffix='.conf', delete=False) as f:
@@ -94,27 +147,34 @@ class LogstashMCPServer:
             try:
                 with open(temp_file, 'rb') as f:
                     files = {'file': ('pipeline.conf', f, 'text/plain')}
-                    result = self._make_request("POST", "/upload_pipeline", files=files)
+                    result = self._make_request("POST", "/upload_pipeline", data=options, files=files, timeout=timeout)
             finally:
                 os.unlink(temp_file)
         else:
             # 文本内容上传
-            data = {"pipeline": pipeline_content}
-            result = self._make_request("POST", "/upload_pipeline", data=data)
+            data = {"pipeline": pipeline_content, **options}
+            result = self._make_request("POST", "/upload_pipeline", data=data, timeout=timeout)
         
         return {
             "success": result.get("ok", False),
             "message": result.get("message", ""),
+            "benchmark_gate": result.get("benchmark_gate"),
             "extracted_filters": result.get("extracted_filters", 0),
+            "changed": result.get("changed", True),
+            "reload_expected": result.get("reload_expected", True),
+            "written": "changed" in result,
+            "reload": result.get("reload"),
             "preview": result.get("applied_filter_preview", "")[:200] + "..." if result.get("applied_filter_preview") else "",
             "raw_response": result
         }
     
-    def send_test_log(self, log_content: str, is_json: bool = False) -> Dict[str, Any]:
-        """发送测试日志"""
+    def send_test_log(self, log_content: str, is_json: bool = False, wait_timeout: Optional[float] = None) -> Dict[str, Any]:
+        """发送测试日志，返回携带本次关联 ID 的事件"""
         data = {"logs": log_content}
         if is_json:
             data["is_json"] = "1"
+        if wait_timeout is not None:
+            data["timeout"] = str(wait_timeout)
         
         result = self._make_request("POST", "/test", data=data)
         events = result.get("events", [])
@@ -122,12 +182,47 @@ class LogstashMCPServer:
         return {
             "success": result.get("ok", False),
             "message": result.get("message", ""),
+            "run_id": result.get("run_id"),
+            "complete": result.get("complete", False),
             "events_count": len(events),
             "events": events,
             "latest_event": events[-1] if events else None,
             "raw_response": result
         }
     
+    def send_test_logs_bulk(self, logs: List[str], is_json: bool = False, batch_size: Optional[int] = None,
+                            wait_timeout: Optional[float] = None, max_events: int = 0) -> Dict[str, Any]:
+        """批量发送测试日志（每项一条日志，Web 端按 NDJSON 分批经连接池提交），返回本次全部事件"""
+        data = {"logs_json": json.dumps(logs, ensure_ascii=False), "max_events": str(max_events)}
+        if is_json:
+            data["is_json"] = "1"
+        if batch_size is not None:
+            data["batch_size"] = str(batch_size)
+        if wait_timeout is not None:
+            data["timeout"] = str(wait_timeout)
+        
+        # 请求超时需覆盖服务端等待结果的时间
+        timeout = 30 + (wait_timeout if wait_timeout is not None else len(logs) / 1000.0)
+        result = self._make_request("POST", "/test_bulk", data=data, timeout=int(timeout))
+        events = result.get("events", [])
+        
+        return {
+            "success": result.get("ok", False),
+            "message": result.get("message", result.get("error", "")),
+            "bulk_supported": result.get("bulk_supported", True),
+            "run_id": result.get("run_id"),
+            "expected": result.get("expected", 0),
+            "complete": result.get("complete", False),
+            "send_time": result.get("send_time"),
+            "wait_time": result.get("wait_time"),
+            "batches": result.get("batches", 0),
+            "failed": result.get("failed", 0),
+            "errors": result.get("errors", []),
+            "events_count": result.get("received", len(events)),
+            "events": events,
+            "truncated": result.get("truncated", False)
+        }
+    
     def validate_pipeline(self, pipeline_content: str) -> Dict[str, Any]:
         """验证 Pipeline 配置"""
         try:
@@ -147,7 +242,8 @@ class LogstashMCPServer:
                     "success": validation_result["success"],
                     "errors": validation_result["errors"],
                     "warnings": validation_result["warnings"],
-                    "validation_time": validation_result["validation_time"]
+                    "validation_time": validation_result["validation_time"],
+                    "cache_hit": validation_result.get("cache_hit", False)
                 },
                 "raw_output": validation_result["raw_output"]
             }
@@ -164,8 +260,50 @@ class LogstashMCPServer:
                 "raw_output": ""
             }
     
-    def get_parsed_results(self, count: int = -1) -> Dict[str, Any]:
-        """获取解析结果"""
+    def validate_pipelines_batch(self, configs: List[Dict[str, str]]) -> Dict[str, Any]:
+        """批量验证多个 Pipeline 配置（同一个 Logstash 进程，错误按名称返回）"""
+        try:
+            import sys
+            sys.path.append('/app/utils')
+            from pipeline_validator import validate_pipeline_configs
+            
+            named = {}
+            for index, item in enumerate(configs):
+                name = str(item.get("name") or f"config_{index + 1}")
+                if name in named:
+                    name = f"{name}#{index + 1}"
+                named[name] = item.get("content", "")
+            
+            report = validate_pipeline_configs(named)
+            summary = report["summary"]
+            return {
+                "success": report["success"],
+                "message": f"共 {summary['total']} 个配置，通过 {summary['passed']} 个，失败 {summary['failed']} 个",
+                "summary": summary,
+                "results": [{
+                    "name": item["name"],
+                    "success": item["success"],
+                    "errors": item["errors"],
+                    "warnings": item["warnings"],
+                    "validation_time": item["validation_time"],
+                    "cache_hit": item.get("cache_hit", False)
+                } for item in report["results"]],
+                "validation_time": report["validation_time"]
+            }
+        except Exception as e:
+            return {
+                "success": False,
+                "message": f"批量验证出错: {str(e)}",
+                "summary": {"total": len(configs), "passed": 0, "failed": len(configs)},
+                "results": [],
+                "validation_time": 0
+            }
+    
+    def get_parsed_results(self, count: int = -1, since: Optional[int] = None, limit: Optional[int] = None) -> Dict[str, Any]:
+        """获取解析结果；指定 since 时按游标分页读取"""
+        if since is not None:
+            return self._read_results_page(since, limit if limit and limit > 0 else 1000)
+        
         result = self._make_request("GET", "/get_parsed_results")
         events = result.get("events", [])
         
@@ -181,6 +319,46 @@ class LogstashMCPServer:
             "raw_response": result
         }
     
+    def _read_results_page(self, since: int, limit: int) -> Dict[str, Any]:
+        """通过 NDJSON 流式接口读取一页结果，逐行解析避免一次性加载"""
+        try:
+            with self.client.get("/results", params={"since": since, "limit": limit}, stream=True, timeout=60) as response:
+                if response.status_code != 200:
+                    return {
+                        "success": False,
+                        "error": f"HTTP {response.status_code}: {response.text}",
+                        "status_code": response.status_code
+                    }
+                
+                events = []
+                for line in response.iter_lines():
+                    if not line.strip():
+                        continue
+                    try:
+                        events.append(json.loads(line))
+                    except json.JSONDecodeError:
+                        continue
+                
+                next_cursor = int(response.headers.get("X-Next-Cursor", since))
+                total = int(response.headers.get("X-Total-Events", 0))
+                return {
+                    "success": True,
+                    "cursor": int(response.headers.get("X-Cursor", since)),
+                    "next_cursor": next_cursor,
+                    "total_count": total,
+                    "has_more": next_cursor < total,
+                    "generation": int(response.headers.get("X-Result-Generation", 0)),
+                    "returned_count": len(events),
+                    "events": events,
+                    "latest_event": events[-1] if events else None
+                }
+        except requests.exceptions.ConnectionError:
+            return {"success": False, "error": "无法连接到 Logstash 测试服务"}
+        except requests.exceptions.Timeout:
+            return {"success": False, "error": "请求超时 (60s)"}
+        except Exception as e:
+            return {"success": False, "error": f"请求异常: {str(e)}"}
+    
     def clear_results(self) -> Dict[str, Any]:
         """清空解析结果"""
         result = self._make_request("POST", "/clear_results")
@@ -191,70 +369,83 @@ class LogstashMCPServer:
             "raw_response": result
         }
     
-    def get_logstash_logs(self, filter_errors: bool = False) -> Dict[str, Any]:
-        """获取 Logstash 日志"""
+    def _get_log_follower(self):
+        """Logstash 容器日志跟踪器（首次调用时启动后台线程，之后所有查询都读内存）"""
+        if self.log_follower is None:
+            import sys
+            sys.path.append('/app/utils')
+            from docker_engine import DockerEngineClient
+            from log_follower import ContainerLogSource, LogFollower
+            
+            if self.docker is None:
+                self.docker = DockerEngineClient()
+            self.log_follower = LogFollower(ContainerLogSource(LOGSTASH_CONTAINER, self.docker)).start()
+        return self.log_follower
+    
+    def get_logstash_logs(self, filter_errors: bool = False, lines: int = 100, since: Any = None) -> Dict[str, Any]:
+        """
+        获取 Logstash 日志
+        
+        Args:
+            filter_errors: 只返回 ERROR/FATAL 日志（走级别索引，不限于最近 lines 行）
+            lines: 返回最近的日志条数
+            since: 起始时间（Unix 秒），或 "run_start" 表示本次 Logstash 启动以来
+        """
         try:
-            import subprocess
-            import time
+            import sys
+            sys.path.append('/app/utils')
+            from logstash_logs import format_record
             
-            # 使用 docker logs 命令直接获取 Logstash 容器日志
-            result = subprocess.run(
-                ["docker", "logs", "--tail", "100", "logstash-lab"],
-                capture_output=True,
-                text=True,
-                timeout=30
-            )
+            follower = self._get_log_follower()
+            follower.wait_ready(timeout=10)
+            if since == "run_start":
+                since = follower.run_started_at
+            elif since is not None:
+                since = float(since)
             
-            if result.returncode == 0:
-                # 成功获取日志
-                logs_output = result.stdout + result.stderr  # 合并标准输出和错误输出
-                current_time = time.strftime("%Y-%m-%d %H:%M:%S")
-                
-                logs_content = []
-                logs_content.append(f"📋 Logstash 容器日志")
-                logs_content.append(f"📅 获取时间: {current_time}")
-                logs_content.append(f"📊 显示最近 100 条日志")
-                logs_content.append("=" * 80)
-                
-                if logs_output.strip():
-                    logs_content.extend(logs_output.strip().split('\n'))
-                else:
-                    logs_content.append("📝 暂无日志输出")
-                
-                logs = '\n'.join(logs_content)
-                
-                if filter_errors:
-                    log_lines = logs_output.split('\n')
-                    error_lines = [line for line in log_lines if 'ERROR' in line.upper() or 'FATAL' in line.upper()]
-                    filtered_logs = '\n'.join(error_lines)
-                    
-                    return {
-                        "success": True,
-                        "total_lines": len(log_lines),
-                        "error_lines": len(error_lines),
-                        "logs": filtered_logs if error_lines else "未发现错误日志",
-                        "raw_response": {"ok": True, "logs": logs}
-                    }
-                
+            records = follower.tail(lines, since)
+            if not records and not follower.connected and follower.last_error:
                 return {
-                    "success": True,
-                    "logs": logs,
-                    "raw_response": {"ok": True, "logs": logs}
+                    "success": False,
+                    "logs": f"获取日志失败: {follower.last_error}",
+                    "raw_response": {"ok": False, "error": follower.last_error}
                 }
+            
+            current_time = time.strftime("%Y-%m-%d %H:%M:%S")
+            
+            logs_content = []
+            logs_content.append(f"📋 Logstash 容器日志")
+            logs_content.append(f"📅 获取时间: {current_time}")
+            logs_content.append(f"📊 显示最近 {len(records)} 条日志")
+            logs_content.append("=" * 80)
+            
+            # 容器日志为 log.format: json，解析后按 text 格式展示
+            if records:
+                logs_content.extend(format_record(record) for record in records)
             else:
-                # docker logs 命令失败
+                logs_content.append("📝 暂无日志输出")
+            
+            logs = '\n'.join(logs_content)
+            
+            if filter_errors:
+                # 按日志级别过滤（消息中恰好包含 "error" 字样的 INFO 记录不算错误）
+                error_lines = [format_record(record) for record in follower.errors(since)]
+                filtered_logs = '\n'.join(error_lines)
+                
                 return {
-                    "success": False,
-                    "logs": f"获取日志失败: {result.stderr}",
-                    "raw_response": {"ok": False, "error": result.stderr}
+                    "success": True,
+                    "total_lines": follower.stats()["total_records"],
+                    "error_lines": len(error_lines),
+                    "logs": filtered_logs if error_lines else "未发现错误日志",
+                    "raw_response": {"ok": True, "logs": logs}
                 }
-                
-        except subprocess.TimeoutExpired:
+            
             return {
-                "success": False,
-                "logs": "获取日志超时（30秒）",
-                "raw_response": {"ok": False, "error": "timeout"}
+                "success": True,
+                "logs": logs,
+                "raw_response": {"ok": True, "logs": logs}
             }
+                
         except Exception as e:
             return {
                 "success": False,
@@ -262,155 +453,572 @@ class LogstashMCPServer:
                 "raw_response": {"ok": False, "error": str(e)}
             }
     
+    def _hold_sandbox(self, owner: str) -> Optional[str]:
+        """
+        同步领取测试沙箱租约（票据记录在当前线程上，之后的请求都带上，用完调用 _release_sandbox）
+        
+        Returns:
+            失败时的错误信息，成功返回 None
+        """
+        steps = self._wait_for_sandbox(owner)
+        error = None
+        try:
+            while True:
+                event_type, data = next(steps)
+                if event_type == "error":
+                    error = data["message"]
+        except StopIteration as stop:
+            return None if stop.value is not None else (error or "申请测试沙箱失败")
+    
+    def profile_pipeline(self, test_logs: List[str], is_json: bool = False, pipeline_content: Optional[str] = None,
+                         repeat: Optional[int] = None, top: int = 10) -> Dict[str, Any]:
+        """
+        性能分析：按插件和条件分支统计每个事件的耗时（基于 Logstash 插件统计的前后差值）
+        
+        Args:
+            pipeline_content: 先上传该配置（等待热重载）再分析；不传则分析当前配置
+            repeat: 日志重复次数，不传时由 Web 服务重复到足够的样本量
+            top: 排行保留的条数
+        """
+        data = {"logs_json": json.dumps(test_logs, ensure_ascii=False), "top": str(top)}
+        if is_json:
+            data["is_json"] = "1"
+        if repeat:
+            data["repeat"] = str(repeat)
+        
+        try:
+            if pipeline_content:
+                # 上传和分析在同一个沙箱租约内，避免中途被其他调用方替换配置
+                error = self._hold_sandbox("mcp-profile")
+                if error:
+                    return {"success": False, "message": error}
+                upload_result = self.upload_pipeline(pipeline_content, wait_reload=True)
+                if not upload_result["written"] or (upload_result.get("reload") or {}).get("status") in ("failed", "timeout"):
+                    return {"success": False, "message": f"Pipeline 上传失败: {upload_result.get('message')}",
+                            "upload": upload_result}
+            result = self._make_request("POST", "/profile", data=data, timeout=int(RELOAD_TIMEOUT) + 60)
+        finally:
+            self._release_sandbox()
+        
+        return {
+            "success": result.get("ok", False),
+            "message": result.get("message") or result.get("error", ""),
+            "sent": result.get("sent"),
+            "repeat": result.get("repeat"),
+            "report": result.get("report")
+        }
+    
+    def benchmark_pipeline(self, test_logs: List[str], is_json: bool = False, pipeline_content: Optional[str] = None,
+                           rate: Optional[float] = None, events: Optional[int] = None,
+                           duration: Optional[float] = None, batch_size: Optional[int] = None,
+                           warmup: Optional[int] = None, repeat: Optional[int] = None,
+                           set_baseline: bool = False) -> Dict[str, Any]:
+        """
+        基准测试：循环回放日志语料，测量吞吐量（事件/秒）和提交 → 写入结果文件的 p50/p95/p99 延迟
+        
+        Args:
+            pipeline_content: 先上传该配置（等待热重载）再测试；不传则测试当前配置
+            rate: 目标速率（事件/秒），不传时尽可能快地发送
+            events / duration: 发送的事件数 / 发送时长（秒），都不传时发送一遍语料
+            repeat: 重复运行次数（结果附带各指标的 95% 置信区间和与基线的比较）
+            set_baseline: 把当前配置保存为该语料和运行参数下的基线
+        """
+        data = {"logs_json": json.dumps(test_logs, ensure_ascii=False)}
+        if is_json:
+            data["is_json"] = "1"
+        for name, value in (("rate", rate), ("events", events), ("duration", duration),
+                            ("batch_size", batch_size), ("warmup", warmup), ("repeat", repeat)):
+            if value is not None:
+                data[name] = str(value)
+        if set_baseline:
+            data["set_baseline"] = "1"
+        # 发送时长 + 等待结果写入的时间
+        expected = (duration or ((events or len(test_logs)) / rate if rate else 60)) * (repeat or 1)
+        
+        try:
+            if pipeline_content:
+                error = self._hold_sandbox("mcp-benchmark")
+                if error:
+                    return {"success": False, "message": error}
+                upload_result = self.upload_pipeline(pipeline_content, wait_reload=True)
+                if not upload_result["written"] or (upload_result.get("reload") or {}).get("status") in ("failed", "timeout"):
+                    return {"success": False, "message": f"Pipeline 上传失败: {upload_result.get('message')}",
+                            "upload": upload_result}
+            result = self._make_request("POST", "/benchmark", data=data,
+                                        timeout=int(expected) + int(RELOAD_TIMEOUT) + 60)
+        finally:
+            self._release_sandbox()
+        
+        return {
+            "success": result.get("ok", False),
+            "message": result.get("message") or result.get("error", ""),
+            "result": result.get("result"),
+            "runs": result.get("runs"),
+            "aggregate": result.get("aggregate"),
+            "comparison": result.get("comparison")
+        }
+    
+    def compare_benchmark_baseline(self, run_id: Optional[str] = None, baseline_config: Optional[str] = None,
+                                   samples: Optional[int] = None, min_effect: Optional[float] = None) -> Dict[str, Any]:
+        """
+        与基线比较：run_id（默认最近一次基准测试）的配置在同一语料、同一运行参数下最近几次运行的结果
+        
+        Args:
+            baseline_config: 基线配置哈希，不传时使用保存的基线
+            samples: 每方取最近几次运行
+            min_effect: 判定回归的最小相对变化（默认 0.05）
+        """
+        params = {name: value for name, value in (("run_id", run_id), ("baseline_config", baseline_config),
+                                                  ("samples", samples), ("min_effect", min_effect))
+                  if value is not None}
+        endpoint = "/benchmarks/compare" + (f"?{urlencode(params)}" if params else "")
+        result = self._make_request("GET", endpoint, label="/benchmarks/compare")
+        comparison = result.get("comparison")
+        return {
+            "success": comparison is not None,
+            "regression": bool(comparison) and comparison["status"] == "regression",
+            "message": result.get("message") or result.get("error", ""),
+            "comparison": comparison
+        }
+    
+    def set_benchmark_baseline(self, run_id: Optional[str] = None, label: Optional[str] = None) -> Dict[str, Any]:
+        """把 run_id（默认最近一次基准测试）的配置保存为同一语料、同一运行参数下的基线"""
+        data = {name: value for name, value in (("run_id", run_id), ("label", label)) if value is not None}
+        result = self._make_request("POST", "/benchmarks/baseline", data=data)
+        return {
+            "success": result.get("ok", False),
+            "message": result.get("message") or result.get("error", ""),
+            "baseline": result.get("baseline")
+        }
+    
+    def sweep_pipeline_settings(self, test_logs: List[str], is_json: bool = False,
+                                pipeline_content: Optional[str] = None, workers: Optional[List[int]] = None,
+                                batch_sizes: Optional[List[int]] = None, batch_delays: Optional[List[int]] = None,
+                                events: Optional[int] = None, repeat: Optional[int] = None,
+                                max_p99_ms: Optional[float] = None, keep: bool = False) -> Dict[str, Any]:
+        """
+        参数扫描：逐组改写 pipelines.yml 中的 pipeline.workers / batch.size / batch.delay 并运行基准测试，
+        返回吞吐量/延迟曲面和推荐参数
+        
+        Args:
+            pipeline_content: 先上传该配置（等待热重载）再扫描；不传则扫描当前配置
+            workers / batch_sizes / batch_delays: 各参数的取值（不传使用 Web 服务的默认网格）
+            events / repeat: 每组参数的事件数和运行次数
+            max_p99_ms: 推荐参数的 p99 延迟上限
+            keep: 扫描结束后保留推荐参数（默认恢复原来的 pipelines.yml）
+        """
+        data = {"logs_json": json.dumps(test_logs, ensure_ascii=False)}
+        if is_json:
+            data["is_json"] = "1"
+        for name, values in (("workers", workers), ("batch_sizes", batch_sizes), ("batch_delays", batch_delays)):
+            if values:
+                data[name] = ",".join(str(value) for value in values)
+        for name, value in (("events", events), ("repeat", repeat), ("max_p99_ms", max_p99_ms)):
+            if value is not None:
+                data[name] = str(value)
+        if keep:
+            data["keep"] = "1"
+        # 每组参数：等待 pipeline 重建（热重载未生效时重启 Logstash）+ 每次运行
+        points = len(workers or [1, 2, 4]) * len(batch_sizes or [125, 250, 500]) * len(batch_delays or [None])
+        
+        try:
+            if pipeline_content:
+                error = self._hold_sandbox("mcp-benchmark")
+                if error:
+                    return {"success": False, "message": error}
+                upload_result = self.upload_pipeline(pipeline_content, wait_reload=True)
+                if not upload_result["written"] or (upload_result.get("reload") or {}).get("status") in ("failed", "timeout"):
+                    return {"success": False, "message": f"Pipeline 上传失败: {upload_result.get('message')}",
+                            "upload": upload_result}
+            result = self._make_request("POST", "/benchmark/sweep", data=data,
+                                        timeout=points * ((repeat or 2) * 60 + 180) + 60)
+        finally:
+            self._release_sandbox()
+        
+        return {
+            "success": result.get("ok", False),
+            "message": result.get("message") or result.get("error", ""),
+            "sweep": result.get("sweep")
+        }
+    
+    def get_service_metrics(self) -> Dict[str, Any]:
+        """调用 Web 服务的延迟直方图（按接口）、熔断器状态和日志跟踪器状态"""
+        return {
+            "success": True,
+            "server_start_time": self.start_time.isoformat(),
+            "web_service": self.client.metrics(),
+            "log_follower": self.log_follower.stats() if self.log_follower is not None else None
+        }
+    
+    def _get_health_monitor(self):
+        """Web 服务、Logstash 监控 API、pipeline 状态的组合健康检查，后台定期刷新"""
+        if self.health is None:
+            from health_monitor import HealthMonitor
+            from logstash_monitor import LogstashMonitor
+            
+            monitor = LogstashMonitor(LOGSTASH_API, "test")
+            
+            def check_web():
+                response = self.client.get("/healthz", timeout=3)
+                result = {"healthy": response.status_code == 200, "url": LOGSTASH_SERVICE_URL}
+                if response.status_code == 200:
+                    result.update(response.json())
+                else:
+                    result["error"] = f"HTTP {response.status_code}"
+                return result
+            
+            def check_logstash():
+                response = monitor.session.get(f"{LOGSTASH_API}/", timeout=monitor.timeout)
+                info = response.json() if response.status_code == 200 else {}
+                return {
+                    "healthy": response.status_code == 200 and info.get("status") != "red",
+                    "url": LOGSTASH_API,
+                    "status": info.get("status"),
+                    "version": info.get("version")
+                }
+            
+            def check_pipeline():
+                state = monitor.snapshot()
+                if state is None:
+                    return {"healthy": False, "error": "Logstash 监控 API 不可达"}
+                return {"healthy": state["running"], "pipeline_id": monitor.pipeline_id, **state}
+            
+            self.health = HealthMonitor(
+                {"web": check_web, "logstash": check_logstash, "pipeline": check_pipeline},
+                required=("web",),
+                interval=HEALTH_INTERVAL
+            ).start()
+        return self.health
+    
     def health_check(self) -> Dict[str, Any]:
-        """健康检查"""
-        result = self._make_request("GET", "/get_parsed_results", timeout=5)
-        healthy = result.get("ok", False) and not result.get("error")
+        """
+        健康检查（读取后台刷新的缓存）
+        
+        healthy 只取决于 Web 服务；Logstash 或 pipeline 异常时 status 为 degraded
+        """
+        snapshot = self._get_health_monitor().snapshot()
         
         return {
-            "healthy": healthy,
+            "healthy": snapshot["healthy"],
+            "status": snapshot["status"],
             "logstash_service_url": LOGSTASH_SERVICE_URL,
             "server_start_time": self.start_time.isoformat(),
             "current_time": datetime.now().isoformat(),
-            "details": result
+            "checked_at": snapshot["checked_at"],
+            "age_seconds": snapshot["age_seconds"],
+            "details": snapshot["components"]
         }
     
+    def _wait_for_sandbox(self, owner: str) -> Generator[Tuple[str, Dict[str, Any]], None, Optional[Dict[str, Any]]]:
+        """
+        领取沙箱票据并等待轮到，排队期间产出位置变化；票据记录在当前线程上，之后的请求都带上
+        
+        Returns:
+            租约生效的票据；失败时产出 error 事件并返回 None
+        """
+        result = self._make_request("POST", "/sandbox/tickets", data={"owner": owner, "wait": "0"}, timeout=15)
+        if result.get("status_code") == 404:
+            # Web 服务不支持沙箱调度时直接执行（不加锁）
+            yield ("warning", {"step": "sandbox", "message": "Web 服务未启用沙箱调度，测试期间可能与其他调用方冲突"})
+            return {"id": None, "status": "active", "waited": 0}
+        ticket = result.get("ticket")
+        if not ticket:
+            yield ("error", {"step": "sandbox", "message": f"申请测试沙箱失败: {result.get('error') or result.get('message')}"})
+            return None
+        self._sandbox.ticket = ticket["id"]
+        
+        deadline = time.time() + SANDBOX_QUEUE_TIMEOUT
+        while ticket["status"] == "queued":
+            # 每轮长轮询产出一次进度（后台任务在事件之间检查取消请求）
+            yield ("progress", {
+                "step": "sandbox",
+                "message": f"测试沙箱正被占用，排队位置 {ticket['position']}（已等待 {ticket['waited']}s）...",
+                "position": ticket["position"],
+                "ticket": ticket["id"]
+            })
+            if time.time() > deadline:
+                yield ("error", {"step": "sandbox", "message": f"排队超过 {SANDBOX_QUEUE_TIMEOUT:g} 秒仍未轮到，已放弃"})
+                return None
+            # 长轮询：轮到时立即返回
+            result = self._make_request("GET", f"/sandbox/tickets/{ticket['id']}?wait=5", timeout=15,
+                                        label="/sandbox/tickets/<id>")
+            if not result.get("ok"):
+                yield ("error", {"step": "sandbox", "message": f"查询沙箱票据失败: {result.get('error') or result.get('message')}"})
+                return None
+            ticket = result["ticket"]
+        
+        if ticket["status"] != "active":
+            yield ("error", {"step": "sandbox", "message": f"沙箱票据已结束（{ticket['status']}）"})
+            return None
+        yield ("success", {
+            "step": "sandbox",
+            "message": f"已获得测试沙箱（排队 {ticket['waited']}s）",
+            "ticket": ticket["id"],
+            "waited": ticket["waited"]
+        })
+        return ticket
+    
+    def _release_sandbox(self):
+        """释放当前线程持有的沙箱票据"""
+        ticket = getattr(self._sandbox, "ticket", None)
+        if not ticket:
+            return
+        self._sandbox.ticket = None
+        try:
+            self.client.request("DELETE", f"/sandbox/tickets/{ticket}", timeout=10, label="/sandbox/tickets/<id>")
+        except requests.exceptions.RequestException:
+            # 释放失败时租约在 TTL 后自动过期
+            pass
+    
     def test_pipeline_complete_stream(self, pipeline_content: str, test_logs: List[str], 
-                                    is_json: bool = False, wait_time: int = 3) -> Generator[str, None, None]:
+                                    is_json: bool = False, wait_time: int = 3,
+                                    sandbox_owner: str = "mcp-server") -> Generator[str, None, None]:
         """完整的 Pipeline 测试流程 - SSE 流式版本"""
         connection_id = str(uuid.uuid4())
         self.active_connections[connection_id] = True
         
-        def send_event(event_type: str, data: Dict[str, Any]):
-            event_json = json.dumps({
-                "type": event_type,
-                "timestamp": datetime.now().isoformat(),
-                "data": data
-            }, ensure_ascii=False)
-            return f"data: {event_json}\n\n"
+        try:
+            for event_type, data in self.pipeline_test_steps(pipeline_content, test_logs, is_json, wait_time,
+                                                             sandbox_owner):
+                event_json = json.dumps({
+                    "type": event_type,
+                    "timestamp": datetime.now().isoformat(),
+                    "data": data
+                }, ensure_ascii=False)
+                yield f"data: {event_json}\n\n"
+        finally:
+            # 清理连接
+            if connection_id in self.active_connections:
+                del self.active_connections[connection_id]
+    
+    def pipeline_test_steps(self, pipeline_content: str, test_logs: List[str], is_json: bool = False,
+                            wait_time: int = 3, sandbox_owner: str = "mcp-server") -> Generator[Tuple[str, Dict[str, Any]], None, None]:
+        """
+        完整的 Pipeline 测试流程：逐步产出 (事件类型, 数据)
         
+        SSE 流式接口和后台任务（/jobs）共用；事件类型为 start/progress/success/warning/error/complete。
+        健康检查后先排队获取测试沙箱租约，清空结果到检查日志的全部步骤都在同一租约内执行，
+        流程结束（或生成器被关闭）时释放
+        """
+        started_at = time.time()
         try:
-            yield send_event("start", {
+            yield ("start", {
                 "message": "开始 Pipeline 测试流程",
                 "pipeline_preview": pipeline_content[:100] + "..." if len(pipeline_content) > 100 else pipeline_content,
                 "test_logs_count": len(test_logs)
             })
             
             # 1. 健康检查
-            yield send_event("progress", {"step": "health_check", "message": "正在检查服务健康状态..."})
+            yield ("progress", {"step": "health_check", "message": "正在检查服务健康状态..."})
             health_result = self.health_check()
             if not health_result["healthy"]:
-                yield send_event("error", {"step": "health_check", "message": "Logstash 测试服务不可用", "details": health_result})
+                yield ("error", {"step": "health_check", "message": "Logstash 测试服务不可用", "details": health_result})
+                return
+            yield ("success", {"step": "health_check", "message": "✅ 服务可用"})
+            
+            # 独占测试沙箱，避免其他调用方中途改写配置或清空结果
+            yield ("progress", {"step": "sandbox", "message": "正在申请测试沙箱..."})
+            ticket = yield from self._wait_for_sandbox(sandbox_owner)
+            if ticket is None:
                 return
-            yield send_event("success", {"step": "health_check", "message": "✅ 服务可用"})
             
             # 2. 清空历史结果
-            yield send_event("progress", {"step": "clear_results", "message": "正在清空历史结果..."})
+            yield ("progress", {"step": "clear_results", "message": "正在清空历史结果..."})
             clear_result = self.clear_results()
-            yield send_event("success", {"step": "clear_results", "message": clear_result.get("message", "清空完成")})
+            yield ("success", {"step": "clear_results", "message": clear_result.get("message", "清空完成")})
             
-            # 3. 上传 Pipeline
-            yield send_event("progress", {"step": "upload_pipeline", "message": "正在上传 Pipeline 配置..."})
-            upload_result = self.upload_pipeline(pipeline_content, use_file_upload=True)
-            if not upload_result["success"]:
-                yield send_event("error", {
+            # 3. 上传 Pipeline（Web 端写入后轮询监控 API，直到新配置生效或重载失败）
+            yield ("progress", {"step": "upload_pipeline", "message": "正在上传 Pipeline 配置..."})
+            upload_result = self.upload_pipeline(pipeline_content, use_file_upload=True, wait_reload=True)
+            if not upload_result["written"]:
+                yield ("error", {
                     "step": "upload_pipeline", 
                     "message": f"Pipeline 上传失败: {upload_result.get('message')}", 
                     "details": upload_result
                 })
                 return
-            yield send_event("success", {
+            yield ("success", {
                 "step": "upload_pipeline", 
-                "message": upload_result.get("message"),
+                "message": "Pipeline 已写入" if upload_result.get("changed") else "Pipeline 与当前配置相同",
                 "extracted_filters": upload_result.get("extracted_filters"),
                 "preview": upload_result.get("preview")
             })
             
-            # 4. 等待热重载
-            yield send_event("progress", {"step": "wait_reload", "message": f"等待 {wait_time} 秒热重载..."})
-            for i in range(wait_time):
-                time.sleep(1)
-                yield send_event("progress", {
-                    "step": "wait_reload", 
-                    "message": f"热重载中... {i+1}/{wait_time}s",
-                    "progress": (i+1) / wait_time * 100
+            # 4. 热重载结果
+            reload = upload_result.get("reload")
+            if not upload_result.get("reload_expected", True):
+                yield ("success", {"step": "wait_reload", "message": "配置未变化，无需热重载"})
+            elif reload and reload["status"] == "reloaded":
+                yield ("success", {
+                    "step": "wait_reload",
+                    "message": f"热重载完成，新配置已生效 ({reload['waited']}s)",
+                    "waited": reload["waited"]
                 })
-            yield send_event("success", {"step": "wait_reload", "message": f"热重载完成"})
-            
-            # 5. 发送测试日志
-            all_events = []
-            for i, log in enumerate(test_logs):
-                yield send_event("progress", {
-                    "step": f"send_log_{i+1}", 
-                    "message": f"正在发送第 {i+1}/{len(test_logs)} 条日志...",
-                    "log_preview": log[:50] + "..." if len(log) > 50 else log
+            elif reload and reload["status"] in ("failed", "timeout"):
+                yield ("error", {
+                    "step": "wait_reload",
+                    "message": f"Logstash 热重载未成功: {reload.get('error')}",
+                    "details": reload
                 })
-                
-                send_result = self.send_test_log(log, is_json)
-                
-                if send_result["success"]:
-                    yield send_event("success", {
-                        "step": f"send_log_{i+1}", 
-                        "message": send_result.get("message"),
-                        "events_count": send_result.get("events_count", 0),
-                        "latest_event": send_result.get("latest_event")
-                    })
-                    all_events.extend(send_result.get("events", []))
-                else:
-                    yield send_event("error", {
-                        "step": f"send_log_{i+1}", 
-                        "message": f"日志 {i+1} 发送失败: {send_result.get('message')}", 
-                        "details": send_result
+                return
+            else:
+                # 监控 API 不可用时退回固定时间等待
+                yield ("progress", {"step": "wait_reload", "message": f"无法确认重载状态，等待 {wait_time} 秒热重载..."})
+                for i in range(wait_time):
+                    time.sleep(1)
+                    yield ("progress", {
+                        "step": "wait_reload", 
+                        "message": f"热重载中... {i+1}/{wait_time}s",
+                        "progress": (i+1) / wait_time * 100
                     })
+                yield ("success", {"step": "wait_reload", "message": f"热重载完成"})
+            
+            # 5. 发送测试日志：一次批量提交全部日志，复用连接池并只等待一次结果写入
+            all_events = []
+            yield ("progress", {
+                "step": "send_logs",
+                "message": f"正在批量发送 {len(test_logs)} 条日志..."
+            })
+            bulk_result = self.send_test_logs_bulk(test_logs, is_json)
             
-            # 6. 获取最终解析结果
-            yield send_event("progress", {"step": "get_results", "message": "正在获取最终解析结果..."})
-            parsed_result = self.get_parsed_results()
-            if parsed_result["success"]:
-                yield send_event("success", {
-                    "step": "get_results", 
-                    "message": f"获取到 {len(parsed_result.get('events', []))} 条解析记录",
-                    "total_count": parsed_result.get("total_count"),
-                    "events": parsed_result.get("events", [])
+            if bulk_result["success"]:
+                yield ("success", {
+                    "step": "send_logs",
+                    "message": bulk_result.get("message"),
+                    "run_id": bulk_result.get("run_id"),
+                    "complete": bulk_result.get("complete"),
+                    "expected": bulk_result.get("expected"),
+                    "events_count": bulk_result.get("events_count", 0),
+                    "send_time": bulk_result.get("send_time"),
+                    "wait_time": bulk_result.get("wait_time")
                 })
+                all_events = bulk_result.get("events", [])
+            elif not bulk_result["bulk_supported"]:
+                # 当前 Pipeline 不支持 NDJSON 批量提交时逐条发送
+                yield ("warning", {"step": "send_logs", "message": bulk_result.get("message") + "，改为逐条发送"})
+                for i, log in enumerate(test_logs):
+                    send_result = self.send_test_log(log, is_json)
+                    if send_result["success"]:
+                        yield ("success", {
+                            "step": f"send_log_{i+1}", 
+                            "message": send_result.get("message"),
+                            "run_id": send_result.get("run_id"),
+                            "complete": send_result.get("complete"),
+                            "events_count": send_result.get("events_count", 0),
+                            "latest_event": send_result.get("latest_event")
+                        })
+                        all_events.extend(send_result.get("events", []))
+                    else:
+                        yield ("error", {
+                            "step": f"send_log_{i+1}", 
+                            "message": f"日志 {i+1} 发送失败: {send_result.get('message')}", 
+                            "details": send_result
+                        })
             else:
-                yield send_event("error", {
-                    "step": "get_results", 
-                    "message": f"获取结果失败: {parsed_result.get('message')}", 
-                    "details": parsed_result
+                yield ("error", {
+                    "step": "send_logs",
+                    "message": f"日志发送失败: {bulk_result.get('message')}",
+                    "details": {key: value for key, value in bulk_result.items() if key != "events"}
                 })
             
+            # 6. 汇总最终解析结果（按关联 ID 精确匹配，只包含本次测试产生的事件）
+            yield ("progress", {"step": "get_results", "message": "正在汇总最终解析结果..."})
+            yield ("success", {
+                "step": "get_results", 
+                "message": f"获取到 {len(all_events)} 条解析记录",
+                "total_count": len(all_events),
+                "events": all_events
+            })
+            
             # 7. 检查错误日志
-            yield send_event("progress", {"step": "check_logs", "message": "正在检查 Logstash 错误日志..."})
-            logs_result = self.get_logstash_logs(filter_errors=True)
+            yield ("progress", {"step": "check_logs", "message": "正在检查 Logstash 错误日志..."})
+            # 只看本次测试期间产生的错误
+            logs_result = self.get_logstash_logs(filter_errors=True, since=started_at)
             if logs_result["success"]:
                 error_count = logs_result.get("error_lines", 0)
                 if error_count > 0:
-                    yield send_event("warning", {
+                    yield ("warning", {
                         "step": "check_logs", 
                         "message": f"发现 {error_count} 个 Logstash 错误",
                         "error_logs": logs_result.get("logs", "")
                     })
                 else:
-                    yield send_event("success", {"step": "check_logs", "message": "未发现错误"})
+                    yield ("success", {"step": "check_logs", "message": "未发现错误"})
             
             # 8. 完成
-            yield send_event("complete", {
+            yield ("complete", {
                 "message": "Pipeline 测试流程完成",
-                "total_events": len(parsed_result.get("events", [])),
+                "total_events": len(all_events),
                 "success": True
             })
             
         except Exception as e:
-            yield send_event("error", {
+            yield ("error", {
                 "step": "exception", 
                 "message": f"执行异常: {str(e)}", 
                 "traceback": traceback.format_exc()
             })
         finally:
-            # 清理连接
-            if connection_id in self.active_connections:
-                del self.active_connections[connection_id]
+            self._release_sandbox()
+    
+    def _get_job_runner(self):
+        if self.jobs is None:
+            from job_queue import JobRunner, JobStore
+            self.jobs = JobRunner(JobStore(), workers=JOB_WORKERS)
+        return self.jobs
+    
+    def submit_pipeline_test_job(self, pipeline_content: str, test_logs: List[str], is_json: bool = False,
+                                 wait_time: int = 3, owner: str = "mcp-server") -> Dict[str, Any]:
+        """
+        提交完整测试流程为后台任务，立即返回任务 ID（事件通过 /jobs/<id>/events 读取）
+        
+        Args:
+            owner: 调用方标识（沙箱 fair 排队策略按此轮转）
+        """
+        from job_queue import JobStoreError
+        
+        runner = self._get_job_runner()
+        try:
+            job = runner.submit(
+                "test_pipeline",
+                lambda params: self.pipeline_test_steps(**params),
+                {"pipeline_content": pipeline_content, "test_logs": test_logs, "is_json": is_json, "wait_time": wait_time,
+                 "sandbox_owner": owner},
+                summary={"pipeline_size": len(pipeline_content), "test_logs_count": len(test_logs), "is_json": is_json,
+                         "owner": owner}
+            )
+        except JobStoreError as e:
+            return {"success": False, "error": str(e)}
+        return self.get_test_job(job["id"])
+    
+    def cancel_test_job(self, job_id: str) -> Dict[str, Any]:
+        """取消任务：排队中的直接取消，运行中的在下一步停止并释放测试沙箱"""
+        job = self._get_job_runner().cancel(job_id)
+        if job is None:
+            return {"success": False, "error": f"任务 {job_id} 不存在或已被清理"}
+        return {"success": True, "job": job}
+    
+    def get_test_job(self, job_id: str, after: Optional[int] = None) -> Dict[str, Any]:
+        """
+        查询任务状态
+        
+        Args:
+            after: 同时返回编号大于 after 的事件（不传则不返回事件）
+        """
+        runner = self._get_job_runner()
+        job = runner.store.get(job_id)
+        if job is None:
+            return {"success": False, "error": f"任务 {job_id} 不存在或已被清理"}
+        result = {
+            "success": True,
+            "job": job,
+            "queue_position": runner.position(job_id),
+            "status_url": f"/jobs/{job_id}",
+            "events_url": f"/jobs/{job_id}/events"
+        }
+        if after is not None:
+            result["events"] = runner.store.events(job_id, after)
+        return result
     
     def get_test_guidance(self, user_request: str, pipeline_content: str = "", test_logs: List[str] = None) -> str:
         """智能测试指导 - 根据用户输入自动分析并提供测试建议和步骤顺序"""
@@ -784,11 +1392,21 @@ def index():
         "available_tools": [
             "upload_pipeline",
             "validate_pipeline_config",
+            "validate_pipelines_batch",
             "test_pipeline_complete_stream", 
+            "get_test_job",
+            "cancel_test_job",
+            "profile_pipeline",
+            "benchmark_pipeline",
+            "compare_benchmark_baseline",
+            "set_benchmark_baseline",
+            "sweep_pipeline_settings",
             "send_test_log",
+            "send_test_logs_bulk",
             "get_parsed_results",
             "clear_results",
             "get_logstash_logs",
+            "get_service_metrics",
             "health_check"
         ],
         "docs": "/docs"
@@ -808,7 +1426,7 @@ def docs():
                         "pipeline_content": "string (required) - Pipeline 配置内容",
                         "test_logs": "array (required) - 测试日志列表（JSON 编码）",
                         "is_json": "boolean (optional) - 是否为 JSON 格式，默认 false",
-                        "wait_time": "integer (optional) - 等待热重载时间，默认 3 秒"
+                        "wait_time": "integer (optional) - 监控 API 不可用时的固定热重载等待时间，默认 3 秒（正常情况下按重载计数器判断新配置何时生效）"
                     },
                     "response_format": "text/event-stream",
                     "event_types": [
@@ -821,6 +1439,33 @@ def docs():
                     ]
                 }
             },
+            "job_endpoints": {
+                "submit_test_pipeline": {
+                    "method": "POST",
+                    "endpoint": "/jobs/test_pipeline",
+                    "description": "提交完整测试流程为后台任务，返回 202 和任务 ID（参数同 SSE 接口，JSON 请求体，test_logs 为数组）"
+                },
+                "list_jobs": {
+                    "method": "GET",
+                    "endpoint": "/jobs",
+                    "description": "最近的任务及状态（queued/running/succeeded/failed/interrupted）"
+                },
+                "get_job": {
+                    "method": "GET",
+                    "endpoint": "/jobs/<job_id>",
+                    "description": "任务状态和排队位置，after 参数可同时返回该编号之后的事件"
+                },
+                "cancel_job": {
+                    "method": "DELETE",
+                    "endpoint": "/jobs/<job_id>",
+                    "description": "取消任务（排队中的直接取消，运行中的在下一步停止并释放测试沙箱）"
+                },
+                "job_events": {
+                    "method": "GET",
+                    "endpoint": "/jobs/<job_id>/events",
+                    "description": "任务事件流（text/event-stream），支持 Last-Event-ID 断点续传，结束时发送 end 事件"
+                }
+            },
             "standard_endpoints": {
                 "upload_pipeline": {
                     "method": "POST",
@@ -832,15 +1477,25 @@ def docs():
                     "endpoint": "/tools/validate_pipeline",
                     "description": "验证 Logstash pipeline 配置语法"
                 },
+                "validate_pipelines_batch": {
+                    "method": "POST",
+                    "endpoint": "/tools/validate_pipelines_batch",
+                    "description": "批量验证多个 pipeline 配置（一个 Logstash 进程，结果按名称返回）"
+                },
                 "send_test_log": {
                     "method": "POST",
                     "endpoint": "/tools/send_test_log", 
                     "description": "发送测试日志"
                 },
+                "send_test_logs_bulk": {
+                    "method": "POST",
+                    "endpoint": "/tools/send_test_logs_bulk",
+                    "description": "批量发送测试日志（NDJSON 分批提交，适合大量样本）"
+                },
                 "get_parsed_results": {
                     "method": "GET",
                     "endpoint": "/tools/get_parsed_results",
-                    "description": "获取解析结果"
+                    "description": "获取解析结果，支持 count 或 since/limit 游标分页"
                 },
                 "clear_results": {
                     "method": "POST",
@@ -852,6 +1507,36 @@ def docs():
                     "endpoint": "/tools/get_logstash_logs",
                     "description": "获取 Logstash 日志"
                 },
+                "profile_pipeline": {
+                    "method": "POST",
+                    "endpoint": "/tools/profile_pipeline",
+                    "description": "性能分析：按插件和条件分支的 µs/事件 耗时排行"
+                },
+                "benchmark_pipeline": {
+                    "method": "POST",
+                    "endpoint": "/tools/benchmark_pipeline",
+                    "description": "基准测试：吞吐量、端到端延迟分位数和丢失数"
+                },
+                "compare_benchmark_baseline": {
+                    "method": "GET",
+                    "endpoint": "/tools/compare_benchmark_baseline",
+                    "description": "与保存的基线比较，按置信区间判定吞吐量/延迟是否显著回归"
+                },
+                "set_benchmark_baseline": {
+                    "method": "POST",
+                    "endpoint": "/tools/set_benchmark_baseline",
+                    "description": "把基准测试对应的配置保存为基线"
+                },
+                "sweep_pipeline_settings": {
+                    "method": "POST",
+                    "endpoint": "/tools/sweep_pipeline_settings",
+                    "description": "参数扫描：pipeline.workers / batch.size / batch.delay 网格的吞吐量/延迟曲面和推荐参数"
+                },
+                "get_service_metrics": {
+                    "method": "GET",
+                    "endpoint": "/tools/get_service_metrics",
+                    "description": "调用 Web 服务的延迟直方图和熔断器状态"
+                },
                 "health_check": {
                     "method": "GET",
                     "endpoint": "/tools/health_check",
@@ -861,6 +1546,10 @@ def docs():
         }
     })
 
+def request_owner():
+    """调用方标识（沙箱排队用）：X-Sandbox-Owner 请求头，默认为客户端地址"""
+    return request.headers.get("X-Sandbox-Owner") or f"mcp:{request.remote_addr}"
+
 # SSE 流式接口
 @app.route("/sse/test_pipeline_complete", methods=["GET"])
 def sse_test_pipeline_complete():
@@ -884,7 +1573,7 @@ def sse_test_pipeline_complete():
         
         def generate():
             yield from mcp_server.test_pipeline_complete_stream(
-                pipeline_content, test_logs, is_json, wait_time
+                pipeline_content, test_logs, is_json, wait_time, request_owner()
             )
         
         return Response(
@@ -901,6 +1590,107 @@ def sse_test_pipeline_complete():
     except Exception as e:
         return jsonify({"error": str(e), "traceback": traceback.format_exc()}), 500
 
+# 后台测试任务
+@app.route("/jobs/test_pipeline", methods=["POST"])
+def submit_test_pipeline_job():
+    """提交完整测试流程任务（JSON 请求体），立即返回任务 ID"""
+    try:
+        data = request.get_json(silent=True) or {}
+        pipeline_content = data.get("pipeline_content", "")
+        test_logs = data.get("test_logs", [])
+        
+        if not pipeline_content:
+            return jsonify({"success": False, "error": "缺少 pipeline_content 参数"}), 400
+        if not isinstance(test_logs, list) or not test_logs:
+            return jsonify({"success": False, "error": "test_logs 必须是非空数组"}), 400
+        
+        result = mcp_server.submit_pipeline_test_job(
+            pipeline_content, [str(log) for log in test_logs],
+            bool(data.get("is_json", False)), int(data.get("wait_time", 3)), request_owner()
+        )
+        if not result["success"]:
+            return jsonify(result), 503
+        response = jsonify(result)
+        response.status_code = 202
+        response.headers["Location"] = result["status_url"]
+        return response
+    
+    except Exception as e:
+        return jsonify({"success": False, "error": str(e), "traceback": traceback.format_exc()}), 500
+
+@app.route("/jobs", methods=["GET"])
+def list_jobs():
+    """最近的任务"""
+    try:
+        runner = mcp_server._get_job_runner()
+        jobs = runner.store.list(request.args.get("limit", 50, type=int))
+        for job in jobs:
+            job["queue_position"] = runner.position(job["id"])
+        return jsonify({"success": True, "jobs": jobs})
+    
+    except Exception as e:
+        return jsonify({"success": False, "error": str(e), "traceback": traceback.format_exc()}), 500
+
+@app.route("/jobs/<job_id>", methods=["GET"])
+def get_job(job_id):
+    """任务状态（after 参数可同时返回该编号之后的事件）"""
+    try:
+        result = mcp_server.get_test_job(job_id, request.args.get("after", type=int))
+        return jsonify(result), 200 if result["success"] else 404
+    
+    except Exception as e:
+        return jsonify({"success": False, "error": str(e), "traceback": traceback.format_exc()}), 500
+
+@app.route("/jobs/<job_id>", methods=["DELETE"])
+def cancel_job(job_id):
+    """取消任务"""
+    try:
+        result = mcp_server.cancel_test_job(job_id)
+        return jsonify(result), 200 if result["success"] else 404
+    
+    except Exception as e:
+        return jsonify({"success": False, "error": str(e), "traceback": traceback.format_exc()}), 500
+
+@app.route("/jobs/<job_id>/events", methods=["GET"])
+def job_events(job_id):
+    """
+    任务事件流（SSE）
+    
+    每个事件带 id（编号），断线重连时通过 Last-Event-ID 请求头（或 last_event_id 参数）从断点继续；
+    任务结束且事件全部发送后以 end 事件收尾。任务已结束时直接回放全部事件。
+    """
+    store = mcp_server._get_job_runner().store
+    if store.get(job_id) is None:
+        return jsonify({"success": False, "error": f"任务 {job_id} 不存在或已被清理"}), 404
+    
+    last_event_id = request.headers.get("Last-Event-ID") or request.args.get("last_event_id") or "0"
+    try:
+        after = int(last_event_id)
+    except ValueError:
+        return jsonify({"success": False, "error": "Last-Event-ID 必须是整数"}), 400
+    
+    def generate():
+        for event in store.follow(job_id, after):
+            if event is None:
+                yield ": keep-alive\n\n"
+                continue
+            payload = {"type": event["type"], "timestamp": event["timestamp"], "data": event["data"]}
+            yield f"id: {event['id']}\ndata: {json.dumps(payload, ensure_ascii=False, default=str)}\n\n"
+        job = store.get(job_id) or {}
+        yield f"event: end\ndata: {json.dumps({'status': job.get('status'), 'error': job.get('error')}, ensure_ascii=False)}\n\n"
+    
+    return Response(
+        generate(),
+        mimetype='text/event-stream',
+        headers={
+            'Cache-Control': 'no-cache',
+            'Connection': 'keep-alive',
+            'X-Accel-Buffering': 'no',
+            'Access-Control-Allow-Origin': '*',
+            'Access-Control-Allow-Headers': 'Cache-Control, Last-Event-ID'
+        }
+    )
+
 # MCP 协议支持
 @app.route("/mcp", methods=["POST"])
 def mcp_handler():
@@ -1081,6 +1871,29 @@ def mcp_handler():
                                         "type": "boolean",
                                         "description": "是否为文件上传方式",
                                         "default": True
+                                    },
+                                    "wait_reload": {
+                                        "type": "boolean",
+                                        "description": "是否等待 Logstash 热重载完成再返回（重载失败时返回错误信息）",
+                                        "default": True
+                                    },
+                                    "reload_timeout": {
+                                        "type": "number",
+                                        "description": "等待热重载的最长时间（秒），默认 60"
+                                    },
+                                    "benchmark_gate": {
+                                        "type": "object",
+                                        "description": "基准测试把关：以 test_logs 为语料，新配置生效后重复运行基准测试并与基线比较（没有基线时先测量上传前的配置；保存的基线不是当前配置且运行不足 2 次时拒绝上传），吞吐量或延迟显著回归时自动恢复上传前的配置",
+                                        "properties": {
+                                            "test_logs": {"type": "array", "items": {"type": "string"}, "description": "日志语料"},
+                                            "is_json": {"type": "boolean", "default": False},
+                                            "rate": {"type": "number", "description": "目标速率（事件/秒），不传时尽可能快"},
+                                            "events": {"type": "integer", "description": "每次运行的事件数（默认 2000）"},
+                                            "duration": {"type": "number", "description": "每次运行的发送时长（秒）"},
+                                            "batch_size": {"type": "integer", "description": "每个请求的事件数"},
+                                            "repeat": {"type": "integer", "description": "每方运行次数（默认 3，至少 2）"}
+                                        },
+                                        "required": ["test_logs"]
                                     }
                                 },
                                 "required": ["pipeline_content"]
@@ -1100,9 +1913,31 @@ def mcp_handler():
                                 "required": ["pipeline_content"]
                             }
                         },
+                        {
+                            "name": "validate_pipelines_batch",
+                            "description": "批量验证多个 Logstash Pipeline 配置（如一个目录下的生产配置）。所有配置在同一个 Logstash 进程中编译，每个配置使用独立的 pipeline.id，错误和行号按配置名称分别返回",
+                            "inputSchema": {
+                                "type": "object",
+                                "properties": {
+                                    "configs": {
+                                        "type": "array",
+                                        "items": {
+                                            "type": "object",
+                                            "properties": {
+                                                "name": {"type": "string", "description": "配置名称（如文件名）"},
+                                                "content": {"type": "string", "description": "完整的 Pipeline 配置内容"}
+                                            },
+                                            "required": ["content"]
+                                        },
+                                        "description": "要验证的配置列表"
+                                    }
+                                },
+                                "required": ["configs"]
+                            }
+                        },
                         {
                             "name": "send_test_log",
-                            "description": "发送测试日志到 Logstash 进行解析",
+                            "description": "发送测试日志到 Logstash 进行解析。每次提交会带上关联 ID，只返回本次日志产生的事件",
                             "inputSchema": {
                                 "type": "object",
                                 "properties": {
@@ -1114,17 +1949,68 @@ def mcp_handler():
                                         "type": "boolean",
                                         "description": "日志是否为 JSON 格式",
                                         "default": False
+                                    },
+                                    "wait_timeout": {
+                                        "type": "number",
+                                        "description": "等待本次日志解析结果写入的最长时间（秒），默认由 Web 服务决定"
                                     }
                                 },
                                 "required": ["log_content"]
                             }
                         },
+                        {
+                            "name": "send_test_logs_bulk",
+                            "description": "批量发送测试日志：所有日志共用一个关联 ID，按 NDJSON 分批复用连接提交，只等待一次结果写入。适合成百上千条样本",
+                            "inputSchema": {
+                                "type": "object",
+                                "properties": {
+                                    "logs": {
+                                        "type": "array",
+                                        "items": {"type": "string"},
+                                        "description": "测试日志列表，每项一条日志"
+                                    },
+                                    "is_json": {
+                                        "type": "boolean",
+                                        "description": "每条日志是否为 JSON 格式",
+                                        "default": False
+                                    },
+                                    "batch_size": {
+                                        "type": "integer",
+                                        "description": "每个请求提交的日志条数，默认 500"
+                                    },
+                                    "wait_timeout": {
+                                        "type": "number",
+                                        "description": "等待全部解析结果写入的最长时间（秒），默认随日志条数增加"
+                                    },
+                                    "max_events": {
+                                        "type": "integer",
+                                        "description": "返回的事件数上限，0 表示全部",
+                                        "default": 0
+                                    }
+                                },
+                                "required": ["logs"]
+                            }
+                        },
                         {
                             "name": "get_parsed_results",
-                            "description": "获取最新的解析结果",
+                            "description": "获取解析结果。默认返回最新记录；指定 since 时按事件序号游标分页，返回 next_cursor 供下一页使用，可完整读取大批量测试结果",
                             "inputSchema": {
                                 "type": "object",
-                                "properties": {},
+                                "properties": {
+                                    "count": {
+                                        "type": "integer",
+                                        "description": "仅返回最新的 N 条（不分页时有效）"
+                                    },
+                                    "since": {
+                                        "type": "integer",
+                                        "description": "游标：起始事件序号，首页传 0"
+                                    },
+                                    "limit": {
+                                        "type": "integer",
+                                        "description": "分页时每页最多事件数，默认 1000",
+                                        "default": 1000
+                                    }
+                                },
                                 "additionalProperties": False
                             }
                         },
@@ -1139,16 +2025,31 @@ def mcp_handler():
                         },
                         {
                             "name": "get_logstash_logs",
-                            "description": "获取 Logstash 运行日志",
+                            "description": "获取 Logstash 运行日志（后台持续跟踪容器日志，可只看错误或本次启动以来的日志）",
                             "inputSchema": {
                                 "type": "object",
-                                "properties": {},
+                                "properties": {
+                                    "filter_errors": {
+                                        "type": "boolean",
+                                        "description": "只返回 ERROR/FATAL 日志",
+                                        "default": False
+                                    },
+                                    "lines": {
+                                        "type": "integer",
+                                        "description": "返回最近的日志条数",
+                                        "default": 100
+                                    },
+                                    "since": {
+                                        "type": "string",
+                                        "description": "起始时间（Unix 秒），run_start 表示本次 Logstash 启动以来"
+                                    }
+                                },
                                 "additionalProperties": False
                             }
                         },
                         {
                             "name": "test_pipeline_complete_stream",
-                            "description": "执行完整的 Pipeline 测试流程，包括上传配置、发送测试日志、获取结果。支持 SSE 流式反馈",
+                            "description": "执行完整的 Pipeline 测试流程，包括上传配置、发送测试日志、获取结果。提交为后台任务，返回任务 ID 和 SSE 事件流地址",
                             "inputSchema": {
                                 "type": "object",
                                 "properties": {
@@ -1170,13 +2071,46 @@ def mcp_handler():
                                     },
                                     "wait_time": {
                                         "type": "integer",
-                                        "description": "等待热重载时间（秒）",
+                                        "description": "监控 API 不可用时的固定热重载等待时间（秒）；正常情况下会等到新配置生效为止",
                                         "default": 3
                                     }
                                 },
                                 "required": ["pipeline_content", "test_logs"]
                             }
                         },
+                        {
+                            "name": "get_test_job",
+                            "description": "查询后台测试任务的状态和事件（任务由 test_pipeline_complete_stream 提交）",
+                            "inputSchema": {
+                                "type": "object",
+                                "properties": {
+                                    "job_id": {
+                                        "type": "string",
+                                        "description": "任务 ID"
+                                    },
+                                    "after": {
+                                        "type": "integer",
+                                        "description": "只返回编号大于该值的事件（已读到的最后一个事件编号）",
+                                        "default": 0
+                                    }
+                                },
+                                "required": ["job_id"]
+                            }
+                        },
+                        {
+                            "name": "cancel_test_job",
+                            "description": "取消后台测试任务（排队中的直接取消，运行中的在下一步停止并释放测试沙箱）",
+                            "inputSchema": {
+                                "type": "object",
+                                "properties": {
+                                    "job_id": {
+                                        "type": "string",
+                                        "description": "任务 ID"
+                                    }
+                                },
+                                "required": ["job_id"]
+                            }
+                        },
                         {
                             "name": "get_test_guidance",
                             "description": "获取智能测试指导，根据用户输入自动分析并提供测试建议和步骤顺序",
@@ -1200,6 +2134,156 @@ def mcp_handler():
                                 "required": ["user_request"]
                             }
                         },
+                        {
+                            "name": "profile_pipeline",
+                            "description": "性能分析：发送测试日志（自动重复放大样本），按插件和条件分支给出 µs/事件 耗时排行、grok 匹配率，找出热点",
+                            "inputSchema": {
+                                "type": "object",
+                                "properties": {
+                                    "test_logs": {
+                                        "type": "array",
+                                        "items": {
+                                            "type": "string"
+                                        },
+                                        "description": "测试日志列表"
+                                    },
+                                    "is_json": {
+                                        "type": "boolean",
+                                        "description": "日志是否为 JSON 格式",
+                                        "default": False
+                                    },
+                                    "pipeline_content": {
+                                        "type": "string",
+                                        "description": "先上传该 Pipeline 配置再分析（不传则分析当前配置）"
+                                    },
+                                    "repeat": {
+                                        "type": "integer",
+                                        "description": "日志重复次数（默认重复到至少 1000 个事件）"
+                                    },
+                                    "top": {
+                                        "type": "integer",
+                                        "description": "排行保留的条数",
+                                        "default": 10
+                                    }
+                                },
+                                "required": ["test_logs"]
+                            }
+                        },
+                        {
+                            "name": "benchmark_pipeline",
+                            "description": "基准测试：把测试日志作为语料循环回放（固定速率或尽可能快），返回吞吐量（事件/秒）、提交到写入结果文件的 p50/p95/p99 延迟、丢失数和运行期间的重载状态，结果保存为 JSON 供比较",
+                            "inputSchema": {
+                                "type": "object",
+                                "properties": {
+                                    "test_logs": {
+                                        "type": "array",
+                                        "items": {
+                                            "type": "string"
+                                        },
+                                        "description": "日志语料（每项一条日志，循环使用）"
+                                    },
+                                    "is_json": {
+                                        "type": "boolean",
+                                        "description": "日志是否为 JSON 格式",
+                                        "default": False
+                                    },
+                                    "pipeline_content": {
+                                        "type": "string",
+                                        "description": "先上传该 Pipeline 配置再测试（不传则测试当前配置）"
+                                    },
+                                    "rate": {
+                                        "type": "number",
+                                        "description": "目标速率（事件/秒），不传时尽可能快地发送"
+                                    },
+                                    "events": {
+                                        "type": "integer",
+                                        "description": "发送的事件数（不传且未指定 duration 时发送一遍语料）"
+                                    },
+                                    "duration": {
+                                        "type": "number",
+                                        "description": "发送时长（秒）"
+                                    },
+                                    "batch_size": {
+                                        "type": "integer",
+                                        "description": "每个请求的事件数",
+                                        "default": 100
+                                    },
+                                    "warmup": {
+                                        "type": "integer",
+                                        "description": "预热事件数（不计入结果）",
+                                        "default": 0
+                                    },
+                                    "repeat": {
+                                        "type": "integer",
+                                        "description": "重复运行次数（给出 95% 置信区间并与基线比较）",
+                                        "default": 1
+                                    },
+                                    "set_baseline": {
+                                        "type": "boolean",
+                                        "description": "把当前配置保存为该语料和运行参数下的基线",
+                                        "default": False
+                                    }
+                                },
+                                "required": ["test_logs"]
+                            }
+                        },
+                        {
+                            "name": "compare_benchmark_baseline",
+                            "description": "把最近一次（或指定 run_id）基准测试的配置与保存的基线比较：双方取同一语料、同一运行参数下最近几次运行，按 Welch t 检验的 95% 置信区间判定吞吐量和 p50/p95/p99 延迟是否显著回归",
+                            "inputSchema": {
+                                "type": "object",
+                                "properties": {
+                                    "run_id": {"type": "string", "description": "基准测试 ID（默认最近一次）"},
+                                    "baseline_config": {"type": "string", "description": "基线配置哈希（默认保存的基线）"},
+                                    "samples": {"type": "integer", "description": "每方取最近几次运行", "default": 5},
+                                    "min_effect": {"type": "number", "description": "判定回归的最小相对变化", "default": 0.05}
+                                }
+                            }
+                        },
+                        {
+                            "name": "set_benchmark_baseline",
+                            "description": "把最近一次（或指定 run_id）基准测试的配置保存为同一语料、同一运行参数下的基线",
+                            "inputSchema": {
+                                "type": "object",
+                                "properties": {
+                                    "run_id": {"type": "string", "description": "基准测试 ID（默认最近一次）"},
+                                    "label": {"type": "string", "description": "基线说明"}
+                                }
+                            }
+                        },
+                        {
+                            "name": "sweep_pipeline_settings",
+                            "description": "参数扫描：按 pipeline.workers × pipeline.batch.size × pipeline.batch.delay 的网格逐组改写 pipelines.yml，等待 Logstash 以新参数重建 pipeline 后用同一语料重复运行基准测试，返回每组的吞吐量和 p50/p99 延迟（含 95% 置信区间）以及推荐参数；结束后恢复原参数",
+                            "inputSchema": {
+                                "type": "object",
+                                "properties": {
+                                    "test_logs": {
+                                        "type": "array",
+                                        "items": {"type": "string"},
+                                        "description": "日志语料（每项一条日志，循环使用）"
+                                    },
+                                    "is_json": {"type": "boolean", "description": "日志是否为 JSON 格式", "default": False},
+                                    "pipeline_content": {"type": "string", "description": "先上传该 Pipeline 配置再扫描（不传则扫描当前配置）"},
+                                    "workers": {"type": "array", "items": {"type": "integer"}, "description": "pipeline.workers 取值", "default": [1, 2, 4]},
+                                    "batch_sizes": {"type": "array", "items": {"type": "integer"}, "description": "pipeline.batch.size 取值", "default": [125, 250, 500]},
+                                    "batch_delays": {"type": "array", "items": {"type": "integer"}, "description": "pipeline.batch.delay 取值（毫秒，不传则不改动）"},
+                                    "events": {"type": "integer", "description": "每次运行发送的事件数", "default": 5000},
+                                    "repeat": {"type": "integer", "description": "每组参数的运行次数", "default": 2},
+                                    "max_p99_ms": {"type": "number", "description": "推荐参数的 p99 延迟上限（毫秒）"},
+                                    "keep": {"type": "boolean", "description": "扫描结束后保留推荐参数", "default": False}
+                                },
+                                "required": ["test_logs"]
+                            }
+                        },
+                        {
+                            "name": "get_service_metrics",
+                            "description": "查看 MCP 服务调用 Web 服务的按接口延迟（p50/p95/p99、直方图）、错误数和熔断器状态",
+                            "inputSchema": {
+                                "type": "object",
+                                "properties": {},
+                                "additionalProperties": False
+                            }
+                        },
                         {
                             "name": "health_check",
                             "description": "检查服务健康状态",
@@ -1220,7 +2304,10 @@ def mcp_handler():
             if tool_name == "upload_pipeline":
                 result = mcp_server.upload_pipeline(
                     tool_args.get("pipeline_content", ""),
-                    tool_args.get("use_file_upload", True)
+                    tool_args.get("use_file_upload", True),
+                    tool_args.get("wait_reload", True),
+                    tool_args.get("reload_timeout"),
+                    tool_args.get("benchmark_gate")
                 )
                 return jsonify({
                     "jsonrpc": "2.0",
@@ -1254,10 +2341,49 @@ def mcp_handler():
                     }
                 })
             
+            elif tool_name == "validate_pipelines_batch":
+                result = mcp_server.validate_pipelines_batch(tool_args.get("configs", []))
+                return jsonify({
+                    "jsonrpc": "2.0",
+                    "id": request_id,
+                    "result": {
+                        "content": [
+                            {
+                                "type": "text",
+                                "text": f"批量验证结果：\n{json.dumps(result, ensure_ascii=False, indent=2)}"
+                            }
+                        ],
+                        "isError": not result.get("success", False)
+                    }
+                })
+            
+            elif tool_name == "send_test_logs_bulk":
+                result = mcp_server.send_test_logs_bulk(
+                    tool_args.get("logs", []),
+                    tool_args.get("is_json", False),
+                    tool_args.get("batch_size"),
+                    tool_args.get("wait_timeout"),
+                    tool_args.get("max_events", 0)
+                )
+                return jsonify({
+                    "jsonrpc": "2.0",
+                    "id": request_id,
+                    "result": {
+                        "content": [
+                            {
+                                "type": "text",
+                                "text": f"批量发送结果：\n{json.dumps(result, ensure_ascii=False, indent=2)}"
+                            }
+                        ],
+                        "isError": not result.get("success", False)
+                    }
+                })
+            
             elif tool_name == "send_test_log":
                 result = mcp_server.send_test_log(
                     tool_args.get("log_content", ""),
-                    tool_args.get("is_json", False)
+                    tool_args.get("is_json", False),
+                    tool_args.get("wait_timeout")
                 )
                 return jsonify({
                     "jsonrpc": "2.0",
@@ -1274,7 +2400,11 @@ def mcp_handler():
                 })
             
             elif tool_name == "get_parsed_results":
-                result = mcp_server.get_parsed_results()
+                result = mcp_server.get_parsed_results(
+                    tool_args.get("count", -1),
+                    tool_args.get("since"),
+                    tool_args.get("limit")
+                )
                 return jsonify({
                     "jsonrpc": "2.0",
                     "id": request_id,
@@ -1304,7 +2434,11 @@ def mcp_handler():
                 })
             
             elif tool_name == "get_logstash_logs":
-                result = mcp_server.get_logstash_logs()
+                result = mcp_server.get_logstash_logs(
+                    filter_errors=bool(tool_args.get("filter_errors", False)),
+                    lines=int(tool_args.get("lines", 100)),
+                    since=tool_args.get("since")
+                )
                 return jsonify({
                     "jsonrpc": "2.0",
                     "id": request_id,
@@ -1319,20 +2453,23 @@ def mcp_handler():
                 })
             
             elif tool_name == "test_pipeline_complete_stream":
-                # 对于流式工具，返回 SSE 端点信息
-                pipeline_content = tool_args.get("pipeline_content", "")
-                test_logs = tool_args.get("test_logs", [])
-                is_json = tool_args.get("is_json", False)
-                wait_time = tool_args.get("wait_time", 3)
-                
-                # 构建 SSE URL
-                sse_url = f"{request.url_root}sse/test_pipeline_complete"
-                params_dict = {
-                    "pipeline_content": pipeline_content,
-                    "test_logs": json.dumps(test_logs),
-                    "is_json": str(is_json).lower(),
-                    "wait_time": str(wait_time)
-                }
+                # 流式工具：提交为后台任务，返回任务 ID 和事件流地址
+                result = mcp_server.submit_pipeline_test_job(
+                    tool_args.get("pipeline_content", ""),
+                    tool_args.get("test_logs", []),
+                    tool_args.get("is_json", False),
+                    tool_args.get("wait_time", 3)
+                )
+                if not result["success"]:
+                    return jsonify({
+                        "jsonrpc": "2.0",
+                        "id": request_id,
+                        "result": {
+                            "content": [{"type": "text", "text": f"提交测试任务失败: {result['error']}"}],
+                            "isError": True
+                        }
+                    })
+                job_id = result["job"]["id"]
                 
                 return jsonify({
                     "jsonrpc": "2.0",
@@ -1341,7 +2478,56 @@ def mcp_handler():
                         "content": [
                             {
                                 "type": "text",
-                                "text": f"SSE 流式测试已启动。\n\n请使用以下信息连接 SSE 流：\n\nURL: {sse_url}\n参数: {json.dumps(params_dict, ensure_ascii=False, indent=2)}\n\n或直接访问测试页面: {request.url_root}test"
+                                "text": f"测试任务已提交（{result['job']['status']}，排队位置 {result['queue_position']}）。\n\n任务 ID: {job_id}\n事件流 (SSE，支持 Last-Event-ID 续传): {request.url_root}jobs/{job_id}/events\n任务状态: {request.url_root}jobs/{job_id}\n\n也可以调用 get_test_job 工具查询进度和事件。"
+                            }
+                        ]
+                    }
+                })
+            
+            elif tool_name == "cancel_test_job":
+                result = mcp_server.cancel_test_job(tool_args.get("job_id", ""))
+                if result["success"]:
+                    job = result["job"]
+                    text = f"任务 {job['id']}: {job['status']}" + \
+                        ("" if job["status"] in ("cancelled", "succeeded", "failed", "interrupted") else "（将在下一步停止）")
+                else:
+                    text = result["error"]
+                return jsonify({
+                    "jsonrpc": "2.0",
+                    "id": request_id,
+                    "result": {
+                        "content": [
+                            {
+                                "type": "text",
+                                "text": text
+                            }
+                        ]
+                    }
+                })
+            
+            elif tool_name == "get_test_job":
+                after = tool_args.get("after", 0)
+                result = mcp_server.get_test_job(tool_args.get("job_id", ""), int(after) if after is not None else None)
+                if not result["success"]:
+                    text = result["error"]
+                else:
+                    job = result["job"]
+                    lines = [f"任务 {job['id']}: {job['status']}（{job['event_count']} 个事件）"]
+                    if result["queue_position"]:
+                        lines.append(f"排队位置: {result['queue_position']}")
+                    if job.get("error"):
+                        lines.append(f"错误: {job['error']}")
+                    for event in result.get("events", []):
+                        lines.append(f"[{event['id']}] {event['type']}: {event['data'].get('message', '')}")
+                    text = "\n".join(lines) + f"\n\n详细数据：\n{json.dumps(result, ensure_ascii=False, indent=2)}"
+                return jsonify({
+                    "jsonrpc": "2.0",
+                    "id": request_id,
+                    "result": {
+                        "content": [
+                            {
+                                "type": "text",
+                                "text": text
                             }
                         ]
                     }
@@ -1366,6 +2552,160 @@ def mcp_handler():
                     }
                 })
             
+            elif tool_name == "profile_pipeline":
+                result = mcp_server.profile_pipeline(
+                    tool_args.get("test_logs", []),
+                    tool_args.get("is_json", False),
+                    tool_args.get("pipeline_content"),
+                    tool_args.get("repeat"),
+                    tool_args.get("top", 10)
+                )
+                lines = [result["message"]]
+                report = result.get("report")
+                if result["success"] and report:
+                    lines.extend(f"⚠️ {note}" for note in report["notes"])
+                    lines.append("\n插件耗时排行：")
+                    for index, plugin in enumerate(report["plugins"], 1):
+                        line = f"{index}. {plugin['id']} ({plugin['kind']}/{plugin['name']}"
+                        line += f"，第 {plugin['line']} 行)" if plugin["line"] else ")"
+                        line += f": {plugin['us_per_event']} µs/事件，{plugin['duration_ms']}ms"
+                        if plugin["share"] is not None:
+                            line += f"，占 filter 耗时 {round(plugin['share'] * 100, 1)}%"
+                        if plugin.get("match_rate") is not None:
+                            line += f"，匹配率 {round(plugin['match_rate'] * 100, 1)}%"
+                        lines.append(line)
+                    if report["conditionals"]:
+                        lines.append("\n条件分支耗时排行：")
+                        for index, clause in enumerate(report["conditionals"], 1):
+                            lines.append(f"{index}. {clause['condition']} (第 {clause['line']} 行，{clause['plugins']} 个插件): "
+                                         f"{clause['us_per_event']} µs/事件，{clause['duration_ms']}ms")
+                return jsonify({
+                    "jsonrpc": "2.0",
+                    "id": request_id,
+                    "result": {
+                        "content": [
+                            {
+                                "type": "text",
+                                "text": "\n".join(lines) + f"\n\n详细数据：\n{json.dumps(result, ensure_ascii=False, indent=2)}"
+                            }
+                        ]
+                    }
+                })
+            
+            elif tool_name == "benchmark_pipeline":
+                from pipeline_benchmark import format_summary
+                
+                result = mcp_server.benchmark_pipeline(
+                    tool_args.get("test_logs", []),
+                    tool_args.get("is_json", False),
+                    tool_args.get("pipeline_content"),
+                    tool_args.get("rate"),
+                    tool_args.get("events"),
+                    tool_args.get("duration"),
+                    tool_args.get("batch_size"),
+                    tool_args.get("warmup"),
+                    tool_args.get("repeat"),
+                    tool_args.get("set_baseline", False)
+                )
+                text = format_summary(result["result"]) if result["success"] and result.get("result") else result["message"]
+                if result.get("comparison") and result["comparison"]["status"] != "no_baseline":
+                    text += f"\n基线比较：{result['comparison']['message']}"
+                return jsonify({
+                    "jsonrpc": "2.0",
+                    "id": request_id,
+                    "result": {
+                        "content": [
+                            {
+                                "type": "text",
+                                "text": text + f"\n\n详细数据：\n{json.dumps(result, ensure_ascii=False, indent=2)}"
+                            }
+                        ],
+                        "isError": not result["success"]
+                    }
+                })
+            
+            elif tool_name in ("compare_benchmark_baseline", "set_benchmark_baseline"):
+                if tool_name == "compare_benchmark_baseline":
+                    result = mcp_server.compare_benchmark_baseline(
+                        tool_args.get("run_id"),
+                        tool_args.get("baseline_config"),
+                        tool_args.get("samples"),
+                        tool_args.get("min_effect")
+                    )
+                    lines = [result["message"]]
+                    for name, metric in ((result.get("comparison") or {}).get("metrics") or {}).items():
+                        if metric["change"] is not None:
+                            lines.append(f"{name}: 基线 {metric['baseline']['mean']} → {metric['candidate']['mean']} "
+                                         f"({metric['change']:+.1%}, 95% CI {metric['change_ci'][0]:+.1%} ~ {metric['change_ci'][1]:+.1%}) "
+                                         f"{metric['status']}")
+                    text = "\n".join(lines)
+                else:
+                    result = mcp_server.set_benchmark_baseline(tool_args.get("run_id"), tool_args.get("label"))
+                    text = result["message"]
+                return jsonify({
+                    "jsonrpc": "2.0",
+                    "id": request_id,
+                    "result": {
+                        "content": [
+                            {
+                                "type": "text",
+                                "text": text + f"\n\n详细数据：\n{json.dumps(result, ensure_ascii=False, indent=2)}"
+                            }
+                        ],
+                        "isError": not result["success"]
+                    }
+                })
+            
+            elif tool_name == "sweep_pipeline_settings":
+                from pipeline_sweep import format_sweep
+                
+                result = mcp_server.sweep_pipeline_settings(
+                    tool_args.get("test_logs", []),
+                    tool_args.get("is_json", False),
+                    tool_args.get("pipeline_content"),
+                    tool_args.get("workers"),
+                    tool_args.get("batch_sizes"),
+                    tool_args.get("batch_delays"),
+                    tool_args.get("events"),
+                    tool_args.get("repeat"),
+                    tool_args.get("max_p99_ms"),
+                    tool_args.get("keep", False)
+                )
+                text = format_sweep(result["sweep"]) if result.get("sweep") else result["message"]
+                return jsonify({
+                    "jsonrpc": "2.0",
+                    "id": request_id,
+                    "result": {
+                        "content": [
+                            {
+                                "type": "text",
+                                "text": text + f"\n\n详细数据：\n{json.dumps(result, ensure_ascii=False, indent=2)}"
+                            }
+                        ],
+                        "isError": not result["success"]
+                    }
+                })
+            
+            elif tool_name == "get_service_metrics":
+                result = mcp_server.get_service_metrics()
+                web_service = result["web_service"]
+                lines = [f"Web 服务 {web_service['base_url']} 熔断器: {web_service['circuit']['state']}"]
+                for endpoint, stats in web_service["endpoints"].items():
+                    lines.append(f"{endpoint}: {stats['count']} 次，错误 {stats['errors']}，"
+                                 f"p50 {stats['p50_ms']}ms / p95 {stats['p95_ms']}ms / p99 {stats['p99_ms']}ms")
+                return jsonify({
+                    "jsonrpc": "2.0",
+                    "id": request_id,
+                    "result": {
+                        "content": [
+                            {
+                                "type": "text",
+                                "text": "服务调用指标：\n" + "\n".join(lines) + f"\n\n详细数据：\n{json.dumps(result, ensure_ascii=False, indent=2)}"
+                            }
+                        ]
+                    }
+                })
+            
             elif tool_name == "health_check":
                 result = mcp_server.health_check()
                 return jsonify({
@@ -1375,7 +2715,7 @@ def mcp_handler():
                         "content": [
                             {
                                 "type": "text",
-                                "text": f"健康检查结果：\n状态: {'健康' if result.get('healthy') else '异常'}\n详情: {json.dumps(result.get('details', {}), ensure_ascii=False, indent=2)}"
+                                "text": f"健康检查结果：\n状态: {'健康' if result.get('status') == 'healthy' else ('部分异常' if result.get('healthy') else '异常')}\n详情: {json.dumps(result.get('details', {}), ensure_ascii=False, indent=2)}"
                             }
                         ]
                     }
@@ -1419,6 +2759,10 @@ def api_upload_pipeline():
     try:
         pipeline_content = ""
         use_file_upload = True
+        options = request.get_json(silent=True) or request.form
+        wait_reload = str(options.get("wait_reload", True)).lower() not in ("0", "false")
+        reload_timeout = options.get("reload_timeout")
+        reload_timeout = float(reload_timeout) if reload_timeout not in (None, "") else None
         
         # 检查是否是文件上传
         if 'file' in request.files:
@@ -1442,7 +2786,8 @@ def api_upload_pipeline():
         if not pipeline_content:
             return jsonify({"success": False, "error": "缺少 pipeline_content 参数"}), 400
         
-        result = mcp_server.upload_pipeline(pipeline_content, use_file_upload)
+        benchmark_gate = options.get("benchmark_gate") if request.is_json else None
+        result = mcp_server.upload_pipeline(pipeline_content, use_file_upload, wait_reload, reload_timeout, benchmark_gate)
         return jsonify(result)
     
     except Exception as e:
@@ -1479,6 +2824,28 @@ def api_validate_pipeline():
     except Exception as e:
         return jsonify({"success": False, "error": str(e), "traceback": traceback.format_exc()}), 500
 
+@app.route("/tools/validate_pipelines_batch", methods=["POST"])
+def api_validate_pipelines_batch():
+    """批量验证 Pipeline 配置"""
+    try:
+        files = request.files.getlist('files')
+        if files:
+            # 多文件上传方式
+            configs = [{"name": file.filename, "content": file.read().decode('utf-8')} for file in files if file.filename]
+        elif request.is_json:
+            configs = request.get_json().get("configs", [])
+        else:
+            return jsonify({"success": False, "error": "未提供 configs"}), 400
+        
+        if not configs or not isinstance(configs, list):
+            return jsonify({"success": False, "error": "缺少 configs 参数（配置数组）"}), 400
+        
+        result = mcp_server.validate_pipelines_batch(configs)
+        return jsonify(result)
+    
+    except Exception as e:
+        return jsonify({"success": False, "error": str(e), "traceback": traceback.format_exc()}), 500
+
 @app.route("/tools/send_test_log", methods=["POST"])
 def api_send_test_log():
     """发送测试日志"""
@@ -1486,11 +2853,34 @@ def api_send_test_log():
         data = request.get_json()
         log_content = data.get("log_content", "")
         is_json = data.get("is_json", False)
+        wait_timeout = data.get("wait_timeout")
         
         if not log_content:
             return jsonify({"success": False, "error": "缺少 log_content 参数"}), 400
         
-        result = mcp_server.send_test_log(log_content, is_json)
+        result = mcp_server.send_test_log(log_content, is_json, wait_timeout)
+        return jsonify(result)
+    
+    except Exception as e:
+        return jsonify({"success": False, "error": str(e), "traceback": traceback.format_exc()}), 500
+
+@app.route("/tools/send_test_logs_bulk", methods=["POST"])
+def api_send_test_logs_bulk():
+    """批量发送测试日志"""
+    try:
+        data = request.get_json()
+        logs = data.get("logs", [])
+        
+        if not logs or not isinstance(logs, list):
+            return jsonify({"success": False, "error": "缺少 logs 参数（日志数组）"}), 400
+        
+        result = mcp_server.send_test_logs_bulk(
+            logs,
+            data.get("is_json", False),
+            data.get("batch_size"),
+            data.get("wait_timeout"),
+            data.get("max_events", 0)
+        )
         return jsonify(result)
     
     except Exception as e:
@@ -1501,7 +2891,9 @@ def api_get_parsed_results():
     """获取解析结果"""
     try:
         count = request.args.get("count", -1, type=int)
-        result = mcp_server.get_parsed_results(count)
+        since = request.args.get("since", type=int)
+        limit = request.args.get("limit", type=int)
+        result = mcp_server.get_parsed_results(count, since, limit)
         return jsonify(result)
     
     except Exception as e:
@@ -1522,12 +2914,111 @@ def api_get_logstash_logs():
     """获取 Logstash 日志"""
     try:
         filter_errors = request.args.get("filter_errors", "false").lower() == "true"
-        result = mcp_server.get_logstash_logs(filter_errors)
+        result = mcp_server.get_logstash_logs(filter_errors, request.args.get("lines", 100, type=int),
+                                              request.args.get("since"))
+        return jsonify(result)
+    
+    except Exception as e:
+        return jsonify({"success": False, "error": str(e), "traceback": traceback.format_exc()}), 500
+
+@app.route("/tools/profile_pipeline", methods=["POST"])
+def api_profile_pipeline():
+    """性能分析"""
+    try:
+        data = request.get_json(silent=True) or {}
+        result = mcp_server.profile_pipeline(
+            data.get("test_logs", []),
+            data.get("is_json", False),
+            data.get("pipeline_content"),
+            data.get("repeat"),
+            data.get("top", 10)
+        )
         return jsonify(result)
     
     except Exception as e:
         return jsonify({"success": False, "error": str(e), "traceback": traceback.format_exc()}), 500
 
+@app.route("/tools/benchmark_pipeline", methods=["POST"])
+def api_benchmark_pipeline():
+    """基准测试"""
+    try:
+        data = request.get_json(silent=True) or {}
+        result = mcp_server.benchmark_pipeline(
+            data.get("test_logs", []),
+            data.get("is_json", False),
+            data.get("pipeline_content"),
+            data.get("rate"),
+            data.get("events"),
+            data.get("duration"),
+            data.get("batch_size"),
+            data.get("warmup"),
+            data.get("repeat"),
+            data.get("set_baseline", False)
+        )
+        return jsonify(result)
+    
+    except Exception as e:
+        return jsonify({"success": False, "error": str(e), "traceback": traceback.format_exc()}), 500
+
+@app.route("/tools/compare_benchmark_baseline", methods=["GET"])
+def api_compare_benchmark_baseline():
+    """与基线比较"""
+    try:
+        samples = request.args.get("samples")
+        min_effect = request.args.get("min_effect")
+        result = mcp_server.compare_benchmark_baseline(
+            request.args.get("run_id"),
+            request.args.get("baseline_config"),
+            int(samples) if samples else None,
+            float(min_effect) if min_effect else None
+        )
+        return jsonify(result)
+    
+    except Exception as e:
+        return jsonify({"success": False, "error": str(e), "traceback": traceback.format_exc()}), 500
+
+@app.route("/tools/set_benchmark_baseline", methods=["POST"])
+def api_set_benchmark_baseline():
+    """保存基线"""
+    try:
+        data = request.get_json(silent=True) or request.form
+        result = mcp_server.set_benchmark_baseline(data.get("run_id"), data.get("label"))
+        return jsonify(result)
+    
+    except Exception as e:
+        return jsonify({"success": False, "error": str(e), "traceback": traceback.format_exc()}), 500
+
+@app.route("/tools/sweep_pipeline_settings", methods=["POST"])
+def api_sweep_pipeline_settings():
+    """参数扫描"""
+    try:
+        data = request.get_json(silent=True) or {}
+        result = mcp_server.sweep_pipeline_settings(
+            data.get("test_logs", []),
+            data.get("is_json", False),
+            data.get("pipeline_content"),
+            data.get("workers"),
+            data.get("batch_sizes"),
+            data.get("batch_delays"),
+            data.get("events"),
+            data.get("repeat"),
+            data.get("max_p99_ms"),
+            data.get("keep", False)
+        )
+        return jsonify(result)
+    
+    except Exception as e:
+        return jsonify({"success": False, "error": str(e), "traceback": traceback.format_exc()}), 500
+
+@app.route("/tools/get_service_metrics", methods=["GET"])
+def api_get_service_metrics():
+    """服务调用指标"""
+    try:
+        return jsonify(mcp_server.get_service_metrics())
+    
+    except Exception as e:
+        return jsonify({"success": False, "error": str(e), "traceback": traceback.format_exc()}), 500
+
 @app.route("/tools/health_check", methods=["GET"])
 def api_health_check():
     """健康检查"""
@@ -1622,46 +3113,58 @@ output {
             }
             
             clearLog();
-            addLog('🔌 正在连接 SSE 流...', 'progress');
+            addLog('📮 正在提交测试任务...', 'progress');
             
-            // 构建 URL
-            const params = new URLSearchParams({
-                pipeline_content: pipelineContent,
-                test_logs: JSON.stringify(testLogs),
-                is_json: 'false',
-                wait_time: '3'
-            });
-            
-            const url = `/sse/test_pipeline_complete?${params.toString()}`;
-            
-            // 创建 SSE 连接
-            eventSource = new EventSource(url);
+            fetch('/jobs/test_pipeline', {
+                method: 'POST',
+                headers: {'Content-Type': 'application/json'},
+                body: JSON.stringify({
+                    pipeline_content: pipelineContent,
+                    test_logs: testLogs,
+                    is_json: false,
+                    wait_time: 3
+                })
+            })
+            .then(response => response.json())
+            .then(result => {
+                if (!result.success) {
+                    addLog(`❌ 提交失败: ${result.error}`, 'error');
+                    return;
+                }
+                addLog(`📋 任务 ${result.job.id} 已提交，排队位置: ${result.queue_position || '-'}`, 'progress');
+                followJob(result.events_url);
+            })
+            .catch(error => addLog(`❌ 提交失败: ${error}`, 'error'));
+        }
+        
+        function followJob(eventsUrl) {
+            // 断线后 EventSource 自动重连并带上 Last-Event-ID，从断点继续
+            eventSource = new EventSource(eventsUrl);
             
             eventSource.onopen = function(event) {
                 addLog('✅ SSE 连接已建立', 'success');
             };
             
+            eventSource.addEventListener('end', function(event) {
+                const data = JSON.parse(event.data);
+                addLog(`🏁 任务结束: ${data.status}`, 'complete');
+                eventSource.close();
+                eventSource = null;
+            });
+            
             eventSource.onmessage = function(event) {
                 try {
                     const data = JSON.parse(event.data);
                     const timestamp = new Date(data.timestamp).toLocaleTimeString();
                     const message = `[${timestamp}] ${data.type.toUpperCase()}: ${data.data.message || JSON.stringify(data.data)}`;
                     addLog(message, data.type);
-                    
-                    if (data.type === 'complete' || data.type === 'error') {
-                        addLog('🏁 流程结束，连接将关闭', 'complete');
-                        eventSource.close();
-                        eventSource = null;
-                    }
                 } catch (e) {
                     addLog(`解析事件失败: ${event.data}`, 'error');
                 }
             };
             
             eventSource.onerror = function(event) {
-                addLog('❌ SSE 连接错误', 'error');
-                eventSource.close();
-                eventSource = null;
+                addLog('⚠️ SSE 连接中断，正在重连...', 'warning');
             };
         }
         
@@ -1695,6 +3198,7 @@ if __name__ == "__main__":
     print(f"📚 API 文档: http://0.0.0.0:19001/docs")
     print(f"🧪 测试页面: http://0.0.0.0:19001/test")
     print(f"🌊 SSE 接口: http://0.0.0.0:19001/sse/test_pipeline_complete")
+    print(f"📋 后台任务: http://0.0.0.0:19001/jobs")
     print(f"🔗 Logstash 服务: {LOGSTASH_SERVICE_URL}")
     
     # 检查是否在开发模式
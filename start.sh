@@ -22,7 +22,7 @@ check_port 15515
 
 # 创建必要的目录
 echo "📁 创建数据目录..."
-mkdir -p data/out
+mkdir -p data/out data/jobs data/validation_cache
 
 # 构建并启动容器
 echo "🔨 构建并启动容器..."
@@ -0,0 +1,257 @@
+#!/usr/bin/env python3
+"""
+基准测试历史与回归检测
+每次基准测试的结果写入 SQLite，按 (配置哈希, 语料哈希, 运行参数) 归组；运行参数包括 Logstash 的
+pipeline.workers / batch.size / batch.delay 和基准测试的发送方式，只有同一语料、同一参数下的结果才相互比较。
+
+每组 (语料, 运行参数) 可以保存一个基线配置。与基线比较时取双方最近的多次运行，按 Welch t 检验计算
+均值差的 95% 置信区间：区间不含 0（差异显著）且变化幅度超过 min_effect 才判定为回归或改进，
+单次结果的波动不会触发误报。
+"""
+
+import os
+import json
+import math
+import sqlite3
+import statistics
+import threading
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+# 历史数据库（默认与 JSON 结果放在同一目录）
+BENCHMARK_DB = os.getenv("BENCHMARK_DB", os.path.join(os.getenv("BENCHMARK_DIR", "/app/data/benchmarks"), "history.db"))
+
+# 比较的指标：(结果中的路径, 是否越大越好)
+METRICS = {
+    "eps": (("throughput", "eps"), True),
+    "p50_ms": (("latency_ms", "p50"), False),
+    "p95_ms": (("latency_ms", "p95"), False),
+    "p99_ms": (("latency_ms", "p99"), False)
+}
+
+# 双侧 95% 置信区间的 t 分布临界值（自由度 1-30，更大时近似为正态分布）
+T_CRITICAL_975 = [12.706, 4.303, 3.182, 2.776, 2.571, 2.447, 2.365, 2.306, 2.262, 2.228,
+                  2.201, 2.179, 2.160, 2.145, 2.131, 2.120, 2.110, 2.101, 2.093, 2.086,
+                  2.080, 2.074, 2.069, 2.064, 2.060, 2.056, 2.052, 2.048, 2.045, 2.042]
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    id TEXT PRIMARY KEY,
+    created_at TEXT NOT NULL,
+    config_sha256 TEXT,
+    corpus_sha256 TEXT,
+    settings_key TEXT NOT NULL,
+    sent INTEGER,
+    dropped INTEGER,
+    eps REAL,
+    p50_ms REAL,
+    p95_ms REAL,
+    p99_ms REAL,
+    reloaded INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS runs_group ON runs (corpus_sha256, settings_key, config_sha256, created_at);
+CREATE TABLE IF NOT EXISTS baselines (
+    corpus_sha256 TEXT NOT NULL,
+    settings_key TEXT NOT NULL,
+    config_sha256 TEXT NOT NULL,
+    label TEXT,
+    created_at TEXT NOT NULL,
+    PRIMARY KEY (corpus_sha256, settings_key)
+);
+"""
+
+def t_critical(df: float) -> float:
+    if df < 1:
+        return T_CRITICAL_975[0]
+    if df > len(T_CRITICAL_975):
+        return 1.96
+    return T_CRITICAL_975[int(df) - 1]
+
+def settings_key(result: Dict[str, Any]) -> str:
+    """
+    运行参数键：Logstash pipeline 参数 + 发送方式（速率、事件数或时长、每批事件数）
+
+    预热事件数不影响测量口径，不参与键计算
+    """
+    logstash = result.get("logstash") or {}
+    settings = result.get("settings") or {}
+    return json.dumps({
+        "workers": logstash.get("workers"),
+        "batch_size": logstash.get("batch_size"),
+        "batch_delay": logstash.get("batch_delay"),
+        "mode": result.get("mode"),
+        "rate": settings.get("rate"),
+        "events": settings.get("events"),
+        "duration": settings.get("duration"),
+        "request_batch_size": settings.get("batch_size")
+    }, sort_keys=True)
+
+def summarize(values: List[float]) -> Dict[str, Any]:
+    """样本均值、标准差和均值的 95% 置信区间"""
+    count = len(values)
+    if not count:
+        return {"n": 0, "mean": None, "stdev": None, "ci": None}
+    mean = statistics.fmean(values)
+    if count < 2:
+        return {"n": 1, "mean": round(mean, 3), "stdev": None, "ci": None}
+    stdev = statistics.stdev(values)
+    margin = t_critical(count - 1) * stdev / math.sqrt(count)
+    return {"n": count, "mean": round(mean, 3), "stdev": round(stdev, 3),
+            "ci": [round(mean - margin, 3), round(mean + margin, 3)]}
+
+def compare_samples(baseline: List[float], candidate: List[float], higher_is_better: bool,
+                    min_effect: float = 0.05) -> Dict[str, Any]:
+    """
+    比较两组样本的均值（Welch t 检验）
+
+    Returns:
+        {baseline, candidate, change, change_ci, status}；change 为相对基线的变化比例，
+        status 为 regression / improvement / unchanged / insufficient（任一方少于 2 个样本）
+    """
+    result = {"baseline": summarize(baseline), "candidate": summarize(candidate),
+              "change": None, "change_ci": None, "status": "insufficient"}
+    if len(baseline) < 2 or len(candidate) < 2:
+        return result
+    base_mean = statistics.fmean(baseline)
+    diff = statistics.fmean(candidate) - base_mean
+    base_var = statistics.variance(baseline) / len(baseline)
+    cand_var = statistics.variance(candidate) / len(candidate)
+    se = math.sqrt(base_var + cand_var)
+    if se > 0:
+        df = (base_var + cand_var) ** 2 / (base_var ** 2 / (len(baseline) - 1) + cand_var ** 2 / (len(candidate) - 1))
+        margin = t_critical(df) * se
+    else:
+        margin = 0.0
+    low, high = diff - margin, diff + margin
+    if base_mean:
+        result["change"] = round(diff / base_mean, 4)
+        result["change_ci"] = [round(low / base_mean, 4), round(high / base_mean, 4)]
+
+    significant = low > 0 or high < 0
+    large = base_mean and abs(diff / base_mean) >= min_effect
+    if significant and large:
+        better = diff > 0 if higher_is_better else diff < 0
+        result["status"] = "improvement" if better else "regression"
+    else:
+        result["status"] = "unchanged"
+    return result
+
+class BenchmarkHistory:
+    """基准测试历史（SQLite，线程安全）"""
+
+    def __init__(self, path: str = BENCHMARK_DB):
+        self.path = path
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with self._connect() as conn:
+            conn.executescript(SCHEMA)
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, timeout=10)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def record(self, result: Dict[str, Any]):
+        """写入一次基准测试结果（pipeline_benchmark 的结果字典，需带 config / corpus 哈希）"""
+        values = {name: _metric(result, path) for name, (path, _) in METRICS.items()}
+        reload = result.get("reload") or {}
+        with self._lock, self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO runs (id, created_at, config_sha256, corpus_sha256, settings_key, sent, dropped,"
+                " eps, p50_ms, p95_ms, p99_ms, reloaded) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (result["id"], result["created_at"], (result.get("config") or {}).get("sha256"),
+                 (result.get("corpus") or {}).get("sha256"), settings_key(result), result.get("sent"),
+                 result.get("dropped"), values["eps"], values["p50_ms"], values["p95_ms"], values["p99_ms"],
+                 1 if reload.get("reloaded") or reload.get("failures") else 0)
+            )
+
+    def runs(self, corpus_sha256: str, key: str, config_sha256: Optional[str] = None,
+             limit: int = 10) -> List[Dict[str, Any]]:
+        """同一语料和运行参数下最近的运行（新的在前，跳过运行期间发生重载的结果）"""
+        query = "SELECT * FROM runs WHERE corpus_sha256 = ? AND settings_key = ? AND reloaded = 0"
+        params: List[Any] = [corpus_sha256, key]
+        if config_sha256 is not None:
+            query += " AND config_sha256 = ?"
+            params.append(config_sha256)
+        query += " ORDER BY created_at DESC LIMIT ?"
+        params.append(limit)
+        with self._connect() as conn:
+            return [dict(row) for row in conn.execute(query, params)]
+
+    def groups(self, limit: int = 50) -> List[Dict[str, Any]]:
+        """按 (语料, 运行参数, 配置) 汇总的运行次数，附带各组的基线"""
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT r.corpus_sha256, r.settings_key, r.config_sha256, COUNT(*) AS runs, MAX(r.created_at) AS last_run,"
+                " b.config_sha256 = r.config_sha256 AS is_baseline"
+                " FROM runs r LEFT JOIN baselines b ON b.corpus_sha256 = r.corpus_sha256 AND b.settings_key = r.settings_key"
+                " GROUP BY r.corpus_sha256, r.settings_key, r.config_sha256 ORDER BY last_run DESC LIMIT ?",
+                (limit,)
+            )
+            return [dict(row, settings=json.loads(row["settings_key"]), is_baseline=bool(row["is_baseline"]))
+                    for row in rows]
+
+    def set_baseline(self, corpus_sha256: str, key: str, config_sha256: str,
+                     label: Optional[str] = None) -> Dict[str, Any]:
+        baseline = {"corpus_sha256": corpus_sha256, "settings_key": key, "config_sha256": config_sha256,
+                    "label": label, "created_at": datetime.now().isoformat()}
+        with self._lock, self._connect() as conn:
+            conn.execute("INSERT OR REPLACE INTO baselines (corpus_sha256, settings_key, config_sha256, label, created_at)"
+                         " VALUES (:corpus_sha256, :settings_key, :config_sha256, :label, :created_at)", baseline)
+        return baseline
+
+    def baseline(self, corpus_sha256: str, key: str) -> Optional[Dict[str, Any]]:
+        with self._connect() as conn:
+            row = conn.execute("SELECT * FROM baselines WHERE corpus_sha256 = ? AND settings_key = ?",
+                               (corpus_sha256, key)).fetchone()
+        return dict(row) if row else None
+
+    def compare(self, corpus_sha256: str, key: str, config_sha256: str, baseline_config: Optional[str] = None,
+                samples: int = 5, min_effect: float = 0.05) -> Dict[str, Any]:
+        """
+        比较候选配置与基线配置在同一语料、同一运行参数下最近 samples 次运行的结果
+
+        Args:
+            baseline_config: 基线配置哈希，不传时使用保存的基线
+            min_effect: 判定回归的最小相对变化（默认 5%）
+
+        Returns:
+            {status, baseline, metrics: {指标: compare_samples 结果}, regressions, message}；
+            status 为 regression / pass / no_baseline / insufficient
+        """
+        if baseline_config is None:
+            saved = self.baseline(corpus_sha256, key)
+            baseline_config = saved["config_sha256"] if saved else None
+        comparison = {"status": "no_baseline", "baseline_config": baseline_config, "candidate_config": config_sha256,
+                      "corpus_sha256": corpus_sha256, "settings": json.loads(key), "metrics": {}, "regressions": []}
+        if baseline_config is None:
+            comparison["message"] = "该语料和运行参数下没有保存的基线"
+            return comparison
+
+        baseline_runs = self.runs(corpus_sha256, key, baseline_config, samples)
+        candidate_runs = self.runs(corpus_sha256, key, config_sha256, samples)
+        for name, (_, higher_is_better) in METRICS.items():
+            comparison["metrics"][name] = compare_samples(
+                [run[name] for run in baseline_runs if run[name] is not None],
+                [run[name] for run in candidate_runs if run[name] is not None],
+                higher_is_better, min_effect
+            )
+        comparison["regressions"] = [name for name, metric in comparison["metrics"].items()
+                                     if metric["status"] == "regression"]
+        if comparison["regressions"]:
+            comparison["status"] = "regression"
+            details = "，".join(f"{name} {comparison['metrics'][name]['change']:+.1%}" for name in comparison["regressions"])
+            comparison["message"] = f"相对基线存在显著回归：{details}"
+        elif any(metric["status"] == "insufficient" for metric in comparison["metrics"].values()):
+            comparison["status"] = "insufficient"
+            comparison["message"] = f"样本不足（基线 {len(baseline_runs)} 次，候选 {len(candidate_runs)} 次，每方至少需要 2 次）"
+        else:
+            comparison["status"] = "pass"
+            comparison["message"] = "与基线相比没有显著回归"
+        return comparison
+
+def _metric(result: Dict[str, Any], path: tuple) -> Optional[float]:
+    value: Any = result
+    for part in path:
+        value = (value or {}).get(part)
+    return value
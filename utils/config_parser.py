@@ -0,0 +1,618 @@
+#!/usr/bin/env python3
+"""
+Logstash 配置解析模块
+单遍词法分析生成带源码位置的语法树，所有配置读写操作（提取/替换 filter 块等）共用。
+支持：# 注释、双引号/单引号字符串（含反斜杠转义，如单引号包裹的 ruby code）、
+=~ / !~ 之后的 /正则/、if / else if / else 条件分支、hash / array / 嵌套插件（codec）取值。
+解析结果按内容哈希（文件按 mtime）缓存，同一份配置只解析一次。
+check_syntax 以严格模式（条件表达式、裸词取值、数组和 hash 中的逗号）检查语法，供验证前置使用。
+"""
+
+import os
+import re
+import bisect
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+# 顶级段
+SECTION_TYPES = ("input", "filter", "output")
+
+TOKEN_PATTERN = re.compile(r"""
+    (?P<ws>[\s\ufeff]+)
+  | (?P<comment>\#[^\n]*)
+  | (?P<string>"(?:\\.|[^"\\])*"|'(?:\\.|[^'\\])*')
+  | (?P<arrow>=>)
+  | (?P<op>==|!=|<=|>=|=~|!~|<|>|!)
+  | (?P<punct>[{}\[\](),])
+  | (?P<word>[^\s{}\[\](),"'\#=!<>~]+)
+""", re.X | re.S)
+
+REGEX_PATTERN = re.compile(r"/(?:\\.|[^/\\])*/", re.S)
+
+# 严格模式（check_syntax）下与 Logstash treetop 语法一致的词法约束
+NAME_PATTERN = re.compile(r"[A-Za-z0-9_-]+$")
+BAREWORD_PATTERN = re.compile(r"[A-Za-z_][A-Za-z0-9_]*$")
+NUMBER_PATTERN = re.compile(r"-?[0-9]+(?:\.[0-9]*)?$")
+COMPARE_OPERATORS = ("==", "!=", "<=", ">=", "<", ">")
+BOOLEAN_OPERATORS = ("and", "or", "xor", "nand")
+
+class ConfigSyntaxError(ValueError):
+    """配置语法错误，带 1 起始的行号和列号"""
+
+    def __init__(self, message: str, line: int, column: int):
+        super().__init__(f"第 {line} 行第 {column} 列: {message}")
+        self.reason = message
+        self.line = line
+        self.column = column
+
+class Token:
+    """词法单元"""
+    __slots__ = ("type", "value", "start", "end")
+
+    def __init__(self, type: str, value: str, start: int, end: int):
+        self.type = type
+        self.value = value
+        self.start = start
+        self.end = end
+
+    def __repr__(self):
+        return f"Token({self.type}, {self.value!r}, {self.start})"
+
+class Node:
+    """
+    语法树节点
+
+    type 取值：
+      section  - 顶级段（name 为 input/filter/output）
+      plugin   - 插件（name 为插件名，attributes 为配置项）
+      branch   - 条件分支，children 为 if / else if / else 子句
+      if, else if, else - 分支子句（condition 为条件源码，else 为 None）
+    start/end 为节点在源码中的区间 [start, end)，body_start/body_end 为 { 和 } 的位置
+    """
+    __slots__ = ("type", "name", "start", "end", "body_start", "body_end",
+                 "children", "attributes", "condition")
+
+    def __init__(self, type: str, name: str, start: int):
+        self.type = type
+        self.name = name
+        self.start = start
+        self.end = start
+        self.body_start = -1
+        self.body_end = -1
+        self.children: List["Node"] = []
+        self.attributes: List["Attribute"] = []
+        self.condition: Optional[str] = None
+
+    def __repr__(self):
+        return f"Node({self.type}, {self.name!r}, {self.start}-{self.end})"
+
+class Attribute:
+    """
+    插件配置项 name => value
+
+    value 为解析后的值：字符串（去掉引号，不处理转义，与 Logstash 默认行为一致）、
+    裸词/数字（原文）、list、dict 或嵌套插件 Node
+    """
+    __slots__ = ("name", "start", "end", "value_start", "value")
+
+    def __init__(self, name: str, start: int, end: int, value_start: int, value: Any):
+        self.name = name
+        self.start = start
+        self.end = end
+        self.value_start = value_start
+        self.value = value
+
+    def __repr__(self):
+        return f"Attribute({self.name!r}, {self.value!r})"
+
+class ConfigDocument:
+    """解析后的配置，语法树被缓存共享，调用方不应修改"""
+
+    def __init__(self, text: str, sections: List[Node], comments: List[Token], sha256: str):
+        self.text = text
+        self.sections = sections
+        self.comments = comments
+        self.sha256 = sha256
+        self._line_starts = line_starts(text)
+
+    def sections_of(self, kind: str) -> List[Node]:
+        return [section for section in self.sections if section.name == kind]
+
+    def source(self, node) -> str:
+        return self.text[node.start:node.end]
+
+    def body(self, node: Node) -> str:
+        """{ 与 } 之间的源码"""
+        return self.text[node.body_start + 1:node.body_end]
+
+    def position(self, offset: int) -> Tuple[int, int]:
+        """偏移量 -> (行号, 列号)，均从 1 开始"""
+        return offset_position(self._line_starts, offset)
+
+    def plugins(self) -> Iterator[Tuple[Node, Node]]:
+        """按源码顺序遍历全部插件，产出 (所在顶级段, 插件节点)"""
+        for section in self.sections:
+            for node in walk(section.children):
+                yield section, node
+
+def walk(nodes: List[Node]) -> Iterator[Node]:
+    """深度优先遍历插件节点（进入条件分支）"""
+    for node in nodes:
+        if node.type == "plugin":
+            yield node
+        else:
+            yield from walk(node.children)
+
+def line_starts(text: str) -> List[int]:
+    starts = [0]
+    pos = text.find("\n")
+    while pos >= 0:
+        starts.append(pos + 1)
+        pos = text.find("\n", pos + 1)
+    return starts
+
+def offset_position(starts: List[int], offset: int) -> Tuple[int, int]:
+    line = bisect.bisect_right(starts, offset)
+    return line, offset - starts[line - 1] + 1
+
+def tokenize(text: str) -> Tuple[List[Token], List[Token]]:
+    """
+    单遍词法分析
+
+    Returns:
+        (有效词法单元列表, 注释列表)
+    """
+    tokens: List[Token] = []
+    comments: List[Token] = []
+    pos = 0
+    length = len(text)
+    match_token = TOKEN_PATTERN.match
+    while pos < length:
+        # =~ / !~ 之后的 /.../ 是正则字面量
+        if text[pos] == "/" and tokens and tokens[-1].value in ("=~", "!~"):
+            match = REGEX_PATTERN.match(text, pos)
+            if not match:
+                _raise_at(text, pos, "正则表达式缺少结尾的 /")
+            tokens.append(Token("regex", match.group(), pos, match.end()))
+            pos = match.end()
+            continue
+
+        match = match_token(text, pos)
+        if not match:
+            char = text[pos]
+            if char in "\"'":
+                _raise_at(text, pos, f"字符串缺少结尾的 {char}")
+            _raise_at(text, pos, f"无法识别的字符 {char!r}")
+
+        kind = match.lastgroup
+        end = match.end()
+        if kind == "comment":
+            comments.append(Token("comment", match.group(), pos, end))
+        elif kind != "ws":
+            value = match.group()
+            tokens.append(Token(value if kind == "punct" else kind, value, pos, end))
+        pos = end
+    return tokens, comments
+
+def _raise_at(text: str, offset: int, message: str):
+    line, column = offset_position(line_starts(text), offset)
+    raise ConfigSyntaxError(message, line, column)
+
+class _Parser:
+    """递归下降语法分析"""
+
+    def __init__(self, text: str, tokens: List[Token], strict: bool = False):
+        self.text = text
+        self.tokens = tokens
+        self.pos = 0
+        # 严格模式额外检查条件表达式、裸词取值、数组和 hash 中的逗号，用于验证而非编辑
+        self.strict = strict
+
+    def error(self, message: str, token: Optional[Token] = None):
+        offset = token.start if token else len(self.text)
+        _raise_at(self.text, offset, message)
+
+    def peek(self, ahead: int = 0) -> Optional[Token]:
+        index = self.pos + ahead
+        return self.tokens[index] if index < len(self.tokens) else None
+
+    def next(self, expected: Optional[str] = None) -> Token:
+        token = self.peek()
+        if token is None:
+            self.error(f"配置意外结束，缺少 {expected!r}" if expected else "配置意外结束")
+        if expected and token.type != expected:
+            self.error(f"期望 {expected!r}，实际为 {token.value!r}", token)
+        self.pos += 1
+        return token
+
+    def parse_config(self) -> List[Node]:
+        sections = []
+        while self.peek() is not None:
+            token = self.next("word")
+            if token.value not in SECTION_TYPES:
+                self.error(f"顶级段只能是 input/filter/output，实际为 {token.value!r}", token)
+            section = Node("section", token.value, token.start)
+            self.parse_block(section, self.parse_statement)
+            sections.append(section)
+        return sections
+
+    def parse_statements(self) -> List[Node]:
+        """解析不带 filter { } 外层的插件/条件列表"""
+        nodes = []
+        while self.peek() is not None:
+            nodes.append(self.parse_statement())
+        return nodes
+
+    def parse_block(self, node: Node, parse_item):
+        """解析 { item* }，记录花括号位置"""
+        node.body_start = self.next("{").start
+        while True:
+            token = self.peek()
+            if token is None:
+                _raise_at(self.text, node.body_start, "'{' 缺少与之匹配的 '}'")
+            if token.type == "}":
+                break
+            item = parse_item()
+            if isinstance(item, Attribute):
+                node.attributes.append(item)
+            else:
+                node.children.append(item)
+        closing = self.next("}")
+        node.body_end = closing.start
+        node.end = closing.end
+
+    def parse_statement(self) -> Node:
+        token = self.peek()
+        if token.type == "word" and token.value == "if":
+            return self.parse_branch()
+        if token.type != "word":
+            self.error(f"期望插件名或 if，实际为 {token.value!r}", token)
+        return self.parse_plugin()
+
+    def parse_plugin(self) -> Node:
+        token = self.next("word")
+        if self.strict and not NAME_PATTERN.match(token.value):
+            self.error(f"无效的插件名 {token.value!r}", token)
+        plugin = Node("plugin", token.value, token.start)
+        self.parse_block(plugin, self.parse_attribute)
+        return plugin
+
+    def parse_branch(self) -> Node:
+        first = self.peek()
+        branch = Node("branch", "if", first.start)
+        clause_type = "if"
+        while True:
+            start = self.next("word").start
+            if clause_type == "else if":
+                self.next("word")
+            clause = Node(clause_type, clause_type, start)
+            if clause_type != "else":
+                clause.condition = self.parse_condition()
+            self.parse_block(clause, self.parse_statement)
+            branch.children.append(clause)
+            branch.end = clause.end
+
+            token = self.peek()
+            if token is None or token.type != "word" or token.value != "else":
+                break
+            following = self.peek(1)
+            clause_type = "else if" if following and following.type == "word" and following.value == "if" else "else"
+        return branch
+
+    def parse_condition(self) -> str:
+        """条件为 { 之前的全部词法单元（方括号/圆括号内的 { 不算）"""
+        first = self.peek()
+        first_index = self.pos
+        depth = 0
+        last = None
+        while True:
+            token = self.peek()
+            if token is None:
+                self.error("条件表达式之后缺少 '{'")
+            if token.type in ("[", "("):
+                depth += 1
+            elif token.type in ("]", ")"):
+                depth -= 1
+            elif token.type == "{" and depth <= 0:
+                break
+            last = self.next()
+        if last is None:
+            self.error("条件表达式为空", first)
+        if self.strict:
+            _ConditionChecker(self, first_index, self.pos).check()
+        return self.text[first.start:last.end]
+
+    def parse_attribute(self) -> Attribute:
+        name_token = self.next()
+        if name_token.type not in ("word", "string"):
+            self.error(f"期望配置项名称，实际为 {name_token.value!r}", name_token)
+        if self.strict and name_token.type == "word" and not NAME_PATTERN.match(name_token.value):
+            self.error(f"无效的配置项名称 {name_token.value!r}", name_token)
+        self.next("arrow")
+        value_start = self.peek().start if self.peek() else len(self.text)
+        value = self.parse_value()
+        end = self.tokens[self.pos - 1].end
+        return Attribute(_unquote(name_token), name_token.start, end, value_start, value)
+
+    def parse_value(self) -> Any:
+        token = self.peek()
+        if token is None:
+            self.error("'=>' 之后缺少取值")
+        if token.type == "{":
+            return self.parse_hash()
+        if token.type == "[":
+            return self.parse_array()
+        if token.type == "word":
+            following = self.peek(1)
+            if following is not None and following.type == "{":
+                # 嵌套插件，如 codec => json { charset => "UTF-8" }
+                return self.parse_plugin()
+            if self.strict and not (BAREWORD_PATTERN.match(token.value) or NUMBER_PATTERN.match(token.value)):
+                self.error(f"无效的取值 {token.value!r}（字符串需要加引号）", token)
+            return self.next().value
+        if token.type == "string":
+            return _unquote(self.next())
+        self.error(f"无效的取值 {token.value!r}", token)
+
+    def parse_hash(self) -> Dict[str, Any]:
+        open_brace = self.next("{")
+        result = {}
+        while True:
+            token = self.peek()
+            if token is None:
+                _raise_at(self.text, open_brace.start, "'{' 缺少与之匹配的 '}'")
+            if token.type == "}":
+                self.next()
+                return result
+            if token.type == ",":
+                if self.strict:
+                    # Logstash 语法中只有数组用逗号分隔，hash 条目之间只能用空白
+                    self.error("hash 条目之间不能有 ','（只用空白或换行分隔）", token)
+                self.next()
+                continue
+            key = self.next()
+            if key.type not in ("word", "string"):
+                self.error(f"期望 hash 键，实际为 {key.value!r}", key)
+            if self.strict and key.type == "word" and not (BAREWORD_PATTERN.match(key.value) or NUMBER_PATTERN.match(key.value)):
+                self.error(f"无效的 hash 键 {key.value!r}（需要加引号）", key)
+            self.next("arrow")
+            result[_unquote(key)] = self.parse_value()
+
+    def parse_array(self) -> List[Any]:
+        open_bracket = self.next("[")
+        result = []
+        while True:
+            token = self.peek()
+            if token is None:
+                _raise_at(self.text, open_bracket.start, "'[' 缺少与之匹配的 ']'")
+            if token.type == "]":
+                self.next()
+                return result
+            if token.type == ",":
+                if self.strict and (not result or self.tokens[self.pos - 1].type == ","):
+                    self.error("数组中多余的 ','", token)
+                self.next()
+                continue
+            if self.strict and result and self.tokens[self.pos - 1].type != ",":
+                self.error("数组元素之间缺少 ','", token)
+            result.append(self.parse_value())
+
+class _ConditionChecker:
+    """
+    按 Logstash 条件语法检查 if / else if 的条件表达式：
+      condition  := expression (and|or|xor|nand expression)*
+      expression := ( condition ) | ! ( condition ) | ! selector
+                  | rvalue [(==|!=|<|>|<=|>=) rvalue | (=~|!~) (string|regex) | [not] in rvalue]
+      rvalue     := string | number | selector | array | regex | method(rvalue, ...)
+    """
+
+    def __init__(self, parser: "_Parser", start: int, end: int):
+        self.parser = parser
+        self.tokens = parser.tokens
+        self.pos = start
+        self.end = end
+
+    def peek(self, ahead: int = 0) -> Optional[Token]:
+        index = self.pos + ahead
+        return self.tokens[index] if index < self.end else None
+
+    def error(self, message: str, token: Optional[Token] = None):
+        self.parser.error(message, token or self.tokens[self.end])
+
+    def next(self, expected: Optional[str] = None) -> Token:
+        token = self.peek()
+        if token is None:
+            self.error(f"条件表达式不完整，缺少 {expected!r}" if expected else "条件表达式不完整")
+        if expected and token.type != expected:
+            self.error(f"条件表达式中期望 {expected!r}，实际为 {token.value!r}", token)
+        self.pos += 1
+        return token
+
+    def check(self):
+        self.condition()
+        token = self.peek()
+        if token is not None:
+            self.error(f"条件表达式中多余的 {token.value!r}", token)
+
+    def condition(self):
+        self.expression()
+        while True:
+            token = self.peek()
+            if token is None or token.type != "word" or token.value not in BOOLEAN_OPERATORS:
+                return
+            self.next()
+            self.expression()
+
+    def expression(self):
+        token = self.peek()
+        if token is not None and token.type == "(":
+            self.next()
+            self.condition()
+            self.next(")")
+            return
+        if token is not None and token.type == "op" and token.value == "!":
+            self.next()
+            following = self.peek()
+            if following is not None and following.type == "(":
+                self.next()
+                self.condition()
+                self.next(")")
+            elif following is not None and following.type == "[":
+                self.selector()
+            else:
+                self.error("'!' 之后只能是 (条件) 或 [字段] 引用", following)
+            return
+
+        self.rvalue()
+        token = self.peek()
+        if token is None:
+            return
+        if token.type == "op" and token.value in COMPARE_OPERATORS:
+            self.next()
+            self.rvalue()
+        elif token.type == "op" and token.value in ("=~", "!~"):
+            self.next()
+            operand = self.next()
+            if operand.type not in ("string", "regex"):
+                self.error(f"{token.value} 右侧必须是字符串或 /正则/，实际为 {operand.value!r}", operand)
+        elif token.type == "word" and token.value == "in":
+            self.next()
+            self.rvalue()
+        elif token.type == "word" and token.value == "not":
+            self.next()
+            following = self.next("word")
+            if following.value != "in":
+                self.error(f"'not' 之后期望 'in'，实际为 {following.value!r}", following)
+            self.rvalue()
+
+    def rvalue(self):
+        token = self.next()
+        if token.type in ("string", "regex"):
+            return
+        if token.type == "[":
+            self.pos -= 1
+            self.selector_or_array()
+            return
+        if token.type == "word":
+            if NUMBER_PATTERN.match(token.value):
+                return
+            following = self.peek()
+            if BAREWORD_PATTERN.match(token.value) and following is not None and following.type == "(":
+                # 方法调用，如 length([field])
+                self.next()
+                if self.peek() is not None and self.peek().type == ")":
+                    self.next()
+                    return
+                self.rvalue()
+                while self.peek() is not None and self.peek().type == ",":
+                    self.next()
+                    self.rvalue()
+                self.next(")")
+                return
+            self.error(f"条件中的 {token.value!r} 需要加引号或写成 [字段] 引用", token)
+        self.error(f"条件表达式中无效的 {token.value!r}", token)
+
+    def selector_or_array(self):
+        # 方括号内有逗号或嵌套方括号的是数组，否则是字段引用
+        depth = 0
+        index = self.pos
+        is_array = False
+        while index < self.end:
+            token = self.tokens[index]
+            if token.type == "[":
+                depth += 1
+                if depth > 1:
+                    is_array = True
+            elif token.type == "]":
+                depth -= 1
+                if depth == 0:
+                    break
+            elif token.type == "," or token.type == "{":
+                is_array = True
+            index += 1
+        if depth != 0:
+            self.error("'[' 缺少与之匹配的 ']'", self.tokens[self.pos])
+        if is_array:
+            self.pos = index + 1
+        else:
+            self.selector()
+
+    def selector(self):
+        previous = None
+        while True:
+            token = self.peek()
+            if token is None or token.type != "[" or (previous is not None and token.start != previous.end):
+                return
+            self.next()
+            if self.peek() is None or self.peek().type == "]":
+                self.error("字段引用 [] 不能为空", token)
+            while self.peek() is not None and self.peek().type != "]":
+                self.next()
+            previous = self.next("]")
+
+def _unquote(token: Token) -> str:
+    return token.value[1:-1] if token.type == "string" else token.value
+
+# 解析结果缓存（内容哈希 -> 文档；文件路径 -> (mtime, 大小, 文档)）
+CACHE_SIZE = 32
+_cache: "OrderedDict[str, ConfigDocument]" = OrderedDict()
+_file_cache: Dict[str, Tuple[int, int, ConfigDocument]] = {}
+_cache_lock = threading.Lock()
+
+def content_hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+def parse_config(text: str) -> ConfigDocument:
+    """
+    解析完整配置（input/filter/output 段），相同内容直接返回缓存结果
+
+    Raises:
+        ConfigSyntaxError: 配置有语法错误
+    """
+    digest = content_hash(text)
+    with _cache_lock:
+        document = _cache.get(digest)
+        if document is not None:
+            _cache.move_to_end(digest)
+            return document
+
+    tokens, comments = tokenize(text)
+    sections = _Parser(text, tokens).parse_config()
+    document = ConfigDocument(text, sections, comments, digest)
+
+    with _cache_lock:
+        _cache[digest] = document
+        while len(_cache) > CACHE_SIZE:
+            _cache.popitem(last=False)
+    return document
+
+def parse_statements(text: str) -> List[Node]:
+    """解析不带段包装的 filter 内容（插件和条件分支列表），不缓存"""
+    tokens, _ = tokenize(text)
+    return _Parser(text, tokens).parse_statements()
+
+def check_syntax(text: str) -> List[Node]:
+    """
+    按 Logstash 语法严格检查完整配置（条件表达式、裸词取值、数组逗号等），不缓存
+
+    Raises:
+        ConfigSyntaxError: 配置有语法错误
+    """
+    tokens, _ = tokenize(text)
+    return _Parser(text, tokens, strict=True).parse_config()
+
+def load_config(path: str) -> ConfigDocument:
+    """读取并解析配置文件，文件 mtime 和大小不变时不重新读取"""
+    stat = os.stat(path)
+    with _cache_lock:
+        cached = _file_cache.get(path)
+    if cached and cached[0] == stat.st_mtime_ns and cached[1] == stat.st_size:
+        return cached[2]
+
+    with open(path, "r", encoding="utf-8") as f:
+        document = parse_config(f.read())
+    with _cache_lock:
+        _file_cache[path] = (stat.st_mtime_ns, stat.st_size, document)
+    return document
@@ -0,0 +1,316 @@
+#!/usr/bin/env python3
+"""
+Docker Engine API 客户端
+直接通过 /var/run/docker.sock 访问 Docker（HTTP over Unix socket，连接池复用），
+替代每次调用都启动一个 docker CLI 进程。
+"""
+
+import io
+import os
+import json
+import queue
+import socket
+import struct
+import tarfile
+import http.client
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+from urllib.parse import quote, urlencode
+
+DOCKER_SOCKET = os.getenv("DOCKER_SOCKET", "/var/run/docker.sock")
+# Docker 20.10+
+DOCKER_API_VERSION = os.getenv("DOCKER_API_VERSION", "v1.41")
+
+class DockerEngineError(Exception):
+    """Docker API 调用失败（status 为 HTTP 状态码，连接失败时为 None）"""
+
+    def __init__(self, message: str, status: Optional[int] = None):
+        super().__init__(message)
+        self.status = status
+
+class UnixHTTPConnection(http.client.HTTPConnection):
+    """基于 Unix socket 的 HTTP 连接"""
+
+    def __init__(self, socket_path: str, timeout: float):
+        super().__init__("localhost", timeout=timeout)
+        self.socket_path = socket_path
+
+    def connect(self):
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.settimeout(self.timeout)
+        sock.connect(self.socket_path)
+        self.sock = sock
+
+class DockerEngineClient:
+    """Docker Engine API 客户端（线程安全，keep-alive 连接池）"""
+
+    def __init__(self, socket_path: str = DOCKER_SOCKET, pool_size: int = 4, timeout: float = 30):
+        """
+        Args:
+            socket_path: Docker socket 路径
+            pool_size: 空闲连接池大小
+            timeout: 默认请求超时（秒）
+        """
+        self.socket_path = socket_path
+        self.timeout = timeout
+        self._pool: "queue.LifoQueue[UnixHTTPConnection]" = queue.LifoQueue(maxsize=pool_size)
+
+    def available(self) -> bool:
+        return os.path.exists(self.socket_path)
+
+    def request(self, method: str, path: str, body: Optional[bytes] = None,
+                headers: Optional[Dict[str, str]] = None, timeout: Optional[float] = None) -> Tuple[int, bytes]:
+        """
+        发送请求并读取完整响应
+
+        Returns:
+            (HTTP 状态码, 响应体)
+
+        Raises:
+            DockerEngineError: socket 不可用或连接失败
+            socket.timeout: 超时
+        """
+        url = f"/{DOCKER_API_VERSION}{path}"
+        for attempt in range(2):
+            reused = False
+            try:
+                conn = self._pool.get_nowait()
+                reused = True
+            except queue.Empty:
+                conn = UnixHTTPConnection(self.socket_path, self.timeout)
+
+            conn.timeout = timeout or self.timeout
+            if conn.sock is not None:
+                conn.sock.settimeout(conn.timeout)
+            try:
+                conn.request(method, url, body=body, headers=headers or {})
+                response = conn.getresponse()
+                data = response.read()
+            except socket.timeout:
+                conn.close()
+                raise
+            except (ConnectionError, http.client.HTTPException, OSError) as e:
+                conn.close()
+                if reused and attempt == 0:
+                    # 池中的空闲连接可能已被 Docker 关闭，换新连接重试一次
+                    continue
+                raise DockerEngineError(f"无法访问 Docker socket {self.socket_path}: {e}")
+
+            if response.will_close:
+                conn.close()
+            else:
+                try:
+                    self._pool.put_nowait(conn)
+                except queue.Full:
+                    conn.close()
+            return response.status, data
+        raise DockerEngineError(f"无法访问 Docker socket {self.socket_path}")
+
+    def request_json(self, method: str, path: str, payload: Any = None, expected: Tuple[int, ...] = (200,),
+                     timeout: Optional[float] = None) -> Any:
+        """发送 JSON 请求，状态码不在 expected 中时抛出 DockerEngineError"""
+        body = json.dumps(payload).encode("utf-8") if payload is not None else None
+        headers = {"Content-Type": "application/json"} if body is not None else {}
+        status, data = self.request(method, path, body, headers, timeout)
+        if status not in expected:
+            raise DockerEngineError(_error_message(status, data), status)
+        if not data:
+            return None
+        try:
+            return json.loads(data.decode("utf-8"))
+        except ValueError:
+            return None
+
+    def ping(self) -> bool:
+        if not self.available():
+            return False
+        try:
+            status, _ = self.request("GET", "/_ping", timeout=3)
+        except (DockerEngineError, socket.timeout):
+            return False
+        return status == 200
+
+    def container_logs(self, container: str, tail: int = 100, since: Optional[float] = None,
+                       timestamps: bool = False, timeout: Optional[float] = None) -> str:
+        """
+        读取容器日志（stdout + stderr，按时间顺序合并），等同于 docker logs --tail
+
+        Raises:
+            DockerEngineError: 容器不存在或 Docker 不可用
+        """
+        params = {"stdout": 1, "stderr": 1, "tail": tail if tail is not None else "all"}
+        if since is not None:
+            params["since"] = int(since)
+        if timestamps:
+            params["timestamps"] = 1
+        status, data = self.request("GET", f"/containers/{quote(container)}/logs?{urlencode(params)}", timeout=timeout)
+        if status != 200:
+            raise DockerEngineError(_error_message(status, data), status)
+        return "".join(text for _, text in demux_stream(data))
+
+    def follow_logs(self, container: str, since: Optional[float] = None, tail: Optional[int] = 0,
+                    timestamps: bool = False) -> Iterator[str]:
+        """
+        持续读取容器日志（docker logs -f），逐行返回（stdout 和 stderr 按到达顺序合并）
+
+        使用独立连接（不放回连接池），容器停止时生成器结束
+
+        Raises:
+            DockerEngineError: 容器不存在或 Docker 不可用
+        """
+        params = {"stdout": 1, "stderr": 1, "follow": 1, "tail": tail if tail is not None else "all"}
+        if since is not None:
+            params["since"] = f"{since:.9f}"
+        if timestamps:
+            params["timestamps"] = 1
+        conn = UnixHTTPConnection(self.socket_path, self.timeout)
+        try:
+            try:
+                conn.request("GET", f"/{DOCKER_API_VERSION}/containers/{quote(container)}/logs?{urlencode(params)}")
+                response = conn.getresponse()
+            except (ConnectionError, http.client.HTTPException, OSError) as e:
+                raise DockerEngineError(f"无法访问 Docker socket {self.socket_path}: {e}")
+            if response.status != 200:
+                raise DockerEngineError(_error_message(response.status, response.read()), response.status)
+            # 日志可能长时间没有新输出
+            conn.sock.settimeout(None)
+
+            pending = {1: "", 2: ""}
+            header = response.read(8)
+            multiplexed = len(header) == 8 and header[0] in (0, 1, 2) and header[1:4] == b"\x00\x00\x00"
+            if not multiplexed:
+                # TTY 容器没有帧头
+                pending[1] = header.decode("utf-8", errors="replace")
+            while len(header) == 8 if multiplexed else header:
+                if multiplexed:
+                    stream, size = struct.unpack(">BxxxL", header)
+                    stream = 2 if stream == 2 else 1
+                    text = response.read(size).decode("utf-8", errors="replace")
+                else:
+                    stream, text = 1, response.read1(65536).decode("utf-8", errors="replace")
+                    if not text:
+                        break
+                lines = (pending[stream] + text).split("\n")
+                pending[stream] = lines.pop()
+                for line in lines:
+                    yield line
+                header = response.read(8) if multiplexed else b"-"
+            for rest in pending.values():
+                if rest:
+                    yield rest
+        finally:
+            conn.close()
+
+    def run_container(self, image: str, command: List[str], files: Optional[Dict[str, bytes]] = None,
+                      workdir: str = "/tmp/lab", env: Optional[Dict[str, str]] = None,
+                      entrypoint: Optional[List[str]] = None, timeout: float = 60) -> Tuple[int, str]:
+        """
+        运行一次性容器：创建 → 上传文件（tar 归档）→ 启动 → 等待退出 → 读取输出 → 删除
+
+        Args:
+            files: {workdir 下的相对路径: 内容}
+            timeout: 容器运行超时（秒），超时后强制删除容器
+
+        Returns:
+            (退出码, stdout + stderr)
+
+        Raises:
+            DockerEngineError: Docker 不可用、镜像拉取失败等
+            socket.timeout: 运行超时
+        """
+        config: Dict[str, Any] = {
+            "Image": image,
+            "Cmd": command,
+            "Env": [f"{key}={value}" for key, value in (env or {}).items()],
+            "WorkingDir": workdir,
+            "Tty": False,
+            "HostConfig": {"NetworkMode": "none"}
+        }
+        if entrypoint is not None:
+            config["Entrypoint"] = entrypoint
+
+        try:
+            created = self.request_json("POST", "/containers/create", config, expected=(201,))
+        except DockerEngineError as e:
+            if e.status != 404:
+                raise
+            self.pull_image(image)
+            created = self.request_json("POST", "/containers/create", config, expected=(201,))
+        container_id = created["Id"]
+
+        try:
+            if files:
+                status, data = self.request(
+                    "PUT", f"/containers/{container_id}/archive?{urlencode({'path': os.path.dirname(workdir.rstrip('/')) or '/'})}",
+                    body=_tar_files(workdir, files), headers={"Content-Type": "application/x-tar"}
+                )
+                if status != 200:
+                    raise DockerEngineError(_error_message(status, data), status)
+            self.request_json("POST", f"/containers/{container_id}/start", expected=(204, 304))
+            waited = self.request_json("POST", f"/containers/{container_id}/wait", expected=(200,), timeout=timeout)
+            status, data = self.request("GET", f"/containers/{container_id}/logs?stdout=1&stderr=1")
+            output = "".join(text for _, text in demux_stream(data)) if status == 200 else ""
+            return int(waited.get("StatusCode", -1)), output
+        finally:
+            try:
+                self.request("DELETE", f"/containers/{container_id}?force=1", timeout=10)
+            except (DockerEngineError, socket.timeout):
+                pass
+
+    def pull_image(self, image: str, timeout: float = 600):
+        name, sep, tag = image.rpartition(":")
+        if not sep or "/" in tag:
+            name, tag = image, "latest"
+        status, data = self.request("POST", f"/images/create?{urlencode({'fromImage': name, 'tag': tag})}",
+                                    timeout=timeout)
+        if status != 200:
+            raise DockerEngineError(_error_message(status, data), status)
+
+    def restart_container(self, container: str, stop_timeout: int = 10):
+        """重启容器（等同于 docker restart -t），停止超过 stop_timeout 秒后强制结束"""
+        self.request_json("POST", f"/containers/{quote(container)}/restart?{urlencode({'t': stop_timeout})}",
+                          expected=(204,), timeout=stop_timeout + self.timeout)
+
+def demux_stream(data: bytes) -> List[Tuple[int, str]]:
+    """
+    拆分 Docker 多路复用输出流（非 TTY 容器）：每帧 8 字节头 [stream, 0, 0, 0, size(4 字节大端)]
+
+    Returns:
+        [(stream, 文本)]，stream 为 1（stdout）或 2（stderr）
+    """
+    frames = []
+    pos = 0
+    length = len(data)
+    while pos + 8 <= length:
+        stream, size = struct.unpack(">BxxxL", data[pos:pos + 8])
+        if stream not in (0, 1, 2):
+            # TTY 容器没有帧头，整体即为输出
+            return [(1, data.decode("utf-8", errors="replace"))]
+        frames.append((stream, data[pos + 8:pos + 8 + size].decode("utf-8", errors="replace")))
+        pos += 8 + size
+    if pos < length and not frames:
+        return [(1, data.decode("utf-8", errors="replace"))]
+    return frames
+
+def _tar_files(workdir: str, files: Dict[str, bytes]) -> bytes:
+    """打包为以 workdir 最后一级目录为根的 tar（解压到 workdir 的父目录）"""
+    root = os.path.basename(workdir.rstrip("/"))
+    buffer = io.BytesIO()
+    with tarfile.open(fileobj=buffer, mode="w") as archive:
+        info = tarfile.TarInfo(root)
+        info.type = tarfile.DIRTYPE
+        # 镜像内进程可能不是 root（logstash 用户），需要可写
+        info.mode = 0o777
+        archive.addfile(info)
+        for name, content in files.items():
+            info = tarfile.TarInfo(f"{root}/{name}")
+            info.size = len(content)
+            info.mode = 0o644
+            archive.addfile(info, io.BytesIO(content))
+    return buffer.getvalue()
+
+def _error_message(status: int, data: bytes) -> str:
+    try:
+        message = json.loads(data.decode("utf-8")).get("message")
+    except (ValueError, AttributeError):
+        message = data.decode("utf-8", errors="replace")[:500]
+    return f"Docker API {status}: {message}"
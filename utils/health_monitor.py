@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""
+组合健康状态
+后台线程定期执行各组件的检查（Web 服务、Logstash 监控 API、pipeline 状态），结果缓存在内存中，
+health_check / 容器 healthcheck 直接读取缓存，不在请求路径上访问任何服务。
+"""
+
+import time
+import threading
+from datetime import datetime
+from typing import Any, Callable, Dict, Iterable, Optional
+
+class HealthMonitor:
+    """
+    组合健康检查（线程安全）
+
+    每个检查函数返回包含 healthy 字段的字典，抛出异常视为不健康。
+    required 中的组件不健康时整体为 unhealthy，其余组件不健康时为 degraded。
+    """
+
+    def __init__(self, checks: Dict[str, Callable[[], Dict[str, Any]]], required: Iterable[str] = (),
+                 interval: float = 10):
+        """
+        Args:
+            checks: {组件名: 检查函数}
+            required: 必需组件
+            interval: 后台刷新间隔（秒）
+        """
+        self.checks = checks
+        self.required = set(required)
+        self.interval = interval
+        self._components: Dict[str, Dict[str, Any]] = {}
+        self._checked_at: Optional[float] = None
+        self._lock = threading.Lock()
+        self._refresh_lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> "HealthMonitor":
+        """启动后台刷新线程（重复调用无副作用）"""
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="health-monitor", daemon=True)
+                self._thread.start()
+        return self
+
+    def _run(self):
+        while True:
+            self.refresh()
+            time.sleep(self.interval)
+
+    def refresh(self):
+        """执行一轮全部检查"""
+        with self._refresh_lock:
+            components = {}
+            for name, check in self.checks.items():
+                start = time.perf_counter()
+                try:
+                    result = dict(check())
+                    result["healthy"] = bool(result.get("healthy"))
+                except Exception as e:
+                    result = {"healthy": False, "error": str(e)}
+                result["latency_ms"] = round((time.perf_counter() - start) * 1000, 3)
+                components[name] = result
+            with self._lock:
+                self._components = components
+                self._checked_at = time.time()
+
+    def snapshot(self) -> Dict[str, Any]:
+        """
+        读取缓存的健康状态（尚无结果时同步检查一次）
+
+        Returns:
+            {healthy, status, checked_at, age_seconds, components}；healthy 只取决于必需组件
+        """
+        if self._checked_at is None:
+            self.refresh()
+        with self._lock:
+            components = self._components
+            checked_at = self._checked_at
+
+        required_ok = all(components.get(name, {}).get("healthy") for name in self.required)
+        all_ok = all(component["healthy"] for component in components.values())
+        return {
+            "healthy": required_ok,
+            "status": "healthy" if all_ok else ("degraded" if required_ok else "unhealthy"),
+            "checked_at": datetime.fromtimestamp(checked_at).isoformat(),
+            "age_seconds": round(time.time() - checked_at, 3),
+            "components": components
+        }
@@ -0,0 +1,297 @@
+#!/usr/bin/env python3
+"""
+后台任务队列
+长时间运行的测试流程提交为任务后立即返回任务 ID，由后台 worker 执行，不占用请求线程。
+每个任务的事件按顺序编号写入磁盘（<目录>/<任务 ID>/events.ndjson），客户端断线后可按
+Last-Event-ID 从断点继续读取；任务结束后状态和事件仍可查询（保留最近 max_jobs 个任务）。
+"""
+
+import os
+import json
+import uuid
+import queue
+import shutil
+import tempfile
+import threading
+from datetime import datetime
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+# 任务目录（状态和事件日志）
+JOB_DIR = os.getenv("JOB_DIR", os.path.join(tempfile.gettempdir(), "logstash_lab_jobs"))
+
+QUEUED = "queued"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+# 服务重启时仍未结束的任务
+INTERRUPTED = "interrupted"
+CANCELLED = "cancelled"
+FINISHED_STATES = (SUCCEEDED, FAILED, INTERRUPTED, CANCELLED)
+
+# 任务函数：接收参数，逐步产出 (事件类型, 数据)
+JobFunction = Callable[[Dict[str, Any]], Iterator[Tuple[str, Dict[str, Any]]]]
+
+class JobStoreError(Exception):
+    """任务目录不可写（如 bind mount 的宿主目录属主为 root），无法创建任务"""
+
+class JobStore:
+    """任务元数据和事件日志（内存 + 磁盘，线程安全）"""
+
+    def __init__(self, directory: str = JOB_DIR, max_jobs: int = 200):
+        """
+        Args:
+            directory: 任务目录
+            max_jobs: 保留的已结束任务数，超出后删除最早的
+        """
+        self.directory = directory
+        self.max_jobs = max_jobs
+        self._jobs: Dict[str, Dict[str, Any]] = {}
+        # 运行中任务的事件（结束后从磁盘读取）
+        self._live_events: Dict[str, List[Dict[str, Any]]] = {}
+        self._changed = threading.Condition()
+        # 目录不可用时仍可查询（没有任务），提交任务时报错
+        self.error: Optional[str] = None
+        try:
+            os.makedirs(directory, exist_ok=True)
+            self._load()
+        except OSError as e:
+            self.error = f"任务目录 {directory} 不可用: {e}"
+
+    def _load(self):
+        """加载已有任务，上次未结束的标记为 interrupted"""
+        for job_id in os.listdir(self.directory):
+            try:
+                with open(self._path(job_id, "job.json"), "r", encoding="utf-8") as f:
+                    job = json.load(f)
+            except (OSError, ValueError):
+                continue
+            if job.get("status") not in FINISHED_STATES:
+                job["status"] = INTERRUPTED
+                job["error"] = "服务重启，任务未完成"
+                job["finished_at"] = job.get("finished_at") or datetime.now().isoformat()
+                self._save(job)
+            self._jobs[job_id] = job
+
+    def _path(self, job_id: str, name: str) -> str:
+        return os.path.join(self.directory, job_id, name)
+
+    def _save(self, job: Dict[str, Any]):
+        path = self._path(job["id"], "job.json")
+        temp_path = f"{path}.tmp"
+        with open(temp_path, "w", encoding="utf-8") as f:
+            json.dump(job, f, ensure_ascii=False)
+        os.replace(temp_path, path)
+
+    def create(self, kind: str, summary: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        新建任务（状态 queued）
+
+        Raises:
+            JobStoreError: 无法写入任务目录
+        """
+        job_id = uuid.uuid4().hex
+        job = {
+            "id": job_id,
+            "kind": kind,
+            "status": QUEUED,
+            "created_at": datetime.now().isoformat(),
+            "started_at": None,
+            "finished_at": None,
+            "event_count": 0,
+            "last_event": None,
+            "error": None,
+            "summary": summary
+        }
+        try:
+            os.makedirs(os.path.join(self.directory, job_id))
+            open(self._path(job_id, "events.ndjson"), "w").close()
+            self._save(job)
+        except OSError as e:
+            shutil.rmtree(os.path.join(self.directory, job_id), ignore_errors=True)
+            raise JobStoreError(f"无法创建任务（任务目录 {self.directory} 需要对服务进程可写）: {e}") from e
+        with self._changed:
+            self._jobs[job_id] = job
+            self._live_events[job_id] = []
+        self._prune()
+        return dict(job)
+
+    def update(self, job_id: str, **fields):
+        with self._changed:
+            job = self._jobs[job_id]
+            job.update(fields)
+            self._save(job)
+            if job["status"] in FINISHED_STATES:
+                self._live_events.pop(job_id, None)
+            self._changed.notify_all()
+
+    def append_event(self, job_id: str, event_type: str, data: Dict[str, Any]) -> Dict[str, Any]:
+        """追加事件（编号从 1 开始，写盘后才对读取方可见）"""
+        with self._changed:
+            job = self._jobs[job_id]
+            event = {
+                "id": job["event_count"] + 1,
+                "type": event_type,
+                "timestamp": datetime.now().isoformat(),
+                "data": data
+            }
+            with open(self._path(job_id, "events.ndjson"), "a", encoding="utf-8") as f:
+                f.write(json.dumps(event, ensure_ascii=False, default=str) + "\n")
+            job["event_count"] = event["id"]
+            job["last_event"] = {"id": event["id"], "type": event_type, "message": data.get("message")}
+            self._live_events.setdefault(job_id, []).append(event)
+            self._changed.notify_all()
+        return event
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        with self._changed:
+            job = self._jobs.get(job_id)
+            return dict(job) if job else None
+
+    def list(self, limit: int = 50) -> List[Dict[str, Any]]:
+        """最近的任务（新的在前）"""
+        with self._changed:
+            jobs = sorted(self._jobs.values(), key=lambda job: job["created_at"], reverse=True)
+            return [dict(job) for job in jobs[:limit]]
+
+    def events(self, job_id: str, after: int = 0) -> List[Dict[str, Any]]:
+        """编号大于 after 的事件"""
+        with self._changed:
+            live = self._live_events.get(job_id)
+            if live is not None:
+                return live[after:]
+        events = []
+        try:
+            with open(self._path(job_id, "events.ndjson"), "r", encoding="utf-8") as f:
+                for line in f:
+                    if not line.strip():
+                        continue
+                    event = json.loads(line)
+                    if event["id"] > after:
+                        events.append(event)
+        except FileNotFoundError:
+            pass
+        return events
+
+    def follow(self, job_id: str, after: int = 0, heartbeat: float = 15) -> Iterator[Optional[Dict[str, Any]]]:
+        """
+        持续读取事件直到任务结束
+
+        Args:
+            after: 已收到的最后一个事件编号（Last-Event-ID）
+            heartbeat: 无新事件时每隔多少秒产出一次 None（用于发送 SSE 心跳）
+        """
+        while True:
+            events = self.events(job_id, after)
+            for event in events:
+                after = event["id"]
+                yield event
+            with self._changed:
+                job = self._jobs.get(job_id)
+                if job is None or (job["status"] in FINISHED_STATES and after >= job["event_count"]):
+                    return
+                if job["event_count"] > after:
+                    continue
+                notified = self._changed.wait(heartbeat)
+            if not notified:
+                yield None
+
+    def _prune(self):
+        with self._changed:
+            finished = sorted((job for job in self._jobs.values() if job["status"] in FINISHED_STATES),
+                              key=lambda job: job["created_at"])
+            expired = finished[:max(0, len(finished) - self.max_jobs)]
+            for job in expired:
+                del self._jobs[job["id"]]
+        for job in expired:
+            shutil.rmtree(os.path.join(self.directory, job["id"]), ignore_errors=True)
+
+class JobRunner:
+    """后台 worker：按提交顺序执行任务"""
+
+    def __init__(self, store: JobStore, workers: int = 1):
+        """
+        Args:
+            workers: 并发执行的任务数（测试流程共用同一个 Logstash 环境，默认串行）
+        """
+        self.store = store
+        self._queue: "queue.Queue[Tuple[str, JobFunction, Dict[str, Any]]]" = queue.Queue()
+        self._pending: List[str] = []
+        # 运行中被要求取消的任务
+        self._cancelling = set()
+        self._lock = threading.Lock()
+        for index in range(workers):
+            threading.Thread(target=self._work, name=f"job-worker-{index}", daemon=True).start()
+
+    def submit(self, kind: str, function: JobFunction, params: Dict[str, Any],
+               summary: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """
+        提交任务，立即返回任务信息
+
+        Raises:
+            JobStoreError: 无法写入任务目录
+        """
+        job = self.store.create(kind, summary or {})
+        with self._lock:
+            self._pending.append(job["id"])
+        self._queue.put((job["id"], function, params))
+        return job
+
+    def position(self, job_id: str) -> Optional[int]:
+        """排队位置（1 为下一个执行），不在队列中返回 None"""
+        with self._lock:
+            return self._pending.index(job_id) + 1 if job_id in self._pending else None
+
+    def cancel(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """
+        取消任务：排队中的直接取消；运行中的在产出下一个事件时停止（任务函数的 finally 会执行）
+
+        Returns:
+            任务信息，不存在时返回 None
+        """
+        job = self.store.get(job_id)
+        if job is None or job["status"] in FINISHED_STATES:
+            return job
+        with self._lock:
+            queued = job_id in self._pending
+            if queued:
+                self._pending.remove(job_id)
+            else:
+                self._cancelling.add(job_id)
+        if queued:
+            self.store.append_event(job_id, "error", {"step": "cancel", "message": "任务已取消"})
+            self.store.update(job_id, status=CANCELLED, error="任务已取消", finished_at=datetime.now().isoformat())
+        return self.store.get(job_id)
+
+    def _work(self):
+        while True:
+            job_id, function, params = self._queue.get()
+            with self._lock:
+                if job_id not in self._pending:
+                    # 排队期间已取消
+                    continue
+                self._pending.remove(job_id)
+            self.store.update(job_id, status=RUNNING, started_at=datetime.now().isoformat())
+            status, error = SUCCEEDED, None
+            steps = function(params)
+            try:
+                last_type = None
+                for event_type, data in steps:
+                    self.store.append_event(job_id, event_type, data)
+                    last_type = event_type
+                    if event_type == "error":
+                        error = data.get("message")
+                    if job_id in self._cancelling:
+                        if hasattr(steps, "close"):
+                            steps.close()
+                        status, error = CANCELLED, "任务已取消"
+                        self.store.append_event(job_id, "error", {"step": "cancel", "message": error})
+                        break
+                if status != CANCELLED and last_type != "complete":
+                    status = FAILED
+            except Exception as e:
+                status, error = FAILED, f"{type(e).__name__}: {e}"
+                self.store.append_event(job_id, "error", {"step": "exception", "message": error})
+            with self._lock:
+                self._cancelling.discard(job_id)
+            self.store.update(job_id, status=status, error=error if status != SUCCEEDED else None,
+                              finished_at=datetime.now().isoformat())
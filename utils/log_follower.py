@@ -0,0 +1,271 @@
+#!/usr/bin/env python3
+"""
+Logstash 日志跟踪器
+后台线程持续读取容器日志（Docker Engine API follow）或日志文件（tail -f），解析后放入有界环形缓冲区，
+并按级别维护独立索引：tail、错误过滤、"本次运行以来的错误"等查询都在内存中完成，
+不再每次请求都 docker logs --tail / readlines() 整个文件，也不会漏掉最近 N 行之外的错误。
+"""
+
+import os
+import time
+import calendar
+import threading
+from collections import deque
+from typing import Any, Deque, Dict, Iterator, List, Optional, Tuple
+
+from docker_engine import DockerEngineClient, DockerEngineError
+from logstash_logs import ERROR_LEVELS, LogLineParser
+
+# 环形缓冲区行数
+LOG_BUFFER_LINES = int(os.getenv("LOG_BUFFER_LINES", "10000"))
+# 每个级别（WARN/ERROR/FATAL）单独保留的记录数，不随环形缓冲区淘汰
+LOG_INDEX_ENTRIES = int(os.getenv("LOG_INDEX_ENTRIES", "2000"))
+INDEXED_LEVELS = ("WARN",) + ERROR_LEVELS
+# Logstash 进程启动时的日志（作为"本次运行"的起点）
+RUN_START_LOGGER = "logstash.runner"
+RUN_START_MESSAGE = "Starting Logstash"
+
+class FileLogSource:
+    """日志文件（tail -f，处理轮转和截断）"""
+
+    POLL_INTERVAL = 0.5
+
+    def __init__(self, path: str, backfill_bytes: int = 4 * 1024 * 1024):
+        self.path = path
+        self.backfill_bytes = backfill_bytes
+        self.name = f"file:{path}"
+
+    def lines(self) -> Iterator[Tuple[Optional[str], Optional[float]]]:
+        """
+        Yields:
+            (行, 时间)；历史内容读完后产出一次 (None, None)
+        """
+        with open(self.path, "r", encoding="utf-8", errors="replace") as f:
+            size = os.fstat(f.fileno()).st_size
+            if size > self.backfill_bytes:
+                f.seek(size - self.backfill_bytes)
+                f.readline()  # 丢弃不完整的首行
+            inode = os.fstat(f.fileno()).st_ino
+            pending = ""
+            backfilled = False
+            while True:
+                chunk = f.readline()
+                if chunk:
+                    pending += chunk
+                    if pending.endswith("\n"):
+                        yield pending, None
+                        pending = ""
+                    continue
+                if not backfilled:
+                    backfilled = True
+                    yield None, None
+                time.sleep(self.POLL_INTERVAL)
+                try:
+                    stat = os.stat(self.path)
+                except FileNotFoundError:
+                    continue
+                if stat.st_ino != inode or stat.st_size < f.tell():
+                    # 文件被轮转或截断，从头读新文件
+                    return
+
+class ContainerLogSource:
+    """容器日志（Docker Engine API，logs?follow=1&timestamps=1）"""
+
+    def __init__(self, container: str, client: Optional[DockerEngineClient] = None, backfill_lines: int = 1000):
+        self.container = container
+        self.client = client or DockerEngineClient()
+        self.backfill_lines = backfill_lines
+        self.name = f"container:{container}"
+        # 最后一行的 Docker 时间戳（纳秒），重连时据此跳过已读的行
+        self._last_ns: Optional[int] = None
+
+    def lines(self) -> Iterator[Tuple[Optional[str], Optional[float]]]:
+        if self._last_ns is None:
+            # 先一次性读取历史日志，再从最后一行之后开始 follow
+            history = self.client.container_logs(self.container, tail=self.backfill_lines, timestamps=True)
+            for line in history.splitlines():
+                item = self._timestamped(line)
+                if item is not None:
+                    yield item
+        yield None, None
+        since = self._last_ns / 1e9 if self._last_ns is not None else time.time()
+        for line in self.client.follow_logs(self.container, since=since, tail=None, timestamps=True):
+            item = self._timestamped(line)
+            if item is not None:
+                yield item
+
+    def _timestamped(self, line: str) -> Optional[Tuple[str, float]]:
+        """拆出 Docker 时间戳；重连后 since 只精确到微秒，已读过的行返回 None"""
+        stamp, _, text = line.partition(" ")
+        stamp_ns = _docker_time_ns(stamp)
+        if stamp_ns is None:
+            return line, time.time()
+        if self._last_ns is not None and stamp_ns <= self._last_ns:
+            return None
+        self._last_ns = stamp_ns
+        return text, stamp_ns / 1e9
+
+def _docker_time_ns(stamp: str) -> Optional[int]:
+    """RFC3339Nano（2024-01-01T00:00:00.123456789Z）→ 纳秒时间戳"""
+    if len(stamp) < 20 or stamp[4:5] != "-" or stamp[10:11] != "T" or not stamp.endswith("Z"):
+        return None
+    try:
+        seconds = calendar.timegm(time.strptime(stamp[:19], "%Y-%m-%dT%H:%M:%S"))
+    except ValueError:
+        return None
+    fraction = stamp[20:-1] if stamp[19:20] == "." else ""
+    return seconds * 1_000_000_000 + int((fraction + "000000000")[:9] or 0)
+
+class LogFollower:
+    """
+    后台日志跟踪器（线程安全）
+
+    记录格式同 logstash_logs.parse_log_output，另含 seq（递增序号）和 time（到达顺序单调的时间戳）
+    """
+
+    RETRY_INTERVAL = 5
+
+    def __init__(self, source, capacity: int = LOG_BUFFER_LINES, index_entries: int = LOG_INDEX_ENTRIES):
+        """
+        Args:
+            source: FileLogSource / ContainerLogSource
+            capacity: 环形缓冲区行数
+            index_entries: 每个级别索引保留的记录数
+        """
+        self.source = source
+        self.capacity = capacity
+        self._buffer: List[Optional[Dict[str, Any]]] = [None] * capacity
+        self._next_seq = 0
+        self._index: Dict[str, Deque[Dict[str, Any]]] = {level: deque(maxlen=index_entries) for level in INDEXED_LEVELS}
+        self._level_counts: Dict[str, int] = {}
+        self._last_time = 0.0
+        self._run_started_at: Optional[float] = None
+        self._lock = threading.Lock()
+        self._ready = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self.connected = False
+        self.last_error: Optional[str] = None
+
+    def start(self) -> "LogFollower":
+        """启动后台线程（重复调用无副作用）"""
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="log-follower", daemon=True)
+                self._thread.start()
+        return self
+
+    def wait_ready(self, timeout: float = 5) -> bool:
+        """等待历史日志读入缓冲区"""
+        return self._ready.wait(timeout)
+
+    def _run(self):
+        while True:
+            parser = LogLineParser()
+            try:
+                for line, timestamp in self.source.lines():
+                    self.connected = True
+                    if line is None:
+                        self._ready.set()
+                        continue
+                    record = parser.parse_line(line)
+                    if record is not None:
+                        self._append(record, timestamp)
+                self.last_error = None
+            except (DockerEngineError, OSError) as e:
+                self.last_error = str(e)
+            except Exception as e:
+                self.last_error = f"{type(e).__name__}: {e}"
+            self.connected = False
+            # 源不可用时也让等待者返回（查询得到已有内容）
+            self._ready.set()
+            time.sleep(self.RETRY_INTERVAL)
+
+    def _append(self, record: Dict[str, Any], timestamp: Optional[float]):
+        if timestamp is None and isinstance(record["timestamp"], (int, float)):
+            timestamp = record["timestamp"]
+        with self._lock:
+            # 时间在缓冲区内单调递增，才能按时间二分查找
+            record["time"] = self._last_time = max(timestamp or time.time(), self._last_time)
+            record["seq"] = self._next_seq
+            self._buffer[self._next_seq % self.capacity] = record
+            self._next_seq += 1
+            level = record["level"]
+            if level in self._index:
+                self._index[level].append(record)
+            if level:
+                self._level_counts[level] = self._level_counts.get(level, 0) + 1
+            if record["logger"] == RUN_START_LOGGER and record["message"].startswith(RUN_START_MESSAGE):
+                self._run_started_at = record["time"]
+
+    def _first_seq(self) -> int:
+        return max(0, self._next_seq - self.capacity)
+
+    def _seq_since(self, since: float) -> int:
+        """缓冲区中第一条 time >= since 的记录序号"""
+        low, high = self._first_seq(), self._next_seq
+        while low < high:
+            middle = (low + high) // 2
+            if self._buffer[middle % self.capacity]["time"] < since:
+                low = middle + 1
+            else:
+                high = middle
+        return low
+
+    @property
+    def run_started_at(self) -> Optional[float]:
+        """最近一次 Logstash 启动的时间（未见到启动日志时为 None）"""
+        return self._run_started_at
+
+    def tail(self, lines: int = 100, since: Optional[float] = None) -> List[Dict[str, Any]]:
+        """最近 lines 条记录（可限定 since 之后）"""
+        with self._lock:
+            start = max(self._first_seq(), self._next_seq - lines)
+            if since is not None:
+                start = max(start, self._seq_since(since))
+            return [self._buffer[seq % self.capacity] for seq in range(start, self._next_seq)]
+
+    def records(self, levels=INDEXED_LEVELS, since: Optional[float] = None,
+                limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        """
+        按级别查询（走级别索引，不受环形缓冲区淘汰影响）
+
+        Args:
+            levels: WARN / ERROR / FATAL 中的若干个
+            since: 只返回该时间之后的记录
+            limit: 只返回最近的 limit 条
+        """
+        with self._lock:
+            selected = []
+            for level in levels:
+                index = self._index[level]
+                # 索引按时间有序，从尾部向前取到 since 为止
+                for position in range(len(index) - 1, -1, -1):
+                    record = index[position]
+                    if since is not None and record["time"] < since:
+                        break
+                    selected.append(record)
+        selected.sort(key=lambda record: record["seq"])
+        return selected[-limit:] if limit else selected
+
+    def errors(self, since: Optional[float] = None, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        """ERROR/FATAL 记录"""
+        return self.records(ERROR_LEVELS, since, limit)
+
+    def errors_since_run_start(self, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        """本次 Logstash 运行（最近一次启动）以来的错误"""
+        return self.errors(self._run_started_at, limit)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "source": self.source.name,
+                "running": self._thread is not None and self._thread.is_alive(),
+                "connected": self.connected,
+                "last_error": self.last_error,
+                "total_records": self._next_seq,
+                "buffered_records": self._next_seq - self._first_seq(),
+                "capacity": self.capacity,
+                "level_counts": dict(self._level_counts),
+                "indexed": {level: len(index) for level, index in self._index.items()},
+                "run_started_at": self._run_started_at
+            }
@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+"""
+Logstash http input 客户端
+复用 keep-alive 连接池向 15515 端口提交日志，支持按 NDJSON 批量提交，
+遇到 429/503（Logstash 队列满或暂不可用）时按指数退避重试
+"""
+
+import json
+import time
+from typing import Any, Dict, Iterable, List, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+# Logstash http input 中 json_lines codec 对应的 Content-Type（见 test.conf additional_codecs）
+NDJSON_CONTENT_TYPE = "application/x-ndjson"
+
+class LogstashInputClient:
+    """Logstash http input 连接池客户端"""
+
+    def __init__(self, url: str, pool_size: int = 8, max_retries: int = 5,
+                 backoff_factor: float = 0.2, timeout: float = 10):
+        """
+        Args:
+            url: http input 地址，如 http://logstash:15515
+            pool_size: 连接池大小
+            max_retries: 429/503 及连接失败的最大重试次数
+            backoff_factor: 指数退避基数（秒）
+            timeout: 单次请求超时（秒）
+        """
+        self.url = url
+        self.timeout = timeout
+        retry = Retry(
+            total=max_retries,
+            connect=max_retries,
+            # 读超时不重试，避免同一批日志被重复提交
+            read=0,
+            status=max_retries,
+            status_forcelist=(429, 503),
+            allowed_methods=frozenset(["POST"]),
+            backoff_factor=backoff_factor,
+            respect_retry_after_header=True,
+            raise_on_status=False
+        )
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=retry)
+        self.session = requests.Session()
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    def send(self, body: str, content_type: str = "text/plain",
+             headers: Optional[Dict[str, str]] = None) -> requests.Response:
+        """
+        提交一个请求体，失败时抛出 requests 异常
+
+        Args:
+            body: 请求体
+            content_type: Content-Type，决定 Logstash 使用的 codec
+            headers: 额外请求头
+        """
+        request_headers = {"Content-Type": content_type}
+        if headers:
+            request_headers.update(headers)
+        response = self.session.post(self.url, data=body.encode("utf-8"),
+                                     headers=request_headers, timeout=self.timeout)
+        response.raise_for_status()
+        return response
+
+    def send_bulk(self, records: Iterable[Dict[str, Any]], batch_size: int = 500,
+                  headers: Optional[Dict[str, str]] = None) -> Dict[str, Any]:
+        """
+        按 NDJSON 分批提交多条记录，每批一个请求
+
+        Args:
+            records: 待提交的记录（每条成为一个 Logstash 事件）
+            batch_size: 每批记录数
+            headers: 额外请求头
+
+        Returns:
+            包含 sent, failed, batches, errors, elapsed 的统计字典
+        """
+        start = time.time()
+        stats = {"sent": 0, "failed": 0, "batches": 0, "errors": []}
+        batch: List[str] = []
+
+        def flush():
+            if not batch:
+                return
+            stats["batches"] += 1
+            try:
+                self.send("\n".join(batch) + "\n", NDJSON_CONTENT_TYPE, headers)
+                stats["sent"] += len(batch)
+            except requests.exceptions.RequestException as e:
+                stats["failed"] += len(batch)
+                stats["errors"].append(f"第 {stats['batches']} 批提交失败: {e}")
+            batch.clear()
+
+        for record in records:
+            batch.append(json.dumps(record, ensure_ascii=False))
+            if len(batch) >= batch_size:
+                flush()
+        flush()
+
+        stats["elapsed"] = round(time.time() - start, 3)
+        return stats
+
+    def close(self):
+        self.session.close()
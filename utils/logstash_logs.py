@@ -0,0 +1,268 @@
+#!/usr/bin/env python3
+"""
+Logstash 日志解析
+验证容器和运行容器都以 log.format: json 输出日志（每行一条 JSON 记录），
+这里一次遍历把输出解析为日志记录，再把 ERROR/FATAL/WARN 记录转换为带插件、行列号、级别、logger 的诊断信息。
+非 JSON 行（启动脚本输出、text 格式日志）按纯文本兼容处理。
+"""
+
+import re
+import json
+import time
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+LEVELS = ("TRACE", "DEBUG", "INFO", "WARN", "ERROR", "FATAL")
+ERROR_LEVELS = ("ERROR", "FATAL")
+
+# text 格式：[时间][级别][logger][pipeline.id][plugin.id] 消息
+PLAIN_RECORD_PATTERN = re.compile(
+    r'^\[(?P<timestamp>[^\]]+)\]\[(?P<level>[A-Z]+)\s*\]\[(?P<logger>[^\]]+?)\s*\]'
+    r'(?:\[(?P<pipeline_id>[^\]\s]*)\])?(?:\[(?P<plugin_id>[^\]\s]*)\])?\s?(?P<message>.*)$'
+)
+# 启动脚本直接打印的 "ERROR: ..." / "WARNING: ..."
+PREFIXED_LINE_PATTERN = re.compile(r'^(?P<level>ERROR|FATAL|WARN|WARNING):\s*(?P<message>.*)$')
+
+# 以下模式只作用于 ERROR/FATAL 记录的消息
+LOCATION_PATTERN = re.compile(r'at line (\d+), column (\d+)')
+EXPECTED_PATTERN = re.compile(r'Expected one of (.+?) at line \d+, column \d+')
+PLUGIN_NOT_FOUND_PATTERN = re.compile(r"Couldn't find any (\w+) plugin named '([^']+)'")
+SETTING_PATTERN = re.compile(r"(?:Unknown|Invalid|Missing a required) setting '([^']+)'(?: for (\w+))?")
+# 进程退出时的收尾记录，不包含新信息
+NOISE_MESSAGES = ("Logstash stopped processing because of an error",)
+
+class LogLineParser:
+    """
+    逐行解析 Logstash 输出（可用于流式读取）
+
+    text 格式的多行消息会追加到上一条记录（原地修改），此时 parse_line 返回 None
+    """
+
+    def __init__(self):
+        self._previous_plain: Optional[Dict[str, Any]] = None
+
+    def parse_line(self, line: str) -> Optional[Dict[str, Any]]:
+        """
+        Returns:
+            新的日志记录；空行或续行返回 None
+        """
+        line = line.rstrip("\r\n")
+        if not line.strip():
+            return None
+        if line.startswith("{"):
+            record = _parse_json_line(line)
+            if record is not None:
+                self._previous_plain = None
+                return record
+        elif line.startswith("["):
+            match = PLAIN_RECORD_PATTERN.match(line)
+            if match and match.group("level") in LEVELS:
+                self._previous_plain = _record(match.group("level"), match.group("logger"), match.group("message"),
+                                               timestamp=match.group("timestamp"),
+                                               pipeline_id=match.group("pipeline_id"),
+                                               plugin_id=match.group("plugin_id"))
+                return self._previous_plain
+        if self._previous_plain is not None and line[:1].isspace():
+            # text 格式的多行消息（语法错误的 "after ..." 片段、堆栈等）
+            self._previous_plain["message"] += "\n" + line
+            return None
+
+        self._previous_plain = None
+        match = PREFIXED_LINE_PATTERN.match(line)
+        if match:
+            level = "WARN" if match.group("level") == "WARNING" else match.group("level")
+            return _record(level, None, match.group("message"))
+        return _record(None, None, line.rstrip())
+
+def parse_log_output(output: str) -> List[Dict[str, Any]]:
+    """
+    一次遍历解析 Logstash 输出
+
+    Returns:
+        日志记录列表：{timestamp, level, logger, thread, message, pipeline_id, plugin_id, params}
+        纯文本行的 level 为 None（"ERROR: ..." 等带前缀的行除外）
+    """
+    parser = LogLineParser()
+    records = []
+    for line in output.splitlines():
+        record = parser.parse_line(line)
+        if record is not None:
+            records.append(record)
+    return records
+
+def _record(level: Optional[str], logger: Optional[str], message: str, timestamp: Any = None,
+            thread: Optional[str] = None, pipeline_id: Optional[str] = None, plugin_id: Optional[str] = None,
+            params: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    return {
+        "timestamp": timestamp,
+        "level": level,
+        "logger": logger,
+        "thread": thread,
+        "message": message,
+        "pipeline_id": pipeline_id or None,
+        "plugin_id": plugin_id or None,
+        "params": params or {}
+    }
+
+def _parse_json_line(line: str) -> Optional[Dict[str, Any]]:
+    """解析一条 JSON 日志记录（Logstash 的 JSONLayout：level/loggerName/timeMillis/thread/logEvent）"""
+    try:
+        data = json.loads(line)
+    except ValueError:
+        return None
+    if not isinstance(data, dict) or "level" not in data:
+        return None
+
+    event = data.get("logEvent")
+    if isinstance(event, dict):
+        params = {key: value for key, value in event.items() if key != "message"}
+        message = str(event.get("message", ""))
+    else:
+        params = {}
+        message = str(data.get("message", event if event is not None else ""))
+
+    timestamp = data.get("timeMillis")
+    if timestamp is not None:
+        timestamp = timestamp / 1000
+    elif isinstance(data.get("instant"), dict):
+        timestamp = data["instant"].get("epochSecond")
+    context = data.get("contextMap") if isinstance(data.get("contextMap"), dict) else {}
+    return _record(
+        str(data.get("level")).upper(), data.get("loggerName"), message,
+        timestamp=timestamp, thread=data.get("thread"),
+        pipeline_id=data.get("pipeline.id") or context.get("pipeline.id"),
+        plugin_id=data.get("plugin.id") or context.get("plugin.id"),
+        params=params
+    )
+
+def _event_detail(params: Dict[str, Any]) -> Tuple[Optional[str], Optional[str]]:
+    """
+    在日志参数中找具体原因
+
+    Returns:
+        (原因消息, 异常类名)；优先取带行列号的消息
+    """
+    candidates: List[str] = []
+    exception = None
+    stack: List[Any] = [params]
+    while stack:
+        value = stack.pop()
+        if isinstance(value, dict):
+            for key, item in value.items():
+                if key == "backtrace":
+                    continue
+                if key == "exception" and isinstance(item, str) and exception is None:
+                    exception = item
+                elif isinstance(item, str) and key in ("message", "error", "reason"):
+                    candidates.append(item)
+                elif isinstance(item, (dict, list)):
+                    stack.append(item)
+        elif isinstance(value, list):
+            stack.extend(item for item in value if isinstance(item, (dict, list)))
+    for candidate in candidates:
+        if LOCATION_PATTERN.search(candidate):
+            return candidate, exception
+    return (candidates[0] if candidates else None), exception
+
+def error_from_message(message: str, level: str = "ERROR", logger: Optional[str] = None,
+                       plugin: Optional[str] = None, exception: Optional[str] = None) -> Dict[str, Any]:
+    """
+    把一条错误消息转换为诊断信息
+
+    Returns:
+        {message, line, column, type, level, logger, plugin, exception}，语法错误另含 details（原始消息）
+    """
+    location = LOCATION_PATTERN.search(message)
+    error = {
+        "message": message.strip(),
+        "line": int(location.group(1)) if location else None,
+        "column": int(location.group(2)) if location else None,
+        "type": "general_error",
+        "level": level,
+        "logger": logger,
+        "plugin": plugin,
+        "exception": exception
+    }
+
+    expected = EXPECTED_PATTERN.search(message)
+    not_found = PLUGIN_NOT_FOUND_PATTERN.search(message)
+    setting = SETTING_PATTERN.search(message)
+    if expected:
+        error["type"] = "syntax_error"
+        error["message"] = f"语法错误: 期望 {expected.group(1)}"
+        error["details"] = message.strip()
+    elif not_found:
+        error["type"] = "plugin_error"
+        error["plugin"] = not_found.group(2)
+    elif setting:
+        error["type"] = "config_error"
+        error["plugin"] = setting.group(2) or plugin
+    elif "compile_imperative" in message:
+        error["type"] = "compile_error"
+    elif (exception or "").endswith("ConfigurationError") or "configuration" in message.lower():
+        error["type"] = "config_error"
+    elif level == "FATAL":
+        error["type"] = "fatal_error"
+    return error
+
+def record_error(record: Dict[str, Any]) -> Dict[str, Any]:
+    """ERROR/FATAL 日志记录 → 诊断信息"""
+    message = record["message"]
+    detail, exception = _event_detail(record["params"])
+    if detail and detail not in message:
+        message = f"{message} {detail}" if message else detail
+    params = record["params"]
+    plugin = params.get("name") if isinstance(params.get("name"), str) and "type" in params else None
+    error = error_from_message(message, record["level"], record["logger"], plugin or record["plugin_id"], exception)
+    if error["type"] == "general_error" and plugin:
+        # "Unable to load plugin. {type, name}"
+        error["type"] = "plugin_error"
+    return error
+
+def log_diagnostics(records: Iterable[Dict[str, Any]]) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+    """
+    从日志记录中提取错误和警告（同一问题被多个 logger 重复记录时只保留信息最全的一条）
+
+    Returns:
+        (errors, warnings)
+    """
+    errors: Dict[Tuple, Dict[str, Any]] = {}
+    warnings = []
+    for record in records:
+        level = record["level"]
+        if level in ERROR_LEVELS:
+            if any(noise in record["message"] for noise in NOISE_MESSAGES):
+                continue
+            error = record_error(record)
+            key = (error["type"], error["line"], error["column"], error["plugin"] or error["message"])
+            existing = errors.get(key)
+            if existing is None or len(error.get("details", error["message"])) > len(existing.get("details", existing["message"])):
+                errors[key] = error
+        elif level == "WARN":
+            warnings.append({
+                "message": record["message"].strip(),
+                "type": "warning",
+                "level": level,
+                "logger": record["logger"],
+                "plugin": record["plugin_id"]
+            })
+    return list(errors.values()), warnings
+
+def format_record(record: Dict[str, Any]) -> str:
+    """把日志记录格式化为一行文本（与 text 格式一致，便于页面展示）"""
+    if record["level"] is None:
+        return record["message"]
+    timestamp = record["timestamp"]
+    if isinstance(timestamp, (int, float)):
+        timestamp = time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(timestamp)) + f",{int(timestamp * 1000) % 1000:03d}"
+    parts = [f"[{timestamp or '-'}][{record['level']:<5}]"]
+    if record["logger"]:
+        parts.append(f"[{record['logger']}]")
+    if record["pipeline_id"]:
+        parts.append(f"[{record['pipeline_id']}]")
+    if record["plugin_id"]:
+        parts.append(f"[{record['plugin_id']}]")
+    text = "".join(parts) + " " + record["message"]
+    params = {key: value for key, value in record["params"].items() if key != "backtrace"}
+    if params:
+        text += " " + json.dumps(params, ensure_ascii=False, default=str)
+    return text
@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+"""
+Logstash 监控 API 客户端
+通过 9600 端口的 _node/stats/pipelines/<id> 读取热重载计数器，
+判断新配置何时生效，替代固定秒数的等待
+"""
+
+import time
+from typing import Any, Dict, Optional
+
+import requests
+
+class LogstashMonitor:
+    """Pipeline 热重载状态监控"""
+
+    def __init__(self, api_url: str = "http://logstash:9600", pipeline_id: str = "test", timeout: float = 2):
+        """
+        Args:
+            api_url: Logstash 监控 API 地址
+            pipeline_id: pipelines.yml 中的 pipeline.id
+            timeout: 单次请求超时（秒）
+        """
+        self.api_url = api_url.rstrip("/")
+        self.pipeline_id = pipeline_id
+        self.timeout = timeout
+        self.session = requests.Session()
+
+    def snapshot(self) -> Optional[Dict[str, Any]]:
+        """
+        读取当前 pipeline 的重载状态
+
+        Returns:
+            包含 running, successes, failures, last_success_timestamp, last_failure_timestamp,
+            last_error, ephemeral_id, hash 的字典；监控 API 不可达时返回 None
+        """
+        url = f"{self.api_url}/_node/stats/pipelines/{self.pipeline_id}"
+        try:
+            response = self.session.get(url, timeout=self.timeout)
+        except requests.exceptions.RequestException:
+            return None
+        if response.status_code == 404:
+            # pipeline 尚未创建成功（如首次加载失败）
+            return {"running": False, "successes": 0, "failures": 0, "last_success_timestamp": None,
+                    "last_failure_timestamp": None, "last_error": None, "ephemeral_id": None, "hash": None}
+        if response.status_code != 200:
+            return None
+
+        try:
+            pipeline = response.json().get("pipelines", {}).get(self.pipeline_id)
+        except ValueError:
+            return None
+        if not pipeline:
+            return {"running": False, "successes": 0, "failures": 0, "last_success_timestamp": None,
+                    "last_failure_timestamp": None, "last_error": None, "ephemeral_id": None, "hash": None}
+
+        reloads = pipeline.get("reloads") or {}
+        last_error = reloads.get("last_error")
+        return {
+            "running": True,
+            "successes": reloads.get("successes", 0),
+            "failures": reloads.get("failures", 0),
+            "last_success_timestamp": reloads.get("last_success_timestamp"),
+            "last_failure_timestamp": reloads.get("last_failure_timestamp"),
+            "last_error": last_error.get("message") if isinstance(last_error, dict) else last_error,
+            "ephemeral_id": pipeline.get("ephemeral_id"),
+            "hash": pipeline.get("hash")
+        }
+
+    def pipeline_settings(self) -> Optional[Dict[str, Any]]:
+        """
+        读取 pipeline 的运行参数（_node/pipelines/<id>）
+
+        Returns:
+            {workers, batch_size, batch_delay}；监控 API 不可达或 pipeline 未运行时返回 None
+        """
+        url = f"{self.api_url}/_node/pipelines/{self.pipeline_id}"
+        try:
+            response = self.session.get(url, timeout=self.timeout)
+            if response.status_code != 200:
+                return None
+            pipeline = response.json().get("pipelines", {}).get(self.pipeline_id)
+        except (requests.exceptions.RequestException, ValueError):
+            return None
+        if not pipeline:
+            return None
+        return {
+            "workers": pipeline.get("workers"),
+            "batch_size": pipeline.get("batch_size"),
+            "batch_delay": pipeline.get("batch_delay")
+        }
+
+    def wait_for_reload(self, baseline: Optional[Dict[str, Any]], timeout: float = 30,
+                        poll_interval: float = 0.25) -> Dict[str, Any]:
+        """
+        等待写入配置后的热重载结果
+
+        baseline 必须在写入配置之前通过 snapshot() 获取：重载成功计数增加（或 pipeline 的
+        ephemeral_id 变化）即认为新配置已生效；失败计数增加则立即返回错误
+
+        Returns:
+            {"ok": True/False/None, "status": "reloaded"/"failed"/"timeout"/"unavailable",
+             "error": 重载失败信息, "waited": 等待秒数, "stats": 最后一次状态}
+            监控 API 始终不可达时 ok 为 None（调用方可退回固定等待）
+        """
+        start = time.time()
+        current = None
+        while True:
+            current = self.snapshot()
+            if current is not None:
+                status = self._compare(baseline, current)
+                if status == "reloaded":
+                    return self._result(True, status, start, current)
+                if status == "failed":
+                    return self._result(False, status, start, current, current.get("last_error") or "Pipeline 重载失败")
+
+            if time.time() - start >= timeout:
+                break
+            time.sleep(poll_interval)
+
+        if current is None:
+            return self._result(None, "unavailable", start, None, "无法访问 Logstash 监控 API")
+        return self._result(False, "timeout", start, current, f"{timeout}s 内未检测到 Pipeline 重载")
+
+    def _compare(self, baseline: Optional[Dict[str, Any]], current: Dict[str, Any]) -> Optional[str]:
+        if baseline is None:
+            # 写入前监控 API 不可达（Logstash 启动中），以 pipeline 正常运行为准
+            return "reloaded" if current["running"] else None
+        if current["failures"] > baseline["failures"]:
+            return "failed"
+        if current["successes"] > baseline["successes"]:
+            return "reloaded"
+        if current["running"] and current["ephemeral_id"] != baseline["ephemeral_id"]:
+            # pipeline 之前未运行（或被重新创建）
+            return "reloaded"
+        return None
+
+    def _result(self, ok: Optional[bool], status: str, start: float, stats: Optional[Dict[str, Any]],
+                error: Optional[str] = None) -> Dict[str, Any]:
+        return {
+            "ok": ok,
+            "status": status,
+            "error": error,
+            "waited": round(time.time() - start, 3),
+            "stats": stats
+        }
@@ -0,0 +1,438 @@
+#!/usr/bin/env python3
+"""
+Pipeline 基准测试
+把日志语料循环回放到 Logstash http input（固定速率或尽可能快），每条记录带上本次运行的关联 ID 和序号；
+同时轮询 events.ndjson，记录每个序号首次出现的时间，得到提交 → 写入结果文件的端到端延迟分布、吞吐量和丢失数。
+运行前后读取 pipeline 计数器和重载状态，区分被 filter 丢弃的事件与运行期间的重载。
+
+延迟的精度受结果文件轮询间隔限制（见 resolution_ms）；提交时间取每个批次请求发出的时间。
+"""
+
+import os
+import sys
+import json
+import math
+import time
+import uuid
+import hashlib
+import threading
+from array import array
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+import requests
+
+from logstash_client import LogstashInputClient, NDJSON_CONTENT_TYPE
+from logstash_monitor import LogstashMonitor
+from pipeline_profiler import PipelineProfiler
+from result_reader import ResultReader, RUN_ID_FIELD, RUN_ID_HEADER
+
+# 基准测试结果目录（每次运行一个 JSON 文件）
+BENCHMARK_DIR = os.getenv("BENCHMARK_DIR", "/app/data/benchmarks")
+# 记录在本次运行中的序号
+SEQ_FIELD = "lab_bench_seq"
+
+def corpus_hash(lines: List[Any]) -> str:
+    """语料内容哈希（相同语料的结果才能相互比较）"""
+    digest = hashlib.sha256()
+    for line in lines:
+        digest.update((line if isinstance(line, str) else json.dumps(line, ensure_ascii=False, sort_keys=True)).encode("utf-8"))
+        digest.update(b"\n")
+    return digest.hexdigest()
+
+def percentile(values: List[float], fraction: float) -> Optional[float]:
+    """最近秩百分位（values 已排序）"""
+    if not values:
+        return None
+    index = max(0, min(len(values) - 1, math.ceil(fraction * len(values)) - 1))
+    return values[index]
+
+class PipelineBenchmark:
+    """语料回放与端到端延迟测量"""
+
+    def __init__(self, client: LogstashInputClient, reader: ResultReader,
+                 monitor: Optional[LogstashMonitor] = None, profiler: Optional[PipelineProfiler] = None,
+                 poll_interval: float = 0.01):
+        """
+        Args:
+            client: http input 客户端
+            reader: 结果文件读取器
+            monitor: 重载状态和 pipeline 参数（可选）
+            profiler: pipeline 事件计数器（可选，用于统计被 filter 丢弃的事件）
+            poll_interval: 结果文件轮询间隔（秒），决定延迟精度
+        """
+        self.client = client
+        self.reader = reader
+        self.monitor = monitor
+        self.profiler = profiler
+        self.poll_interval = poll_interval
+
+    def run(self, records: List[Dict[str, Any]], rate: Optional[float] = None, events: Optional[int] = None,
+            duration: Optional[float] = None, batch_size: int = 100, warmup: int = 0,
+            drain_timeout: float = 30, settle: float = 2) -> Dict[str, Any]:
+        """
+        执行一次基准测试
+
+        Args:
+            records: 语料（每条成为一个事件，循环使用）
+            rate: 目标速率（事件/秒），为空时尽可能快地发送
+            events: 发送的事件数；与 duration 都为空时发送一遍语料（固定速率时为 rate × duration）
+            duration: 发送时长（秒）
+            batch_size: 每个请求的事件数（固定速率时不超过每 50ms 的事件数，避免突发）
+            warmup: 正式测量前先发送并等待的预热事件数（不计入结果）
+            drain_timeout: 发送结束后最多等待结果写入的秒数
+            settle: 发送结束后连续多少秒没有新结果即认为剩余事件已被丢弃
+
+        Returns:
+            基准测试结果（发送/接收计数、吞吐量、延迟分位数、pipeline 计数器、重载状态、notes）
+        """
+        if not records:
+            raise ValueError("语料为空")
+        plan = self.plan(len(records), rate, events, duration, batch_size)
+        events, batch_size = plan["events"], plan["batch_size"]
+
+        if warmup > 0:
+            self._warmup(records, warmup, batch_size, drain_timeout)
+
+        run_id = uuid.uuid4().hex
+        reload_before = self.monitor.snapshot() if self.monitor else None
+        counters_before = self.profiler.snapshot() if self.profiler else None
+        settings = self.monitor.pipeline_settings() if self.monitor else None
+
+        state = {
+            "submitted": array("d"),
+            "arrivals": array("d"),
+            "sent": 0,
+            "failed": 0,
+            "batches": 0,
+            "errors": [],
+            "max_lag": 0.0,
+            "send_start": None,
+            "send_end": None,
+            "done": False
+        }
+        sender = threading.Thread(target=self._send, name="benchmark-sender",
+                                  args=(state, records, run_id, rate, events, duration, batch_size), daemon=True)
+        cursor = self.reader.page(0, 0)["total"]
+        sender.start()
+        observed = self._observe(state, run_id, cursor, drain_timeout, settle)
+        sender.join()
+
+        counters_after = self.profiler.snapshot() if self.profiler else None
+        reload_after = self.monitor.snapshot() if self.monitor else None
+        return self._report(state, observed, run_id, rate, events, duration, batch_size, warmup, settings,
+                            counters_before, counters_after, reload_before, reload_after)
+
+    @staticmethod
+    def plan(corpus_size: int, rate: Optional[float] = None, events: Optional[int] = None,
+             duration: Optional[float] = None, batch_size: int = 100) -> Dict[str, Any]:
+        """
+        实际执行的发送计划（与结果中的 mode / settings 一致，调用方可据此预先计算历史记录的分组键）
+
+        Returns:
+            {mode, rate, events, duration, batch_size}
+        """
+        if rate is not None and rate <= 0:
+            raise ValueError("rate 必须大于 0")
+        if events is None:
+            if duration is None:
+                events = corpus_size
+            elif rate is not None:
+                events = int(rate * duration)
+        if rate is not None:
+            batch_size = max(1, min(batch_size, int(rate / 20)))
+        return {"mode": "rate" if rate is not None else "max", "rate": rate, "events": events,
+                "duration": duration, "batch_size": batch_size}
+
+    def _warmup(self, records: List[Dict[str, Any]], count: int, batch_size: int, timeout: float):
+        run_id = uuid.uuid4().hex
+        warmup = [dict(records[index % len(records)], **{RUN_ID_FIELD: run_id}) for index in range(count)]
+        stats = self.client.send_bulk(warmup, batch_size, {RUN_ID_HEADER: run_id})
+        self.reader.wait_for_run(run_id, stats["sent"], timeout)
+
+    def _send(self, state: Dict[str, Any], records: List[Dict[str, Any]], run_id: str, rate: Optional[float],
+              events: Optional[int], duration: Optional[float], batch_size: int):
+        """发送线程：按计划提交批次，记录每条记录的提交时间"""
+        headers = {RUN_ID_HEADER: run_id}
+        start = state["send_start"] = time.time()
+        seq = 0
+        try:
+            while True:
+                now = time.time()
+                if events is not None and seq >= events:
+                    break
+                if duration is not None and now - start >= duration:
+                    break
+                count = batch_size if events is None else min(batch_size, events - seq)
+                if rate is not None:
+                    delay = start + seq / rate - now
+                    if delay > 0:
+                        time.sleep(delay)
+                    else:
+                        state["max_lag"] = max(state["max_lag"], -delay)
+                lines = []
+                for index in range(seq, seq + count):
+                    record = dict(records[index % len(records)])
+                    record[RUN_ID_FIELD] = run_id
+                    record[SEQ_FIELD] = index
+                    lines.append(json.dumps(record, ensure_ascii=False))
+                body = "\n".join(lines) + "\n"
+                # 先登记再提交：结果可能在请求返回前就已写入
+                state["submitted"].extend([time.time()] * count)
+                state["arrivals"].extend([0.0] * count)
+                state["batches"] += 1
+                try:
+                    self.client.send(body, NDJSON_CONTENT_TYPE, headers)
+                    state["sent"] += count
+                except requests.exceptions.RequestException as e:
+                    state["failed"] += count
+                    # 提交失败的序号不参与延迟统计
+                    for index in range(seq, seq + count):
+                        state["submitted"][index] = 0.0
+                    if len(state["errors"]) < 10:
+                        state["errors"].append(f"第 {state['batches']} 批提交失败: {e}")
+                seq += count
+        finally:
+            state["send_end"] = time.time()
+            state["done"] = True
+
+    def _observe(self, state: Dict[str, Any], run_id: str, cursor: int, drain_timeout: float,
+                 settle: float) -> Dict[str, Any]:
+        """轮询结果文件，记录本次运行每个序号首次出现的时间，直到收齐或超时"""
+        observed = {"received": 0, "matched": 0, "duplicates": 0, "first_arrival": None, "last_arrival": None,
+                    "timed_out": False, "results_reset": False}
+        generation = self.reader.generation
+        last_change = time.time()
+        while True:
+            page = self.reader.read_page(cursor, 5000)
+            now = time.time()
+            if page["generation"] != generation:
+                # 运行期间结果被清空，从新文件开头继续
+                generation = page["generation"]
+                observed["results_reset"] = True
+                cursor = page["first_cursor"]
+                continue
+            cursor = page["next_cursor"]
+            submitted, arrivals = state["submitted"], state["arrivals"]
+            for event in page["events"]:
+                if event.get(RUN_ID_FIELD) != run_id:
+                    continue
+                observed["received"] += 1
+                last_change = now
+                seq = event.get(SEQ_FIELD)
+                if not isinstance(seq, int) or not 0 <= seq < len(arrivals):
+                    continue
+                if arrivals[seq]:
+                    # split 等插件一拆多
+                    observed["duplicates"] += 1
+                    continue
+                arrivals[seq] = now
+                observed["matched"] += 1
+                observed["first_arrival"] = observed["first_arrival"] or now
+                observed["last_arrival"] = now
+            if page["next_cursor"] < page["total"]:
+                continue
+
+            if state["done"]:
+                if observed["matched"] >= state["sent"]:
+                    break
+                if now - max(last_change, state["send_end"]) >= settle:
+                    break
+                if now - state["send_end"] >= drain_timeout:
+                    observed["timed_out"] = True
+                    break
+            time.sleep(self.poll_interval)
+        return observed
+
+    def _report(self, state: Dict[str, Any], observed: Dict[str, Any], run_id: str, rate: Optional[float],
+                events: Optional[int], duration: Optional[float], batch_size: int, warmup: int, settings: Optional[Dict[str, Any]],
+                counters_before: Optional[Dict[str, Any]], counters_after: Optional[Dict[str, Any]],
+                reload_before: Optional[Dict[str, Any]], reload_after: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+        latencies = sorted((arrival - submitted) * 1000
+                           for submitted, arrival in zip(state["submitted"], state["arrivals"])
+                           if submitted and arrival)
+        sent = state["sent"]
+        send_elapsed = state["send_end"] - state["send_start"]
+        # 吞吐量：第一批提交到最后一个结果写入
+        span = (observed["last_arrival"] - state["send_start"]) if observed["last_arrival"] else None
+
+        def ms(value: Optional[float]) -> Optional[float]:
+            return round(value, 3) if value is not None else None
+
+        pipeline = None
+        if counters_before and counters_after:
+            restarted = counters_before["ephemeral_id"] != counters_after["ephemeral_id"]
+            base = {"in": 0, "filtered": 0, "out": 0} if restarted else counters_before["events"]
+            pipeline = {key: counters_after["events"][key] - base[key] for key in ("in", "filtered", "out")}
+            pipeline["dropped"] = max(pipeline["in"] - pipeline["out"], 0)
+
+        reload = None
+        if reload_before is not None and reload_after is not None:
+            reload = {
+                "running": reload_after["running"],
+                "reloaded": reload_after["successes"] > reload_before["successes"]
+                            or reload_after["ephemeral_id"] != reload_before["ephemeral_id"],
+                "failures": reload_after["failures"] - reload_before["failures"],
+                "last_error": reload_after["last_error"],
+                "hash": reload_after["hash"]
+            }
+
+        notes = []
+        lost = sent - observed["matched"]
+        if reload and reload["reloaded"]:
+            notes.append("运行期间 pipeline 发生了重载，结果不可比较")
+        if reload and not reload["running"]:
+            notes.append("pipeline 未在运行")
+        if observed["results_reset"]:
+            notes.append("运行期间结果文件被清空，部分事件可能未被观测到")
+        if state["failed"]:
+            notes.append(f"{state['failed']} 个事件提交失败")
+        if lost:
+            if pipeline and pipeline["dropped"] >= lost:
+                notes.append(f"{lost} 个事件未写入结果文件（pipeline 计数显示被 filter 丢弃）")
+            elif observed["timed_out"]:
+                notes.append(f"{lost} 个事件在 drain_timeout 内未写入结果文件")
+            else:
+                notes.append(f"{lost} 个事件未写入结果文件")
+        if rate is not None and state["max_lag"] > 0.1:
+            notes.append(f"发送落后于计划最多 {round(state['max_lag'], 3)}s，未能维持目标速率（http input 背压）")
+        if len(latencies) < 100:
+            notes.append(f"只有 {len(latencies)} 个延迟样本，分位数不可靠，建议增加事件数")
+
+        return {
+            "id": run_id,
+            "created_at": datetime.now().isoformat(),
+            "mode": "rate" if rate is not None else "max",
+            "settings": {"rate": rate, "events": events, "duration": duration, "batch_size": batch_size, "warmup": warmup},
+            "logstash": settings,
+            "sent": sent,
+            "failed": state["failed"],
+            "batches": state["batches"],
+            "errors": state["errors"],
+            "received": observed["received"],
+            "matched": observed["matched"],
+            "duplicates": observed["duplicates"],
+            "dropped": lost,
+            "pipeline": pipeline,
+            "throughput": {
+                "send_eps": round(sent / send_elapsed, 1) if send_elapsed > 0 else None,
+                "eps": round(observed["matched"] / span, 1) if span and span > 0 else None,
+                "target_eps": rate,
+                "send_seconds": round(send_elapsed, 3),
+                "seconds": round(span, 3) if span else None,
+                "max_lag_ms": round(state["max_lag"] * 1000, 3)
+            },
+            "latency_ms": {
+                "samples": len(latencies),
+                "min": ms(latencies[0] if latencies else None),
+                "mean": ms(sum(latencies) / len(latencies) if latencies else None),
+                "p50": ms(percentile(latencies, 0.50)),
+                "p95": ms(percentile(latencies, 0.95)),
+                "p99": ms(percentile(latencies, 0.99)),
+                "max": ms(latencies[-1] if latencies else None),
+                "resolution": round(self.poll_interval * 1000, 3)
+            },
+            "reload": reload,
+            "timed_out": observed["timed_out"],
+            "notes": notes
+        }
+
+def save_result(result: Dict[str, Any], directory: str = BENCHMARK_DIR) -> str:
+    """保存结果为 <目录>/<id>.json，返回文件路径"""
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, f"{result['id']}.json")
+    temp_path = f"{path}.tmp"
+    with open(temp_path, "w", encoding="utf-8") as f:
+        json.dump(result, f, ensure_ascii=False, indent=2)
+    os.replace(temp_path, path)
+    return path
+
+def load_result(result_id: str, directory: str = BENCHMARK_DIR) -> Optional[Dict[str, Any]]:
+    if not result_id.isalnum():
+        return None
+    try:
+        with open(os.path.join(directory, f"{result_id}.json"), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+def list_results(directory: str = BENCHMARK_DIR, limit: int = 50) -> List[Dict[str, Any]]:
+    """最近的结果摘要（新的在前）"""
+    results = []
+    try:
+        names = [name for name in os.listdir(directory) if name.endswith(".json")]
+    except FileNotFoundError:
+        return []
+    for name in names:
+        result = load_result(name[:-len(".json")], directory)
+        if result is None:
+            continue
+        results.append({
+            "id": result["id"],
+            "created_at": result["created_at"],
+            "mode": result["mode"],
+            "sent": result["sent"],
+            "dropped": result["dropped"],
+            "eps": result["throughput"]["eps"],
+            "p50_ms": result["latency_ms"]["p50"],
+            "p99_ms": result["latency_ms"]["p99"],
+            "config_sha256": (result.get("config") or {}).get("sha256"),
+            "corpus_sha256": (result.get("corpus") or {}).get("sha256")
+        })
+    results.sort(key=lambda result: result["created_at"], reverse=True)
+    return results[:limit]
+
+def format_summary(result: Dict[str, Any]) -> str:
+    """单次结果的文本摘要（CLI 和 MCP 输出共用）"""
+    throughput = result["throughput"]
+    latency = result["latency_ms"]
+    mode = f"固定速率 {throughput['target_eps']:g}/s" if result["mode"] == "rate" else "最大速率"
+    lines = [
+        f"基准测试 {result['id']}（{mode}）",
+        f"  发送 {result['sent']} 个事件，写入 {result['matched']} 个，丢失 {result['dropped']} 个，提交失败 {result['failed']} 个",
+        f"  吞吐量 {throughput['eps']} 事件/秒（发送 {throughput['send_eps']} 事件/秒）",
+        f"  延迟 ms：p50 {latency['p50']} / p95 {latency['p95']} / p99 {latency['p99']} / max {latency['max']}"
+        f"（{latency['samples']} 个样本，精度 {latency['resolution']} ms）"
+    ]
+    if result.get("logstash"):
+        settings = result["logstash"]
+        lines.append(f"  pipeline.workers={settings['workers']} batch.size={settings['batch_size']} "
+                     f"batch.delay={settings['batch_delay']}")
+    lines.extend(f"  ⚠️ {note}" for note in result["notes"])
+    return "\n".join(lines)
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="通过 Web 服务对当前 pipeline 执行基准测试")
+    parser.add_argument("corpus", help="日志语料文件（每行一条）")
+    parser.add_argument("--url", default="http://localhost:19000", help="Web 服务地址")
+    parser.add_argument("--json", action="store_true", help="每行按 JSON 对象解析")
+    parser.add_argument("--rate", type=float, help="目标速率（事件/秒），不指定时尽可能快")
+    parser.add_argument("--events", type=int, help="发送的事件数（语料循环使用）")
+    parser.add_argument("--duration", type=float, help="发送时长（秒）")
+    parser.add_argument("--batch-size", type=int, help="每个请求的事件数")
+    parser.add_argument("--warmup", type=int, help="预热事件数")
+    parser.add_argument("--output", help="把完整结果写入 JSON 文件")
+    args = parser.parse_args()
+
+    form = {"is_json": "1" if args.json else "0"}
+    for name in ("rate", "events", "duration", "batch_size", "warmup"):
+        if getattr(args, name) is not None:
+            form[name] = str(getattr(args, name))
+    with open(args.corpus, "rb") as corpus:
+        response = requests.post(f"{args.url.rstrip('/')}/benchmark", data=form,
+                                 files={"file": (os.path.basename(args.corpus), corpus)}, timeout=None)
+    try:
+        body = response.json()
+    except ValueError:
+        print(f"请求失败: HTTP {response.status_code}", file=sys.stderr)
+        sys.exit(1)
+    if not body.get("ok"):
+        print(body.get("message"), file=sys.stderr)
+        sys.exit(1)
+    print(format_summary(body["result"]))
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(body["result"], f, ensure_ascii=False, indent=2)
+    sys.exit(0)
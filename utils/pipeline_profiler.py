@@ -0,0 +1,259 @@
+#!/usr/bin/env python3
+"""
+Pipeline 性能分析
+在一次测试运行前后各读取一次 _node/stats/pipelines/<id>，按插件计算耗时、事件数和 grok 匹配/失败次数的增量，
+再借助配置语法树把插件归到所在的条件分支（if / else if / else），得到按插件和按条件分支排序的热点报告。
+
+Logstash 只统计插件的 duration_in_millis（毫秒精度），样本太少时结果不可靠，调用方应重复日志放大样本。
+"""
+
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+import requests
+
+from config_parser import ConfigDocument, Node
+
+PLUGIN_KINDS = (("inputs", "input"), ("filters", "filter"), ("outputs", "output"))
+
+class PipelineProfiler:
+    """读取 pipeline 的插件级统计"""
+
+    def __init__(self, api_url: str = "http://logstash:9600", pipeline_id: str = "test", timeout: float = 2):
+        """
+        Args:
+            api_url: Logstash 监控 API 地址
+            pipeline_id: pipelines.yml 中的 pipeline.id
+            timeout: 单次请求超时（秒）
+        """
+        self.api_url = api_url.rstrip("/")
+        self.pipeline_id = pipeline_id
+        self.timeout = timeout
+        self.session = requests.Session()
+
+    def snapshot(self) -> Optional[Dict[str, Any]]:
+        """
+        读取当前统计
+
+        Returns:
+            {captured_at, ephemeral_id, hash, events: {in, filtered, out, duration_ms}, plugins: {id: 插件统计}}；
+            监控 API 不可达或 pipeline 未运行时返回 None
+        """
+        url = f"{self.api_url}/_node/stats/pipelines/{self.pipeline_id}"
+        try:
+            response = self.session.get(url, timeout=self.timeout)
+            if response.status_code != 200:
+                return None
+            pipeline = response.json().get("pipelines", {}).get(self.pipeline_id)
+        except (requests.exceptions.RequestException, ValueError):
+            return None
+        if not pipeline:
+            return None
+
+        events = pipeline.get("events") or {}
+        plugins = {}
+        for group, kind in PLUGIN_KINDS:
+            for plugin in (pipeline.get("plugins") or {}).get(group) or []:
+                counters = plugin.get("events") or {}
+                plugins[plugin.get("id")] = {
+                    "id": plugin.get("id"),
+                    "name": plugin.get("name"),
+                    "kind": kind,
+                    "events_in": counters.get("in", 0),
+                    "events_out": counters.get("out", 0),
+                    # input 的耗时为写入队列的等待时间
+                    "duration_ms": counters.get("duration_in_millis", counters.get("queue_push_duration_in_millis", 0)),
+                    # grok 等插件的匹配计数
+                    "matches": plugin.get("matches"),
+                    "failures": plugin.get("failures")
+                }
+        return {
+            "captured_at": time.time(),
+            "ephemeral_id": pipeline.get("ephemeral_id"),
+            "hash": pipeline.get("hash"),
+            "events": {
+                "in": events.get("in", 0),
+                "filtered": events.get("filtered", 0),
+                "out": events.get("out", 0),
+                "duration_ms": events.get("duration_in_millis", 0)
+            },
+            "plugins": plugins
+        }
+
+    def wait_for_output(self, before: Dict[str, Any], expected: int, timeout: float = 5,
+                        poll_interval: float = 0.1) -> Optional[Dict[str, Any]]:
+        """
+        等待 pipeline 输出计数增加 expected 后再读取统计（插件统计在每个批次处理完后才更新）
+
+        Returns:
+            最后一次快照（超时也返回，由调用方比较事件数）
+        """
+        deadline = time.time() + timeout
+        current = self.snapshot()
+        while current is not None and time.time() < deadline:
+            if current["ephemeral_id"] != before["ephemeral_id"] or \
+                    current["events"]["out"] - before["events"]["out"] >= expected:
+                break
+            time.sleep(poll_interval)
+            current = self.snapshot() or current
+        return current
+
+def _delta(after: Dict[str, Any], before: Optional[Dict[str, Any]], key: str) -> Optional[int]:
+    value = after.get(key)
+    if value is None:
+        return None
+    previous = (before or {}).get(key) or 0
+    return max(value - previous, 0)
+
+def _micros(duration_ms: float, events: int) -> Optional[float]:
+    return round(duration_ms * 1000 / events, 3) if events else None
+
+def _clauses(document: ConfigDocument) -> Tuple[Dict[str, Dict[str, Any]], List[Dict[str, Any]]]:
+    """
+    遍历语法树，返回 ({插件 id: 源码位置和所在分支}, [条件分支子句])
+
+    子句的 plugin_ids 包含全部下级插件；first_ids 为子句第一条语句是插件时该插件的 id
+    （进入分支的事件都会流经它，用于计算分支的事件数）
+    """
+    located: Dict[str, Dict[str, Any]] = {}
+    clauses: List[Dict[str, Any]] = []
+
+    def visit(nodes: List[Node], section: str, path: List[Dict[str, Any]]):
+        for node in nodes:
+            if node.type == "plugin":
+                identifier = next((attribute.value for attribute in node.attributes
+                                   if attribute.name == "id" and isinstance(attribute.value, str)), None)
+                line, _ = document.position(node.start)
+                if identifier is not None:
+                    located[identifier] = {"section": section, "line": line,
+                                           "conditions": [clause["label"] for clause in path]}
+                    for clause in path:
+                        clause["plugin_ids"].append(identifier)
+                        if clause["_first"] is node:
+                            clause["first_ids"].append(identifier)
+                else:
+                    for clause in path:
+                        clause["unidentified"] += 1
+                continue
+            for child in node.children:
+                line, _ = document.position(child.start)
+                condition = f"{child.type} {child.condition}" if child.condition is not None else child.type
+                clause = {"label": f"{condition} (第 {line} 行)", "condition": condition, "section": section,
+                          "line": line, "depth": len(path), "plugin_ids": [], "first_ids": [],
+                          "unidentified": 0, "_first": None}
+                clauses.append(clause)
+                if child.children:
+                    # 分支内第一条语句（插件或嵌套分支）
+                    clause["_first"] = child.children[0] if child.children[0].type == "plugin" else None
+                visit(child.children, section, path + [clause])
+
+    for section in document.sections:
+        visit(section.children, section.name, [])
+    return located, clauses
+
+def build_report(before: Dict[str, Any], after: Dict[str, Any], document: Optional[ConfigDocument] = None,
+                 top: Optional[int] = None) -> Dict[str, Any]:
+    """
+    计算两次快照之间的增量并生成热点报告
+
+    Args:
+        before, after: PipelineProfiler.snapshot() 的结果
+        document: 当前配置（用于定位插件源码行和所在条件分支）
+        top: 插件和分支列表只保留耗时最高的 top 项
+
+    Returns:
+        {events, duration_ms, us_per_event, reloaded, plugins, conditionals, unattributed, notes}
+    """
+    reloaded = before["ephemeral_id"] != after["ephemeral_id"]
+    # pipeline 重载后计数器从 0 开始，直接使用 after 的值
+    base = None if reloaded else before
+
+    events_in = _delta(after["events"], base and base["events"], "in")
+    events_out = _delta(after["events"], base and base["events"], "out")
+    pipeline_ms = _delta(after["events"], base and base["events"], "duration_ms")
+
+    located, clauses = _clauses(document) if document is not None else ({}, [])
+
+    plugins = []
+    for plugin_id, plugin in after["plugins"].items():
+        previous = base["plugins"].get(plugin_id) if base else None
+        plugin_in = _delta(plugin, previous, "events_in")
+        duration = _delta(plugin, previous, "duration_ms") or 0
+        matches = _delta(plugin, previous, "matches")
+        failures = _delta(plugin, previous, "failures")
+        if not plugin_in and not duration:
+            continue
+        location = located.get(plugin_id, {})
+        entry = {
+            "id": plugin_id,
+            "name": plugin["name"],
+            "kind": plugin["kind"],
+            "line": location.get("line"),
+            "conditions": location.get("conditions", []),
+            "events_in": plugin_in,
+            "events_out": _delta(plugin, previous, "events_out"),
+            "duration_ms": duration,
+            # 处理每个流经该插件的事件的耗时
+            "us_per_event": _micros(duration, plugin_in),
+            # 分摊到 pipeline 每个输入事件的耗时
+            "us_per_pipeline_event": _micros(duration, events_in)
+        }
+        if matches is not None or failures is not None:
+            total = (matches or 0) + (failures or 0)
+            entry.update({"matches": matches, "failures": failures,
+                          "match_rate": round((matches or 0) / total, 4) if total else None})
+        plugins.append(entry)
+
+    filter_ms = sum(plugin["duration_ms"] for plugin in plugins if plugin["kind"] == "filter")
+    for plugin in plugins:
+        plugin["share"] = round(plugin["duration_ms"] / filter_ms, 4) if filter_ms and plugin["kind"] == "filter" else None
+    plugins.sort(key=lambda plugin: (plugin["kind"] != "filter", -plugin["duration_ms"]))
+
+    measured = {plugin["id"]: plugin for plugin in plugins}
+    conditionals = []
+    for clause in clauses:
+        members = [measured[plugin_id] for plugin_id in clause["plugin_ids"] if plugin_id in measured]
+        if not members:
+            continue
+        duration = sum(member["duration_ms"] for member in members)
+        entering = [measured[plugin_id]["events_in"] for plugin_id in clause["first_ids"] if plugin_id in measured]
+        clause_in = max(entering) if entering else max(member["events_in"] or 0 for member in members)
+        conditionals.append({
+            "condition": clause["condition"],
+            "section": clause["section"],
+            "line": clause["line"],
+            "depth": clause["depth"],
+            "plugins": len(members),
+            "unidentified_plugins": clause["unidentified"],
+            "events_in": clause_in,
+            "duration_ms": duration,
+            "us_per_event": _micros(duration, clause_in),
+            "us_per_pipeline_event": _micros(duration, events_in),
+            "share": round(duration / filter_ms, 4) if filter_ms and clause["section"] == "filter" else None
+        })
+    conditionals.sort(key=lambda clause: -clause["duration_ms"])
+
+    notes = []
+    if reloaded:
+        notes.append("运行期间 pipeline 发生了重载，统计从重载后开始计算")
+    if document is not None:
+        unattributed = [plugin["id"] for plugin in plugins if plugin["id"] not in located]
+        if unattributed:
+            notes.append(f"{len(unattributed)} 个插件在配置中没有显式 id，无法定位源码行和所在分支")
+    else:
+        unattributed = []
+    if events_in and events_in < 1000:
+        notes.append(f"本次只处理了 {events_in} 个事件，毫秒级耗时统计误差较大，建议增加样本")
+
+    return {
+        "events": {"in": events_in, "out": events_out},
+        "duration_ms": pipeline_ms,
+        "filter_duration_ms": filter_ms,
+        "us_per_event": _micros(pipeline_ms or 0, events_in),
+        "reloaded": reloaded,
+        "elapsed": round(after["captured_at"] - before["captured_at"], 3),
+        "plugins": plugins[:top] if top else plugins,
+        "conditionals": conditionals[:top] if top else conditionals,
+        "unattributed": unattributed,
+        "notes": notes
+    }
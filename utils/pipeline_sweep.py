@@ -0,0 +1,388 @@
+#!/usr/bin/env python3
+"""
+Pipeline 参数扫描
+按 pipeline.workers × pipeline.batch.size × pipeline.batch.delay 的网格逐点改写 pipelines.yml，
+等待 Logstash 应用新参数（config.reload.automatic 会在 pipelines.yml 变化时重建 pipeline；未生效时可重启容器），
+用同一份语料重复测量，得到吞吐量/延迟随参数变化的曲面，并给出推荐参数。扫描结束后恢复原来的 pipelines.yml。
+
+推荐规则：在没有丢失事件的点中取吞吐量均值最高的点，吞吐量与之无显著差异（95% 置信区间重叠或相差不超过
+min_effect）的点里再选 p99 延迟最低的；同样好时选 worker 数和批大小更小的（占用更少的 CPU 和堆内存）。
+"""
+
+import os
+import re
+import sys
+import json
+import time
+import uuid
+import itertools
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from benchmark_history import METRICS, summarize
+from logstash_monitor import LogstashMonitor
+from pipeline_benchmark import BENCHMARK_DIR
+
+# pipelines.yml 路径（docker-compose 挂载到 Web 容器）
+PIPELINES_YML = os.getenv("PIPELINES_YML", "/app/logstash/pipelines.yml")
+# 扫描结果目录
+SWEEP_DIR = os.path.join(BENCHMARK_DIR, "sweeps")
+# 参数名 → pipelines.yml 中的键
+SETTING_KEYS = (("workers", "pipeline.workers"), ("batch_size", "pipeline.batch.size"),
+                ("batch_delay", "pipeline.batch.delay"))
+
+def _pipeline_entry(lines: List[str], pipeline_id: str) -> Tuple[int, int, int]:
+    """
+    pipelines.yml 中 pipeline_id 条目的 (起始行, 结束行, 键的缩进)
+
+    Raises:
+        ValueError: 找不到该 pipeline
+    """
+    start = indent = None
+    for index, line in enumerate(lines):
+        match = re.match(r"^(\s*)-(\s+)pipeline\.id:\s*[\"']?([^\"'#\s]+)", line)
+        if start is None:
+            if match and match.group(3) == pipeline_id:
+                start, indent = index, len(match.group(1)) + 1 + len(match.group(2))
+            continue
+        stripped = line.strip()
+        if stripped and not stripped.startswith("#") and len(line) - len(line.lstrip()) < indent:
+            # 下一个条目（- ...）或缩进更浅的内容
+            return start, index, indent
+    if start is None:
+        raise ValueError(f"pipelines.yml 中没有 pipeline.id 为 {pipeline_id} 的条目")
+    return start, len(lines), indent
+
+def read_pipeline_settings(text: str, pipeline_id: str) -> Dict[str, Optional[int]]:
+    """pipelines.yml 中该 pipeline 显式设置的 {workers, batch_size, batch_delay}（未设置为 None）"""
+    lines = text.splitlines()
+    start, end, indent = _pipeline_entry(lines, pipeline_id)
+    settings: Dict[str, Optional[int]] = {name: None for name, _ in SETTING_KEYS}
+    for line in lines[start:end]:
+        for name, key in SETTING_KEYS:
+            match = re.match(rf"^(\s*-\s+|\s{{{indent}}}){re.escape(key)}:\s*[\"']?(\d+)", line)
+            if match:
+                settings[name] = int(match.group(2))
+    return settings
+
+def set_pipeline_settings(text: str, pipeline_id: str, settings: Dict[str, Optional[int]]) -> str:
+    """
+    改写 pipelines.yml 中该 pipeline 的参数（值为 None 的参数不改动），其余内容和注释保持不变
+
+    Raises:
+        ValueError: 找不到该 pipeline
+    """
+    lines = text.splitlines()
+    start, end, indent = _pipeline_entry(lines, pipeline_id)
+    # 条目的最后一个非空行（新增的键插在其后）
+    last = max(index for index in range(start, end) if lines[index].strip() and not lines[index].strip().startswith("#"))
+    for name, key in SETTING_KEYS:
+        value = settings.get(name)
+        if value is None:
+            continue
+        pattern = re.compile(rf"^(\s{{{indent}}}){re.escape(key)}:.*$")
+        for index in range(start + 1, last + 1):
+            if pattern.match(lines[index]):
+                lines[index] = f"{' ' * indent}{key}: {int(value)}"
+                break
+        else:
+            last += 1
+            lines.insert(last, f"{' ' * indent}{key}: {int(value)}")
+    return "\n".join(lines) + "\n"
+
+def sweep_grid(workers: List[int], batch_sizes: List[int], batch_delays: List[Optional[int]]) -> List[Dict[str, Any]]:
+    """参数网格（workers 变化最慢，batch_delay 变化最快）"""
+    return [{"workers": worker, "batch_size": batch_size, "batch_delay": batch_delay}
+            for worker, batch_size, batch_delay in itertools.product(workers, batch_sizes, batch_delays or [None])]
+
+def recommend(points: List[Dict[str, Any]], min_effect: float = 0.05,
+              max_p99_ms: Optional[float] = None) -> Optional[Dict[str, Any]]:
+    """
+    从扫描点中选出推荐参数（规则见模块说明）
+
+    Args:
+        max_p99_ms: p99 延迟上限，超过的点不参与推荐
+
+    Returns:
+        {settings, eps, p99_ms, tied, reason}；没有可用的点时返回 None
+    """
+    candidates = [point for point in points
+                  if point["status"] == "ok" and point["aggregate"]["eps"]["mean"] is not None
+                  and (max_p99_ms is None or (point["aggregate"]["p99_ms"]["mean"] or 0) <= max_p99_ms)]
+    if not candidates:
+        return None
+    best = max(candidates, key=lambda point: point["aggregate"]["eps"]["mean"])
+    best_eps = best["aggregate"]["eps"]
+
+    def tied(point: Dict[str, Any]) -> bool:
+        eps = point["aggregate"]["eps"]
+        if eps["mean"] >= best_eps["mean"] * (1 - min_effect):
+            return True
+        return bool(eps["ci"] and best_eps["ci"] and eps["ci"][1] >= best_eps["ci"][0])
+
+    group = [point for point in candidates if tied(point)]
+    chosen = min(group, key=lambda point: (point["aggregate"]["p99_ms"]["mean"] or 0, point["settings"]["workers"],
+                                           point["settings"]["batch_size"], point["settings"]["batch_delay"] or 0))
+    reason = f"吞吐量最高为 {best_eps['mean']} 事件/秒"
+    if len(group) > 1:
+        reason += f"，{len(group)} 组参数与之无显著差异，其中 p99 延迟最低"
+    if max_p99_ms is not None:
+        reason += f"（只考虑 p99 ≤ {max_p99_ms:g} ms 的参数）"
+    return {
+        "settings": chosen["settings"],
+        "eps": chosen["aggregate"]["eps"]["mean"],
+        "p99_ms": chosen["aggregate"]["p99_ms"]["mean"],
+        "tied": [point["settings"] for point in group if point is not chosen],
+        "reason": reason
+    }
+
+class PipelineSweep:
+    """逐点改写 pipelines.yml 并测量"""
+
+    def __init__(self, monitor: LogstashMonitor, path: str = PIPELINES_YML,
+                 restart: Optional[Callable[[], None]] = None, apply_timeout: float = 30,
+                 restart_timeout: float = 180, poll_interval: float = 0.5):
+        """
+        Args:
+            monitor: 读取 pipeline 生效的参数和重载状态
+            path: pipelines.yml 路径
+            restart: 重启 Logstash 的函数（热重载未应用新参数时调用；None 表示不重启）
+            apply_timeout: 等待热重载应用新参数的秒数
+            restart_timeout: 重启后等待 pipeline 以新参数运行的秒数
+        """
+        self.monitor = monitor
+        self.path = path
+        self.restart = restart
+        self.apply_timeout = apply_timeout
+        self.restart_timeout = restart_timeout
+        self.poll_interval = poll_interval
+
+    def read(self) -> str:
+        with open(self.path, "r", encoding="utf-8") as f:
+            return f.read()
+
+    def write(self, text: str):
+        # pipelines.yml 是单文件 bind mount，rename 后 Logstash 容器仍看到旧文件，只能原地写入
+        with open(self.path, "w", encoding="utf-8") as f:
+            f.write(text)
+
+    def apply(self, text: str, settings: Dict[str, Optional[int]], restart: bool = False) -> Dict[str, Any]:
+        """
+        写入 pipelines.yml 并等待 pipeline 以 settings 运行
+
+        Args:
+            text: 要写入的 pipelines.yml 内容
+            restart: 写入后直接重启 Logstash，不等待热重载
+
+        Returns:
+            {ok, status: unchanged/reloaded/restarted/failed/timeout/unavailable, waited, effective, error}
+        """
+        start = time.time()
+        baseline = self.monitor.snapshot()
+        changed = text != self.read()
+        if changed:
+            self.write(text)
+        status = "unchanged" if not changed else "reloaded"
+        if restart and self.restart is not None:
+            self.restart()
+            status = "restarted"
+        matched, effective, error = self._wait(settings, baseline,
+                                               self.restart_timeout if status == "restarted" else self.apply_timeout)
+        if not matched and error is None and status == "reloaded" and self.restart is not None:
+            # 热重载没有应用 pipelines.yml 的变化（如关闭了 config.reload.automatic），重启 Logstash
+            self.restart()
+            status = "restarted"
+            matched, effective, error = self._wait(settings, None, self.restart_timeout)
+        if not matched:
+            if error is None:
+                status = "unavailable" if effective is None else "timeout"
+                error = "无法访问 Logstash 监控 API" if effective is None else "等待超时，pipeline 未以新参数运行"
+            else:
+                status = "failed"
+        return {"ok": matched, "status": status, "waited": round(time.time() - start, 3),
+                "effective": effective, "error": error}
+
+    def _wait(self, settings: Dict[str, Optional[int]], baseline: Optional[Dict[str, Any]],
+              timeout: float) -> Tuple[bool, Optional[Dict[str, Any]], Optional[str]]:
+        """轮询 pipeline 参数直到与 settings 一致，返回 (是否一致, 最后读到的参数, 重载失败信息)"""
+        deadline = time.time() + timeout
+        effective = None
+        while True:
+            current = self.monitor.pipeline_settings()
+            if current is not None:
+                effective = current
+                if all(value is None or current.get(name) == value for name, value in settings.items()):
+                    return True, effective, None
+                stats = self.monitor.snapshot() if baseline is not None else None
+                if stats is not None and stats["failures"] > baseline["failures"]:
+                    return False, effective, stats.get("last_error") or "Pipeline 重载失败"
+            if time.time() >= deadline:
+                return False, effective, None
+            time.sleep(self.poll_interval)
+
+    def run(self, grid: List[Dict[str, Any]], measure: Callable[[Dict[str, Any]], List[Dict[str, Any]]],
+            pipeline_id: str = "test", restart: bool = False, min_effect: float = 0.05,
+            max_p99_ms: Optional[float] = None, keep: bool = False) -> Dict[str, Any]:
+        """
+        逐点应用参数并测量
+
+        Args:
+            grid: sweep_grid() 的结果
+            measure: 测量函数，接收当前参数，返回本点的基准测试结果列表（见 PipelineBenchmark.run）
+            restart: 每个点都重启 Logstash（默认只在热重载未生效时重启）
+            keep: 扫描结束后保留推荐参数，否则恢复原来的 pipelines.yml
+
+        Returns:
+            {id, created_at, original, original_effective, grid, points, recommendation, final, notes}
+        """
+        original_text = self.read()
+        original = read_pipeline_settings(original_text, pipeline_id)
+        # 扫描前实际生效的参数：pipelines.yml 未设置的键（如 batch.delay）恢复后应回到这里的值，
+        # 等待恢复时按它判断，而不是把未设置的键当作已生效
+        original_effective = self.monitor.pipeline_settings()
+
+        def expected(settings: Dict[str, Optional[int]]) -> Dict[str, Optional[int]]:
+            return {name: value if value is not None else (original_effective or {}).get(name)
+                    for name, value in settings.items()}
+
+        points = []
+        try:
+            for settings in grid:
+                point = {"settings": settings, "status": "ok", "runs": [], "sent": 0, "dropped": 0,
+                         "aggregate": {name: summarize([]) for name in METRICS}, "notes": []}
+                points.append(point)
+                point["apply"] = self.apply(set_pipeline_settings(original_text, pipeline_id, settings),
+                                            expected(settings), restart)
+                if not point["apply"]["ok"]:
+                    point["status"] = "not_applied"
+                    continue
+                results = measure(settings)
+                point["runs"] = [result["id"] for result in results]
+                point["sent"] = sum(result["sent"] for result in results)
+                point["dropped"] = sum(result["dropped"] for result in results)
+                # 运行期间发生重载的结果不参与统计
+                valid = [result for result in results if not (result.get("reload") or {}).get("reloaded")]
+                point["aggregate"] = {
+                    name: summarize([value for value in (result[section][field] for result in valid) if value is not None])
+                    for name, ((section, field), _) in METRICS.items()
+                }
+                point["notes"] = sorted({note for result in results for note in result["notes"]})
+                if not valid:
+                    point["status"] = "reloaded"
+                elif point["dropped"]:
+                    point["status"] = "dropped"
+        finally:
+            # 扫描中途抛出的异常（恢复失败的信息附加在它上面，不替换它）
+            pending = sys.exc_info()[1]
+            recommendation = recommend(points, min_effect, max_p99_ms)
+            kept = keep and recommendation is not None
+            if kept:
+                final_settings = recommendation["settings"]
+                final_text = set_pipeline_settings(original_text, pipeline_id, final_settings)
+            else:
+                final_settings, final_text = original, original_text
+            try:
+                final = self.apply(final_text, expected(final_settings))
+            except Exception as e:
+                # 不掩盖扫描过程中的异常；恢复失败记录在结果中
+                final = {"ok": False, "status": "failed", "waited": None, "effective": None,
+                         "error": f"{type(e).__name__}: {e}"}
+                if pending is not None:
+                    pending.add_note(f"恢复 pipelines.yml 失败: {final['error']}")
+
+        notes = []
+        measured = [point for point in points if point["status"] == "ok"]
+        if len(measured) < len(points):
+            notes.append(f"{len(points) - len(measured)} 组参数未生效、丢失事件或运行期间发生重载，不参与推荐")
+        if any(point["aggregate"]["eps"]["n"] < 2 for point in measured):
+            notes.append("每组参数只有 1 次有效运行，无法给出置信区间，建议 repeat ≥ 2")
+        reference = expected(original)
+        baseline = next((point for point in measured
+                         if all(point["settings"][name] == value for name, value in reference.items()
+                                if value is not None and point["settings"][name] is not None)),
+                        None)
+        if recommendation is not None and baseline is not None and baseline["aggregate"]["eps"]["mean"]:
+            recommendation["speedup"] = round(recommendation["eps"] / baseline["aggregate"]["eps"]["mean"], 3)
+        if original_effective is None:
+            notes.append("扫描前无法读取 pipeline 实际参数，pipelines.yml 未设置的参数无法确认已恢复")
+        if not final["ok"]:
+            notes.append(f"扫描结束后恢复 pipelines.yml 未确认生效: {final['error']}")
+
+        return {
+            "id": uuid.uuid4().hex,
+            "created_at": datetime.now().isoformat(),
+            "pipeline_id": pipeline_id,
+            "original": original,
+            "original_effective": original_effective,
+            "grid": grid,
+            "points": points,
+            "recommendation": recommendation,
+            "final": {"settings": final_settings, "kept_recommendation": kept, **final},
+            "notes": notes
+        }
+
+def save_sweep(sweep: Dict[str, Any], directory: str = SWEEP_DIR) -> str:
+    """保存扫描结果为 <目录>/<id>.json，返回文件路径"""
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, f"{sweep['id']}.json")
+    temp_path = f"{path}.tmp"
+    with open(temp_path, "w", encoding="utf-8") as f:
+        json.dump(sweep, f, ensure_ascii=False, indent=2)
+    os.replace(temp_path, path)
+    return path
+
+def load_sweep(sweep_id: str, directory: str = SWEEP_DIR) -> Optional[Dict[str, Any]]:
+    if not sweep_id.isalnum():
+        return None
+    try:
+        with open(os.path.join(directory, f"{sweep_id}.json"), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+def list_sweeps(directory: str = SWEEP_DIR, limit: int = 20) -> List[Dict[str, Any]]:
+    """最近的扫描摘要（新的在前）"""
+    try:
+        names = [name for name in os.listdir(directory) if name.endswith(".json")]
+    except FileNotFoundError:
+        return []
+    sweeps = []
+    for name in names:
+        sweep = load_sweep(name[:-len(".json")], directory)
+        if sweep is None:
+            continue
+        sweeps.append({
+            "id": sweep["id"],
+            "created_at": sweep["created_at"],
+            "points": len(sweep["points"]),
+            "config_sha256": (sweep.get("config") or {}).get("sha256"),
+            "corpus_sha256": (sweep.get("corpus") or {}).get("sha256"),
+            "recommendation": (sweep.get("recommendation") or {}).get("settings")
+        })
+    sweeps.sort(key=lambda sweep: sweep["created_at"], reverse=True)
+    return sweeps[:limit]
+
+def format_sweep(sweep: Dict[str, Any]) -> str:
+    """扫描结果的文本表格（MCP 输出使用）"""
+    lines = [f"参数扫描 {sweep['id']}（{len(sweep['points'])} 组参数）",
+             "  workers  batch.size  batch.delay   吞吐量(事件/秒)          p50 ms    p99 ms   状态"]
+    recommended = (sweep.get("recommendation") or {}).get("settings")
+    for point in sweep["points"]:
+        settings, aggregate = point["settings"], point["aggregate"]
+        eps = aggregate["eps"]
+        ci = f" ±{round((eps['ci'][1] - eps['ci'][0]) / 2, 1)}" if eps["ci"] else ""
+        marker = " ⭐" if settings == recommended else ""
+        lines.append(f"  {settings['workers']:>7}  {settings['batch_size']:>10}  {str(settings['batch_delay'] or '-'):>11}"
+                     f"   {str(eps['mean']) + ci:<22} {str(aggregate['p50_ms']['mean']):>8}  "
+                     f"{str(aggregate['p99_ms']['mean']):>8}   {point['status']}{marker}")
+    recommendation = sweep.get("recommendation")
+    if recommendation:
+        settings = recommendation["settings"]
+        lines.append(f"推荐: pipeline.workers={settings['workers']} pipeline.batch.size={settings['batch_size']}"
+                     + (f" pipeline.batch.delay={settings['batch_delay']}" if settings["batch_delay"] is not None else ""))
+        lines.append(f"  {recommendation['reason']}"
+                     + (f"，是原参数的 {recommendation['speedup']} 倍" if recommendation.get("speedup") else ""))
+    else:
+        lines.append("没有可推荐的参数")
+    lines.extend(f"  ⚠️ {note}" for note in sweep["notes"])
+    return "\n".join(lines)
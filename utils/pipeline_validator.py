@@ -1,21 +1,102 @@
 #!/usr/bin/env python3
 """
 Pipeline 配置验证工具模块
-使用 Docker 容器运行 Logstash 配置验证
+进程内语法/插件检查，之后由常驻验证进程或 Logstash（本机 / Docker Engine API / docker CLI）编译检查
 """
 
 import tempfile
-import subprocess
 import os
-import re
 import json
+import socket
+import threading
+import time
 from typing import Dict, List, Any, Optional
 
+from config_parser import ConfigSyntaxError, check_syntax, parse_config
+from logstash_logs import error_from_message, log_diagnostics, parse_log_output
+from plugin_schema import check_plugins, extract_schema, load_schema, save_schema
+from validation_cache import ValidationCache
+from validator_backends import BackendUnavailable, ValidationBackend, create_backends, detect_backend
+
+# 常驻验证进程地址（docker-compose 中的 logstash-validator 服务），为空时不使用
+VALIDATOR_ADDR = os.getenv("VALIDATOR_ADDR", "logstash-validator:19600")
+# 常驻验证进程脚本，验证进程不可用时用于 docker run 批量验证
+VALIDATOR_SCRIPT = os.getenv("VALIDATOR_SCRIPT",
+                             os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                                          "logstash", "validator", "validator_worker.rb"))
+# 验证结果磁盘缓存目录，为空时只使用内存缓存
+VALIDATION_CACHE_DIR = os.getenv("VALIDATION_CACHE_DIR", os.path.join(tempfile.gettempdir(), "logstash_lab_validation_cache"))
+# 确定性的验证结论（配置本身的问题），基础设施故障（Docker 不可用、超时等）不缓存
+CACHEABLE_ERROR_TYPES = {"syntax_error", "config_error", "compile_error", "plugin_error"}
+
+class ValidatorDaemonClient:
+    """常驻验证进程客户端：TCP 上每行一个 JSON 请求/响应"""
+    
+    def __init__(self, address: str, connect_timeout: float = 1, timeout: float = 60):
+        """
+        Args:
+            address: host:port
+            connect_timeout: 连接超时（秒）
+            timeout: 等待验证结果的超时（秒）
+        """
+        host, _, port = address.rpartition(":")
+        self.host = host or "localhost"
+        self.port = int(port)
+        self.connect_timeout = connect_timeout
+        self.timeout = timeout
+    
+    def request(self, payload: Dict[str, Any], timeout: Optional[float] = None) -> Dict[str, Any]:
+        """
+        发送一个请求并读取一行响应
+        
+        Args:
+            payload: 请求内容
+            timeout: 等待响应的超时（秒），默认使用 self.timeout
+        
+        Raises:
+            OSError: 连接失败或超时
+            ValueError: 响应不是合法 JSON
+        """
+        with socket.create_connection((self.host, self.port), timeout=self.connect_timeout) as conn:
+            conn.settimeout(timeout or self.timeout)
+            conn.sendall(json.dumps(payload, ensure_ascii=False).encode("utf-8") + b"\n")
+            with conn.makefile("rb") as reader:
+                line = reader.readline()
+        if not line:
+            raise ConnectionError("验证进程关闭了连接")
+        return json.loads(line.decode("utf-8"))
+    
+    def validate(self, pipeline_content: str) -> Dict[str, Any]:
+        return self.request({"config": pipeline_content})
+    
+    def validate_batch(self, configs: List[Dict[str, str]], timeout: Optional[float] = None) -> List[Dict[str, Any]]:
+        """批量验证，configs 为 [{"id": ..., "config": ...}]，返回与之一一对应的结果"""
+        response = self.request({"op": "batch", "configs": configs}, timeout=timeout)
+        if not response.get("ok") or not isinstance(response.get("results"), list):
+            raise ValueError(response.get("error") or "批量验证响应格式错误")
+        return response["results"]
+    
+    def ping(self) -> Dict[str, Any]:
+        return self.request({"op": "ping"})
+
 class PipelineValidator:
     """Pipeline 配置验证器"""
     
-    def __init__(self, logstash_image: str = "docker.elastic.co/logstash/logstash:8.14.2"):
+    # 常驻验证进程不可达后，暂停尝试的秒数（避免每次验证都等待连接超时）
+    DAEMON_RETRY_INTERVAL = 30
+    # 单次 config.test_and_exit 超时（秒）
+    VALIDATION_TIMEOUT = 60
+    
+    def __init__(self, logstash_image: str = "docker.elastic.co/logstash/logstash:8.14.2",
+                 daemon_address: Optional[str] = VALIDATOR_ADDR, backends: Optional[List[ValidationBackend]] = None):
         self.logstash_image = logstash_image
+        # 常驻验证进程之外的验证后端，首次使用时探测并缓存
+        self._backends = backends if backends is not None else create_backends(logstash_image)
+        self._backend: Optional[ValidationBackend] = None
+        self._backend_lock = threading.Lock()
+        self.daemon = ValidatorDaemonClient(daemon_address) if daemon_address else None
+        self._daemon_down_until = 0.0
+        self._schema_extracting = False
     
     def validate_pipeline(self, pipeline_content: str) -> Dict[str, Any]:
         """
@@ -28,32 +109,20 @@ class PipelineValidator:
             验证结果字典，包含 success, errors, warnings 等信息
         """
         try:
-            # 尝试多种验证方式
-            # 1. 首先尝试通过 stdin 传递配置内容
-            try:
-                result = self._run_logstash_validation_with_stdin(pipeline_content)
-                return result
-            except Exception as stdin_error:
-                # 2. 如果 stdin 方式失败，尝试创建临时文件
-                try:
-                    result = self._run_logstash_validation_with_tempfile(pipeline_content)
-                    return result
-                except Exception as tempfile_error:
-                    # 3. 如果都失败了，返回详细的错误信息
-                    return {
-                        "success": False,
-                        "errors": [
-                            {
-                                "message": f"验证失败 - stdin方式: {str(stdin_error)}; 临时文件方式: {str(tempfile_error)}", 
-                                "line": None, 
-                                "column": None
-                            }
-                        ],
-                        "warnings": [],
-                        "raw_output": "",
-                        "validation_time": 0
-                    }
-                    
+            # 0. 进程内语法检查（毫秒级），语法错误无需启动 Logstash
+            syntax_result = self._run_syntax_check(pipeline_content)
+            if syntax_result is not None:
+                return syntax_result
+            
+            # 1. 按本地插件 schema 静态检查（未知插件、无效配置项、取值类型）
+            schema_result, schema_warnings = self._run_schema_check(pipeline_content)
+            if schema_result is not None:
+                return schema_result
+            
+            result = self._run_logstash_checks(pipeline_content)
+            result["warnings"] = schema_warnings + result.get("warnings", [])
+            return result
+            
         except Exception as e:
             return {
                 "success": False,
@@ -63,340 +132,329 @@ class PipelineValidator:
                 "validation_time": 0
             }
     
-    def _run_logstash_validation(self, config_path: str) -> Dict[str, Any]:
+    def _run_logstash_checks(self, pipeline_content: str) -> Dict[str, Any]:
+        """由 Logstash 编译检查配置（常驻验证进程，不可用时使用本机/容器中的 logstash --config.test_and_exit）"""
+        # 优先使用常驻验证进程（JVM 已预热，通常 1-2 秒内返回）
+        daemon_result = self._run_daemon_validation(pipeline_content)
+        if daemon_result is not None:
+            return daemon_result
+        return self._run_backend_validation(pipeline_content)
+    
+    def _get_backend(self) -> Optional[ValidationBackend]:
+        """探测一次可用后端并缓存"""
+        with self._backend_lock:
+            if self._backend is None:
+                self._backend = detect_backend(self._backends)
+            return self._backend
+    
+    def _backend_failed(self, backend: ValidationBackend):
+        """后端故障时清除缓存，下次调用重新探测（本次不再换后端重跑）"""
+        with self._backend_lock:
+            if self._backend is backend:
+                self._backend = None
+    
+    def _error_result(self, message: str, start_time: float, backend: Optional[str] = None) -> Dict[str, Any]:
+        result = {
+            "success": False,
+            "errors": [{"message": message, "line": None, "column": None}],
+            "warnings": [],
+            "raw_output": "",
+            "validation_time": time.time() - start_time
+        }
+        if backend:
+            result["backend"] = backend
+        return result
+    
+    def _run_backend_validation(self, pipeline_content: str) -> Dict[str, Any]:
         """
-        运行 Logstash Docker 容器进行配置验证
+        在 Logstash 中运行 --config.test_and_exit
         
-        Args:
-            config_path: 配置文件路径
-            
         Returns:
             验证结果
         """
-        import time
         start_time = time.time()
+        backend = self._get_backend()
+        if backend is None:
+            return self._error_result("没有可用的验证后端（验证进程、本机 Logstash、Docker 均不可用）", start_time)
         
         try:
-            # Docker 命令
-            docker_cmd = [
-                "docker", "run", "--rm",
-                "-v", f"{config_path}:/tmp/test.conf:ro",
-                self.logstash_image,
-                "logstash", "--config.test_and_exit", "--path.config", "/tmp/test.conf"
-            ]
-            
-            # 运行 Docker 容器
-            process = subprocess.run(
-                docker_cmd,
-                capture_output=True,
-                text=True,
-                timeout=30  # 30秒超时
+            returncode, raw_output = backend.run(
+                "logstash",
+                ["--config.test_and_exit", "--path.config", "{workdir}/test.conf", "--path.data", "{workdir}/data",
+                 "--log.format", "json"],
+                {"test.conf": pipeline_content},
+                timeout=self.VALIDATION_TIMEOUT
             )
-            
-            validation_time = time.time() - start_time
-            raw_output = process.stdout + process.stderr
-            
-            # 解析输出
-            if process.returncode == 0:
-                # 配置验证成功
-                return {
-                    "success": True,
-                    "errors": [],
-                    "warnings": self._extract_warnings(raw_output),
-                    "raw_output": raw_output,
-                    "validation_time": validation_time
-                }
-            else:
-                # 配置验证失败
-                errors = self._extract_errors(raw_output)
-                warnings = self._extract_warnings(raw_output)
-                
-                return {
-                    "success": False,
-                    "errors": errors,
-                    "warnings": warnings,
-                    "raw_output": raw_output,
-                    "validation_time": validation_time
-                }
-                
-        except subprocess.TimeoutExpired:
+        except TimeoutError as e:
+            return self._error_result(str(e), start_time, backend.name)
+        except BackendUnavailable as e:
+            self._backend_failed(backend)
+            return self._error_result(str(e), start_time, backend.name)
+        
+        validation_time = time.time() - start_time
+        if returncode == 0:
+            # 配置验证成功
             return {
-                "success": False,
-                "errors": [{"message": "验证超时（30秒）", "line": None, "column": None}],
-                "warnings": [],
-                "raw_output": "",
-                "validation_time": 30
+                "success": True,
+                "errors": [],
+                "warnings": self._extract_warnings(raw_output),
+                "raw_output": raw_output,
+                "validation_time": validation_time,
+                "backend": backend.name
             }
-        except Exception as e:
+        
+        # 配置验证失败
+        return {
+            "success": False,
+            "errors": self._extract_errors(raw_output),
+            "warnings": self._extract_warnings(raw_output),
+            "raw_output": raw_output,
+            "validation_time": validation_time,
+            "backend": backend.name
+        }
+    
+    def _run_syntax_check(self, pipeline_content: str) -> Optional[Dict[str, Any]]:
+        """
+        按 Logstash 语法在进程内检查配置（花括号、=> 键值对、字符串、条件表达式等）
+        
+        Returns:
+            有语法错误时返回验证结果（含精确行列号）；语法正确返回 None，继续做 Logstash 编译检查
+        """
+        start_time = time.time()
+        try:
+            check_syntax(pipeline_content)
+        except ConfigSyntaxError as e:
             return {
                 "success": False,
-                "errors": [{"message": f"Docker 执行失败: {str(e)}", "line": None, "column": None}],
+                "errors": [{
+                    "message": f"语法错误: {e.reason}",
+                    "line": e.line,
+                    "column": e.column,
+                    "type": "syntax_error"
+                }],
                 "warnings": [],
-                "raw_output": "",
-                "validation_time": time.time() - start_time
+                "raw_output": str(e),
+                "validation_time": time.time() - start_time,
+                "backend": "syntax"
             }
+        return None
     
-    def _run_logstash_validation_with_stdin(self, pipeline_content: str) -> Dict[str, Any]:
+    def _run_schema_check(self, pipeline_content: str):
         """
-        运行 Logstash Docker 容器进行配置验证，通过 stdin 传递配置内容
+        按本地插件 schema（plugin_schema.json）静态检查，无需启动 Logstash
+        
+        schema 文件不存在时跳过检查，并在后台从常驻验证进程导出一次
         
-        Args:
-            pipeline_content: Pipeline 配置内容
-            
         Returns:
-            验证结果
+            (验证结果, warnings)：有错误时验证结果非 None
         """
-        import time
+        schema = load_schema()
+        if schema is None:
+            self._extract_schema_in_background()
+            return None, []
+        if not schema.matches_image(self.logstash_image):
+            return None, []
+        
         start_time = time.time()
+        errors, warnings = check_plugins(parse_config(pipeline_content), schema)
+        if not errors:
+            return None, warnings
+        return {
+            "success": False,
+            "errors": errors,
+            "warnings": warnings,
+            "raw_output": "\n".join(f"第 {e['line']} 行第 {e['column']} 列: {e['message']}" for e in errors),
+            "validation_time": time.time() - start_time,
+            "backend": "schema"
+        }, warnings
+    
+    def _extract_schema_in_background(self):
+        if self.daemon is None or self._schema_extracting or time.time() < self._daemon_down_until:
+            return
+        self._schema_extracting = True
+        
+        def extract():
+            try:
+                save_schema(extract_schema(ValidatorDaemonClient(f"{self.daemon.host}:{self.daemon.port}", timeout=300)))
+            except Exception:
+                # 下次验证时再试
+                self._schema_extracting = False
         
+        threading.Thread(target=extract, daemon=True).start()
+    
+    def _run_daemon_validation(self, pipeline_content: str) -> Optional[Dict[str, Any]]:
+        """
+        通过常驻验证进程验证配置
+        
+        Returns:
+            验证结果；验证进程未配置或不可达时返回 None（由调用方退回 docker run）
+        """
+        if self.daemon is None or time.time() < self._daemon_down_until:
+            return None
+        
+        start_time = time.time()
         try:
-            # Docker 命令 - 使用 bash 来创建临时文件并运行 logstash
-            docker_cmd = [
-                "docker", "run", "--rm", "-i",
-                self.logstash_image,
-                "bash", "-c", 
-                "cat > /tmp/test.conf && logstash --config.test_and_exit --path.config /tmp/test.conf"
-            ]
-            
-            # 运行 Docker 容器
-            process = subprocess.run(
-                docker_cmd,
-                input=pipeline_content,
-                capture_output=True,
-                text=True,
-                timeout=30  # 30秒超时
-            )
-            
-            validation_time = time.time() - start_time
-            raw_output = process.stdout + process.stderr
-            
-            # 解析输出
-            if process.returncode == 0:
-                # 配置验证成功
-                return {
-                    "success": True,
-                    "errors": [],
-                    "warnings": self._extract_warnings(raw_output),
-                    "raw_output": raw_output,
-                    "validation_time": validation_time
-                }
-            else:
-                # 配置验证失败
-                errors = self._extract_errors(raw_output)
-                warnings = self._extract_warnings(raw_output)
-                
-                return {
-                    "success": False,
-                    "errors": errors,
-                    "warnings": warnings,
-                    "raw_output": raw_output,
-                    "validation_time": validation_time
-                }
-                
-        except subprocess.TimeoutExpired:
-            return {
-                "success": False,
-                "errors": [{"message": "验证超时（30秒）", "line": None, "column": None}],
-                "warnings": [],
-                "raw_output": "",
-                "validation_time": 30
-            }
-        except Exception as e:
-            return {
-                "success": False,
-                "errors": [{"message": f"Docker 执行失败: {str(e)}", "line": None, "column": None}],
-                "warnings": [],
-                "raw_output": "",
-                "validation_time": time.time() - start_time
-            }
+            response = self.daemon.validate(pipeline_content)
+        except (OSError, ValueError):
+            self._daemon_down_until = time.time() + self.DAEMON_RETRY_INTERVAL
+            return None
+        
+        return self._worker_result(response, time.time() - start_time, "daemon")
+    
+    def _worker_result(self, response: Dict[str, Any], validation_time: float, backend: str) -> Dict[str, Any]:
+        """
+        把验证进程（validator_worker.rb）的单个结果转换为验证结果字典
+
+        只有带 validation_time 的成功结果或带 error_class 的编译失败才是配置的结论；
+        其余失败（缺少结果、missing config、请求被截断时的 invalid request 等）标记为 protocol_error，不缓存
+        """
+        raw_output = response.get("error", "") or "Configuration OK"
+        compiled = "validation_time" in response and bool(response.get("success") or response.get("error_class"))
+        if response.get("success") and compiled:
+            errors = []
+        elif not compiled:
+            errors = [{
+                "message": f"验证进程未返回编译结果: {response.get('error') or '响应格式错误'}",
+                "line": None,
+                "column": None,
+                "type": "protocol_error"
+            }]
+        else:
+            # 验证进程直接返回异常消息（不经过日志），按单条 ERROR 消息分类
+            error = error_from_message(response.get("error") or "配置验证失败",
+                                       exception=response.get("error_class"))
+            if error["type"] in ("general_error", "fatal_error"):
+                # 插件不存在、参数非法等错误没有行号，直接返回 Logstash 的原始信息
+                error["type"] = "config_error"
+            errors = [error]
+        
+        return {
+            "success": not errors,
+            "errors": errors,
+            "warnings": [],
+            "raw_output": raw_output,
+            "validation_time": validation_time,
+            "backend": backend
+        }
     
-    def _run_logstash_validation_with_tempfile(self, pipeline_content: str) -> Dict[str, Any]:
+    def validate_batch(self, configs: Dict[str, str]) -> Dict[str, Dict[str, Any]]:
         """
-        使用临时文件方式运行 Logstash 验证，参考 web 服务的 docker logs 实现
+        批量验证多个 Pipeline 配置，语法/schema 检查通过的配置在同一个 Logstash 进程中编译
         
         Args:
-            pipeline_content: Pipeline 配置内容
+            configs: {名称: 配置内容}，名称通常是文件名
             
         Returns:
-            验证结果
+            {名称: 验证结果}，顺序与输入一致
         """
-        import time
-        import tempfile
-        import os
-        start_time = time.time()
+        results: Dict[str, Dict[str, Any]] = {}
+        pending = []
+        for name, content in configs.items():
+            try:
+                syntax_result = self._run_syntax_check(content)
+                if syntax_result is not None:
+                    results[name] = syntax_result
+                    continue
+                schema_result, schema_warnings = self._run_schema_check(content)
+                if schema_result is not None:
+                    results[name] = schema_result
+                    continue
+            except Exception as e:
+                results[name] = {
+                    "success": False,
+                    "errors": [{"message": f"验证过程出错: {str(e)}", "line": None, "column": None}],
+                    "warnings": [],
+                    "raw_output": "",
+                    "validation_time": 0
+                }
+                continue
+            pending.append((name, content, schema_warnings))
+        
+        if pending:
+            batch_results = self._run_batch_daemon(pending)
+            if batch_results is None:
+                batch_results = self._run_batch_backend(pending)
+            for name, _, schema_warnings in pending:
+                result = batch_results[name]
+                result["warnings"] = schema_warnings + result.get("warnings", [])
+                results[name] = result
         
+        return {name: results[name] for name in configs}
+    
+    def _run_batch_daemon(self, pending: List[Any]) -> Optional[Dict[str, Dict[str, Any]]]:
+        """通过常驻验证进程批量验证；不可达时返回 None"""
+        if self.daemon is None or time.time() < self._daemon_down_until:
+            return None
+        
+        start_time = time.time()
         try:
-            # 创建临时配置文件
-            with tempfile.NamedTemporaryFile(mode='w', suffix='.conf', delete=False) as temp_file:
-                temp_file.write(pipeline_content)
-                temp_config_path = temp_file.name
-            
+            responses = self.daemon.validate_batch(
+                [{"id": name, "config": content} for name, content, _ in pending],
+                timeout=self.daemon.timeout + 10 * len(pending)
+            )
+        except (OSError, ValueError):
+            self._daemon_down_until = time.time() + self.DAEMON_RETRY_INTERVAL
+            return None
+        return self._map_batch_responses(pending, responses, time.time() - start_time, "daemon")
+    
+    def _run_batch_backend(self, pending: List[Any]) -> Dict[str, Dict[str, Any]]:
+        """
+        通过验证后端启动一次 Logstash 完成整批验证：validator_worker.rb 以批量模式运行，
+        JVM 只启动一次，每个配置作为独立的 pipeline.id 编译
+        """
+        start_time = time.time()
+        timeout = 60 + 10 * len(pending)
+        backend = self._get_backend()
+        if backend is None:
+            message = "没有可用的验证后端（验证进程、本机 Logstash、Docker 均不可用）"
+        else:
             try:
-                # 使用 subprocess 运行 docker 命令，类似于 web 服务中的 docker logs 实现
-                import subprocess
-                
-                docker_cmd = [
-                    "docker", "run", "--rm",
-                    "-v", f"{temp_config_path}:/tmp/test.conf:ro",
-                    self.logstash_image,
-                    "logstash", "--config.test_and_exit", "--path.config", "/tmp/test.conf"
-                ]
-                
-                # 运行 Docker 容器，参考 web 服务的实现
-                process = subprocess.run(
-                    docker_cmd,
-                    capture_output=True,
-                    text=True,
-                    timeout=30  # 30秒超时
+                with open(VALIDATOR_SCRIPT, "r", encoding="utf-8") as f:
+                    script = f.read()
+                batch = json.dumps({"configs": [{"id": name, "config": content} for name, content, _ in pending]},
+                                   ensure_ascii=False)
+                _, output = backend.run(
+                    "ruby", ["{workdir}/validator_worker.rb"],
+                    {"validator_worker.rb": script, "batch.json": batch},
+                    env={"VALIDATOR_BATCH_FILE": "{workdir}/batch.json"},
+                    timeout=timeout
                 )
-                
-                validation_time = time.time() - start_time
-                raw_output = process.stdout + process.stderr
-                
-                # 解析输出
-                if process.returncode == 0:
-                    # 配置验证成功
-                    return {
-                        "success": True,
-                        "errors": [],
-                        "warnings": self._extract_warnings(raw_output),
-                        "raw_output": raw_output,
-                        "validation_time": validation_time
-                    }
-                else:
-                    # 配置验证失败
-                    errors = self._extract_errors(raw_output)
-                    warnings = self._extract_warnings(raw_output)
-                    
-                    return {
-                        "success": False,
-                        "errors": errors,
-                        "warnings": warnings,
-                        "raw_output": raw_output,
-                        "validation_time": validation_time
-                    }
-                    
-            finally:
-                # 清理临时文件
-                if os.path.exists(temp_config_path):
-                    os.unlink(temp_config_path)
-                    
-        except subprocess.TimeoutExpired:
-            return {
-                "success": False,
-                "errors": [{"message": "验证超时（30秒）", "line": None, "column": None}],
-                "warnings": [],
-                "raw_output": "",
-                "validation_time": 30
-            }
-        except Exception as e:
-            return {
-                "success": False,
-                "errors": [{"message": f"Docker 执行失败: {str(e)}", "line": None, "column": None}],
-                "warnings": [],
-                "raw_output": "",
-                "validation_time": time.time() - start_time
-            }
+                for line in output.splitlines():
+                    if line.startswith("LAB_BATCH "):
+                        responses = json.loads(line[len("LAB_BATCH "):])
+                        return self._map_batch_responses(pending, responses, time.time() - start_time,
+                                                         f"{backend.name}_batch")
+                message = f"批量验证失败: {output[-2000:]}"
+            except TimeoutError as e:
+                message = f"批量{e}"
+            except BackendUnavailable as e:
+                self._backend_failed(backend)
+                message = str(e)
+            except (OSError, ValueError) as e:
+                message = f"批量验证失败: {str(e)}"
+        
+        return {name: self._error_result(message, start_time) for name, _, _ in pending}
+    
+    def _map_batch_responses(self, pending: List[Any], responses: List[Dict[str, Any]], elapsed: float,
+                             backend: str) -> Dict[str, Dict[str, Any]]:
+        by_id = {str(response.get("id")): response for response in responses}
+        results = {}
+        for name, _, _ in pending:
+            response = by_id.get(name) or {"success": False, "error": "验证进程未返回该配置的结果"}
+            results[name] = self._worker_result(response, response.get("validation_time", elapsed), backend)
+        return results
     
     def _extract_errors(self, output: str) -> List[Dict[str, Any]]:
         """
-        从 Logstash 输出中提取错误信息
+        从 Logstash 输出（log.format: json）中提取错误信息
         
         Args:
             output: Logstash 输出
             
         Returns:
-            错误信息列表
+            错误信息列表（含 line、column、type、level、logger、plugin）
         """
-        errors = []
-        
-        # 常见的错误模式
-        error_patterns = [
-            # 语法错误 - FATAL 级别
-            r'\[FATAL\].*?Expected one of (.+?) at line (\d+), column (\d+)',
-            # 语法错误 - 一般格式
-            r'Expected one of (.+?) at line (\d+), column (\d+)',
-            # 编译错误
-            r'compile_imperative.*?line (\d+)',
-            # 配置错误
-            r'Configuration error.*?line (\d+)',
-            # 插件错误
-            r'Plugin not found.*?(\w+)',
-            # FATAL 错误
-            r'\[FATAL\].*?(.+)',
-            # 一般错误
-            r'\[ERROR\].*?(.+)',
-        ]
-        
-        lines = output.split('\n')
-        
-        for line in lines:
-            # 检查 FATAL 级别的语法错误
-            fatal_syntax_match = re.search(r'\[FATAL\].*?Expected one of (.+?) at line (\d+), column (\d+)', line)
-            if fatal_syntax_match:
-                errors.append({
-                    "message": f"语法错误: 期望 {fatal_syntax_match.group(1)}",
-                    "line": int(fatal_syntax_match.group(2)),
-                    "column": int(fatal_syntax_match.group(3)),
-                    "type": "syntax_error"
-                })
-                continue
-            
-            # 检查一般语法错误
-            syntax_match = re.search(r'Expected one of (.+?) at line (\d+), column (\d+)', line)
-            if syntax_match:
-                errors.append({
-                    "message": f"语法错误: 期望 {syntax_match.group(1)}",
-                    "line": int(syntax_match.group(2)),
-                    "column": int(syntax_match.group(3)),
-                    "type": "syntax_error"
-                })
-                continue
-            
-            # 检查编译错误
-            compile_match = re.search(r'compile_imperative', line)
-            if compile_match and 'ERROR' in line:
-                # 尝试提取行号
-                line_match = re.search(r'line (\d+)', line)
-                line_num = int(line_match.group(1)) if line_match else None
-                
-                errors.append({
-                    "message": "配置编译错误",
-                    "line": line_num,
-                    "column": None,
-                    "type": "compile_error",
-                    "details": line.strip()
-                })
-                continue
-            
-            # 检查 FATAL 错误
-            if '[FATAL]' in line:
-                # 清理错误消息
-                clean_message = re.sub(r'\[FATAL\].*?\s+', '', line).strip()
-                clean_message = re.sub(r'^\d{4}-\d{2}-\d{2}T\d{2}:\d{2}:\d{2}.*?\s+', '', clean_message)
-                
-                if clean_message and 'Expected one of' not in clean_message:
-                    errors.append({
-                        "message": clean_message,
-                        "line": None,
-                        "column": None,
-                        "type": "fatal_error"
-                    })
-                continue
-            
-            # 检查一般错误
-            if '[ERROR]' in line or 'ERROR' in line:
-                # 清理错误消息
-                clean_message = re.sub(r'\[.*?\]', '', line).strip()
-                clean_message = re.sub(r'^\d{4}-\d{2}-\d{2}T\d{2}:\d{2}:\d{2}.*?\s+', '', clean_message)
-                
-                if clean_message:
-                    errors.append({
-                        "message": clean_message,
-                        "line": None,
-                        "column": None,
-                        "type": "general_error"
-                    })
+        errors, _ = log_diagnostics(parse_log_output(output))
         
         # 如果没有找到具体错误，但返回码非0，添加通用错误
         if not errors and 'Configuration OK' not in output:
@@ -411,7 +469,7 @@ class PipelineValidator:
     
     def _extract_warnings(self, output: str) -> List[Dict[str, Any]]:
         """
-        从 Logstash 输出中提取警告信息
+        从 Logstash 输出中提取警告信息（WARN 级别的日志记录）
         
         Args:
             output: Logstash 输出
@@ -419,34 +477,149 @@ class PipelineValidator:
         Returns:
             警告信息列表
         """
-        warnings = []
-        lines = output.split('\n')
-        
-        for line in lines:
-            if '[WARN]' in line or 'WARNING' in line:
-                # 清理警告消息
-                clean_message = re.sub(r'\[.*?\]', '', line).strip()
-                clean_message = re.sub(r'^\d{4}-\d{2}-\d{2}T\d{2}:\d{2}:\d{2}.*?\s+', '', clean_message)
-                
-                if clean_message:
-                    warnings.append({
-                        "message": clean_message,
-                        "type": "warning"
-                    })
-        
+        _, warnings = log_diagnostics(parse_log_output(output))
         return warnings
 
 # 全局验证器实例
 validator = PipelineValidator()
+validation_cache = ValidationCache(VALIDATION_CACHE_DIR or None, namespace=validator.logstash_image)
+
+def is_cacheable_result(result: Dict[str, Any]) -> bool:
+    """验证结论只取决于配置内容时才缓存"""
+    errors = result.get("errors", [])
+    if any(error.get("type") == "protocol_error" for error in errors):
+        return False
+    backend = result.get("backend", "")
+    if result.get("success") or backend == "daemon" or backend.endswith("_batch"):
+        # 验证进程返回的编译失败（_worker_result 已排除协议错误）都是配置本身的问题
+        return True
+    return any(error.get("type") in CACHEABLE_ERROR_TYPES for error in errors)
 
-def validate_pipeline_config(pipeline_content: str) -> Dict[str, Any]:
+def _syntax_result(pipeline_content: str) -> Optional[Dict[str, Any]]:
+    """
+    查找缓存前先做进程内语法检查：缓存键只保留词法单元和它们是否相邻，
+    语法错误的配置不能借用与之规范化后相同的合法配置的缓存
+    """
+    try:
+        result = validator._run_syntax_check(pipeline_content)
+    except Exception:
+        # 交给 validate_pipeline 统一报告
+        return None
+    if result is not None:
+        result["cache_hit"] = False
+    return result
+
+def _cached_result(pipeline_content: str) -> Optional[Dict[str, Any]]:
+    start_time = time.time()
+    cached = validation_cache.get(pipeline_content)
+    if cached is not None:
+        cached["cache_hit"] = True
+        cached["original_validation_time"] = cached.get("validation_time", 0)
+        cached["validation_time"] = round(time.time() - start_time, 4)
+    return cached
+
+def validate_pipeline_config(pipeline_content: str, use_cache: bool = True) -> Dict[str, Any]:
     """
     验证 Pipeline 配置的便捷函数
     
+    结果按规范化配置（去掉注释和空白）的哈希缓存，仅格式或注释不同的配置直接复用；
+    进程内语法检查先于缓存查找，语法错误总是按当前文本报告
+    
     Args:
         pipeline_content: Pipeline 配置内容
+        use_cache: 是否使用验证结果缓存
         
     Returns:
-        验证结果
+        验证结果（cache_hit 表示是否命中缓存）
     """
-    return validator.validate_pipeline(pipeline_content)
+    if use_cache:
+        syntax_result = _syntax_result(pipeline_content)
+        if syntax_result is not None:
+            return syntax_result
+        cached = _cached_result(pipeline_content)
+        if cached is not None:
+            return cached
+    
+    result = validator.validate_pipeline(pipeline_content)
+    if use_cache and is_cacheable_result(result):
+        validation_cache.put(pipeline_content, result)
+    result["cache_hit"] = False
+    return result
+
+def validate_pipeline_configs(configs: Dict[str, str], use_cache: bool = True) -> Dict[str, Any]:
+    """
+    批量验证多个 Pipeline 配置（未命中缓存的配置在同一个 Logstash 进程中验证）
+    
+    Args:
+        configs: {名称: 配置内容}
+        use_cache: 是否使用验证结果缓存
+        
+    Returns:
+        {"success": 全部通过, "results": [{"name": ..., 验证结果...}], "summary": {...}, "validation_time": 秒}
+    """
+    start_time = time.time()
+    results: Dict[str, Dict[str, Any]] = {}
+    misses: Dict[str, str] = {}
+    for name, content in configs.items():
+        syntax_result = _syntax_result(content) if use_cache else None
+        if syntax_result is not None:
+            results[name] = syntax_result
+            continue
+        cached = _cached_result(content) if use_cache else None
+        if cached is not None:
+            results[name] = cached
+        else:
+            misses[name] = content
+    
+    if misses:
+        for name, result in validator.validate_batch(misses).items():
+            if use_cache and is_cacheable_result(result):
+                validation_cache.put(misses[name], result)
+            result["cache_hit"] = False
+            results[name] = result
+    
+    ordered = [{"name": name, **results[name]} for name in configs]
+    passed = sum(1 for result in ordered if result["success"])
+    return {
+        "success": passed == len(ordered),
+        "results": ordered,
+        "summary": {
+            "total": len(ordered),
+            "passed": passed,
+            "failed": len(ordered) - passed,
+            "cache_hits": sum(1 for result in ordered if result.get("cache_hit"))
+        },
+        "validation_time": time.time() - start_time
+    }
+
+def collect_config_files(paths: List[str]) -> Dict[str, str]:
+    """读取配置文件；目录下取所有非隐藏的普通文件（如 *.conf、palo_alto_firewall）"""
+    configs: Dict[str, str] = {}
+    for path in paths:
+        if os.path.isdir(path):
+            files = sorted(os.path.join(path, name) for name in os.listdir(path)
+                           if not name.startswith(".") and os.path.isfile(os.path.join(path, name)))
+        else:
+            files = [path]
+        for file_path in files:
+            with open(file_path, "r", encoding="utf-8") as f:
+                configs[file_path] = f.read()
+    return configs
+
+if __name__ == "__main__":
+    import sys
+    
+    if len(sys.argv) < 2:
+        print("用法: python pipeline_validator.py <配置文件或目录>...", file=sys.stderr)
+        sys.exit(2)
+    
+    report = validate_pipeline_configs(collect_config_files(sys.argv[1:]))
+    for item in report["results"]:
+        status = "OK" if item["success"] else "FAILED"
+        print(f"{item['name']}: {status} ({item['validation_time']:.2f}s{', cached' if item.get('cache_hit') else ''})")
+        for error in item["errors"]:
+            location = f"{item['name']}:{error.get('line')}:{error.get('column')}" if error.get("line") else item["name"]
+            print(f"  {location}: {error['message']}")
+    summary = report["summary"]
+    print(f"共 {summary['total']} 个，通过 {summary['passed']} 个，失败 {summary['failed']} 个，耗时 {report['validation_time']:.2f}s")
+    sys.exit(0 if report["success"] else 1)
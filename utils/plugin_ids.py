@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""
+插件 id 注入
+没有显式 id 的插件由 Logstash 随机分配 id，每次重载都会变化，插件级统计无法跨运行比较。
+这里为这类插件生成确定性的 id：<插件名>_<8 位哈希>，哈希取自插件在配置中的位置（所在段和外层条件分支）
+和插件源码（空白归一化），相同位置的相同插件得到相同 id，与前后其他插件的增删无关；完全相同的插件重复出现时
+按出现顺序追加 _2、_3。
+
+id 插在插件的 { 之后同一行，不增加行数，提交内容中的行号保持不变。
+"""
+
+import hashlib
+from typing import Any, Dict, List, Optional, Tuple
+
+from config_parser import ConfigSyntaxError, Node, line_starts, offset_position, parse_config, parse_statements
+
+def plugin_id(name: str, source: str, path: List[str]) -> str:
+    """由插件名、源码和位置（段名 + 外层条件）生成 id"""
+    normalized = " ".join(source.split())
+    digest = hashlib.sha256("\n".join(path + [normalized]).encode("utf-8")).hexdigest()
+    return f"{name}_{digest[:8]}"
+
+def inject_plugin_ids(text: str) -> Tuple[str, List[Dict[str, Any]]]:
+    """
+    为没有 id 的插件注入确定性 id
+
+    Args:
+        text: 完整配置（input/filter/output 段）或不带段包装的 filter 内容
+
+    Returns:
+        (注入后的文本, [{id, name, section, line, conditions, injected}])，line 为插件在 text 中的行号；
+        有语法错误时原样返回（由 Logstash 报告错误）
+    """
+    try:
+        sections = [(section.name, section.children) for section in parse_config(text).sections]
+    except ConfigSyntaxError:
+        try:
+            sections = [("filter", parse_statements(text))]
+        except ConfigSyntaxError:
+            return text, []
+
+    starts = line_starts(text)
+    plugins: List[Dict[str, Any]] = []
+    inserts: List[Tuple[int, str]] = []
+    seen: Dict[str, int] = {}
+
+    def visit(nodes: List[Node], section: str, path: List[str]):
+        for node in nodes:
+            if node.type != "plugin":
+                for clause in node.children:
+                    condition = f"{clause.type} {clause.condition}" if clause.condition is not None else clause.type
+                    visit(clause.children, section, path + [condition])
+                continue
+            explicit = _explicit_id(node)
+            if explicit is not None:
+                identifier = explicit
+            else:
+                identifier = plugin_id(node.name, text[node.start:node.end], [section] + path)
+                seen[identifier] = seen.get(identifier, 0) + 1
+                if seen[identifier] > 1:
+                    identifier = f"{identifier}_{seen[identifier]}"
+                inserts.append((node.body_start + 1, f' id => "{identifier}"'))
+            line, _ = offset_position(starts, node.start)
+            plugins.append({
+                "id": identifier,
+                "name": node.name,
+                "section": section,
+                "line": line,
+                "conditions": path,
+                "injected": explicit is None
+            })
+
+    for name, children in sections:
+        visit(children, name, [])
+
+    for position, insert in sorted(inserts, reverse=True):
+        text = text[:position] + insert + text[position:]
+    return text, plugins
+
+def _explicit_id(node: Node) -> Optional[str]:
+    for attribute in node.attributes:
+        if attribute.name == "id" and isinstance(attribute.value, str):
+            return attribute.value
+    return None
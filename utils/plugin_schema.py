@@ -0,0 +1,317 @@
+#!/usr/bin/env python3
+"""
+Logstash 插件/配置项 schema 索引
+从固定版本的 Logstash 镜像中导出一次全部插件及配置项定义（logstash/validator/plugin_schema.rb），
+保存为本地 JSON，之后不启动 Logstash 即可静态检查：未知插件、无效配置项、取值类型错误、缺少必填项。
+
+导出：
+    python plugin_schema.py extract [--image IMAGE] [--daemon HOST:PORT] [--output PATH]
+检查：
+    python plugin_schema.py check pipeline.conf
+"""
+
+import os
+import re
+import sys
+import json
+import difflib
+import tempfile
+import threading
+import subprocess
+from typing import Any, Dict, List, Optional, Tuple
+
+from config_parser import ConfigDocument, Node, SECTION_TYPES, walk
+
+SCHEMA_VERSION = 1
+SCHEMA_PATH = os.getenv("PLUGIN_SCHEMA_PATH",
+                        os.path.join(os.path.dirname(os.path.abspath(__file__)), "plugin_schema.json"))
+# 单独运行导出脚本时（docker run）脚本所在位置，Web/MCP 容器内不存在时只能通过验证进程导出
+SCHEMA_SCRIPT = os.getenv("PLUGIN_SCHEMA_SCRIPT",
+                          os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                                       "logstash", "validator", "plugin_schema.rb"))
+SCHEMA_OUTPUT_PREFIX = "LAB_SCHEMA "
+
+BOOLEAN_VALUES = ("true", "false")
+NUMBER_PATTERN = re.compile(r"-?[0-9]+(?:\.[0-9]*)?$")
+
+class PluginSchema:
+    """插件 schema 索引"""
+
+    def __init__(self, data: Dict[str, Any]):
+        self.data = data
+        self.logstash_version = data.get("logstash_version")
+        self.plugins: Dict[str, Dict[str, Any]] = data.get("plugins", {})
+        self._patterns: Dict[Tuple[str, str], Optional[List[Any]]] = {}
+
+    def plugin_names(self, kind: str) -> List[str]:
+        return sorted(self.plugins.get(kind, {}))
+
+    def lookup(self, kind: str, name: str) -> Optional[Dict[str, Any]]:
+        return self.plugins.get(kind, {}).get(name)
+
+    def option_patterns(self, kind: str, name: str) -> Optional[List[Any]]:
+        """
+        插件以正则定义的配置项名称（编译后）
+
+        Returns:
+            正则列表；有无法编译的正则时返回 None（视为接受任意配置项）
+        """
+        key = (kind, name)
+        if key not in self._patterns:
+            compiled = []
+            for source in (self.lookup(kind, name) or {}).get("option_patterns", []):
+                try:
+                    compiled.append(re.compile(source))
+                except re.error:
+                    compiled = None
+                    break
+            self._patterns[key] = compiled
+        return self._patterns[key]
+
+    def matches_image(self, logstash_image: str) -> bool:
+        """schema 是否由该镜像版本导出（版本不同时不使用，避免误报）"""
+        tag = logstash_image.rsplit(":", 1)[-1] if ":" in logstash_image else ""
+        return not tag or tag == "latest" or tag == self.logstash_version
+
+_cache_lock = threading.Lock()
+_cached: Dict[str, Tuple[int, int, PluginSchema]] = {}
+
+def load_schema(path: str = SCHEMA_PATH) -> Optional[PluginSchema]:
+    """读取本地 schema，文件不存在或格式不对时返回 None；文件未变化时不重新读取"""
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    with _cache_lock:
+        cached = _cached.get(path)
+    if cached and cached[0] == stat.st_mtime_ns and cached[1] == stat.st_size:
+        return cached[2]
+
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if data.get("version") != SCHEMA_VERSION or not isinstance(data.get("plugins"), dict):
+        return None
+
+    schema = PluginSchema(data)
+    with _cache_lock:
+        _cached[path] = (stat.st_mtime_ns, stat.st_size, schema)
+    return schema
+
+def save_schema(data: Dict[str, Any], path: str = SCHEMA_PATH):
+    """原子写入 schema 文件"""
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False, indent=1, sort_keys=True)
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.unlink(tmp_path)
+        except OSError:
+            pass
+        raise
+
+def extract_schema(daemon=None, logstash_image: str = "docker.elastic.co/logstash/logstash:8.14.2",
+                   timeout: float = 300) -> Dict[str, Any]:
+    """
+    从 Logstash 导出插件 schema：优先通过常驻验证进程（插件已加载，几秒内完成），
+    否则在镜像中单独运行 plugin_schema.rb
+
+    Args:
+        daemon: ValidatorDaemonClient，为 None 时直接使用 docker run
+
+    Raises:
+        RuntimeError: 导出失败
+    """
+    if daemon is not None:
+        try:
+            response = daemon.request({"op": "schema"})
+            if response.get("ok") and isinstance(response.get("schema"), dict):
+                return response["schema"]
+        except (OSError, ValueError):
+            pass
+
+    if not os.path.exists(SCHEMA_SCRIPT):
+        raise RuntimeError(f"找不到导出脚本 {SCHEMA_SCRIPT}，且验证进程不可用")
+    with open(SCHEMA_SCRIPT, "r", encoding="utf-8") as f:
+        script = f.read()
+    cmd = [
+        "docker", "run", "--rm", "-i",
+        "--entrypoint", "/usr/share/logstash/bin/ruby",
+        logstash_image,
+        "/dev/stdin"
+    ]
+    try:
+        result = subprocess.run(cmd, input=script, capture_output=True, text=True, timeout=timeout)
+    except (OSError, subprocess.TimeoutExpired) as e:
+        raise RuntimeError(f"导出 schema 失败: {e}")
+    for line in result.stdout.splitlines():
+        if line.startswith(SCHEMA_OUTPUT_PREFIX):
+            return json.loads(line[len(SCHEMA_OUTPUT_PREFIX):])
+    raise RuntimeError(f"导出 schema 失败: {(result.stderr or result.stdout)[-2000:]}")
+
+def check_plugins(document: ConfigDocument, schema: PluginSchema) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+    """
+    按 schema 静态检查配置中的插件和配置项
+
+    Returns:
+        (errors, warnings)，格式与 pipeline_validator 的验证结果一致
+    """
+    errors: List[Dict[str, Any]] = []
+    warnings: List[Dict[str, Any]] = []
+    for section in document.sections:
+        if section.name not in SECTION_TYPES:
+            continue
+        for node in walk(section.children):
+            if node.type == "plugin":
+                _check_plugin(document, schema, section.name, node, errors, warnings)
+    return errors, warnings
+
+def _check_plugin(document: ConfigDocument, schema: PluginSchema, kind: str, node: Node,
+                  errors: List[Dict[str, Any]], warnings: List[Dict[str, Any]]):
+    spec = schema.lookup(kind, node.name)
+    if spec is None:
+        message = f"未知的 {kind} 插件 '{node.name}'"
+        suggestion = difflib.get_close_matches(node.name, schema.plugin_names(kind), n=1)
+        if suggestion:
+            message += f"，是否为 '{suggestion[0]}'？"
+        errors.append(_issue(document, node.start, message, "plugin_error"))
+        return
+
+    options = spec.get("options")
+    for attribute in node.attributes:
+        if isinstance(attribute.value, Node):
+            # 嵌套插件，如 codec => json { ... }
+            _check_plugin(document, schema, "codec", attribute.value, errors, warnings)
+        if options is None:
+            continue
+
+        option = options.get(attribute.name)
+        if option is None:
+            patterns = schema.option_patterns(kind, node.name)
+            if patterns is None or any(pattern.match(attribute.name) for pattern in patterns):
+                continue
+            message = f"{node.name} 插件没有配置项 '{attribute.name}'"
+            suggestion = difflib.get_close_matches(attribute.name, list(options), n=1)
+            if suggestion:
+                message += f"，是否为 '{suggestion[0]}'？"
+            errors.append(_issue(document, attribute.start, message, "config_error"))
+            continue
+
+        if option.get("obsolete"):
+            detail = option["obsolete"] if isinstance(option["obsolete"], str) else "已废弃"
+            errors.append(_issue(document, attribute.start,
+                                 f"{node.name} 插件的配置项 '{attribute.name}' 已移除: {detail}", "config_error"))
+            continue
+        if option.get("deprecated"):
+            detail = option["deprecated"] if isinstance(option["deprecated"], str) else "将在后续版本移除"
+            warnings.append(_issue(document, attribute.start,
+                                   f"{node.name} 插件的配置项 '{attribute.name}' 已不推荐使用: {detail}", "warning"))
+
+        problem = _check_value(schema, option, attribute.value)
+        if problem:
+            errors.append(_issue(document, attribute.value_start,
+                                 f"{node.name} 插件的配置项 '{attribute.name}' {problem}", "config_error"))
+
+    if options is not None:
+        present = {attribute.name for attribute in node.attributes}
+        for name, option in options.items():
+            if option.get("required") and name not in present:
+                errors.append(_issue(document, node.start, f"{node.name} 插件缺少必填配置项 '{name}'", "config_error"))
+
+def _check_value(schema: PluginSchema, option: Dict[str, Any], value: Any) -> Optional[str]:
+    """检查取值类型，只报告 Logstash 一定会拒绝的情况；返回问题描述"""
+    kind = option.get("type")
+    if isinstance(value, list) and option.get("list"):
+        values = value
+    elif isinstance(value, list) and len(value) == 1 and kind not in ("array", "hash"):
+        # Logstash 会把单元素数组展开
+        values = value
+    else:
+        values = [value]
+
+    for item in values:
+        if isinstance(item, str) and "${" in item:
+            # 环境变量/keystore 引用在 Logstash 中先替换再校验
+            continue
+        if kind == "boolean":
+            if not isinstance(item, str) or item not in BOOLEAN_VALUES:
+                return f"应为布尔值 true/false，实际为 {_describe(item)}"
+        elif kind == "number":
+            if not isinstance(item, str) or not NUMBER_PATTERN.match(item.strip()):
+                return f"应为数字，实际为 {_describe(item)}"
+        elif kind == "enum":
+            allowed = option.get("values") or []
+            if not isinstance(item, str) or (allowed and item not in allowed):
+                return f"取值应为 {', '.join(allowed)} 之一，实际为 {_describe(item)}"
+        elif kind == "hash":
+            if isinstance(item, (str, Node)):
+                return f"应为 hash（{{ \"key\" => \"value\" }}），实际为 {_describe(item)}"
+        elif kind in ("string", "password", "path", "uri", "field_reference"):
+            if isinstance(item, (dict, list, Node)):
+                return f"应为字符串，实际为 {_describe(item)}"
+        elif kind == "codec":
+            if isinstance(item, str) and schema.lookup("codec", item) is None:
+                return f"使用了未知的 codec '{item}'"
+    return None
+
+def _describe(value: Any) -> str:
+    if isinstance(value, Node):
+        return f"插件 {value.name}"
+    if isinstance(value, dict):
+        return "hash"
+    if isinstance(value, list):
+        return "数组"
+    return repr(value)
+
+def _issue(document: ConfigDocument, offset: int, message: str, issue_type: str) -> Dict[str, Any]:
+    line, column = document.position(offset)
+    return {"message": message, "line": line, "column": column, "type": issue_type}
+
+def main(argv: List[str]) -> int:
+    import argparse
+    from config_parser import ConfigSyntaxError, parse_config
+
+    parser = argparse.ArgumentParser(description="Logstash 插件 schema 导出与静态检查")
+    commands = parser.add_subparsers(dest="command", required=True)
+    extract = commands.add_parser("extract", help="从 Logstash 导出插件 schema")
+    extract.add_argument("--image", default="docker.elastic.co/logstash/logstash:8.14.2")
+    extract.add_argument("--daemon", default=os.getenv("VALIDATOR_ADDR", ""), help="常驻验证进程地址 host:port")
+    extract.add_argument("--output", default=SCHEMA_PATH)
+    check = commands.add_parser("check", help="按本地 schema 检查配置文件")
+    check.add_argument("config")
+    check.add_argument("--schema", default=SCHEMA_PATH)
+    args = parser.parse_args(argv)
+
+    if args.command == "extract":
+        daemon = None
+        if args.daemon:
+            from pipeline_validator import ValidatorDaemonClient
+            daemon = ValidatorDaemonClient(args.daemon, timeout=300)
+        data = extract_schema(daemon, args.image)
+        save_schema(data, args.output)
+        count = sum(len(plugins) for plugins in data["plugins"].values())
+        print(f"已导出 Logstash {data.get('logstash_version')} 的 {count} 个插件到 {args.output}")
+        return 0
+
+    schema = load_schema(args.schema)
+    if schema is None:
+        print(f"找不到 schema 文件 {args.schema}，请先运行 extract", file=sys.stderr)
+        return 2
+    with open(args.config, "r", encoding="utf-8") as f:
+        text = f.read()
+    try:
+        errors, warnings = check_plugins(parse_config(text), schema)
+    except ConfigSyntaxError as e:
+        errors, warnings = [{"message": e.reason, "line": e.line, "column": e.column, "type": "syntax_error"}], []
+    for issue in errors + warnings:
+        print(f"{args.config}:{issue['line']}:{issue['column']}: {issue['type']}: {issue['message']}")
+    return 1 if errors else 0
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
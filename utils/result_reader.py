@@ -0,0 +1,409 @@
+#!/usr/bin/env python3
+"""
+解析结果增量读取模块
+跟踪 events.ndjson 的读取偏移量和 inode，只解析新追加的字节，
+并在内存环形缓冲区中保存最近的事件。
+配置了分段目录时，活动文件超过大小上限后轮转为带索引的只读分段（见 result_store）
+"""
+
+import os
+import json
+import time
+import threading
+from array import array
+from collections import deque
+from typing import Any, Deque, Dict, Iterator, List, Optional, Tuple
+
+from result_store import SegmentStore, add_run_event, extract_run_id
+
+# 每次提交注入的关联 ID：JSON 日志写入该字段，纯文本日志通过请求头传递，
+# 再由 test.conf 中的 ruby 过滤器复制到事件字段
+RUN_ID_FIELD = "lab_run_id"
+RUN_ID_HEADER = "X-Lab-Run-Id"
+
+class ResultReader:
+    """events.ndjson 增量读取器"""
+
+    def __init__(self, path: str, capacity: int = 500, initial_window: int = 500000,
+                 chunk_size: int = 1 << 20, segment_dir: Optional[str] = None,
+                 segment_bytes: int = 64 * 1024 * 1024, max_total_bytes: int = 512 * 1024 * 1024,
+                 seal_grace: float = 5.0):
+        """
+        Args:
+            path: 结果文件路径
+            capacity: 环形缓冲区保存的最大事件数
+            initial_window: 首次读取时从文件末尾回读并解析的最大字节数（防爆内存）
+            chunk_size: 每次从文件读取的最大字节数
+            segment_dir: 分段目录，为空时不做轮转
+            segment_bytes: 活动文件轮转阈值
+            max_total_bytes: 分段与活动文件的总大小上限
+            seal_grace: 轮转后等待 Logstash 重新创建活动文件的最长秒数，超时后直接封存分段
+        """
+        self.path = path
+        self.capacity = capacity
+        self.initial_window = initial_window
+        self.chunk_size = chunk_size
+        self.segment_bytes = segment_bytes
+        self.seal_grace = seal_grace
+        self.store = SegmentStore(segment_dir, max_total_bytes=max_total_bytes) if segment_dir else None
+        self._lock = threading.RLock()
+        # 每条记录为 (原始行, 解析后的事件或 None)
+        self._recent: Deque[Tuple[str, Optional[Dict[str, Any]]]] = deque(maxlen=capacity)
+        # 当前读取文件的第一个事件的全局序号
+        self._base_seq = self.store.next_seq() if self.store else 0
+        # 当前读取文件中每个事件（行）的起始偏移量，下标 + _base_seq 即事件序号（游标）
+        self._offsets = array("Q")
+        # 当前读取文件中关联 ID -> 事件区间（文件内序号）
+        self._file_runs: Dict[str, List[List[int]]] = {}
+        # 当前读取的文件：通常是活动文件，轮转后到封存前是刚改名的分段文件
+        self._reading_path = path
+        self._pending_since: Optional[float] = None
+        self._inode: Optional[int] = None
+        self._offset = 0
+        self._partial = b""
+        self._partial_start = 0
+        # 文件被截断或替换时递增，调用方可据此判断缓存是否失效
+        self.generation = 0
+
+    def _reset_file_state(self):
+        self._offsets = array("Q")
+        self._file_runs = {}
+        self._reading_path = self.path
+        self._pending_since = None
+        self._inode = None
+        self._offset = 0
+        self._partial = b""
+        self._partial_start = 0
+
+    def reset(self):
+        """清空内存状态和所有分段，下次 refresh 时从文件头重新读取"""
+        with self._lock:
+            if self.store:
+                if self._pending_since is not None:
+                    try:
+                        os.unlink(self._reading_path)
+                    except FileNotFoundError:
+                        pass
+                self.store.clear()
+            self._recent.clear()
+            self._reset_file_state()
+            self._base_seq = 0
+            self.generation += 1
+
+    def refresh(self) -> int:
+        """
+        读取自上次调用以来新追加的内容
+
+        Returns:
+            新增的完整行数
+        """
+        with self._lock:
+            count = 0
+            if self._pending_since is not None:
+                # 轮转后 Logstash 可能还在向旧文件写最后一批数据；
+                # 活动文件被重新创建说明旧文件已写完（file 输出串行写入），此时读完并封存
+                logstash_reopened = os.path.exists(self.path)
+                count += self._read_current(fresh=False)
+                if not logstash_reopened and time.time() - self._pending_since < self.seal_grace:
+                    return count
+                count += self._read_current(fresh=False)
+                self._seal_pending()
+
+            count += self._read_current(fresh=True)
+
+            if self.store and self._offset >= self.segment_bytes and not self._partial:
+                self._rotate()
+            return count
+
+    def _read_current(self, fresh: bool) -> int:
+        """读取当前文件的新内容；fresh 表示允许按首次读取只解析末尾窗口"""
+        try:
+            st = os.stat(self._reading_path)
+        except FileNotFoundError:
+            if self._inode is not None and self._pending_since is None:
+                self.reset()
+            return 0
+
+        first_read = self._inode is None
+        if not first_read and (st.st_ino != self._inode or st.st_size < self._offset):
+            # 文件被 /clear_results 截断或被替换，按首次读取处理
+            self.reset()
+            first_read = True
+
+        self._inode = st.st_ino
+        if st.st_size == self._offset:
+            return 0
+
+        # 首次读取时窗口之前的行只记录偏移量（供游标分页），不做 JSON 解析（防爆内存）
+        parse_from = st.st_size - self.initial_window if first_read and fresh else 0
+
+        count = 0
+        with open(self._reading_path, "rb") as f:
+            f.seek(self._offset)
+            while self._offset < st.st_size:
+                chunk = f.read(min(self.chunk_size, st.st_size - self._offset))
+                if not chunk:
+                    break
+                self._offset += len(chunk)
+                count += self._consume(chunk, parse_from)
+        return count
+
+    def _consume(self, chunk: bytes, parse_from: int) -> int:
+        """处理一块新读取的字节，记录每行的起始偏移量和关联 ID"""
+        data = self._partial + chunk
+        base = self._partial_start
+
+        # 最后一段没有换行符时说明 Logstash 还没写完，留到下次处理
+        last_newline = data.rfind(b"\n")
+        if last_newline < 0:
+            self._partial = data
+            return 0
+
+        count = 0
+        pos = 0
+        for raw in data[:last_newline].split(b"\n"):
+            start = base + pos
+            pos += len(raw) + 1
+            if not raw.strip():
+                continue
+            run_id = extract_run_id(raw)
+            if run_id:
+                add_run_event(self._file_runs, run_id, len(self._offsets))
+            self._offsets.append(start)
+            if start >= parse_from:
+                self._append(raw.decode("utf-8", "ignore"))
+            count += 1
+
+        self._partial = data[last_newline + 1:]
+        self._partial_start = base + last_newline + 1
+        return count
+
+    def _rotate(self):
+        """把活动文件改名为新分段；Logstash file 输出发现文件不存在时会重新创建"""
+        target = self.store.new_segment_path()
+        os.rename(self.path, target)
+        self._reading_path = target
+        self._pending_since = time.time()
+
+    def _seal_pending(self):
+        """写入分段索引，切换回活动文件并按总大小上限淘汰旧分段"""
+        segment = self.store.seal(self._reading_path, self._base_seq, self._offsets, self._file_runs)
+        self._base_seq = segment.end_seq
+        self._reset_file_state()
+        try:
+            active_size = os.path.getsize(self.path)
+        except FileNotFoundError:
+            active_size = 0
+        self.store.enforce_limit(active_size)
+
+    def _append(self, line: str):
+        """解析一行并放入环形缓冲区"""
+        try:
+            event = json.loads(line)
+        except json.JSONDecodeError:
+            # 无效 JSON 行仍保留原文，供页面展示
+            event = None
+        self._recent.append((line, event))
+
+    def recent_lines(self, count: int = 50) -> List[str]:
+        """获取最近的原始行"""
+        with self._lock:
+            self.refresh()
+            items = list(self._recent)[-count:] if count > 0 else list(self._recent)
+        return [line for line, _ in items]
+
+    def recent_events(self, count: int = 50) -> List[Dict[str, Any]]:
+        """获取最近的解析事件（跳过无效 JSON 行）"""
+        with self._lock:
+            self.refresh()
+            items = list(self._recent)[-count:] if count > 0 else list(self._recent)
+        # 返回副本，避免调用方修改缓存中的事件
+        return [dict(event) for _, event in items if isinstance(event, dict)]
+
+    def _run_ranges(self, run_id: str) -> List[Tuple[int, int]]:
+        """关联 ID 对应的全局事件序号区间（分段索引 + 当前文件）"""
+        ranges = self.store.run_ranges(run_id) if self.store else []
+        for start, end in self._file_runs.get(run_id, []):
+            ranges.append((self._base_seq + start, self._base_seq + end))
+        return ranges
+
+    def run_count(self, run_id: str) -> int:
+        """携带指定关联 ID 的事件数（只查索引，不读取事件内容）"""
+        with self._lock:
+            self.refresh()
+            return sum(end - start for start, end in self._run_ranges(run_id))
+
+    def events_for_run(self, run_id: str) -> List[Dict[str, Any]]:
+        """按索引定位并读取携带指定关联 ID 的全部事件"""
+        with self._lock:
+            self.refresh()
+            events = []
+            for start, end in self._run_ranges(run_id):
+                events.extend(self.read_page(start, end - start)["events"])
+            return events
+
+    def read_event(self, seq: int) -> Optional[Dict[str, Any]]:
+        """按全局序号读取单个事件（通过偏移量索引直接定位）"""
+        page = self.read_page(seq, 1)
+        if page["cursor"] != seq or not page["events"]:
+            return None
+        return page["events"][0]
+
+    def wait_for_run(self, run_id: str, expected: int = 1, timeout: float = 3.0,
+                     poll_interval: float = 0.05, quiet: float = 0.1) -> Dict[str, Any]:
+        """
+        等待指定关联 ID 的事件写入结果文件
+
+        至少收到 expected 条事件、且 quiet 秒内没有新事件（split 等插件可能一拆多）时立即返回；
+        超过 timeout 仍未收齐则返回已收到的部分（被 drop/cancel 的事件永远不会出现）
+
+        Args:
+            run_id: 关联 ID
+            expected: 期望的最少事件数
+            timeout: 最长等待秒数
+            poll_interval: 轮询间隔秒数
+            quiet: 收齐后确认没有后续事件的静默时间
+
+        Returns:
+            包含 events, complete, waited 的字典
+        """
+        start = time.time()
+        deadline = start + max(0.0, timeout)
+        last_count = 0
+        last_change = start
+
+        while True:
+            count = self.run_count(run_id)
+            now = time.time()
+            if count != last_count:
+                last_count = count
+                last_change = now
+            if count >= expected and now - last_change >= quiet:
+                break
+            if now >= deadline:
+                break
+            time.sleep(poll_interval)
+
+        events = self.events_for_run(run_id)
+        return {
+            "events": events,
+            "complete": len(events) >= expected,
+            "waited": round(time.time() - start, 3)
+        }
+
+    def page(self, since: int = 0, limit: int = 1000) -> Dict[str, Any]:
+        """
+        按事件序号游标定位一页结果
+
+        Args:
+            since: 起始事件序号（上一页返回的 next_cursor）
+            limit: 本页最多事件数
+
+        Returns:
+            包含 cursor, next_cursor, total, first_cursor, generation 以及各文件字节范围的字典；
+            since 早于最早保留的事件（分段已被淘汰）时从最早的事件开始。
+            各范围的文件在持锁时打开（handles），之后的轮转改名或分段淘汰不影响读取；
+            调用方必须通过 iter_page_bytes 读完或 close_page 关闭
+        """
+        with self._lock:
+            self.refresh()
+            total = self._base_seq + len(self._offsets)
+            first = self.store.first_seq() if self.store else None
+            if first is None:
+                first = self._base_seq
+            since = min(max(first, since), total)
+            end = min(total, since + max(0, limit))
+
+            ranges = []
+            handles = []
+            seq = since
+            while seq < end:
+                if seq < self._base_seq:
+                    located = self.store.locate(seq)
+                    if located is None:
+                        break
+                    segment, local = located
+                    local_end = min(end, segment.end_seq) - segment.base_seq
+                    start_offset, end_offset = self.store.offset_range(segment, local, local_end)
+                    path, next_seq = segment.data_path, segment.base_seq + local_end
+                else:
+                    local = seq - self._base_seq
+                    local_end = end - self._base_seq
+                    start_offset = self._offsets[local]
+                    end_offset = self._offsets[local_end] if local_end < len(self._offsets) else self._partial_start
+                    path, next_seq = self._reading_path, end
+                try:
+                    handles.append(open(path, "rb"))
+                except FileNotFoundError:
+                    break
+                ranges.append((path, start_offset, end_offset))
+                seq = next_seq
+            # 游标只前进到能读取的事件为止
+            end = seq
+
+            return {
+                "cursor": since,
+                "next_cursor": end,
+                "total": total,
+                "first_cursor": first,
+                "generation": self.generation,
+                "ranges": ranges,
+                "handles": handles
+            }
+
+    def iter_page_bytes(self, page: Dict[str, Any], block_size: int = 65536) -> Iterator[bytes]:
+        """按块读取一页的原始 NDJSON 字节（使用 page() 打开的文件），内存占用与页大小无关"""
+        try:
+            for f, (_, start_offset, end_offset) in zip(page["handles"], page["ranges"]):
+                remaining = end_offset - start_offset
+                f.seek(start_offset)
+                while remaining > 0:
+                    block = f.read(min(block_size, remaining))
+                    if not block:
+                        break
+                    remaining -= len(block)
+                    yield block
+        finally:
+            self.close_page(page)
+
+    @staticmethod
+    def close_page(page: Dict[str, Any]):
+        """关闭 page() 打开的文件（不读取该页时调用）"""
+        for f in page["handles"]:
+            f.close()
+
+    def read_page(self, since: int = 0, limit: int = 1000) -> Dict[str, Any]:
+        """读取一页并解析为事件列表（跳过无效 JSON 行）"""
+        page = self.page(since, limit)
+        events = []
+        data = b"".join(self.iter_page_bytes(page))
+        for raw in data.split(b"\n"):
+            if not raw.strip():
+                continue
+            try:
+                event = json.loads(raw)
+            except json.JSONDecodeError:
+                continue
+            if isinstance(event, dict):
+                events.append(event)
+        page["events"] = events
+        return page
+
+    def stats(self) -> Dict[str, Any]:
+        """读取器状态，便于调试"""
+        with self._lock:
+            stats = {
+                "path": self.path,
+                "reading_path": self._reading_path,
+                "offset": self._offset,
+                "inode": self._inode,
+                "buffered": len(self._recent),
+                "tracked_runs": len(self._file_runs),
+                "base_seq": self._base_seq,
+                "total_events": self._base_seq + len(self._offsets),
+                "capacity": self.capacity,
+                "generation": self.generation
+            }
+            if self.store:
+                stats["store"] = self.store.stats()
+            return stats
@@ -0,0 +1,274 @@
+#!/usr/bin/env python3
+"""
+解析结果分段存储模块
+events.ndjson 超过一定大小后被轮转为只读分段，每个分段带有：
+  - .idx  事件偏移量索引（每个事件 8 字节，第 N 个事件可 O(1) 定位）
+  - .meta.json  分段元数据（起始序号、事件数、大小、关联 ID 对应的事件区间）
+分段总大小超过上限时淘汰最早的分段
+"""
+
+import os
+import re
+import sys
+import json
+import bisect
+import threading
+from array import array
+from typing import Any, Dict, List, Optional, Tuple
+
+# 分段数据文件名：events-000001.ndjson
+SEGMENT_NAME_PATTERN = re.compile(r"^(?P<prefix>.+)-(?P<id>\d{6})\.ndjson$")
+
+# 索引中每个偏移量的字节数（array("Q")）
+OFFSET_WIDTH = 8
+
+class Segment:
+    """只读结果分段"""
+
+    def __init__(self, seg_id: int, data_path: str, base_seq: int, count: int, size: int,
+                 runs: Dict[str, List[List[int]]]):
+        self.seg_id = seg_id
+        self.data_path = data_path
+        self.base_seq = base_seq
+        self.count = count
+        self.size = size
+        # 关联 ID -> 分段内事件区间列表 [[start, end), ...]
+        self.runs = runs
+
+    @property
+    def idx_path(self) -> str:
+        return self.data_path[:-len(".ndjson")] + ".idx"
+
+    @property
+    def meta_path(self) -> str:
+        return self.data_path[:-len(".ndjson")] + ".meta.json"
+
+    @property
+    def end_seq(self) -> int:
+        return self.base_seq + self.count
+
+    def to_meta(self) -> Dict[str, Any]:
+        return {
+            "id": self.seg_id,
+            "base_seq": self.base_seq,
+            "count": self.count,
+            "size": self.size,
+            "runs": self.runs
+        }
+
+class SegmentStore:
+    """结果分段目录管理"""
+
+    def __init__(self, directory: str, prefix: str = "events", max_total_bytes: int = 512 * 1024 * 1024):
+        """
+        Args:
+            directory: 分段目录
+            prefix: 分段文件名前缀
+            max_total_bytes: 分段与活动文件的总大小上限
+        """
+        self.directory = directory
+        self.prefix = prefix
+        self.max_total_bytes = max_total_bytes
+        self.segments: List[Segment] = []
+        self._bases: List[int] = []
+        self._lock = threading.RLock()
+        self._load()
+
+    def _load(self):
+        """加载已有分段；只有数据文件没有元数据的分段（轮转过程中中断）会重新建立索引"""
+        if not os.path.isdir(self.directory):
+            return
+
+        found = []
+        for name in os.listdir(self.directory):
+            match = SEGMENT_NAME_PATTERN.match(name)
+            if match and match.group("prefix") == self.prefix:
+                found.append((int(match.group("id")), os.path.join(self.directory, name)))
+
+        next_seq = 0
+        for seg_id, data_path in sorted(found):
+            segment = Segment(seg_id, data_path, next_seq, 0, 0, {})
+            try:
+                with open(segment.meta_path, "r", encoding="utf-8") as f:
+                    meta = json.load(f)
+                segment.base_seq = meta["base_seq"]
+                segment.count = meta["count"]
+                segment.size = meta["size"]
+                segment.runs = meta.get("runs", {})
+            except (OSError, ValueError, KeyError):
+                offsets, runs = build_index(data_path)
+                segment = self.seal(data_path, next_seq, offsets, runs, seg_id=seg_id, register=False)
+            self.segments.append(segment)
+            next_seq = segment.end_seq
+
+        self._bases = [segment.base_seq for segment in self.segments]
+
+    def next_id(self) -> int:
+        return self.segments[-1].seg_id + 1 if self.segments else 1
+
+    def next_seq(self) -> int:
+        """下一个分段的起始事件序号"""
+        return self.segments[-1].end_seq if self.segments else 0
+
+    def first_seq(self) -> Optional[int]:
+        """仍然保留的最早事件序号"""
+        return self.segments[0].base_seq if self.segments else None
+
+    def total_bytes(self) -> int:
+        return sum(segment.size for segment in self.segments)
+
+    def new_segment_path(self) -> str:
+        """下一个分段的数据文件路径"""
+        os.makedirs(self.directory, exist_ok=True)
+        return os.path.join(self.directory, f"{self.prefix}-{self.next_id():06d}.ndjson")
+
+    def seal(self, data_path: str, base_seq: int, offsets: array, runs: Dict[str, List[List[int]]],
+             seg_id: Optional[int] = None, register: bool = True) -> Segment:
+        """
+        为已轮转的数据文件写入索引和元数据（元数据最后写入，作为分段完成标记）
+
+        Args:
+            data_path: 分段数据文件路径
+            base_seq: 分段第一个事件的全局序号
+            offsets: 每个事件在文件中的起始偏移量
+            runs: 关联 ID -> 分段内事件区间
+            register: 是否加入分段列表
+        """
+        with self._lock:
+            if seg_id is None:
+                match = SEGMENT_NAME_PATTERN.match(os.path.basename(data_path))
+                seg_id = int(match.group("id")) if match else self.next_id()
+            segment = Segment(seg_id, data_path, base_seq, len(offsets), os.path.getsize(data_path), runs)
+
+            with open(segment.idx_path + ".tmp", "wb") as f:
+                offsets.tofile(f)
+            os.replace(segment.idx_path + ".tmp", segment.idx_path)
+
+            with open(segment.meta_path + ".tmp", "w", encoding="utf-8") as f:
+                json.dump(segment.to_meta(), f, ensure_ascii=False)
+            os.replace(segment.meta_path + ".tmp", segment.meta_path)
+
+            if register:
+                self.segments.append(segment)
+                self._bases.append(segment.base_seq)
+            return segment
+
+    def enforce_limit(self, extra_bytes: int = 0) -> List[Segment]:
+        """
+        删除最早的分段，直到分段总大小加上 extra_bytes（活动文件大小）不超过上限
+
+        Returns:
+            被删除的分段列表
+        """
+        removed = []
+        with self._lock:
+            while self.segments and self.total_bytes() + extra_bytes > self.max_total_bytes:
+                segment = self.segments.pop(0)
+                self._bases.pop(0)
+                self._remove_files(segment)
+                removed.append(segment)
+        return removed
+
+    def clear(self):
+        """删除所有分段（/clear_results）"""
+        with self._lock:
+            for segment in self.segments:
+                self._remove_files(segment)
+            self.segments = []
+            self._bases = []
+
+    def _remove_files(self, segment: Segment):
+        for path in (segment.meta_path, segment.idx_path, segment.data_path):
+            try:
+                os.unlink(path)
+            except FileNotFoundError:
+                pass
+
+    def locate(self, seq: int) -> Optional[Tuple[Segment, int]]:
+        """全局事件序号 -> (分段, 分段内序号)"""
+        with self._lock:
+            pos = bisect.bisect_right(self._bases, seq) - 1
+            if pos < 0:
+                return None
+            segment = self.segments[pos]
+            if seq >= segment.end_seq:
+                return None
+            return segment, seq - segment.base_seq
+
+    def offset_range(self, segment: Segment, start: int, end: int) -> Tuple[int, int]:
+        """分段内事件区间 [start, end) 对应的字节范围，只读取索引中的两个偏移量"""
+        with open(segment.idx_path, "rb") as f:
+            f.seek(start * OFFSET_WIDTH)
+            start_offset = int.from_bytes(f.read(OFFSET_WIDTH), sys.byteorder)
+            if end < segment.count:
+                f.seek(end * OFFSET_WIDTH)
+                end_offset = int.from_bytes(f.read(OFFSET_WIDTH), sys.byteorder)
+            else:
+                end_offset = segment.size
+        return start_offset, end_offset
+
+    def run_ranges(self, run_id: str) -> List[Tuple[int, int]]:
+        """关联 ID 在各分段中的全局事件序号区间"""
+        with self._lock:
+            ranges = []
+            for segment in self.segments:
+                for start, end in segment.runs.get(run_id, []):
+                    ranges.append((segment.base_seq + start, segment.base_seq + end))
+            return ranges
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "directory": self.directory,
+                "segments": len(self.segments),
+                "segment_bytes": self.total_bytes(),
+                "max_total_bytes": self.max_total_bytes,
+                "first_seq": self.first_seq(),
+                "next_seq": self.next_seq()
+            }
+
+# json_lines 输出中的关联 ID 字段，直接在字节上匹配，避免为建索引解析每一行 JSON
+RUN_ID_BYTES_PATTERN = re.compile(rb'"lab_run_id"\s*:\s*"([^"\\]*)"')
+
+def extract_run_id(raw: bytes) -> Optional[str]:
+    """从一行原始 NDJSON 中提取关联 ID"""
+    match = RUN_ID_BYTES_PATTERN.search(raw)
+    return match.group(1).decode("utf-8", "ignore") if match else None
+
+def add_run_event(runs: Dict[str, List[List[int]]], run_id: str, local_seq: int):
+    """把事件序号并入关联 ID 的区间列表（连续事件合并为一个区间）"""
+    ranges = runs.setdefault(run_id, [])
+    if ranges and ranges[-1][1] == local_seq:
+        ranges[-1][1] += 1
+    else:
+        ranges.append([local_seq, local_seq + 1])
+
+def build_index(data_path: str, chunk_size: int = 1 << 20) -> Tuple[array, Dict[str, List[List[int]]]]:
+    """扫描数据文件，重建偏移量索引和关联 ID 区间"""
+    offsets = array("Q")
+    runs: Dict[str, List[List[int]]] = {}
+    partial = b""
+    base = 0
+    with open(data_path, "rb") as f:
+        while True:
+            chunk = f.read(chunk_size)
+            if not chunk:
+                break
+            data = partial + chunk
+            last_newline = data.rfind(b"\n")
+            if last_newline < 0:
+                partial = data
+                continue
+            pos = 0
+            for raw in data[:last_newline].split(b"\n"):
+                start = base + pos
+                pos += len(raw) + 1
+                if not raw.strip():
+                    continue
+                run_id = extract_run_id(raw)
+                if run_id:
+                    add_run_event(runs, run_id, len(offsets))
+                offsets.append(start)
+            partial = data[last_newline + 1:]
+            base += last_newline + 1
+    return offsets, runs
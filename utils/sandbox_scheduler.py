@@ -0,0 +1,261 @@
+#!/usr/bin/env python3
+"""
+测试沙箱调度器
+整个实验环境只有一份 test.conf 和一份 events.ndjson，写配置、发日志、清空结果的请求必须互斥。
+调用方先领取票据（ticket）排队，轮到后持有租约（lease）独占沙箱，期间的多个请求带上同一票据即可；
+租约在空闲超过 TTL 后自动过期，避免异常退出的调用方长期占用。
+排队策略：fifo 按到达顺序；fair 按调用方（owner）轮转，同一调用方连续提交多个票据时不会饿死其他调用方。
+"""
+
+import os
+import time
+import uuid
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional
+
+SANDBOX_POLICY = os.getenv("SANDBOX_POLICY", "fair")
+# 租约空闲多久后过期（秒），持有方的每个请求都会续期
+SANDBOX_LEASE_TTL = float(os.getenv("SANDBOX_LEASE_TTL", "60"))
+
+QUEUED = "queued"
+ACTIVE = "active"
+RELEASED = "released"
+CANCELLED = "cancelled"
+EXPIRED = "expired"
+FINISHED_STATES = (RELEASED, CANCELLED, EXPIRED)
+
+class SandboxBusyError(Exception):
+    """等待超时仍未轮到（ticket 为排队中的票据信息）"""
+
+    def __init__(self, message: str, ticket: Dict[str, Any]):
+        super().__init__(message)
+        self.ticket = ticket
+
+class SandboxTicketError(Exception):
+    """票据不存在或已结束"""
+
+class SandboxScheduler:
+    """沙箱调度器（线程安全，单进程内有效）"""
+
+    def __init__(self, policy: str = SANDBOX_POLICY, lease_ttl: float = SANDBOX_LEASE_TTL, history: int = 500):
+        """
+        Args:
+            policy: fifo / fair
+            lease_ttl: 租约空闲过期时间（秒）
+            history: 保留的已结束票据数（供查询）
+        """
+        if policy not in ("fifo", "fair"):
+            raise ValueError(f"未知的排队策略: {policy}")
+        self.policy = policy
+        self.lease_ttl = lease_ttl
+        self.history = history
+        self._tickets: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._waiting: List[Dict[str, Any]] = []
+        self._active: Optional[Dict[str, Any]] = None
+        self._next_seq = 0
+        # fair 策略：各调用方最近一次获得租约的序号
+        self._last_served: Dict[str, int] = {}
+        self._grants = 0
+        self._stats = {"granted": 0, "released": 0, "cancelled": 0, "expired": 0,
+                       "total_wait": 0.0, "total_hold": 0.0}
+        self._changed = threading.Condition()
+
+    def acquire(self, owner: str, wait: float = 0) -> Dict[str, Any]:
+        """
+        领取票据并排队
+
+        Args:
+            owner: 调用方标识（fair 策略按此轮转）
+            wait: 最多等待多少秒轮到（0 表示立即返回排队中的票据）
+
+        Returns:
+            票据信息（status 为 active 或 queued）
+        """
+        with self._changed:
+            ticket = {
+                "id": uuid.uuid4().hex,
+                "owner": owner,
+                "seq": self._next_seq,
+                "status": QUEUED,
+                "created_at": time.time(),
+                "granted_at": None,
+                "finished_at": None,
+                "last_used": None,
+                "in_flight": 0,
+                "requests": 0
+            }
+            self._next_seq += 1
+            self._tickets[ticket["id"]] = ticket
+            self._waiting.append(ticket)
+            self._schedule()
+        return self.wait(ticket["id"], wait)
+
+    def wait(self, ticket_id: str, timeout: float) -> Dict[str, Any]:
+        """等待票据轮到，最多 timeout 秒；返回票据当前状态"""
+        deadline = time.time() + max(timeout, 0)
+        with self._changed:
+            while True:
+                self._schedule()
+                ticket = self._get(ticket_id)
+                remaining = deadline - time.time()
+                if ticket["status"] != QUEUED or remaining <= 0:
+                    return self._describe(ticket)
+                # 当前租约可能在等待期间过期，按过期时间提前醒来
+                self._changed.wait(min(remaining, self._expiry_delay()))
+
+    def ticket(self, ticket_id: str) -> Dict[str, Any]:
+        with self._changed:
+            self._schedule()
+            return self._describe(self._get(ticket_id))
+
+    def release(self, ticket_id: str) -> Dict[str, Any]:
+        """释放租约；票据仍在排队时取消"""
+        with self._changed:
+            ticket = self._get(ticket_id)
+            if ticket["status"] == ACTIVE:
+                self._finish(ticket, RELEASED)
+            elif ticket["status"] == QUEUED:
+                self._waiting.remove(ticket)
+                self._finish(ticket, CANCELLED)
+            self._schedule()
+            return self._describe(ticket)
+
+    cancel = release
+
+    @contextmanager
+    def hold(self, ticket_id: Optional[str] = None, owner: str = "anonymous",
+             wait: float = 30) -> Iterator[Dict[str, Any]]:
+        """
+        在租约内执行一个请求
+
+        带 ticket_id 时使用已有票据（排队中则最多等待 wait 秒），请求期间租约不会过期，结束后续期；
+        不带时领取一次性票据，请求结束即释放
+
+        Raises:
+            SandboxTicketError: 票据不存在或已结束
+            SandboxBusyError: wait 秒内未轮到（一次性票据会被取消）
+        """
+        if ticket_id:
+            ticket = self.wait(ticket_id, wait)
+            if ticket["status"] in FINISHED_STATES:
+                raise SandboxTicketError(f"票据 {ticket_id} 已结束（{ticket['status']}），请重新领取")
+            if ticket["status"] == QUEUED:
+                raise SandboxBusyError(f"沙箱正被占用，票据排队位置 {ticket['position']}", ticket)
+        else:
+            ticket = self.acquire(owner, wait)
+            if ticket["status"] != ACTIVE:
+                self.release(ticket["id"])
+                raise SandboxBusyError(f"沙箱正被占用，等待 {wait:g} 秒后仍未轮到", ticket)
+
+        with self._changed:
+            current = self._get(ticket["id"])
+            if current["status"] != ACTIVE:
+                raise SandboxTicketError(f"票据 {ticket['id']} 已结束（{current['status']}），请重新领取")
+            current["in_flight"] += 1
+            current["requests"] += 1
+        try:
+            yield ticket
+        finally:
+            with self._changed:
+                current["in_flight"] -= 1
+                current["last_used"] = time.time()
+            if not ticket_id:
+                self.release(ticket["id"])
+
+    def status(self) -> Dict[str, Any]:
+        """当前持有方、排队列表和累计统计"""
+        with self._changed:
+            self._schedule()
+            granted = self._stats["granted"]
+            finished = self._stats["released"] + self._stats["expired"]
+            return {
+                "policy": self.policy,
+                "lease_ttl": self.lease_ttl,
+                "active": self._describe(self._active) if self._active else None,
+                "queue": [self._describe(ticket) for ticket in self._ordered()],
+                "stats": {
+                    "granted": granted,
+                    "released": self._stats["released"],
+                    "cancelled": self._stats["cancelled"],
+                    "expired": self._stats["expired"],
+                    "avg_wait_seconds": round(self._stats["total_wait"] / granted, 3) if granted else None,
+                    "avg_hold_seconds": round(self._stats["total_hold"] / finished, 3) if finished else None
+                }
+            }
+
+    def _get(self, ticket_id: str) -> Dict[str, Any]:
+        ticket = self._tickets.get(ticket_id)
+        if ticket is None:
+            raise SandboxTicketError(f"票据 {ticket_id} 不存在或已被清理")
+        return ticket
+
+    def _ordered(self) -> List[Dict[str, Any]]:
+        """排队中的票据按轮到的先后排序"""
+        if self.policy == "fifo":
+            return sorted(self._waiting, key=lambda ticket: ticket["seq"])
+        # fair：每个调用方的第 k 个票据排在第 k 轮，同一轮内最久未获得租约的调用方优先
+        rounds: Dict[str, int] = {}
+        keyed = []
+        for ticket in sorted(self._waiting, key=lambda ticket: ticket["seq"]):
+            owner = ticket["owner"]
+            keyed.append(((rounds.get(owner, 0), self._last_served.get(owner, -1), ticket["seq"]), ticket))
+            rounds[owner] = rounds.get(owner, 0) + 1
+        return [ticket for _, ticket in sorted(keyed, key=lambda item: item[0])]
+
+    def _expiry_delay(self) -> float:
+        active = self._active
+        if active is None or active["in_flight"]:
+            return self.lease_ttl
+        return max(active["last_used"] + self.lease_ttl - time.time(), 0.01)
+
+    def _schedule(self):
+        """回收过期租约，沙箱空闲时把租约交给下一个票据（调用方持有锁）"""
+        active = self._active
+        now = time.time()
+        if active is not None and not active["in_flight"] and now - active["last_used"] > self.lease_ttl:
+            self._finish(active, EXPIRED)
+        if self._active is None and self._waiting:
+            ticket = self._ordered()[0]
+            self._waiting.remove(ticket)
+            ticket["status"] = ACTIVE
+            ticket["granted_at"] = ticket["last_used"] = now
+            self._active = ticket
+            self._last_served[ticket["owner"]] = self._grants
+            self._grants += 1
+            self._stats["granted"] += 1
+            self._stats["total_wait"] += now - ticket["created_at"]
+            self._changed.notify_all()
+
+    def _finish(self, ticket: Dict[str, Any], status: str):
+        ticket["status"] = status
+        ticket["finished_at"] = time.time()
+        self._stats[status] += 1
+        if self._active is ticket:
+            self._active = None
+            self._stats["total_hold"] += ticket["finished_at"] - ticket["granted_at"]
+        while len(self._tickets) > self.history + len(self._waiting) + 1:
+            oldest = next(iter(self._tickets.values()))
+            if oldest["status"] not in FINISHED_STATES:
+                break
+            self._tickets.popitem(last=False)
+        self._changed.notify_all()
+
+    def _describe(self, ticket: Dict[str, Any]) -> Dict[str, Any]:
+        position = None
+        if ticket["status"] == QUEUED:
+            position = self._ordered().index(ticket) + 1
+        expires_in = None
+        if ticket["status"] == ACTIVE:
+            expires_in = self.lease_ttl if ticket["in_flight"] else \
+                round(max(ticket["last_used"] + self.lease_ttl - time.time(), 0), 3)
+        return {
+            "id": ticket["id"],
+            "owner": ticket["owner"],
+            "status": ticket["status"],
+            "position": position,
+            "waited": round((ticket["granted_at"] or ticket["finished_at"] or time.time()) - ticket["created_at"], 3),
+            "requests": ticket["requests"],
+            "expires_in": expires_in
+        }
@@ -0,0 +1,257 @@
+#!/usr/bin/env python3
+"""
+服务间 HTTP 客户端
+MCP 服务调用 Web 服务（web:19000）时共用：keep-alive 连接池复用、幂等请求按指数退避重试、
+目标服务宕机时熔断（快速失败，不再逐个请求等待超时），并按接口记录延迟直方图。
+"""
+
+import re
+import time
+import threading
+from typing import Any, Dict, List, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+# 延迟直方图桶上界（毫秒），最后一个桶为 +Inf
+LATENCY_BUCKETS_MS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000)
+# 路径中的 ID 段（UUID、十六进制哈希、纯数字），直方图按替换为 <id> 后的路径归并
+ID_SEGMENT = re.compile(r"^(?:[0-9a-fA-F]{8}-?[0-9a-fA-F]{4}-?[0-9a-fA-F]{4}-?[0-9a-fA-F]{4}-?[0-9a-fA-F]{12}|[0-9a-fA-F]{16,}|\d+)$")
+
+def endpoint_label(endpoint: str) -> str:
+    """直方图的接口标签：去掉查询字符串，ID 段替换为 <id>（避免每个票据/任务产生一个新的直方图）"""
+    path = endpoint.split("?", 1)[0]
+    return "/".join("<id>" if ID_SEGMENT.match(segment) else segment for segment in path.split("/"))
+
+class CircuitOpenError(requests.exceptions.ConnectionError):
+    """熔断器打开，请求未发出"""
+
+    def __init__(self, url: str, retry_after: float):
+        super().__init__(f"{url} 暂不可用（熔断中，{retry_after:.0f} 秒后重试）")
+        self.retry_after = retry_after
+
+class CircuitBreaker:
+    """
+    熔断器：连续 failure_threshold 次失败后打开，reset_timeout 秒内直接拒绝请求；
+    之后进入半开状态放行一个试探请求，成功则关闭，失败则重新打开
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 10):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self.consecutive_failures = 0
+        self.opened_at = 0.0
+        self.open_count = 0
+        self._probe_in_flight = False
+        self._lock = threading.Lock()
+
+    def allow(self) -> Optional[float]:
+        """
+        Returns:
+            None 表示放行；否则为距离下次试探的秒数
+        """
+        with self._lock:
+            if self.state == self.CLOSED:
+                return None
+            remaining = self.opened_at + self.reset_timeout - time.time()
+            if self.state == self.OPEN and remaining <= 0:
+                self.state = self.HALF_OPEN
+                self._probe_in_flight = False
+            if self.state == self.HALF_OPEN and not self._probe_in_flight:
+                self._probe_in_flight = True
+                return None
+            return max(remaining, 0)
+
+    def record_success(self):
+        with self._lock:
+            self.state = self.CLOSED
+            self.consecutive_failures = 0
+            self._probe_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self.consecutive_failures += 1
+            if self.state == self.HALF_OPEN or self.consecutive_failures >= self.failure_threshold:
+                if self.state != self.OPEN:
+                    self.open_count += 1
+                self.state = self.OPEN
+                self.opened_at = time.time()
+                self._probe_in_flight = False
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "state": self.state,
+                "consecutive_failures": self.consecutive_failures,
+                "failure_threshold": self.failure_threshold,
+                "reset_timeout": self.reset_timeout,
+                "open_count": self.open_count,
+                "retry_after": round(max(self.opened_at + self.reset_timeout - time.time(), 0), 3)
+                if self.state == self.OPEN else 0
+            }
+
+class LatencyHistogram:
+    """固定桶的延迟直方图（毫秒），分位数按桶内线性插值估算"""
+
+    def __init__(self, buckets=LATENCY_BUCKETS_MS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.errors = 0
+        # 熔断期间被拒绝的请求（未发出，不计入延迟）
+        self.rejected = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+
+    def observe(self, elapsed_ms: float, error: bool = False):
+        index = len(self.buckets)
+        for position, bound in enumerate(self.buckets):
+            if elapsed_ms <= bound:
+                index = position
+                break
+        self.counts[index] += 1
+        self.count += 1
+        self.total_ms += elapsed_ms
+        self.max_ms = max(self.max_ms, elapsed_ms)
+        if error:
+            self.errors += 1
+
+    def percentile(self, q: float) -> Optional[float]:
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        for index, count in enumerate(self.counts):
+            if count and seen + count >= rank:
+                lower = self.buckets[index - 1] if index > 0 else 0
+                upper = self.buckets[index] if index < len(self.buckets) else self.max_ms
+                return round(min(lower + (upper - lower) * (rank - seen) / count, self.max_ms), 3)
+            seen += count
+        return round(self.max_ms, 3)
+
+    def snapshot(self) -> Dict[str, Any]:
+        bounds: List[str] = [str(bound) for bound in self.buckets] + ["+Inf"]
+        return {
+            "count": self.count,
+            "errors": self.errors,
+            "rejected": self.rejected,
+            "avg_ms": round(self.total_ms / self.count, 3) if self.count else None,
+            "max_ms": round(self.max_ms, 3),
+            "p50_ms": self.percentile(0.50),
+            "p95_ms": self.percentile(0.95),
+            "p99_ms": self.percentile(0.99),
+            "buckets": {bound: count for bound, count in zip(bounds, self.counts)}
+        }
+
+class ServiceClient:
+    """服务间 HTTP 客户端（线程安全）"""
+
+    def __init__(self, base_url: str, pool_size: int = 10, max_retries: int = 3, backoff_factor: float = 0.2,
+                 timeout: float = 30, failure_threshold: int = 5, reset_timeout: float = 10):
+        """
+        Args:
+            base_url: 服务地址，如 http://web:19000
+            pool_size: 连接池大小
+            max_retries: 重试次数（连接失败任何方法都重试；读超时和 502/503/504 只重试 GET 等幂等方法）
+            backoff_factor: 指数退避基数（秒）
+            timeout: 默认请求超时（秒）
+            failure_threshold: 连续失败多少次后熔断
+            reset_timeout: 熔断持续时间（秒）
+        """
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
+        retry = Retry(
+            total=max_retries,
+            connect=max_retries,
+            read=max_retries,
+            status=max_retries,
+            status_forcelist=(502, 503, 504),
+            allowed_methods=Retry.DEFAULT_ALLOWED_METHODS,
+            backoff_factor=backoff_factor,
+            respect_retry_after_header=True,
+            raise_on_status=False
+        )
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=retry)
+        self.session = requests.Session()
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.breaker = CircuitBreaker(failure_threshold, reset_timeout)
+        self._histograms: Dict[str, LatencyHistogram] = {}
+        self._lock = threading.Lock()
+
+    def request(self, method: str, endpoint: str, timeout: Optional[float] = None,
+                label: Optional[str] = None, **kwargs) -> requests.Response:
+        """
+        发送请求（参数同 requests.Session.request）
+
+        连接失败、超时和 5xx 计入熔断器；其他状态码原样返回，由调用方处理
+
+        Args:
+            label: 延迟直方图的接口标签（路由模板，如 /sandbox/tickets/<id>），默认由 endpoint_label 推导
+
+        Raises:
+            CircuitOpenError: 熔断中
+            requests.exceptions.RequestException: 重试后仍失败
+        """
+        label = label or endpoint_label(endpoint)
+        retry_after = self.breaker.allow()
+        if retry_after is not None:
+            histogram = self._histogram(method, label)
+            with self._lock:
+                histogram.rejected += 1
+            raise CircuitOpenError(self.base_url, retry_after)
+
+        start = time.perf_counter()
+        try:
+            response = self.session.request(method, f"{self.base_url}{endpoint}",
+                                            timeout=timeout or self.timeout, **kwargs)
+        except requests.exceptions.RequestException:
+            self.breaker.record_failure()
+            self._observe(method, label, (time.perf_counter() - start) * 1000, error=True)
+            raise
+
+        failed = response.status_code >= 500
+        if failed:
+            self.breaker.record_failure()
+        else:
+            self.breaker.record_success()
+        self._observe(method, label, (time.perf_counter() - start) * 1000, error=failed)
+        return response
+
+    def get(self, endpoint: str, **kwargs) -> requests.Response:
+        return self.request("GET", endpoint, **kwargs)
+
+    def post(self, endpoint: str, **kwargs) -> requests.Response:
+        return self.request("POST", endpoint, **kwargs)
+
+    def _histogram(self, method: str, label: str) -> LatencyHistogram:
+        key = f"{method.upper()} {label}"
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = LatencyHistogram()
+            return histogram
+
+    def _observe(self, method: str, label: str, elapsed_ms: float, error: bool):
+        histogram = self._histogram(method, label)
+        with self._lock:
+            histogram.observe(elapsed_ms, error)
+
+    def metrics(self) -> Dict[str, Any]:
+        """熔断器状态和按接口（方法 + 路径）的延迟直方图"""
+        with self._lock:
+            endpoints = {key: histogram.snapshot() for key, histogram in sorted(self._histograms.items())}
+        return {
+            "base_url": self.base_url,
+            "circuit": self.breaker.snapshot(),
+            "endpoints": endpoints
+        }
+
+    def close(self):
+        self.session.close()
@@ -0,0 +1,233 @@
+#!/usr/bin/env python3
+"""
+Pipeline 验证结果缓存
+以规范化配置（去掉注释和空白后的词法单元序列，保留相邻词法单元之间是否有间隔）的哈希为键，内存 LRU + 磁盘存储两级缓存。
+格式不同但内容相同的配置共用同一条缓存；命中时错误的行列号按词法单元位置换算到当前文本。
+"""
+
+import os
+import json
+import time
+import bisect
+import hashlib
+import tempfile
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+from config_parser import ConfigSyntaxError, line_starts, offset_position, tokenize
+
+# 缓存格式版本，结果结构变化时递增使旧缓存失效
+CACHE_VERSION = 2
+# 规范化文本中词法单元之间的分隔符：原文中紧邻 / 有空白或注释隔开
+# （Logstash 语法对此敏感，如 [a][b] 是字段引用，[a] [b] 在条件表达式中不合法）
+ADJACENT_SEPARATOR = "\x1f"
+SPACED_SEPARATOR = "\x1e"
+
+def normalize_config(pipeline_content: str) -> Tuple[str, Optional[List[int]]]:
+    """
+    规范化配置
+
+    Returns:
+        (规范化文本, 每个词法单元在原文中的起始偏移量)；无法分词时返回 (原文, None)
+    """
+    try:
+        tokens, _ = tokenize(pipeline_content)
+    except ConfigSyntaxError:
+        return pipeline_content, None
+    parts = []
+    for index, token in enumerate(tokens):
+        if index:
+            parts.append(ADJACENT_SEPARATOR if token.start == tokens[index - 1].end else SPACED_SEPARATOR)
+        parts.append(token.value)
+    return "".join(parts), [token.start for token in tokens]
+
+class ValidationCache:
+    """验证结果缓存（线程安全）"""
+
+    def __init__(self, directory: Optional[str], namespace: str = "", memory_entries: int = 256,
+                 disk_entries: int = 5000, ttl: float = 7 * 24 * 3600):
+        """
+        Args:
+            directory: 磁盘缓存目录，为 None 时只使用内存缓存
+            namespace: 参与键计算的命名空间（如 Logstash 镜像），镜像变化时缓存自然失效
+            memory_entries: 内存 LRU 条目数
+            disk_entries: 磁盘条目数上限，超出时按最近访问时间淘汰
+            ttl: 磁盘条目有效期（秒）
+        """
+        self.directory = directory
+        self.namespace = namespace
+        self.memory_entries = memory_entries
+        self.disk_entries = disk_entries
+        self.ttl = ttl
+        self._memory: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._puts_since_sweep = 0
+        self.hits = 0
+        self.misses = 0
+
+    def key(self, normalized: str) -> str:
+        digest = hashlib.sha256()
+        digest.update(f"v{CACHE_VERSION}\0{self.namespace}\0".encode("utf-8"))
+        digest.update(normalized.encode("utf-8"))
+        return digest.hexdigest()
+
+    def get(self, pipeline_content: str) -> Optional[Dict[str, Any]]:
+        """查找缓存，命中时返回行列号已换算到当前文本的结果副本"""
+        normalized, starts = normalize_config(pipeline_content)
+        key = self.key(normalized)
+
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                self._memory.move_to_end(key)
+        if entry is None:
+            entry = self._load(key)
+            if entry is not None:
+                self._remember(key, entry)
+
+        with self._lock:
+            if entry is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+
+        result = json.loads(json.dumps(entry["result"]))
+        if starts is not None and entry.get("source_sha256") != _sha256(pipeline_content):
+            self._relocate(result, pipeline_content, starts)
+        for error in result.get("errors", []):
+            error.pop("token_index", None)
+        result["cache_key"] = key
+        return result
+
+    def put(self, pipeline_content: str, result: Dict[str, Any]):
+        """写入验证结果（错误位置以词法单元序号保存，便于换算到其他格式的同一配置）"""
+        normalized, starts = normalize_config(pipeline_content)
+        key = self.key(normalized)
+        stored = json.loads(json.dumps(result))
+        stored.pop("cache_key", None)
+        stored.pop("cache_hit", None)
+
+        if starts is not None:
+            text_starts = line_starts(pipeline_content)
+            for error in stored.get("errors", []):
+                if error.get("line"):
+                    offset = text_starts[min(error["line"], len(text_starts)) - 1] + max((error.get("column") or 1) - 1, 0)
+                    error["token_index"] = _token_at(starts, offset)
+
+        entry = {
+            "version": CACHE_VERSION,
+            "source_sha256": _sha256(pipeline_content),
+            "created": time.time(),
+            "result": stored
+        }
+        self._remember(key, entry)
+        self._store(key, entry)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "memory_entries": len(self._memory),
+                "hits": self.hits,
+                "misses": self.misses,
+                "directory": self.directory
+            }
+
+    def _relocate(self, result: Dict[str, Any], pipeline_content: str, starts: List[int]):
+        text_starts = line_starts(pipeline_content)
+        for error in result.get("errors", []):
+            index = error.pop("token_index", None)
+            if index is None:
+                continue
+            offset = starts[index] if index < len(starts) else len(pipeline_content)
+            error["line"], error["column"] = offset_position(text_starts, offset)
+
+    def _remember(self, key: str, entry: Dict[str, Any]):
+        with self._lock:
+            self._memory[key] = entry
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.memory_entries:
+                self._memory.popitem(last=False)
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, key[:2], f"{key}.json")
+
+    def _load(self, key: str) -> Optional[Dict[str, Any]]:
+        if not self.directory:
+            return None
+        path = self._path(key)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if entry.get("version") != CACHE_VERSION or time.time() - entry.get("created", 0) > self.ttl:
+            _unlink(path)
+            return None
+        try:
+            # 更新访问时间，淘汰时按最近访问排序
+            os.utime(path)
+        except OSError:
+            pass
+        return entry
+
+    def _store(self, key: str, entry: Dict[str, Any]):
+        if not self.directory:
+            return
+        path = self._path(key)
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(entry, f, ensure_ascii=False)
+            os.replace(tmp_path, path)
+        except OSError:
+            return
+
+        with self._lock:
+            self._puts_since_sweep += 1
+            sweep = self._puts_since_sweep >= 32
+            if sweep:
+                self._puts_since_sweep = 0
+        if sweep:
+            self.evict()
+
+    def evict(self):
+        """删除过期条目，并按最近访问时间把磁盘条目数控制在上限内"""
+        if not self.directory or not os.path.isdir(self.directory):
+            return
+        now = time.time()
+        entries = []
+        for root, _, files in os.walk(self.directory):
+            for name in files:
+                path = os.path.join(root, name)
+                try:
+                    st = os.stat(path)
+                except OSError:
+                    continue
+                if name.endswith(".tmp"):
+                    if now - st.st_mtime > 3600:
+                        _unlink(path)
+                    continue
+                if now - st.st_mtime > self.ttl:
+                    _unlink(path)
+                    continue
+                entries.append((st.st_mtime, path))
+        if len(entries) > self.disk_entries:
+            entries.sort()
+            for _, path in entries[:len(entries) - self.disk_entries]:
+                _unlink(path)
+
+def _token_at(starts: List[int], offset: int) -> int:
+    """偏移量所在的词法单元序号"""
+    index = bisect.bisect_right(starts, offset) - 1
+    return max(index, 0)
+
+def _sha256(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+def _unlink(path: str):
+    try:
+        os.unlink(path)
+    except OSError:
+        pass
@@ -0,0 +1,180 @@
+#!/usr/bin/env python3
+"""
+配置验证后端
+在 Logstash 中运行一次性命令（config.test_and_exit、批量验证脚本）的几种方式：
+  local      - 本机 logstash 安装（LOGSTASH_HOME 或 PATH 中的 logstash），无容器开销
+  docker_api - 通过 /var/run/docker.sock 直接调用 Docker Engine API（连接池复用）
+  docker_cli - docker run 子进程（兜底）
+PipelineValidator 只探测一次可用后端并缓存，后端故障时下次调用重新探测。
+"""
+
+import io
+import os
+import shutil
+import socket
+import tarfile
+import tempfile
+import subprocess
+from typing import Dict, List, Optional, Tuple
+
+from docker_engine import DockerEngineClient, DockerEngineError
+
+# 镜像中的 Logstash 安装目录
+IMAGE_LOGSTASH_HOME = "/usr/share/logstash"
+# 指定后端：auto / local / docker_api / docker_cli
+VALIDATOR_BACKEND = os.getenv("VALIDATOR_BACKEND", "auto")
+
+class BackendUnavailable(Exception):
+    """后端本身不可用（Docker 不可达、镜像拉取失败等），与配置是否正确无关"""
+
+class ValidationBackend:
+    """
+    验证后端基类
+
+    run() 在工作目录中放入 files 后执行 bin/<program>，参数和环境变量中的 {workdir} 会替换为实际目录
+    """
+
+    name = ""
+
+    def available(self) -> bool:
+        raise NotImplementedError
+
+    def run(self, program: str, args: List[str], files: Dict[str, str], env: Optional[Dict[str, str]] = None,
+            timeout: float = 60) -> Tuple[int, str]:
+        """
+        Args:
+            program: bin 目录下的程序名（logstash / ruby）
+
+        Returns:
+            (退出码, stdout + stderr)
+
+        Raises:
+            BackendUnavailable: 后端故障
+            TimeoutError: 超时
+        """
+        raise NotImplementedError
+
+def _expand(values: List[str], workdir: str) -> List[str]:
+    return [value.replace("{workdir}", workdir) for value in values]
+
+class LocalLogstashBackend(ValidationBackend):
+    """本机 Logstash 安装"""
+
+    name = "local"
+
+    def __init__(self, logstash_home: Optional[str] = None):
+        self.logstash_home = logstash_home or os.getenv("LOGSTASH_HOME") or self._find_home()
+
+    @staticmethod
+    def _find_home() -> Optional[str]:
+        binary = shutil.which("logstash")
+        if not binary:
+            return None
+        # <home>/bin/logstash
+        return os.path.dirname(os.path.dirname(os.path.realpath(binary)))
+
+    def available(self) -> bool:
+        return bool(self.logstash_home) and os.access(os.path.join(self.logstash_home, "bin", "logstash"), os.X_OK)
+
+    def run(self, program, args, files, env=None, timeout=60):
+        with tempfile.TemporaryDirectory(prefix="logstash_lab_") as workdir:
+            for name, content in files.items():
+                with open(os.path.join(workdir, name), "w", encoding="utf-8") as f:
+                    f.write(content)
+            cmd = [os.path.join(self.logstash_home, "bin", program)] + _expand(args, workdir)
+            run_env = {**os.environ, "LOGSTASH_HOME": self.logstash_home}
+            run_env.update({key: value.replace("{workdir}", workdir) for key, value in (env or {}).items()})
+            try:
+                process = subprocess.run(cmd, capture_output=True, text=True, timeout=timeout,
+                                         cwd=workdir, env=run_env)
+            except subprocess.TimeoutExpired:
+                raise TimeoutError(f"验证超时（{timeout}秒）")
+            except OSError as e:
+                raise BackendUnavailable(f"无法运行本机 Logstash: {e}")
+        return process.returncode, process.stdout + process.stderr
+
+class DockerAPIBackend(ValidationBackend):
+    """Docker Engine API（/var/run/docker.sock）"""
+
+    name = "docker_api"
+    WORKDIR = "/tmp/lab"
+
+    def __init__(self, image: str, client: Optional[DockerEngineClient] = None):
+        self.image = image
+        self.client = client or DockerEngineClient()
+
+    def available(self) -> bool:
+        return self.client.ping()
+
+    def run(self, program, args, files, env=None, timeout=60):
+        try:
+            return self.client.run_container(
+                self.image,
+                _expand(args, self.WORKDIR),
+                files={name: content.encode("utf-8") for name, content in files.items()},
+                workdir=self.WORKDIR,
+                env={key: value.replace("{workdir}", self.WORKDIR) for key, value in (env or {}).items()},
+                entrypoint=[f"{IMAGE_LOGSTASH_HOME}/bin/{program}"],
+                timeout=timeout
+            )
+        except socket.timeout:
+            raise TimeoutError(f"验证超时（{timeout}秒）")
+        except DockerEngineError as e:
+            raise BackendUnavailable(str(e))
+
+class DockerCLIBackend(ValidationBackend):
+    """docker run 子进程：文件以 tar 通过 stdin 传入容器"""
+
+    name = "docker_cli"
+    WORKDIR = "/tmp/lab"
+
+    def __init__(self, image: str):
+        self.image = image
+
+    def available(self) -> bool:
+        return shutil.which("docker") is not None
+
+    def run(self, program, args, files, env=None, timeout=60):
+        buffer = io.BytesIO()
+        with tarfile.open(fileobj=buffer, mode="w") as archive:
+            for name, content in files.items():
+                data = content.encode("utf-8")
+                info = tarfile.TarInfo(name)
+                info.size = len(data)
+                info.mode = 0o644
+                archive.addfile(info, io.BytesIO(data))
+
+        cmd = ["docker", "run", "--rm", "-i", "--network", "none", "--entrypoint", "bash"]
+        for key, value in (env or {}).items():
+            cmd += ["-e", f"{key}={value.replace('{workdir}', self.WORKDIR)}"]
+        script = (f'mkdir -p {self.WORKDIR} && cd {self.WORKDIR} && tar xf - && '
+                  f'exec {IMAGE_LOGSTASH_HOME}/bin/{program} "$@"')
+        cmd += [self.image, "-c", script, program] + _expand(args, self.WORKDIR)
+        try:
+            process = subprocess.run(cmd, input=buffer.getvalue(), capture_output=True, timeout=timeout)
+        except subprocess.TimeoutExpired:
+            raise TimeoutError(f"验证超时（{timeout}秒）")
+        except OSError as e:
+            raise BackendUnavailable(f"Docker 执行失败: {e}")
+        output = (process.stdout + process.stderr).decode("utf-8", errors="replace")
+        # 125: docker 自身出错（daemon 不可达、镜像不存在等）
+        if process.returncode == 125:
+            raise BackendUnavailable(f"Docker 执行失败: {output.strip()[-500:]}")
+        return process.returncode, output
+
+def create_backends(image: str, preferred: str = VALIDATOR_BACKEND) -> List[ValidationBackend]:
+    """按优先级返回候选后端（preferred 非 auto 时只返回指定后端）"""
+    backends: List[ValidationBackend] = [LocalLogstashBackend(), DockerAPIBackend(image), DockerCLIBackend(image)]
+    if preferred and preferred != "auto":
+        backends = [backend for backend in backends if backend.name == preferred]
+    return backends
+
+def detect_backend(backends: List[ValidationBackend]) -> Optional[ValidationBackend]:
+    """返回第一个可用的后端"""
+    for backend in backends:
+        try:
+            if backend.available():
+                return backend
+        except Exception:
+            continue
+    return None
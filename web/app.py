@@ -1,13 +1,117 @@
-from flask import Flask, request, render_template, jsonify
-import os, time, json, pathlib, re, subprocess
+from flask import Flask, request, render_template, jsonify, Response
+import os, sys, time, json, pathlib, re, subprocess, uuid, tempfile, functools
 import urllib.request
 
+# 共享工具模块（docker-compose 挂载到 /app/utils）
+sys.path.append('/app/utils')
+from result_reader import ResultReader, RUN_ID_FIELD, RUN_ID_HEADER
+from logstash_client import LogstashInputClient, NDJSON_CONTENT_TYPE
+from config_parser import ConfigSyntaxError, content_hash, load_config, parse_config, parse_statements
+from logstash_monitor import LogstashMonitor
+from logstash_logs import format_record
+from log_follower import ContainerLogSource, FileLogSource, LogFollower
+from sandbox_scheduler import SandboxBusyError, SandboxScheduler, SandboxTicketError
+from pipeline_profiler import PipelineProfiler, build_report
+from plugin_ids import inject_plugin_ids
+from pipeline_benchmark import PipelineBenchmark, corpus_hash, list_results, load_result, save_result
+from benchmark_history import METRICS, BenchmarkHistory, settings_key, summarize
+from pipeline_sweep import PIPELINES_YML, PipelineSweep, list_sweeps, load_sweep, save_sweep, sweep_grid
+from docker_engine import DockerEngineClient
+
 app = Flask(__name__)
+APP_START_TIME = time.time()
 PIPELINE_PATH = "/app/pipeline/test.conf"
 RESULT_FILE = "/app/data/out/events.ndjson"
 LOGSTASH_HTTP = os.getenv("LOGSTASH_HTTP", "http://logstash:15515")
 
-FILTER_PATTERN = re.compile(r"(filter\s*\{)(.*?)(\}\s*output\s*\{)", re.S)
+# 结果分段：活动文件超过 RESULT_SEGMENT_MB 后轮转为带偏移量索引的只读分段，总大小不超过 RESULT_MAX_MB
+RESULT_SEGMENT_DIR = os.path.join(os.path.dirname(RESULT_FILE), "segments")
+RESULT_SEGMENT_BYTES = int(float(os.getenv("RESULT_SEGMENT_MB", "64")) * 1024 * 1024)
+RESULT_MAX_BYTES = int(float(os.getenv("RESULT_MAX_MB", "512")) * 1024 * 1024)
+
+# 全局结果读取器：增量解析 events.ndjson，页面/测试/MCP 查询共用
+result_reader = ResultReader(
+    RESULT_FILE,
+    segment_dir=RESULT_SEGMENT_DIR,
+    segment_bytes=RESULT_SEGMENT_BYTES,
+    max_total_bytes=RESULT_MAX_BYTES
+)
+# 游标分页单页事件数上限（JSON 接口 / NDJSON 流式接口）
+RESULT_PAGE_LIMIT = 1000
+RESULT_STREAM_LIMIT = 100000
+# 为没有 id 的插件注入确定性 id（插件统计可跨重载比较），id 与提交内容行号的映射写入 PLUGIN_ID_MAP_FILE
+INJECT_PLUGIN_IDS = os.getenv("INJECT_PLUGIN_IDS", "1") != "0"
+PLUGIN_ID_MAP_FILE = os.getenv("PLUGIN_ID_MAP_FILE", "/app/data/plugin_ids.json")
+# 等待本次提交结果写入的默认超时（秒）
+RESULT_WAIT_TIMEOUT = float(os.getenv("RESULT_WAIT_TIMEOUT", "3"))
+
+# Logstash 监控 API：写入配置后据此判断热重载何时完成/是否失败
+LOGSTASH_API = os.getenv("LOGSTASH_API", "http://logstash:9600")
+RELOAD_TIMEOUT = float(os.getenv("RELOAD_TIMEOUT", "60"))
+logstash_monitor = LogstashMonitor(LOGSTASH_API, "test")
+# 插件级耗时统计（性能分析前后各取一次快照）
+pipeline_profiler = PipelineProfiler(LOGSTASH_API, "test")
+# 性能分析的最少事件数：日志不足时重复发送（插件耗时只有毫秒精度）
+PROFILE_MIN_EVENTS = int(os.getenv("PROFILE_MIN_EVENTS", "1000"))
+
+# 基准测试：发送事件数和时长上限，结果保存在 BENCHMARK_DIR（见 pipeline_benchmark）
+BENCHMARK_MAX_EVENTS = 1000000
+BENCHMARK_MAX_DURATION = float(os.getenv("BENCHMARK_MAX_DURATION", "300"))
+BENCHMARK_MAX_REPEAT = 10
+# 与基线比较时每方取最近几次运行、判定回归的最小相对变化；上传把关默认的运行次数和事件数
+BENCHMARK_COMPARE_SAMPLES = int(os.getenv("BENCHMARK_COMPARE_SAMPLES", "5"))
+BENCHMARK_MIN_EFFECT = float(os.getenv("BENCHMARK_MIN_EFFECT", "0.05"))
+BENCHMARK_GATE_REPEAT = int(os.getenv("BENCHMARK_GATE_REPEAT", "3"))
+BENCHMARK_GATE_EVENTS = int(os.getenv("BENCHMARK_GATE_EVENTS", "2000"))
+# 参数扫描：最多的参数组数，每组默认的运行次数、事件数和预热事件数
+SWEEP_MAX_POINTS = 27
+SWEEP_REPEAT = int(os.getenv("SWEEP_REPEAT", "2"))
+SWEEP_EVENTS = int(os.getenv("SWEEP_EVENTS", "5000"))
+SWEEP_WARMUP = int(os.getenv("SWEEP_WARMUP", "500"))
+# 基准测试历史（SQLite，首次使用时创建）
+benchmark_history = None
+
+def get_benchmark_history():
+    global benchmark_history
+    if benchmark_history is None:
+        benchmark_history = BenchmarkHistory()
+    return benchmark_history
+
+# 沙箱调度：写配置、发日志、清空结果的请求互斥执行（排队策略和租约 TTL 见 sandbox_scheduler）
+sandbox = SandboxScheduler()
+SANDBOX_TICKET_HEADER = "X-Sandbox-Ticket"
+SANDBOX_OWNER_HEADER = "X-Sandbox-Owner"
+# 未带票据的请求最多排队等待多少秒
+SANDBOX_WAIT_TIMEOUT = float(os.getenv("SANDBOX_WAIT_TIMEOUT", "30"))
+# 票据接口长轮询（wait 参数）的上限（秒）
+SANDBOX_MAX_WAIT = 60
+
+# 复用 keep-alive 连接池向 Logstash http input 提交日志（429/503 自动退避重试）
+logstash_client = LogstashInputClient(LOGSTASH_HTTP)
+# 批量提交：默认每批行数、单次请求最多行数、响应中默认返回的事件数
+BULK_BATCH_SIZE = int(os.getenv("BULK_BATCH_SIZE", "500"))
+BULK_MAX_LINES = 200000
+BULK_RESPONSE_EVENTS = 1000
+
+# 把请求头中的关联 ID 复制到事件字段（兼容 ECS 与非 ECS 两种请求头位置）
+RUN_ID_FILTER_LINES = [
+    "  # 将请求头 X-Lab-Run-Id 复制到 lab_run_id 字段，供 Web 精确匹配本次提交的结果",
+    "  if ![lab_run_id] {",
+    "    ruby {",
+    "      id => \"lab_run_id_from_header\"",
+    "      code => '",
+    "      headers = event.get(\"[@metadata][input][http][request][headers]\") || event.get(\"[headers]\")",
+    "      if headers.is_a?(Hash)",
+    "        run_id = headers[\"x_lab_run_id\"] || headers[\"x-lab-run-id\"]",
+    "        event.set(\"lab_run_id\", run_id) if run_id",
+    "      end",
+    "      '",
+    "    }",
+    "  }",
+]
+
+# test.conf 中的标记注释：其后的第一个 filter 段由 Web 整块替换
+FILTER_MARKER = "!!! Web 会把下面 filter"
 
 DEFAULT_FILTER = """filter {
   grok { match => { "message" => "%{COMBINEDAPACHELOG}" } }
@@ -29,17 +133,24 @@ def wrap_filter_with_condition(filter_rules, metadata_type):
     # 移除外层的 filter {} 包装（如果有）
     content = filter_rules.strip()
     if content.startswith('filter'):
-        # 提取 filter { ... } 中间的内容
-        match = re.match(r'filter\s*\{(.*)\}', content, re.DOTALL)
-        if match:
-            content = match.group(1).strip()
+        try:
+            document = parse_config(content)
+            if len(document.sections) == 1 and document.sections[0].name == "filter":
+                content = document.body(document.sections[0]).strip()
+        except ConfigSyntaxError:
+            # 语法错误的内容原样包装，由 Logstash 热重载报告错误
+            pass
     
     # 检查是否已经有条件判断，如果有则提取内部内容
-    # 匹配 if "任何值" == [@metadata][type] { ... } 模式
-    condition_match = re.match(r'\s*if\s+"[^"]*"\s*==\s*\[@metadata\]\[type\]\s*\{(.*)\}\s*$', content, re.DOTALL)
-    if condition_match:
-        # 如果已经有条件判断，提取内部内容
-        content = condition_match.group(1).strip()
+    # 匹配 if "任何值" == [@metadata][type] { ... } 且没有 else 分支的模式
+    try:
+        nodes = parse_statements(content)
+    except ConfigSyntaxError:
+        nodes = []
+    if len(nodes) == 1 and nodes[0].type == "branch" and len(nodes[0].children) == 1:
+        clause = nodes[0].children[0]
+        if re.fullmatch(r'"[^"]*"\s*==\s*\[@metadata\]\[type\]', clause.condition):
+            content = content[clause.body_start + 1:clause.body_end].strip()
     
     # 缩进处理：为每行添加适当的缩进
     lines = content.split('\n')
@@ -60,36 +171,95 @@ def wrap_filter_with_condition(filter_rules, metadata_type):
 }}'''
     return wrapped
 
+def find_target_filter(document):
+    """Web 负责替换的 filter 段：标记注释之后的第一个 filter 段，没有标记时取最后一个"""
+    filters = document.sections_of("filter")
+    for comment in document.comments:
+        if FILTER_MARKER in comment.value:
+            for section in filters:
+                if section.start > comment.start:
+                    return section
+            break
+    return filters[-1] if filters else None
+
+def find_metadata_mutate(document):
+    """查找设置 [@metadata][type] 的 mutate 插件，返回 (插件, add_field 配置项)"""
+    for section, plugin in document.plugins():
+        if section.name != "filter" or plugin.name != "mutate":
+            continue
+        for attribute in plugin.attributes:
+            if attribute.name == "add_field" and isinstance(attribute.value, dict) \
+                    and "[@metadata][type]" in attribute.value:
+                return plugin, attribute
+    return None, None
+
+def line_end(text, pos):
+    """pos 所在行的行尾位置"""
+    end = text.find('\n', pos)
+    return len(text) if end < 0 else end
+
+def write_config_atomic(path, content):
+    """
+    原子写入配置文件：先写同目录临时文件再 rename，Logstash 热重载不会读到写了一半的配置。
+    临时文件沿用原文件的权限和属主（Logstash 容器以非 root 用户读取）
+    """
+    directory = os.path.dirname(path) or "."
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=f".{os.path.basename(path)}.", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            f.write(content)
+            f.flush()
+            os.fsync(f.fileno())
+        try:
+            st = os.stat(path)
+            os.chmod(tmp_path, st.st_mode & 0o7777)
+            if hasattr(os, "chown"):
+                try:
+                    os.chown(tmp_path, st.st_uid, st.st_gid)
+                except PermissionError:
+                    pass
+        except FileNotFoundError:
+            os.chmod(tmp_path, 0o644)
+        os.replace(tmp_path, path)
+    except OSError:
+        # 单文件 bind mount 等无法 rename 的场景，退回原地写入
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(content)
+
 def write_filter(new_filter_block: str, metadata_type: str = ""):
-    """更新 pipeline 配置文件中的 filter 段"""
+    """
+    更新 pipeline 配置文件中的 filter 段
+
+    内容哈希与当前文件一致时不写入（不会触发 Logstash 热重载）
+
+    Returns:
+        {"changed": 是否写入, "reload_expected": 是否会触发热重载, "sha256": 写入后的内容哈希}
+    """
+    # 写入前总是读取最新内容（按内容哈希命中解析缓存），不依赖 mtime
     with open(PIPELINE_PATH, "r", encoding="utf-8") as f:
         conf = f.read()
+    document = parse_config(conf)
+    target = find_target_filter(document)
+    # 基于语法树位置的编辑 (start, end, 替换文本)，最后从后往前统一应用
+    edits = []
     
-    lines = conf.split('\n')
-    
-    # 固定使用 "test" 作为 metadata type，更新第一个 filter 块中的 metadata 设置
+    # 固定使用 "test" 作为 metadata type，更新 metadata 设置块
     if metadata_type.strip():
-        # 查找第一个 filter 块（metadata 设置块）
-        first_filter_updated = False
-        for i, line in enumerate(lines):
-            if 'add_field => { "[@metadata][type]"' in line:
-                # 固定设置为 "test"
-                lines[i] = '    add_field => { "[@metadata][type]" => "test" }'
-                first_filter_updated = True
-                break
-        
-        # 如果没有找到 metadata 设置，在 input 后添加
-        if not first_filter_updated:
-            input_end = -1
-            for i, line in enumerate(lines):
-                if line.strip() == '}' and i > 0:
-                    # 检查前面是否有 input 相关内容
-                    prev_lines = '\n'.join(lines[max(0, i-10):i])
-                    if 'input {' in prev_lines and 'http {' in prev_lines:
-                        input_end = i
-                        break
-            
-            if input_end != -1:
+        plugin, attribute = find_metadata_mutate(document)
+        if plugin is not None:
+            # metadata 设置就在被替换的 filter 段里时，无需单独更新
+            if target is None or not target.start <= plugin.start < target.end:
+                edits.append((attribute.start, attribute.end, 'add_field => { "[@metadata][type]" => "test" }'))
+                # 旧版配置缺少关联 ID 复制逻辑时，补在 mutate 块之后
+                if 'lab_run_id_from_header' not in conf:
+                    pos = line_end(conf, plugin.end)
+                    edits.append((pos, pos, '\n' + '\n'.join(RUN_ID_FILTER_LINES)))
+        else:
+            # 如果没有找到 metadata 设置，在 input 后添加
+            inputs = document.sections_of("input")
+            if inputs:
                 metadata_filter = [
                     "",
                     "# 自动设置 metadata type，这里会被 Web 界面动态替换",
@@ -97,147 +267,233 @@ def write_filter(new_filter_block: str, metadata_type: str = ""):
                     "  mutate {",
                     f'    add_field => {{ "[@metadata][type]" => "{metadata_type}" }}',
                     "  }",
+                ] + RUN_ID_FILTER_LINES + [
                     "}"
                 ]
-                lines = lines[:input_end + 1] + metadata_filter + lines[input_end + 1:]
-    
-    # 查找主要的 filter 块（带注释标记的）
-    filter_start_line = -1
-    filter_end_line = -1
-    
-    # 查找带有替换标记的 filter 块
-    for i, line in enumerate(lines):
-        if '!!! Web 会把下面 filter' in line:
-            # 找到下一个 filter 块
-            for j in range(i + 1, len(lines)):
-                stripped = lines[j].strip()
-                if stripped.startswith('filter {') or stripped == 'filter{':
-                    filter_start_line = j
-                    break
-            break
+                pos = line_end(conf, inputs[0].end)
+                edits.append((pos, pos, '\n' + '\n'.join(metadata_filter)))
     
-    if filter_start_line == -1:
-        # 如果没有找到标记的 filter 块，查找最后一个 filter 块
-        for i, line in enumerate(lines):
-            stripped = line.strip()
-            if stripped.startswith('#') or not stripped:
-                continue
-            if stripped.startswith('filter {') or stripped == 'filter{':
-                filter_start_line = i
-    
-    if filter_start_line != -1:
-        # 找到 filter 块的结束行 - 改进的 bracket counting
-        bracket_count = 0
-        in_string = False
-        escape_next = False
-        
-        for i in range(filter_start_line, len(lines)):
-            line = lines[i]
-            for char in line:
-                if escape_next:
-                    escape_next = False
-                    continue
-                    
-                if char == '\\':
-                    escape_next = True
-                    continue
-                    
-                if char == '"' and not escape_next:
-                    in_string = not in_string
-                    continue
-                    
-                if not in_string:
-                    if char == '{':
-                        bracket_count += 1
-                    elif char == '}':
-                        bracket_count -= 1
-                        if bracket_count == 0:
-                            filter_end_line = i
-                            break
-                            
-            if filter_end_line != -1:
-                break
-        
-        if filter_end_line == -1:
-            # 如果无法找到结束行，尝试查找下一个顶级块（如 output）
-            for i in range(filter_start_line + 1, len(lines)):
-                stripped = lines[i].strip()
-                if stripped.startswith('output {') or stripped.startswith('input {'):
-                    filter_end_line = i - 1
-                    break
-            
-            if filter_end_line == -1:
-                filter_end_line = len(lines) - 1
-        
+    if target is not None:
         # 替换主要的 filter 块
-        new_lines = lines[:filter_start_line] + [new_filter_block] + lines[filter_end_line + 1:]
-    else:
+        edits.append((target.start, target.end, new_filter_block))
+    
+    conf2 = conf
+    for start, end, replacement in sorted(edits, key=lambda edit: edit[0], reverse=True):
+        conf2 = conf2[:start] + replacement + conf2[end:]
+    
+    if target is None:
         # 如果没有找到 filter 块，在最后添加
-        new_lines = lines + ["", new_filter_block]
+        conf2 = conf2 + '\n\n' + new_filter_block
     
-    conf2 = '\n'.join(new_lines)
+    new_hash = content_hash(conf2)
+    if new_hash == document.sha256:
+        return {"changed": False, "reload_expected": False, "sha256": new_hash}
     
-    with open(PIPELINE_PATH, "w", encoding="utf-8") as f:
-        f.write(conf2)
+    write_config_atomic(PIPELINE_PATH, conf2)
+    # config.reload.automatic 开启时，内容变化会在下一个检查周期触发重载
+    return {"changed": True, "reload_expected": True, "sha256": new_hash}
+
+def apply_filter(block, metadata_type, wait_reload=False, reload_timeout=RELOAD_TIMEOUT):
+    """
+    写入 filter，并可选地等待 Logstash 热重载结果
+
+    重载基线必须在写入前读取，否则可能错过写入后立即发生的重载
+
+    Returns:
+        write_filter 的结果，等待重载时附加 reload 字段（见 LogstashMonitor.wait_for_reload）
+    """
+    baseline = logstash_monitor.snapshot() if wait_reload else None
+    write_result = write_filter(block, metadata_type)
+    if wait_reload and write_result["reload_expected"]:
+        write_result["reload"] = logstash_monitor.wait_for_reload(baseline, reload_timeout)
+    return write_result
+
+def reload_form_options():
+    """表单参数 wait_reload / reload_timeout"""
+    wait_reload = request.form.get("wait_reload") in ("1", "true")
+    try:
+        reload_timeout = float(request.form.get("reload_timeout", RELOAD_TIMEOUT))
+    except ValueError:
+        reload_timeout = RELOAD_TIMEOUT
+    return wait_reload, reload_timeout
+
+def reload_status(write_result, message):
+    """根据重载结果修正响应的 ok 和提示信息"""
+    reload = write_result.get("reload")
+    if not reload:
+        return True, message
+    if reload["status"] == "reloaded":
+        return True, f"{message}，新配置已生效 ({reload['waited']}s)"
+    if reload["status"] == "unavailable":
+        return True, f"{message}（无法访问监控 API，未确认重载结果）"
+    return False, f"配置已写入，但 Logstash 重载未成功: {reload['error']}"
+
+def prepare_plugin_ids(content):
+    """
+    为提交内容中没有 id 的插件注入确定性 id（INJECT_PLUGIN_IDS=0 时只记录已有的 id）
+
+    Returns:
+        (注入后的内容, 插件列表)，插件的 line 为提交内容中的行号
+    """
+    injected, plugins = inject_plugin_ids(content)
+    if not INJECT_PLUGIN_IDS:
+        return content, [plugin for plugin in plugins if not plugin["injected"]]
+    return injected, plugins
+
+def save_plugin_id_map(plugins, source):
+    """
+    记录插件 id → 提交内容行号 / test.conf 行号，只保留实际写入 test.conf 的插件
+
+    Returns:
+        写入的映射
+    """
+    try:
+        document = load_config(PIPELINE_PATH)
+    except (OSError, ConfigSyntaxError):
+        return None
+    config_lines = {}
+    for _, plugin in document.plugins():
+        for attribute in plugin.attributes:
+            if attribute.name == "id" and isinstance(attribute.value, str):
+                config_lines[attribute.value] = document.position(plugin.start)[0]
+    mapping = {
+        "sha256": document.sha256,
+        "source": source,
+        "updated_at": time.strftime("%Y-%m-%d %H:%M:%S"),
+        "plugins": {
+            plugin["id"]: {
+                "name": plugin["name"],
+                "source_line": plugin["line"],
+                "config_line": config_lines[plugin["id"]],
+                "conditions": plugin["conditions"],
+                "injected": plugin["injected"]
+            }
+            for plugin in plugins if plugin["id"] in config_lines
+        }
+    }
+    try:
+        os.makedirs(os.path.dirname(PLUGIN_ID_MAP_FILE), exist_ok=True)
+        write_config_atomic(PLUGIN_ID_MAP_FILE, json.dumps(mapping, ensure_ascii=False, indent=2))
+    except OSError:
+        pass
+    return mapping
+
+def load_plugin_id_map():
+    """当前 test.conf 对应的插件 id 映射（配置已被其他方式修改时返回 None）"""
+    try:
+        with open(PLUGIN_ID_MAP_FILE, "r", encoding="utf-8") as f:
+            mapping = json.load(f)
+        if mapping.get("sha256") != load_config(PIPELINE_PATH).sha256:
+            return None
+    except (OSError, ValueError, ConfigSyntaxError):
+        return None
+    return mapping
 
 def extract_current_filter(conf):
-    """从完整配置中提取当前的 filter 块"""
-    lines = conf.split('\n')
-    filter_start_line = -1
-    filter_end_line = -1
-    
-    # 查找 filter 块的开始行（跳过注释）
-    for i, line in enumerate(lines):
-        stripped = line.strip()
-        if stripped.startswith('#') or not stripped:
-            continue
-        if stripped.startswith('filter {') or stripped == 'filter{':
-            filter_start_line = i
-            break
-    
-    if filter_start_line == -1:
+    """从完整配置中提取当前由 Web 维护的 filter 块（标记注释之后的 filter 段）"""
+    try:
+        document = parse_config(conf)
+    except ConfigSyntaxError:
         return DEFAULT_FILTER
     
-    # 找到 filter 块的结束行
-    bracket_count = 0
-    for i in range(filter_start_line, len(lines)):
-        line = lines[i]
-        for char in line:
-            if char == '{':
-                bracket_count += 1
-            elif char == '}':
-                bracket_count -= 1
-                if bracket_count == 0:
-                    filter_end_line = i
-                    break
-        if filter_end_line != -1:
-            break
-    
-    if filter_end_line == -1:
+    target = find_target_filter(document)
+    if target is None:
         return DEFAULT_FILTER
-    
-    return '\n'.join(lines[filter_start_line:filter_end_line + 1])
+    return document.source(target)
+
+def sandbox_owner():
+    """调用方标识：X-Sandbox-Owner 请求头，默认为客户端地址"""
+    return request.headers.get(SANDBOX_OWNER_HEADER) or request.remote_addr or "anonymous"
+
+def sandboxed(view):
+    """
+    在沙箱租约内执行会修改 test.conf / events.ndjson 的请求
+
+    带 X-Sandbox-Ticket（或表单字段 sandbox_ticket）时使用该票据的租约；
+    否则临时排队（最多 SANDBOX_WAIT_TIMEOUT 秒），请求结束即释放。
+    排队超时返回 423，票据无效返回 409
+    """
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        ticket_id = request.headers.get(SANDBOX_TICKET_HEADER) or request.form.get("sandbox_ticket")
+        try:
+            with sandbox.hold(ticket_id, sandbox_owner(), SANDBOX_WAIT_TIMEOUT):
+                return view(*args, **kwargs)
+        except SandboxTicketError as e:
+            return jsonify({"ok": False, "message": str(e), "sandbox": sandbox.status()}), 409
+        except SandboxBusyError as e:
+            response = jsonify({"ok": False, "message": str(e), "ticket": e.ticket, "sandbox": sandbox.status()})
+            response.status_code = 423
+            response.headers["Retry-After"] = str(max(1, int(sandbox.lease_ttl / 4)))
+            return response
+    return wrapper
+
+@app.route("/sandbox", methods=["GET"])
+def sandbox_status():
+    """沙箱当前持有方、排队列表和统计"""
+    return jsonify({"ok": True, **sandbox.status()})
+
+@app.route("/sandbox/tickets", methods=["POST"])
+def sandbox_acquire():
+    """
+    领取票据：之后的请求带上 X-Sandbox-Ticket 即在同一租约内执行，用完 DELETE 释放
+
+    参数（表单或 JSON）：owner 调用方标识；wait 最多等待多少秒轮到（默认 0，立即返回排队位置）
+    """
+    params = request.get_json(silent=True) or request.form
+    try:
+        wait = float(params.get("wait", 0))
+    except (TypeError, ValueError):
+        return jsonify({"ok": False, "message": "wait 必须是数字"}), 400
+    ticket = sandbox.acquire(params.get("owner") or sandbox_owner(), min(wait, SANDBOX_MAX_WAIT))
+    return jsonify({"ok": True, "ticket": ticket}), 201
+
+@app.route("/sandbox/tickets/<ticket_id>", methods=["GET"])
+def sandbox_ticket(ticket_id):
+    """票据状态和排队位置；wait 参数可等待最多若干秒直到轮到"""
+    try:
+        wait = min(request.args.get("wait", 0, type=float), SANDBOX_MAX_WAIT)
+        ticket = sandbox.wait(ticket_id, wait) if wait > 0 else sandbox.ticket(ticket_id)
+    except SandboxTicketError as e:
+        return jsonify({"ok": False, "message": str(e)}), 404
+    return jsonify({"ok": True, "ticket": ticket})
+
+@app.route("/sandbox/tickets/<ticket_id>", methods=["DELETE"])
+def sandbox_release(ticket_id):
+    """释放租约（排队中的票据则取消）"""
+    try:
+        ticket = sandbox.release(ticket_id)
+    except SandboxTicketError as e:
+        return jsonify({"ok": False, "message": str(e)}), 404
+    return jsonify({"ok": True, "ticket": ticket})
+
+@app.route("/healthz", methods=["GET"])
+def healthz():
+    """轻量健康检查：只确认进程存活和挂载目录可用，不读取结果文件、不访问其他服务"""
+    return jsonify({
+        "ok": True,
+        "service": "web",
+        "uptime_seconds": round(time.time() - APP_START_TIME, 3),
+        "pipeline_config": os.path.exists(PIPELINE_PATH),
+        "result_dir": os.path.isdir(os.path.dirname(RESULT_FILE))
+    })
 
 @app.route("/", methods=["GET"])
 def index():
     """主页面 - 显示当前 filter 配置和最近结果"""
-    # 读取当前 filter
-    with open(PIPELINE_PATH, "r", encoding="utf-8") as f:
-        conf = f.read()
+    # 读取当前 filter（文件未变化时复用已解析的配置）
+    try:
+        conf = load_config(PIPELINE_PATH).text
+    except ConfigSyntaxError:
+        with open(PIPELINE_PATH, "r", encoding="utf-8") as f:
+            conf = f.read()
     current_filter = extract_current_filter(conf)
     
     # 提取当前的 metadata type
     current_metadata_type = extract_metadata_type_from_filter(current_filter)
     
     # 读取最近 50 条结果
-    last = []
-    if os.path.exists(RESULT_FILE):
-        with open(RESULT_FILE, "rb") as f:
-            f.seek(0, os.SEEK_END)
-            size = f.tell()
-            f.seek(max(0, size-200000), os.SEEK_SET)  # 防爆内存
-            lines = f.read().decode("utf-8", "ignore").splitlines()
-            last = lines[-50:]
+    last = result_reader.recent_lines(50)
     
     return render_template("index.html", 
                          current_filter=current_filter, 
@@ -245,6 +501,7 @@ def index():
                          last=last)
 
 @app.route("/save_filter", methods=["POST"])
+@sandboxed
 def save_filter():
     """保存 filter 配置"""
     filter_data = request.form.get("filter", "")
@@ -256,17 +513,39 @@ def save_filter():
     if not filter_data.strip():
         filter_data = DEFAULT_FILTER
     
+    # 没有 id 的插件注入确定性 id，行号对应编辑框中的内容
+    filter_data, plugins = prepare_plugin_ids(filter_data)
+    
     # 总是通过 wrap_filter_with_condition 处理，以确保条件判断使用正确的值
     block = wrap_filter_with_condition(filter_data, metadata_type)
     
-    write_filter(block, metadata_type)
+    wait_reload, reload_timeout = reload_form_options()
+    try:
+        write_result = apply_filter(block, metadata_type, wait_reload, reload_timeout)
+    except ConfigSyntaxError as e:
+        return jsonify({"ok": False, "message": f"{PIPELINE_PATH} 语法错误，无法定位 filter 块: {e}"})
+    plugin_map = save_plugin_id_map(plugins, "save_filter")
     
     # 构造响应消息
-    message = f"Filter 已保存并自动重载 (已自动添加条件判断: if \"test\" == [@metadata][type])"
+    if write_result["changed"]:
+        message = f"Filter 已保存并自动重载 (已自动添加条件判断: if \"test\" == [@metadata][type])"
+    else:
+        message = "Filter 内容未变化，无需重载"
+    ok, message = reload_status(write_result, message)
     
-    return jsonify({"ok": True, "message": message})
+    return jsonify({"ok": ok, "message": message, "plugin_ids": plugin_map["plugins"] if plugin_map else {},
+                    **write_result})
+
+@app.route("/plugin_ids", methods=["GET"])
+def plugin_ids():
+    """当前配置的插件 id 映射（id → 提交内容行号 / test.conf 行号 / 所在条件分支）"""
+    mapping = load_plugin_id_map()
+    if mapping is None:
+        return jsonify({"ok": False, "message": "当前配置没有对应的插件 id 映射（不是通过 Web 写入的）"})
+    return jsonify({"ok": True, **mapping})
 
 @app.route("/test", methods=["POST"])
+@sandboxed
 def test_send():
     """发送测试日志到 Logstash"""
     body = request.form.get("logs", "")
@@ -275,140 +554,860 @@ def test_send():
     if not body.strip():
         return jsonify({"ok": False, "message": "请输入测试日志内容"})
     
-    req = urllib.request.Request(
-        LOGSTASH_HTTP,
-        data=body.encode("utf-8"),
-        headers={"Content-Type": "application/json" if is_json else "text/plain"},
-        method="POST",
-    )
+    try:
+        timeout = float(request.form.get("timeout", RESULT_WAIT_TIMEOUT))
+    except ValueError:
+        timeout = RESULT_WAIT_TIMEOUT
+    
+    # 为本次提交生成关联 ID，并据此只返回本次提交产生的事件
+    run_id = request.form.get("run_id") or uuid.uuid4().hex
+    body, expected = tag_log_body(body, is_json, run_id)
     
     try:
-        urllib.request.urlopen(req, timeout=3)
+        logstash_client.send(
+            body,
+            "application/json" if is_json else "text/plain",
+            {RUN_ID_HEADER: run_id}
+        )
         send_status = "✅ 日志发送成功"
+        sent = True
     except Exception as e:
         send_status = f"❌ 日志发送失败: {e}"
+        sent = False
     
-    # 简单等待 Logstash flush
-    time.sleep(0.6)
-    
-    # 回读末尾 50 条
-    out = []
-    if os.path.exists(RESULT_FILE):
-        with open(RESULT_FILE, "rb") as f:
-            f.seek(0, os.SEEK_END)
-            size = f.tell()
-            f.seek(max(0, size-200000), os.SEEK_SET)
-            lines = f.read().decode("utf-8", "ignore").splitlines()
-            out = lines[-50:]
-    
-    events = []
-    for line in out:
-        if line.strip():
-            try:
-                events.append(json.loads(line))
-            except:
-                pass
+    # 等待携带本次关联 ID 的事件全部写入（发送失败时不必等待）
+    wait_result = result_reader.wait_for_run(run_id, expected, timeout if sent else 0)
     
     return jsonify({
         "ok": True, 
         "message": send_status,
-        "events": events
+        "run_id": run_id,
+        "expected": expected,
+        "complete": wait_result["complete"],
+        "wait_time": wait_result["waited"],
+        "events": wait_result["events"]
+    })
+
+def tag_log_body(body, is_json, run_id):
+    """
+    为 JSON 日志注入关联 ID 字段，并估算 Logstash 会产生的事件数
+
+    纯文本日志整体作为一个事件（plain codec），关联 ID 通过请求头传递；
+    JSON 数组会被 json codec 拆成多个事件
+
+    Returns:
+        (处理后的请求体, 期望事件数)
+    """
+    if not is_json:
+        return body, 1
+    
+    try:
+        payload = json.loads(body)
+    except json.JSONDecodeError:
+        # 无法解析时原样发送，依赖请求头传递关联 ID
+        return body, 1
+    
+    if isinstance(payload, list):
+        for item in payload:
+            if isinstance(item, dict):
+                item[RUN_ID_FIELD] = run_id
+        return json.dumps(payload, ensure_ascii=False), max(1, len(payload))
+    
+    if isinstance(payload, dict):
+        payload[RUN_ID_FIELD] = run_id
+        return json.dumps(payload, ensure_ascii=False), 1
+    
+    return body, 1
+
+@app.route("/test_bulk", methods=["POST"])
+@sandboxed
+def test_send_bulk():
+    """
+    批量发送测试日志：每行一条日志，按 NDJSON 分批经连接池提交
+
+    表单参数：
+      logs: 多行日志文本（或上传文件 file）；logs_json: 日志字符串的 JSON 数组（可含多行日志）
+      is_json: 为 1 时每行/每项按 JSON 对象解析，否则作为 message 字段
+      batch_size: 每个请求的行数；timeout: 等待结果写入的超时（秒）
+      max_events: 响应中返回的事件数上限（0 表示全部），完整结果可通过 /results?run_id= 获取
+    """
+    is_json = request.form.get("is_json") == "1"
+    
+    lines, error = request_log_lines()
+    if error:
+        return jsonify({"ok": False, "message": error})
+    if len(lines) > BULK_MAX_LINES:
+        return jsonify({"ok": False, "message": f"单次最多提交 {BULK_MAX_LINES} 行日志"})
+    
+    if not pipeline_supports_bulk():
+        return jsonify({
+            "ok": False,
+            "bulk_supported": False,
+            "message": f"当前 Pipeline 的 http input 未配置 \"{NDJSON_CONTENT_TYPE}\" => \"json_lines\" codec，无法批量提交"
+        })
+    
+    try:
+        batch_size = max(1, int(request.form.get("batch_size", BULK_BATCH_SIZE)))
+        max_events = int(request.form.get("max_events", BULK_RESPONSE_EVENTS))
+    except ValueError:
+        return jsonify({"ok": False, "message": "batch_size/max_events 必须是整数"})
+    
+    # 默认超时随行数增加，大批量日志需要更多处理时间
+    try:
+        timeout = float(request.form.get("timeout", RESULT_WAIT_TIMEOUT + len(lines) / 1000.0))
+    except ValueError:
+        timeout = RESULT_WAIT_TIMEOUT
+    
+    run_id = request.form.get("run_id") or uuid.uuid4().hex
+    records, invalid = build_bulk_records(lines, is_json, run_id)
+    
+    stats = logstash_client.send_bulk(records, batch_size, {RUN_ID_HEADER: run_id})
+    
+    # 等待本次全部事件写入（有失败批次时只等待已提交的部分）
+    wait_result = result_reader.wait_for_run(run_id, stats["sent"], timeout if stats["sent"] else 0)
+    events = wait_result["events"]
+    
+    if stats["failed"]:
+        send_status = f"⚠️ 已发送 {stats['sent']} 条，失败 {stats['failed']} 条"
+    else:
+        send_status = f"✅ 已发送 {stats['sent']} 条日志（{stats['batches']} 个请求，{stats['elapsed']}s）"
+    
+    return jsonify({
+        "ok": stats["sent"] > 0,
+        "message": send_status,
+        "run_id": run_id,
+        "expected": stats["sent"],
+        "received": len(events),
+        "complete": wait_result["complete"],
+        "wait_time": wait_result["waited"],
+        "send_time": stats["elapsed"],
+        "batches": stats["batches"],
+        "failed": stats["failed"],
+        "invalid_json": invalid,
+        "errors": stats["errors"],
+        "events": events if max_events <= 0 else events[:max_events],
+        "truncated": 0 < max_events < len(events)
+    })
+
+def request_log_lines(prefix=""):
+    """
+    读取请求中的多行日志：logs_json（JSON 数组）、上传文件 file 或 logs 文本，去掉空行
+
+    Args:
+        prefix: 字段前缀（上传把关的语料为 gate_logs / gate_logs_json，不读取上传文件）
+
+    Returns:
+        (日志列表, 错误信息)
+    """
+    if request.form.get(f"{prefix}logs_json"):
+        try:
+            lines = json.loads(request.form[f"{prefix}logs_json"])
+        except json.JSONDecodeError as e:
+            return None, f"{prefix}logs_json 不是合法的 JSON 数组: {e}"
+        if not isinstance(lines, list):
+            return None, f"{prefix}logs_json 必须是 JSON 数组"
+    elif not prefix and "file" in request.files and request.files["file"].filename:
+        lines = request.files["file"].read().decode("utf-8", "replace").splitlines()
+    else:
+        lines = request.form.get(f"{prefix}logs", "").splitlines()
+    
+    lines = [line for line in lines if not isinstance(line, str) or line.strip()]
+    if not lines:
+        return None, "请输入测试日志内容"
+    return lines, None
+
+def build_bulk_records(lines, is_json, run_id):
+    """
+    把日志行转换为批量提交的记录，每条记录都带关联 ID 字段
+
+    Returns:
+        (记录列表, 无法按 JSON 解析而作为 message 发送的行数)
+    """
+    records = []
+    invalid = 0
+    for line in lines:
+        payload = line
+        if is_json and isinstance(line, str):
+            try:
+                payload = json.loads(line)
+            except json.JSONDecodeError:
+                invalid += 1
+        
+        # 与 json codec 一致：JSON 数组中的每个对象各成为一个事件
+        items = payload if isinstance(payload, list) and payload and all(isinstance(item, dict) for item in payload) else [payload]
+        for item in items:
+            if isinstance(item, dict):
+                record = dict(item)
+            elif isinstance(line, str):
+                record = {"message": line}
+            else:
+                record = {"message": json.dumps(line, ensure_ascii=False)}
+            record[RUN_ID_FIELD] = run_id
+            records.append(record)
+    return records, invalid
+
+def pipeline_supports_bulk():
+    """当前 Pipeline 的 http input 是否能按行拆分 NDJSON 请求体"""
+    try:
+        content = pathlib.Path(PIPELINE_PATH).read_text(encoding="utf-8")
+    except OSError:
+        return False
+    return NDJSON_CONTENT_TYPE in content
+
+@app.route("/profile", methods=["POST"])
+@sandboxed
+def profile_pipeline():
+    """
+    性能分析：批量发送测试日志前后各读取一次插件统计，按插件和条件分支给出耗时排行
+
+    表单参数：
+      logs: 多行日志文本（每行一条）；logs_json: 日志字符串的 JSON 数组；is_json: 为 1 时按 JSON 解析
+      repeat: 日志重复次数（默认重复到至少 PROFILE_MIN_EVENTS 个事件）；top: 排行保留的条数（默认全部）
+    """
+    is_json = request.form.get("is_json") == "1"
+    lines, error = request_log_lines()
+    if error:
+        return jsonify({"ok": False, "message": error})
+    if not pipeline_supports_bulk():
+        return jsonify({"ok": False, "message": f"当前 Pipeline 的 http input 未配置 \"{NDJSON_CONTENT_TYPE}\" => \"json_lines\" codec，无法批量提交"})
+    
+    try:
+        repeat = int(request.form.get("repeat") or -(-PROFILE_MIN_EVENTS // len(lines)))
+        top = int(request.form.get("top", 0))
+    except ValueError:
+        return jsonify({"ok": False, "message": "repeat/top 必须是整数"})
+    repeat = max(1, min(repeat, BULK_MAX_LINES // len(lines)))
+    
+    before = pipeline_profiler.snapshot()
+    if before is None:
+        return jsonify({"ok": False, "message": f"无法读取 Logstash 插件统计（{LOGSTASH_API}），pipeline 可能未运行"})
+    
+    run_id = uuid.uuid4().hex
+    records, invalid = build_bulk_records(lines * repeat, is_json, run_id)
+    stats = logstash_client.send_bulk(records, BULK_BATCH_SIZE, {RUN_ID_HEADER: run_id})
+    wait_result = result_reader.wait_for_run(run_id, stats["sent"], RESULT_WAIT_TIMEOUT + stats["sent"] / 1000.0)
+    # 被 drop 的事件不会写入结果文件，以 pipeline 输出计数为准再等一会儿
+    after = pipeline_profiler.wait_for_output(before, stats["sent"]) or before
+    
+    try:
+        document = load_config(PIPELINE_PATH)
+    except (OSError, ConfigSyntaxError):
+        document = None
+    report = build_report(before, after, document, top or None)
+    # 标注插件在提交内容（编辑框 / 上传文件）中的行号
+    plugin_map = load_plugin_id_map()
+    if plugin_map:
+        for plugin in report["plugins"]:
+            plugin["source_line"] = plugin_map["plugins"].get(plugin["id"], {}).get("source_line")
+    hotspot = next((plugin for plugin in report["plugins"] if plugin["kind"] == "filter"), None)
+    message = f"已分析 {report['events']['in']} 个事件"
+    if report["us_per_event"] is not None:
+        message += f"，平均 {report['us_per_event']} µs/事件"
+    if hotspot:
+        message += f"，最耗时插件 {hotspot['id']} ({hotspot['name']}) 占 filter 耗时 {round((hotspot['share'] or 0) * 100, 1)}%"
+    
+    return jsonify({
+        "ok": stats["sent"] > 0,
+        "message": message,
+        "sent": stats["sent"],
+        "failed": stats["failed"],
+        "invalid_json": invalid,
+        "repeat": repeat,
+        "received": len(wait_result["events"]),
+        "report": report
+    })
+
+def benchmark_options(prefix=""):
+    """
+    表单中的基准测试参数（prefix 为字段前缀，上传把关使用 gate_）
+
+    Returns:
+        (参数字典, 错误信息)
+    """
+    def number(name, cast, default=None):
+        value = request.form.get(prefix + name)
+        return cast(value) if value not in (None, "") else default
+    
+    try:
+        options = {
+            "rate": number("rate", float),
+            "events": number("events", int),
+            "duration": number("duration", float),
+            "batch_size": max(1, number("batch_size", int, 100)),
+            "warmup": min(max(0, number("warmup", int, 0)), BENCHMARK_MAX_EVENTS),
+            "drain_timeout": number("timeout", float, 30)
+        }
+        repeat = number("repeat", int, 1)
+    except ValueError:
+        return None, f"{prefix}rate/events/duration/batch_size/warmup/timeout/repeat 必须是数字"
+    rate, events, duration = options["rate"], options["events"], options["duration"]
+    if rate is not None and rate <= 0:
+        return None, "rate 必须大于 0"
+    if duration is not None and not 0 < duration <= BENCHMARK_MAX_DURATION:
+        return None, f"duration 必须在 0 到 {BENCHMARK_MAX_DURATION:g} 秒之间"
+    if events is not None and not 0 < events <= BENCHMARK_MAX_EVENTS:
+        return None, f"events 必须在 1 到 {BENCHMARK_MAX_EVENTS} 之间"
+    if not 1 <= repeat <= BENCHMARK_MAX_REPEAT:
+        return None, f"repeat 必须在 1 到 {BENCHMARK_MAX_REPEAT} 之间"
+    if duration is None and rate is not None and (events or 0) / rate > BENCHMARK_MAX_DURATION:
+        return None, f"按 {rate:g} 事件/秒发送将超过 {BENCHMARK_MAX_DURATION:g} 秒，请减少事件数"
+    if duration is not None and events is None and rate is None:
+        # 尽可能快地发送指定时长，仍需要事件数上限
+        options["events"] = BENCHMARK_MAX_EVENTS
+    options["repeat"] = repeat
+    return options, None
+
+def benchmark_group(lines, options):
+    """本次基准测试在历史记录中的分组：(语料哈希, 运行参数键)"""
+    plan = PipelineBenchmark.plan(len(lines), options["rate"], options["events"], options["duration"],
+                                  options["batch_size"])
+    probe = {"mode": plan["mode"], "settings": plan, "logstash": logstash_monitor.pipeline_settings()}
+    return corpus_hash(lines), settings_key(probe)
+
+def run_benchmarks(lines, is_json, options):
+    """
+    按 options 执行 repeat 次基准测试，每次结果保存为 JSON 并写入历史
+
+    Returns:
+        结果列表
+    """
+    records, _ = build_bulk_records(lines, is_json, "")
+    try:
+        config_sha256 = load_config(PIPELINE_PATH).sha256
+    except (OSError, ConfigSyntaxError):
+        config_sha256 = None
+    
+    benchmark = PipelineBenchmark(logstash_client, result_reader, logstash_monitor, pipeline_profiler)
+    results = []
+    for _ in range(options["repeat"]):
+        result = benchmark.run(records, rate=options["rate"], events=options["events"], duration=options["duration"],
+                               batch_size=options["batch_size"], warmup=options["warmup"],
+                               drain_timeout=options["drain_timeout"])
+        result["config"] = {"sha256": config_sha256}
+        result["corpus"] = {"lines": len(lines), "sha256": corpus_hash(lines), "is_json": is_json}
+        save_result(result)
+        get_benchmark_history().record(result)
+        results.append(result)
+    return results
+
+def aggregate_benchmarks(results):
+    """多次运行的各指标均值和 95% 置信区间"""
+    return {name: summarize([value for value in (result[section][field] for result in results) if value is not None])
+            for name, ((section, field), _) in METRICS.items()}
+
+@app.route("/benchmark", methods=["POST"])
+@sandboxed
+def benchmark_pipeline():
+    """
+    基准测试：把日志语料循环回放到 http input，测量吞吐量和提交 → 写入结果文件的端到端延迟
+
+    表单参数：
+      logs / logs_json / file: 日志语料（每行一条）；is_json: 为 1 时每行按 JSON 对象解析
+      rate: 目标速率（事件/秒），不填时尽可能快地发送；events: 发送的事件数；duration: 发送时长（秒）
+      batch_size: 每个请求的事件数；warmup: 预热事件数（不计入结果）；timeout: 发送结束后等待结果的秒数
+      repeat: 重复运行次数（用于置信区间和基线比较）；set_baseline: 为 1 时把当前配置保存为该语料和参数下的基线
+    """
+    is_json = request.form.get("is_json") == "1"
+    lines, error = request_log_lines()
+    if error:
+        return jsonify({"ok": False, "message": error})
+    if len(lines) > BULK_MAX_LINES:
+        return jsonify({"ok": False, "message": f"语料最多 {BULK_MAX_LINES} 行"})
+    if not pipeline_supports_bulk():
+        return jsonify({"ok": False, "message": f"当前 Pipeline 的 http input 未配置 \"{NDJSON_CONTENT_TYPE}\" => \"json_lines\" codec，无法批量提交"})
+    options, error = benchmark_options()
+    if error:
+        return jsonify({"ok": False, "message": error})
+    if options["rate"] and options["events"] is None and options["duration"] is None \
+            and len(lines) / options["rate"] > BENCHMARK_MAX_DURATION:
+        return jsonify({"ok": False, "message": f"按 {options['rate']:g} 事件/秒发送将超过 {BENCHMARK_MAX_DURATION:g} 秒，请减少事件数"})
+    
+    results = run_benchmarks(lines, is_json, options)
+    result = results[-1]
+    history = get_benchmark_history()
+    key = settings_key(result)
+    if request.form.get("set_baseline") in ("1", "true"):
+        history.set_baseline(result["corpus"]["sha256"], key, result["config"]["sha256"], request.form.get("label"))
+    comparison = history.compare(result["corpus"]["sha256"], key, result["config"]["sha256"],
+                                 samples=max(options["repeat"], BENCHMARK_COMPARE_SAMPLES),
+                                 min_effect=BENCHMARK_MIN_EFFECT)
+    
+    throughput = result["throughput"]
+    latency = result["latency_ms"]
+    message = f"已发送 {result['sent']} 个事件，吞吐量 {throughput['eps']} 事件/秒，" \
+              f"延迟 p50 {latency['p50']} ms / p99 {latency['p99']} ms，丢失 {result['dropped']} 个"
+    if len(results) > 1:
+        aggregate = aggregate_benchmarks(results)
+        message = f"已运行 {len(results)} 次，吞吐量 {aggregate['eps']['mean']} 事件/秒" \
+                  f"（95% CI {aggregate['eps']['ci']}），p99 {aggregate['p99_ms']['mean']} ms"
+    if comparison["status"] in ("regression", "pass"):
+        message += f"；{comparison['message']}"
+    return jsonify({
+        "ok": result["sent"] > 0,
+        "message": message,
+        "result": result,
+        "runs": [result["id"] for result in results],
+        "aggregate": aggregate_benchmarks(results),
+        "comparison": comparison
     })
 
+def benchmark_gate_request():
+    """
+    上传把关参数：benchmark_gate=1 时以 gate_logs / gate_logs_json 为语料，gate_ 前缀的字段为基准测试参数
+
+    Returns:
+        (把关参数，未开启时为 None, 错误信息)
+    """
+    if request.form.get("benchmark_gate") not in ("1", "true"):
+        return None, None
+    lines, error = request_log_lines("gate_")
+    if error:
+        return None, f"基准测试把关: {error}"
+    if not pipeline_supports_bulk():
+        return None, f"基准测试把关: 当前 Pipeline 的 http input 未配置 \"{NDJSON_CONTENT_TYPE}\" codec"
+    options, error = benchmark_options("gate_")
+    if error:
+        return None, f"基准测试把关: {error}"
+    if not request.form.get("gate_repeat"):
+        options["repeat"] = BENCHMARK_GATE_REPEAT
+    # 置信区间每方至少需要 2 次运行
+    options["repeat"] = max(2, options["repeat"])
+    if options["events"] is None and options["duration"] is None:
+        options["events"] = max(BENCHMARK_GATE_EVENTS, len(lines))
+    return {"lines": lines, "is_json": request.form.get("gate_is_json") == "1", "options": options}, None
+
+def prepare_benchmark_gate(gate):
+    """
+    写入新配置前确定基线：该语料和运行参数下已保存的基线至少有 2 次运行时直接使用；
+    运行不足且当前配置就是基线时补测当前配置；没有基线时测量当前配置并保存为基线
+
+    Returns:
+        错误信息（已保存的基线不是当前配置且运行不足 2 次，无法把关），可以把关时为 None
+    """
+    history = get_benchmark_history()
+    corpus_sha256, key = benchmark_group(gate["lines"], gate["options"])
+    baseline = history.baseline(corpus_sha256, key)
+    gate["baseline_runs"] = []
+    if baseline is not None and len(history.runs(corpus_sha256, key, baseline["config_sha256"])) < 2:
+        try:
+            config_sha256 = load_config(PIPELINE_PATH).sha256
+        except (OSError, ConfigSyntaxError):
+            config_sha256 = None
+        if config_sha256 != baseline["config_sha256"]:
+            # 不能用当前配置替换用户保存的基线
+            return f"基准测试把关: 保存的基线配置 {baseline['config_sha256'][:12]} 在该语料和运行参数下不足 2 次运行，" \
+                   "且不是当前配置；请先对基线配置补充基准测试，或用 /benchmarks/baseline 重新指定基线"
+        results = run_benchmarks(gate["lines"], gate["is_json"], gate["options"])
+        gate["baseline_runs"] = [result["id"] for result in results]
+    elif baseline is None:
+        results = run_benchmarks(gate["lines"], gate["is_json"], gate["options"])
+        key = settings_key(results[-1])
+        baseline = history.set_baseline(corpus_sha256, key, results[-1]["config"]["sha256"], "上传把关前的配置")
+        gate["baseline_runs"] = [result["id"] for result in results]
+    gate["baseline"] = baseline
+    return None
+
+def read_plugin_id_map_file():
+    """PLUGIN_ID_MAP_FILE 的原始内容（不存在时为 None），用于把关回滚时一并恢复"""
+    try:
+        with open(PLUGIN_ID_MAP_FILE, "r", encoding="utf-8") as f:
+            return f.read()
+    except OSError:
+        return None
+
+def restore_plugin_id_map_file(content):
+    try:
+        if content is None:
+            os.unlink(PLUGIN_ID_MAP_FILE)
+        else:
+            write_config_atomic(PLUGIN_ID_MAP_FILE, content)
+    except OSError:
+        pass
+
+def finish_benchmark_gate(gate, previous_conf, previous_plugin_map):
+    """
+    新配置生效后重复测量并与基线比较，显著回归时恢复上传前的配置和插件 id 映射
+
+    Args:
+        previous_plugin_map: 上传前 PLUGIN_ID_MAP_FILE 的内容（read_plugin_id_map_file）
+
+    Returns:
+        {comparison, baseline, baseline_runs, candidate_runs, aggregate, rolled_back[, rollback_reload]}
+    """
+    history = get_benchmark_history()
+    results = run_benchmarks(gate["lines"], gate["is_json"], gate["options"])
+    latest = results[-1]
+    comparison = history.compare(latest["corpus"]["sha256"], settings_key(latest), latest["config"]["sha256"],
+                                 gate["baseline"]["config_sha256"], gate["options"]["repeat"], BENCHMARK_MIN_EFFECT)
+    outcome = {
+        "comparison": comparison,
+        "baseline": gate["baseline"],
+        "baseline_runs": gate["baseline_runs"],
+        "candidate_runs": [result["id"] for result in results],
+        "aggregate": aggregate_benchmarks(results),
+        "rolled_back": False
+    }
+    if comparison["status"] == "regression":
+        baseline = logstash_monitor.snapshot()
+        write_config_atomic(PIPELINE_PATH, previous_conf)
+        restore_plugin_id_map_file(previous_plugin_map)
+        outcome["rolled_back"] = True
+        outcome["rollback_reload"] = logstash_monitor.wait_for_reload(baseline, RELOAD_TIMEOUT)
+    return outcome
+
+@app.route("/benchmarks", methods=["GET"])
+def benchmarks():
+    """最近的基准测试结果摘要"""
+    try:
+        limit = int(request.args.get("limit", 50))
+    except ValueError:
+        limit = 50
+    return jsonify({"ok": True, "results": list_results(limit=limit)})
+
+@app.route("/benchmarks/history", methods=["GET"])
+def benchmark_history_groups():
+    """按 (语料, 运行参数, 配置) 汇总的历史运行次数及各组的基线"""
+    return jsonify({"ok": True, "groups": get_benchmark_history().groups()})
+
+def benchmark_reference():
+    """按 run_id 参数（默认最近一次）取基准测试结果，用于确定语料和运行参数"""
+    run_id = request.values.get("run_id")
+    if not run_id:
+        latest = list_results(limit=1)
+        run_id = latest[0]["id"] if latest else None
+    return load_result(run_id) if run_id else None
+
+@app.route("/benchmarks/baseline", methods=["POST"])
+def set_benchmark_baseline():
+    """
+    保存基线：run_id 对应运行（默认最近一次）的配置成为同一语料、同一运行参数下的基线
+
+    表单参数：run_id；label: 基线说明
+    """
+    result = benchmark_reference()
+    if result is None:
+        return jsonify({"ok": False, "message": "没有可作为基线的基准测试结果"}), 404
+    baseline = get_benchmark_history().set_baseline(result["corpus"]["sha256"], settings_key(result),
+                                                    result["config"]["sha256"], request.form.get("label"))
+    return jsonify({"ok": True, "message": f"已将配置 {result['config']['sha256'][:12]} 保存为基线", "baseline": baseline})
+
+@app.route("/benchmarks/compare", methods=["GET"])
+def compare_benchmark():
+    """
+    与基线比较：run_id 对应运行（默认最近一次）的配置在同一语料、同一运行参数下的最近几次结果
+
+    查询参数：run_id；baseline_config: 基线配置哈希（默认保存的基线）；samples: 每方取最近几次；min_effect: 最小相对变化
+    """
+    result = benchmark_reference()
+    if result is None:
+        return jsonify({"ok": False, "message": "没有可比较的基准测试结果"}), 404
+    try:
+        samples = int(request.args.get("samples", BENCHMARK_COMPARE_SAMPLES))
+        min_effect = float(request.args.get("min_effect", BENCHMARK_MIN_EFFECT))
+    except ValueError:
+        return jsonify({"ok": False, "message": "samples/min_effect 必须是数字"})
+    comparison = get_benchmark_history().compare(result["corpus"]["sha256"], settings_key(result),
+                                                 result["config"]["sha256"], request.args.get("baseline_config"),
+                                                 samples, min_effect)
+    return jsonify({"ok": comparison["status"] != "regression", "message": comparison["message"],
+                    "comparison": comparison})
+
+def sweep_values(name, default):
+    """逗号分隔的正整数列表（去重并保持顺序）"""
+    text = request.form.get(name) or default
+    values = []
+    for item in text.split(","):
+        if not item.strip():
+            continue
+        value = int(item)
+        if value <= 0:
+            raise ValueError(item)
+        if value not in values:
+            values.append(value)
+    return values
+
+def restart_logstash():
+    """通过 Docker socket 重启 Logstash 容器（热重载未应用 pipelines.yml 的变化时使用）"""
+    DockerEngineClient().restart_container(LOGSTASH_CONTAINER)
+
+@app.route("/benchmark/sweep", methods=["POST"])
+@sandboxed
+def sweep_pipeline_settings():
+    """
+    参数扫描：按 workers × batch_sizes × batch_delays 的网格逐组改写 pipelines.yml，每组用同一语料执行基准测试，
+    返回吞吐量/延迟曲面和推荐参数，结束后恢复原来的 pipelines.yml
+
+    表单参数：
+      logs / logs_json / file / is_json: 日志语料（同 /benchmark）
+      workers / batch_sizes / batch_delays: 逗号分隔的取值（默认 1,2,4 / 125,250,500 / 不改动 batch.delay）
+      rate / events / duration / batch_size / warmup / timeout / repeat: 每组的基准测试参数（同 /benchmark，
+        默认每组 SWEEP_REPEAT 次、SWEEP_EVENTS 个事件、预热 SWEEP_WARMUP 个事件）
+      restart: 为 1 时每组都重启 Logstash（默认只在热重载未生效时重启）；keep: 为 1 时保留推荐参数
+      max_p99_ms: 推荐参数的 p99 延迟上限；min_effect: 吞吐量视为无差异的相对差距（默认 BENCHMARK_MIN_EFFECT）
+    """
+    is_json = request.form.get("is_json") == "1"
+    lines, error = request_log_lines()
+    if error:
+        return jsonify({"ok": False, "message": error})
+    if len(lines) > BULK_MAX_LINES:
+        return jsonify({"ok": False, "message": f"语料最多 {BULK_MAX_LINES} 行"})
+    if not pipeline_supports_bulk():
+        return jsonify({"ok": False, "message": f"当前 Pipeline 的 http input 未配置 \"{NDJSON_CONTENT_TYPE}\" => \"json_lines\" codec，无法批量提交"})
+    if not os.path.exists(PIPELINES_YML):
+        return jsonify({"ok": False, "message": f"找不到 {PIPELINES_YML}，请在 docker-compose 中把 logstash/pipelines.yml 挂载到 Web 容器"})
+    try:
+        grid = sweep_grid(sweep_values("workers", "1,2,4"), sweep_values("batch_sizes", "125,250,500"),
+                          sweep_values("batch_delays", ""))
+        max_p99_ms = float(request.form["max_p99_ms"]) if request.form.get("max_p99_ms") else None
+        min_effect = float(request.form.get("min_effect") or BENCHMARK_MIN_EFFECT)
+    except ValueError:
+        return jsonify({"ok": False, "message": "workers/batch_sizes/batch_delays 必须是逗号分隔的正整数，max_p99_ms/min_effect 必须是数字"})
+    if len(grid) > SWEEP_MAX_POINTS:
+        return jsonify({"ok": False, "message": f"参数组合 {len(grid)} 组，最多 {SWEEP_MAX_POINTS} 组"})
+    options, error = benchmark_options()
+    if error:
+        return jsonify({"ok": False, "message": error})
+    if not request.form.get("repeat"):
+        options["repeat"] = SWEEP_REPEAT
+    if not request.form.get("warmup"):
+        options["warmup"] = SWEEP_WARMUP
+    if options["events"] is None and options["duration"] is None:
+        options["events"] = max(SWEEP_EVENTS, len(lines))
+    
+    sweeper = PipelineSweep(logstash_monitor, restart=restart_logstash if os.path.exists("/var/run/docker.sock") else None)
+    try:
+        sweep = sweeper.run(grid, lambda settings: run_benchmarks(lines, is_json, options),
+                            restart=request.form.get("restart") in ("1", "true"), min_effect=min_effect,
+                            max_p99_ms=max_p99_ms, keep=request.form.get("keep") in ("1", "true"))
+    except ValueError as e:
+        return jsonify({"ok": False, "message": str(e)})
+    try:
+        sweep["config"] = {"sha256": load_config(PIPELINE_PATH).sha256}
+    except (OSError, ConfigSyntaxError):
+        sweep["config"] = {"sha256": None}
+    sweep["corpus"] = {"lines": len(lines), "sha256": corpus_hash(lines), "is_json": is_json}
+    sweep["options"] = options
+    save_sweep(sweep)
+    
+    recommendation = sweep["recommendation"]
+    if recommendation:
+        settings = recommendation["settings"]
+        message = f"已扫描 {len(grid)} 组参数，推荐 pipeline.workers={settings['workers']} " \
+                  f"pipeline.batch.size={settings['batch_size']}"
+        if settings["batch_delay"] is not None:
+            message += f" pipeline.batch.delay={settings['batch_delay']}"
+        message += f"：吞吐量 {recommendation['eps']} 事件/秒，p99 {recommendation['p99_ms']} ms"
+        if recommendation.get("speedup"):
+            message += f"（原参数的 {recommendation['speedup']} 倍）"
+    else:
+        message = f"已扫描 {len(grid)} 组参数，没有可推荐的参数（各组均未生效或丢失事件）"
+    return jsonify({"ok": recommendation is not None, "message": message, "sweep": sweep})
+
+@app.route("/benchmarks/sweeps", methods=["GET"])
+def benchmark_sweeps():
+    """最近的参数扫描摘要"""
+    return jsonify({"ok": True, "sweeps": list_sweeps()})
+
+@app.route("/benchmarks/sweeps/<sweep_id>", methods=["GET"])
+def benchmark_sweep(sweep_id):
+    sweep = load_sweep(sweep_id)
+    if sweep is None:
+        return jsonify({"ok": False, "message": f"参数扫描 {sweep_id} 不存在"}), 404
+    return jsonify({"ok": True, "sweep": sweep})
+
+@app.route("/benchmarks/<result_id>", methods=["GET"])
+def benchmark_result(result_id):
+    result = load_result(result_id)
+    if result is None:
+        return jsonify({"ok": False, "message": f"基准测试结果 {result_id} 不存在"}), 404
+    return jsonify({"ok": True, "result": result})
+
 @app.route("/clear_results", methods=["POST"])
+@sandboxed
 def clear_results():
-    """清空结果文件"""
+    """清空结果文件及所有历史分段"""
     try:
         if os.path.exists(RESULT_FILE):
             open(RESULT_FILE, 'w').close()
+        result_reader.reset()
         return jsonify({"ok": True, "message": "结果已清空"})
     except Exception as e:
         return jsonify({"ok": False, "message": f"清空失败: {e}"})
 
 @app.route("/get_parsed_results", methods=["GET"])
 def get_parsed_results():
-    """获取最新的解析记录"""
+    """获取最新的解析记录；带 since 参数时按游标分页"""
     try:
-        events = []
         current_time = time.strftime("%Y-%m-%d %H:%M:%S")
+        since = request.args.get("since", type=int)
         
-        if os.path.exists(RESULT_FILE):
-            with open(RESULT_FILE, "rb") as f:
-                f.seek(0, os.SEEK_END)
-                size = f.tell()
-                f.seek(max(0, size-500000), os.SEEK_SET)  # 读取最后 500KB
-                lines = f.read().decode("utf-8", "ignore").splitlines()
-                
-                # 获取最新的 50 条记录
-                recent_lines = lines[-50:] if len(lines) > 50 else lines
-                
-                for line in recent_lines:
-                    if line.strip():
-                        try:
-                            event = json.loads(line)
-                            # 添加时间戳信息
-                            if '@timestamp' in event:
-                                event['_parsed_time'] = current_time
-                            events.append(event)
-                        except json.JSONDecodeError:
-                            # 跳过无效的 JSON 行
-                            continue
+        if since is not None:
+            # 游标分页：since 为事件序号，返回 next_cursor 供下一页使用
+            limit = min(request.args.get("limit", RESULT_PAGE_LIMIT, type=int), RESULT_PAGE_LIMIT)
+            page = result_reader.read_page(since, limit)
+            events = page["events"]
+        else:
+            page = None
+            # 获取最新的 50 条记录（增量读取，跳过无效的 JSON 行）
+            events = result_reader.recent_events(50)
         
-        return jsonify({
+        for event in events:
+            # 添加时间戳信息
+            if '@timestamp' in event:
+                event['_parsed_time'] = current_time
+        
+        response = {
             "ok": True, 
             "events": events,
             "count": len(events),
             "message": f"成功获取 {len(events)} 条解析记录"
-        })
+        }
+        if page is not None:
+            response.update({
+                "cursor": page["cursor"],
+                "next_cursor": page["next_cursor"],
+                "total": page["total"],
+                "first_cursor": page["first_cursor"],
+                "generation": page["generation"],
+                "has_more": page["next_cursor"] < page["total"]
+            })
+        return jsonify(response)
         
     except Exception as e:
         return jsonify({"ok": False, "message": f"获取解析记录失败: {e}"})
 
+@app.route("/results", methods=["GET"])
+def stream_results():
+    """
+    以 NDJSON 流式返回解析结果（chunked 传输）
+    
+    since 为事件序号游标，limit 为本次最多返回的事件数；下一页游标在响应头 X-Next-Cursor 中。
+    传入 generation 且与当前不一致时（结果已被清空），返回 409 提示客户端从 0 重新开始。
+    传入 run_id 时只返回该关联 ID 的事件（通过分段索引定位）。
+    """
+    run_id = request.args.get("run_id")
+    if run_id:
+        events = result_reader.events_for_run(run_id)
+        body = "".join(json.dumps(event, ensure_ascii=False) + "\n" for event in events)
+        return Response(
+            body,
+            mimetype="application/x-ndjson",
+            headers={"X-Total-Events": str(len(events)), "Cache-Control": "no-cache"}
+        )
+    
+    since = request.args.get("since", 0, type=int)
+    limit = min(request.args.get("limit", RESULT_STREAM_LIMIT, type=int), RESULT_STREAM_LIMIT)
+    generation = request.args.get("generation", type=int)
+    
+    page = result_reader.page(since, limit)
+    if generation is not None and generation != page["generation"]:
+        result_reader.close_page(page)
+        return jsonify({
+            "ok": False,
+            "reset": True,
+            "generation": page["generation"],
+            "message": "结果文件已被清空或替换，请从 since=0 重新读取"
+        }), 409
+    
+    response = Response(
+        result_reader.iter_page_bytes(page),
+        mimetype="application/x-ndjson",
+        headers={
+            "X-Cursor": str(page["cursor"]),
+            "X-Next-Cursor": str(page["next_cursor"]),
+            "X-First-Cursor": str(page["first_cursor"]),
+            "X-Total-Events": str(page["total"]),
+            "X-Result-Generation": str(page["generation"]),
+            "Cache-Control": "no-cache"
+        }
+    )
+    # 客户端在开始读取前断开时生成器不会执行，由这里关闭文件
+    response.call_on_close(lambda: result_reader.close_page(page))
+    return response
+
+@app.route("/results/<int:seq>", methods=["GET"])
+def get_result_event(seq):
+    """按全局序号读取单个事件（偏移量索引直接定位）"""
+    event = result_reader.read_event(seq)
+    if event is None:
+        return jsonify({"ok": False, "message": f"事件 {seq} 不存在或已被淘汰"}), 404
+    return jsonify({"ok": True, "seq": seq, "event": event})
+
+@app.route("/results/stats", methods=["GET"])
+def result_store_stats():
+    """结果存储状态：活动文件、分段数量和总大小"""
+    return jsonify({"ok": True, "stats": result_reader.stats()})
+
+# Logstash 日志：log.format: json 时写 logstash-json.log，text 格式时写 logstash-plain.log
+LOGSTASH_LOG_PATHS = [
+    "/app/data/../logs/logstash-json.log",
+    "/app/data/../logs/logstash-plain.log",    # 通过挂载访问
+    "/app/data/../logs/logstash.log",
+    "/logs/logstash-json.log",
+    "/logs/logstash-plain.log",                # 直接日志挂载
+    "/logs/logstash.log"
+]
+LOGSTASH_CONTAINER = os.getenv("LOGSTASH_CONTAINER", "logstash-lab")
+# 后台日志跟踪器（首次查看日志时启动）：优先跟踪日志文件，没有文件时通过 Docker socket 跟踪容器日志
+log_follower = None
+
+def get_log_follower():
+    global log_follower
+    if log_follower is None:
+        log_path = next((path for path in LOGSTASH_LOG_PATHS if os.path.exists(path)), None)
+        if log_path:
+            source = FileLogSource(log_path)
+        elif os.path.exists("/var/run/docker.sock"):
+            source = ContainerLogSource(LOGSTASH_CONTAINER)
+        else:
+            return None
+        log_follower = LogFollower(source).start()
+    return log_follower
+
 @app.route("/logstash_logs", methods=["GET"])
 def logstash_logs():
-    """获取 Logstash 日志"""
+    """
+    获取 Logstash 日志
+
+    查询参数：lines（最近条数，默认 100）、level=error（只看 ERROR/FATAL，不限于最近 lines 条）、
+    since（Unix 秒，或 run_start 表示本次 Logstash 启动以来）
+    """
     try:
         logs_content = []
         current_time = time.strftime("%Y-%m-%d %H:%M:%S")
+        lines = request.args.get("lines", 100, type=int)
+        errors_only = request.args.get("level", "").lower() == "error"
+        since = request.args.get("since")
         
-        # 定义可能的日志文件路径
-        log_paths = [
-            "/app/data/../logs/logstash-plain.log",    # 通过挂载访问
-            "/app/data/../logs/logstash.log",
-            "/logs/logstash-plain.log",                # 直接日志挂载
-            "/logs/logstash.log"
-        ]
-        
-        # 尝试读取日志文件
-        log_file_found = False
-        for log_path in log_paths:
-            if os.path.exists(log_path):
-                log_file_found = True
-                try:
-                    with open(log_path, 'r', encoding='utf-8', errors='ignore') as f:
-                        # 读取最后 100 行
-                        lines = f.readlines()
-                        recent_lines = lines[-100:] if len(lines) > 100 else lines
-                        
-                        logs_content.append(f"📋 Logstash 日志文件: {log_path}")
-                        logs_content.append(f"📅 读取时间: {current_time}")
-                        logs_content.append(f"📊 显示最近 {len(recent_lines)} 条日志")
-                        logs_content.append("=" * 80)
-                        logs_content.extend([line.rstrip() for line in recent_lines])
-                        break
-                        
-                except Exception as e:
-                    logs_content.append(f"❌ 读取日志文件失败: {e}")
-                    continue
+        # 从后台跟踪器的内存缓冲区读取
+        logs_found = False
+        follower = get_log_follower()
+        if follower is not None:
+            follower.wait_ready(timeout=10)
+            if since == "run_start":
+                since = follower.run_started_at
+            elif since is not None:
+                since = float(since)
+            records = follower.errors(since, lines) if errors_only else follower.tail(lines, since)
+            if records or follower.connected:
+                logs_found = True
+                logs_content.append(f"📋 Logstash 日志: {follower.source.name}")
+                logs_content.append(f"📅 读取时间: {current_time}")
+                logs_content.append(f"📊 显示最近 {len(records)} 条{'错误' if errors_only else ''}日志")
+                logs_content.append("=" * 80)
+                logs_content.extend(format_record(record) for record in records)
         
-        # 如果没有找到日志文件，尝试通过 MCP 服务获取容器日志
-        if not log_file_found:
+        # 跟踪器不可用时，尝试通过 MCP 服务获取容器日志
+        if not logs_found:
             try:
                 import requests
                 
                 # 调用 MCP 服务的日志获取 API
                 mcp_url = "http://mcp-server:19001/tools/get_logstash_logs"
-                response = requests.get(mcp_url, timeout=30)
+                params = {"filter_errors": str(errors_only).lower(), "lines": lines}
+                if request.args.get("since"):
+                    params["since"] = request.args.get("since")
+                response = requests.get(mcp_url, params=params, timeout=30)
                 
                 if response.status_code == 200:
                     mcp_result = response.json()
@@ -466,7 +1465,7 @@ def logstash_logs():
                         f"📅 当前时间: {current_time}",
                         "",
                         "❌ 无法获取 Logstash 日志，可能的原因：",
-                        f"• Docker 命令错误: {docker_error}",
+                        f"• MCP 服务错误: {mcp_error}",
                         f"• API 访问错误: {api_error}",
                         "",
                         "🔧 请在宿主机上手动查看日志：",
@@ -482,133 +1481,25 @@ def logstash_logs():
         return jsonify({"ok": False, "message": f"获取日志失败: {e}"})
 
 def extract_filter_from_pipeline(pipeline_content):
-    """从 pipeline 配置中提取 filter 块内容"""
-    lines = pipeline_content.split('\n')
-    filter_blocks = []
-    current_block = []
-    in_filter_block = False
-    bracket_count = 0
-    in_string = False
-    escape_next = False
-    
-    for i, line in enumerate(lines):
-        stripped = line.strip()
-        
-        # 跳过空行和注释
-        if not stripped or stripped.startswith('#'):
-            if in_filter_block:
-                current_block.append(line)
-            continue
-        
-        # 检查是否是 filter 块的开始
-        if stripped.startswith('filter') and '{' in stripped and not in_filter_block:
-            in_filter_block = True
-            current_block = [line]
-            bracket_count = 0
-            
-            # 计算这一行的括号
-            for char in stripped:
-                if escape_next:
-                    escape_next = False
-                    continue
-                if char == '\\':
-                    escape_next = True
-                    continue
-                if char == '"' and not escape_next:
-                    in_string = not in_string
-                if not in_string:
-                    if char == '{':
-                        bracket_count += 1
-                    elif char == '}':
-                        bracket_count -= 1
-            
-            if bracket_count == 0:
-                # 单行 filter 块
-                filter_blocks.append('\n'.join(current_block))
-                in_filter_block = False
-                current_block = []
-        elif in_filter_block:
-            current_block.append(line)
-            
-            # 计算这一行的括号
-            for char in line:
-                if escape_next:
-                    escape_next = False
-                    continue
-                if char == '\\':
-                    escape_next = True
-                    continue
-                if char == '"' and not escape_next:
-                    in_string = not in_string
-                if not in_string:
-                    if char == '{':
-                        bracket_count += 1
-                    elif char == '}':
-                        bracket_count -= 1
-            
-            # 检查是否结束
-            if bracket_count == 0:
-                filter_blocks.append('\n'.join(current_block))
-                in_filter_block = False
-                current_block = []
-    
-    return filter_blocks
+    """
+    从 pipeline 配置中提取全部 filter 块
+
+    Raises:
+        ConfigSyntaxError: 配置有语法错误
+    """
+    document = parse_config(pipeline_content)
+    return [document.source(section) for section in document.sections_of("filter")]
 
 def extract_main_filter_content(filter_block):
     """从 filter 块中提取主要内容（去除外层 filter {} 包装）"""
-    lines = filter_block.split('\n')
-    content_lines = []
-    found_opening = False
-    bracket_count = 0
-    in_string = False
-    escape_next = False
-    
-    for line in lines:
-        stripped = line.strip()
-        
-        if not found_opening:
-            if stripped.startswith('filter') and '{' in stripped:
-                found_opening = True
-                # 提取 { 后面的内容
-                brace_pos = line.find('{')
-                after_brace = line[brace_pos + 1:].strip()
-                if after_brace:
-                    content_lines.append(after_brace)
-                continue
-            continue
-        
-        # 计算括号层级
-        line_bracket_count = bracket_count
-        for char in line:
-            if escape_next:
-                escape_next = False
-                continue
-            if char == '\\':
-                escape_next = True
-                continue
-            if char == '"' and not escape_next:
-                in_string = not in_string
-            if not in_string:
-                if char == '{':
-                    bracket_count += 1
-                elif char == '}':
-                    bracket_count -= 1
-        
-        # 如果这一行结束后括号平衡了，说明这是最后一行
-        if bracket_count < 0:
-            # 去除最后的 }
-            brace_pos = line.rfind('}')
-            if brace_pos >= 0:
-                before_brace = line[:brace_pos].rstrip()
-                if before_brace:
-                    content_lines.append(before_brace)
-            break
-        else:
-            content_lines.append(line)
-    
-    return '\n'.join(content_lines)
+    document = parse_config(filter_block)
+    filters = document.sections_of("filter")
+    if not filters:
+        return ""
+    return document.body(filters[0]).strip('\n').rstrip()
 
 @app.route("/upload_pipeline", methods=["POST"])
+@sandboxed
 def upload_pipeline():
     """接收 pipeline 配置文件，提取 filter 并应用到测试环境"""
     try:
@@ -628,8 +1519,14 @@ def upload_pipeline():
         if not pipeline_content.strip():
             return jsonify({"ok": False, "message": "Pipeline 内容为空"})
         
+        # 没有 id 的插件注入确定性 id（注入在同一行，行号与上传的文件一致）
+        pipeline_content, plugins = prepare_plugin_ids(pipeline_content)
+        
         # 提取 filter 块
-        filter_blocks = extract_filter_from_pipeline(pipeline_content)
+        try:
+            filter_blocks = extract_filter_from_pipeline(pipeline_content)
+        except ConfigSyntaxError as e:
+            return jsonify({"ok": False, "message": f"Pipeline 语法错误: {e}", "line": e.line, "column": e.column})
         
         if not filter_blocks:
             return jsonify({"ok": False, "message": "未在 pipeline 中找到 filter 块"})
@@ -649,14 +1546,48 @@ def upload_pipeline():
         # 包装 filter 内容
         block = wrap_filter_with_condition(filter_content, metadata_type)
         
-        # 写入配置文件
-        write_filter(block, metadata_type)
+        # 基准测试把关：写入前确定基线（没有基线时先测量当前配置并保存为基线）
+        gate, error = benchmark_gate_request()
+        if error:
+            return jsonify({"ok": False, "message": error})
+        if gate:
+            with open(PIPELINE_PATH, "r", encoding="utf-8") as f:
+                previous_conf = f.read()
+            previous_plugin_map = read_plugin_id_map_file()
+            error = prepare_benchmark_gate(gate)
+            if error:
+                return jsonify({"ok": False, "message": error})
+        
+        # 写入配置文件（wait_reload=1 时等待热重载完成，把关时总是等待）
+        wait_reload, reload_timeout = reload_form_options()
+        write_result = apply_filter(block, metadata_type, wait_reload or gate is not None, reload_timeout)
+        plugin_map = save_plugin_id_map(plugins, "upload_pipeline")
+        
+        if write_result["changed"]:
+            message = "Pipeline 已成功上传并应用到测试环境"
+        else:
+            message = "Pipeline filter 与当前配置相同，无需重载"
+        ok, message = reload_status(write_result, message)
+        
+        gate_result = None
+        if gate and ok and write_result["changed"]:
+            gate_result = finish_benchmark_gate(gate, previous_conf, previous_plugin_map)
+            comparison = gate_result["comparison"]
+            if gate_result["rolled_back"]:
+                ok = False
+                plugin_map = load_plugin_id_map()
+                message = f"基准测试把关未通过，已恢复上传前的配置：{comparison['message']}"
+            else:
+                message += f"；基准测试把关：{comparison['message']}"
         
         return jsonify({
-            "ok": True, 
-            "message": f"Pipeline 已成功上传并应用到测试环境",
+            "ok": ok, 
+            "message": message,
             "extracted_filters": len(filter_blocks),
-            "applied_filter_preview": filter_content[:200] + "..." if len(filter_content) > 200 else filter_content
+            "applied_filter_preview": filter_content[:200] + "..." if len(filter_content) > 200 else filter_content,
+            "plugin_ids": plugin_map["plugins"] if plugin_map else {},
+            "benchmark_gate": gate_result,
+            **write_result
         })
         
     except Exception as e:
@@ -707,8 +1638,6 @@ def validate_pipeline():
             # 2. 如果 MCP 服务不可用，尝试本地验证（如果有 Docker CLI）
             try:
                 # 导入验证工具
-                import sys
-                sys.path.append('/app/utils')
                 from pipeline_validator import validate_pipeline_config
                 
                 # 验证配置
@@ -722,7 +1651,8 @@ def validate_pipeline():
                         "success": validation_result["success"],
                         "errors": validation_result["errors"],
                         "warnings": validation_result["warnings"],
-                        "validation_time": validation_result["validation_time"]
+                        "validation_time": validation_result["validation_time"],
+                        "cache_hit": validation_result.get("cache_hit", False)
                     },
                     "raw_output": validation_result["raw_output"]
                 }
@@ -758,6 +1688,47 @@ def validate_pipeline():
             }
         })
 
+@app.route("/validate_pipelines", methods=["POST"])
+def validate_pipelines():
+    """批量验证多个 Pipeline 配置（一个 Logstash 进程），错误按文件名返回"""
+    try:
+        files = request.files.getlist('files')
+        if files:
+            configs = {}
+            for file in files:
+                if file.filename:
+                    configs[file.filename] = file.read().decode('utf-8')
+        elif request.is_json:
+            items = (request.get_json() or {}).get("configs", [])
+            configs = {str(item.get("name") or f"config_{index + 1}"): item.get("content", "")
+                       for index, item in enumerate(items)}
+        else:
+            return jsonify({"ok": False, "message": "未提供配置（files 多文件上传或 JSON configs）"})
+        
+        if not configs:
+            return jsonify({"ok": False, "message": "配置列表为空"})
+        
+        from pipeline_validator import validate_pipeline_configs
+        report = validate_pipeline_configs(configs)
+        summary = report["summary"]
+        return jsonify({
+            "ok": report["success"],
+            "message": f"共 {summary['total']} 个配置，通过 {summary['passed']} 个，失败 {summary['failed']} 个",
+            "summary": summary,
+            "results": [{
+                "name": item["name"],
+                "success": item["success"],
+                "errors": item["errors"],
+                "warnings": item["warnings"],
+                "validation_time": item["validation_time"],
+                "cache_hit": item.get("cache_hit", False)
+            } for item in report["results"]],
+            "validation_time": report["validation_time"]
+        })
+    
+    except Exception as e:
+        return jsonify({"ok": False, "message": f"批量验证出错: {str(e)}"})
+
 if __name__ == "__main__":
     # 初始化：确保目录存在
     os.makedirs(os.path.dirname(PIPELINE_PATH), exist_ok=True)